@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Pizzaria, UsuarioPizzaria
+from .models import MetricaDesempenho, Pizzaria, UsuarioPizzaria
 
 
 @admin.register(Pizzaria)
@@ -24,3 +24,17 @@ class UsuarioPizzariaAdmin(admin.ModelAdmin):
         "usuario__email",
         "pizzaria__nome",
     )
+
+
+@admin.register(MetricaDesempenho)
+class MetricaDesempenhoAdmin(admin.ModelAdmin):
+    list_display = ("view_nome", "periodo_inicio", "requisicoes", "atualizado_em")
+    list_filter = ("periodo_inicio",)
+    search_fields = ("view_nome",)
+    readonly_fields = (
+        "latencia_us",
+        "consultas",
+        "tempo_sql_us",
+        "consultas_duplicadas",
+        "tamanho_resposta",
+    )
@@ -11,4 +11,7 @@ urlpatterns = [
     
     # Dashboard
     path('dashboard/super-admin/', api_views.DashboardSuperAdminView.as_view(), name='dashboard_super_admin'),
+
+    # Desempenho
+    path('desempenho/', api_views.DesempenhoViewsView.as_view(), name='desempenho_views'),
 ]
@@ -4,6 +4,11 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .desempenho import PERCENTIS, estatisticas_por_view, gravar_pendentes, horas_retencao, perfilamento_ativo
 from .models import Pizzaria, UsuarioPizzaria
 from .forms import PizzariaForm
 
@@ -41,7 +46,7 @@ class PizzariasListView(APIView):
     
     def get(self, request):
         """Lista todas as pizzarias (apenas Super Admin)"""
-        usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+        usuario_pizzaria = request.tenant.usuario_pizzaria
 
         if not usuario_pizzaria:
             return Response({
@@ -127,7 +132,7 @@ class PizzariaCreateView(APIView):
     
     def post(self, request):
         """Cadastra uma nova pizzaria (apenas Super Admin)"""
-        usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+        usuario_pizzaria = request.tenant.usuario_pizzaria
 
         if not usuario_pizzaria:
             return Response({
@@ -200,7 +205,7 @@ class PizzariaDetailView(APIView):
     
     def get(self, request, pizzaria_id):
         """Exibe os detalhes de uma pizzaria específica"""
-        usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+        usuario_pizzaria = request.tenant.usuario_pizzaria
 
         if not usuario_pizzaria:
             return Response({
@@ -260,7 +265,7 @@ class DashboardSuperAdminView(APIView):
             # Superusuário Django tem acesso total
             pass
         else:
-            usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+            usuario_pizzaria = request.tenant.usuario_pizzaria
             if not usuario_pizzaria or not usuario_pizzaria.is_super_admin():
                 return Response({
                     'error': 'Permissão negada. Apenas Super Admin pode acessar.'
@@ -279,3 +284,81 @@ class DashboardSuperAdminView(APIView):
             'total_super_admins': total_super_admins,
             'total_donos': total_donos,
         })
+
+
+_percentis_schema = {
+    'type': 'object',
+    'properties': {f'p{percentual}': {'type': 'number', 'nullable': True} for percentual in PERCENTIS},
+}
+
+
+@extend_schema(
+    tags=['autenticacao'],
+    summary='Desempenho por view',
+    description=(
+        'Percentis (p50/p95/p99) de latência, consultas SQL, tempo de SQL, consultas '
+        'duplicadas (N+1) e tamanho da resposta por view, medidos pelo perfilamento opt-in. '
+        'Ordenado pelo p95 da latência.'
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='horas',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description='Janela em horas (padrão: 24, máximo: a retenção das métricas)'
+        ),
+    ],
+    responses={
+        200: {
+            'description': 'Estatísticas por view',
+            'type': 'object',
+            'properties': {
+                'perfilamento_ativo': {'type': 'boolean'},
+                'horas': {'type': 'integer'},
+                'views': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'view': {'type': 'string'},
+                            'requisicoes': {'type': 'integer'},
+                            'latencia_ms': _percentis_schema,
+                            'consultas': _percentis_schema,
+                            'tempo_sql_ms': _percentis_schema,
+                            'consultas_duplicadas': _percentis_schema,
+                            'tamanho_bytes': _percentis_schema,
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'Parâmetro horas inválido'},
+        403: {'description': 'Acesso negado - apenas Super Admins'},
+    }
+)
+class DesempenhoViewsView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Retorna os percentis de desempenho por view"""
+        if not request.user.is_superuser and not request.tenant.is_super_admin():
+            return Response({
+                'error': 'Permissão negada. Apenas Super Admin pode acessar.'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        try:
+            horas = int(request.query_params.get('horas', 24))
+        except ValueError:
+            horas = 0
+        if not 1 <= horas <= horas_retencao():
+            return Response({'error': 'Parâmetro horas inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Inclui as medidas ainda em memória neste processo
+        if perfilamento_ativo():
+            gravar_pendentes()
+
+        return Response({
+            'perfilamento_ativo': perfilamento_ativo(),
+            'horas': horas,
+            'views': estatisticas_por_view(timezone.now() - timedelta(hours=horas)),
+        })
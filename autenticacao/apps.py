@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AutenticacaoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'autenticacao'
+
+    def ready(self):
+        """Registra os sinais quando o app é carregado."""
+        import autenticacao.signals  # noqa: F401
@@ -0,0 +1,57 @@
+"""Requisições condicionais (``ETag``/``Last-Modified``) nas leituras repetidas.
+
+PDVs e a tela da cozinha consultam as mesmas listas e pedidos o tempo
+todo. A versão do recurso é calculada sem montar as linhas: ``COUNT`` e
+``MAX`` da coluna de atualização em uma consulta agregada
+(``versao_linhas``). Versões mantidas só em cache, como a do cardápio, não
+bastam sozinhas: com um cache local ao processo, um worker que não viu a
+alteração responderia 304 indefinidamente. Se o cliente já tem essa versão (``If-None-Match``/``If-Modified-Since``), a
+resposta é um 304 sem corpo.
+
+Listagens mandam só o ``ETag``: uma exclusão não muda o ``MAX`` da coluna,
+então ``Last-Modified`` acompanha apenas as leituras de uma linha. Escritas
+em lote (``update()``) precisam gravar a coluna de atualização, como já
+fazem as do estoque e do resumo de vendas.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def versao_linhas(consulta, *campos_atualizacao):
+    """``(quantidade, ultima alteração de cada campo)`` das linhas, em uma consulta agregada.
+
+    Os campos podem ser caminhos com ``__`` (ex.: o nome do cliente que
+    aparece na lista de pedidos) ou expressões, como um ``Subquery``.
+    """
+    ultimas = {f'ultima_{indice}': Max(campo) for indice, campo in enumerate(campos_atualizacao)}
+    totais = consulta.order_by().aggregate(quantidade=Count('*'), **ultimas)
+    return (totais['quantidade'], *(totais[nome] for nome in ultimas))
+
+
+def calcular_etag(*partes):
+    """ETag opaco a partir das partes da versão (e do que mais variar a resposta)."""
+    return quote_etag(hashlib.md5(repr(partes).encode(), usedforsecurity=False).hexdigest())
+
+
+def nao_modificado(request, etag, ultima_alteracao=None):
+    """Resposta 304 se o cliente já tem esta versão; ``None`` para montar a resposta."""
+    ultima = int(ultima_alteracao.timestamp()) if ultima_alteracao else None
+    resposta = get_conditional_response(request, etag=etag, last_modified=ultima)
+    if resposta is None:
+        return None
+    if isinstance(resposta, HttpResponseNotModified):
+        marcar_versao(resposta, etag, ultima_alteracao)
+    return resposta
+
+
+def marcar_versao(resposta, etag, ultima_alteracao=None):
+    """Grava ``ETag``/``Last-Modified`` e pede revalidação a cada uso do cache do cliente."""
+    resposta['ETag'] = etag
+    if ultima_alteracao:
+        resposta['Last-Modified'] = http_date(ultima_alteracao.timestamp())
+    patch_cache_control(resposta, private=True, no_cache=True)
+    return resposta
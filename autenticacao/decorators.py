@@ -3,8 +3,6 @@ from functools import wraps
 from django.contrib import messages
 from django.shortcuts import redirect
 
-from .models import UsuarioPizzaria
-
 
 def pizzaria_required(view_func):
     """Decorator que garante acesso apenas a usuários autenticados com vínculo ativo em uma pizzaria.
@@ -22,12 +20,8 @@ def pizzaria_required(view_func):
             messages.error(request, "É necessário estar autenticado para acessar esta página.")
             return redirect("login")
 
-        # Verificar se existe vínculo ativo
-        usuario_pizzaria = (
-            UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
-        )
-
-        if not usuario_pizzaria:
+        # Verificar se existe vínculo ativo (resolvido uma vez pelo TenantMiddleware)
+        if not request.tenant:
             messages.error(request, "Usuário sem perfil ativo no sistema. Entre em contato com o administrador.")
             return redirect("dashboard")
 
@@ -54,15 +48,11 @@ def super_admin_required(view_func):
             return redirect("login")
 
         # Verificar se existe vínculo ativo e se é super admin
-        usuario_pizzaria = (
-            UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
-        )
-
-        if not usuario_pizzaria:
+        if not request.tenant:
             messages.error(request, "Usuário sem perfil ativo no sistema. Entre em contato com o administrador.")
             return redirect("dashboard")
         
-        if not usuario_pizzaria.is_super_admin():
+        if not request.tenant.is_super_admin():
             messages.warning(request, "Acesso restrito. Apenas Super Administradores podem acessar esta funcionalidade.")
             return redirect("dashboard")
 
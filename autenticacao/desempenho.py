@@ -0,0 +1,283 @@
+"""Perfilamento de latência e consultas por view (opt-in).
+
+O ``PerfilamentoMiddleware`` (ativado com ``DESEMPENHO_PERFILAMENTO_ATIVO``)
+mede, para cada requisição, a latência, o número de consultas SQL, o tempo
+total de SQL, as consultas duplicadas (mesmo SQL executado mais de uma vez,
+o sinal de N+1) e o tamanho da resposta. As consultas são contadas com
+``connection.execute_wrapper``.
+
+As medidas são agregadas em memória, por nome de rota, em histogramas
+log-linear no estilo HDR: valores até 64 ficam em baldes exatos e, acima
+disso, cada potência de 2 é dividida em 32 baldes (erro relativo de até
+~3%). Histogramas são somáveis, então o agregador de cada processo é
+gravado periodicamente (``DESEMPENHO_INTERVALO_GRAVACAO``) somando-se à
+linha da hora em ``MetricaDesempenho``; a página do super admin e a API
+leem essas linhas e calculam p50/p95/p99 por view.
+"""
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+
+from .models import MetricaDesempenho
+
+
+logger = logging.getLogger(__name__)
+
+SUB_BALDES = 32
+PERCENTIS = (50, 95, 99)
+# Campo de ``MetricaDesempenho`` -> (chave no resultado, divisor para exibição)
+METRICAS = {
+    'latencia_us': ('latencia_ms', 1000),
+    'consultas': ('consultas', 1),
+    'tempo_sql_us': ('tempo_sql_ms', 1000),
+    'consultas_duplicadas': ('consultas_duplicadas', 1),
+    'tamanho_resposta': ('tamanho_bytes', 1),
+}
+
+
+def perfilamento_ativo():
+    return getattr(settings, 'DESEMPENHO_PERFILAMENTO_ATIVO', False)
+
+
+def _intervalo_gravacao():
+    return getattr(settings, 'DESEMPENHO_INTERVALO_GRAVACAO', 60)
+
+
+def _retencao_dias():
+    return getattr(settings, 'DESEMPENHO_RETENCAO_DIAS', 30)
+
+
+def horas_retencao():
+    """Maior janela, em horas, que ainda tem medidas gravadas."""
+    return _retencao_dias() * 24
+
+
+# --------------------------------------------------
+# Histograma
+# --------------------------------------------------
+
+def balde(valor):
+    """Índice do balde de um valor inteiro não negativo."""
+    valor = max(int(valor), 0)
+    if valor < 2 * SUB_BALDES:
+        return valor
+    deslocamento = valor.bit_length() - SUB_BALDES.bit_length()
+    return deslocamento * SUB_BALDES + (valor >> deslocamento)
+
+
+def limites_do_balde(indice):
+    """Intervalo ``[inicio, fim)`` dos valores de um balde."""
+    if indice < 2 * SUB_BALDES:
+        return indice, indice + 1
+    deslocamento = indice // SUB_BALDES - 1
+    inicio = (indice - deslocamento * SUB_BALDES) << deslocamento
+    return inicio, inicio + (1 << deslocamento)
+
+
+class Histograma:
+    """Contagens por balde log-linear; ``percentil`` devolve o meio do balde."""
+
+    def __init__(self, contagens=None):
+        self.contagens = Counter({int(indice): quantidade for indice, quantidade in (contagens or {}).items()})
+
+    def registrar(self, valor, quantidade=1):
+        self.contagens[balde(valor)] += quantidade
+
+    def mesclar(self, outro):
+        self.contagens.update(outro.contagens)
+        return self
+
+    @property
+    def total(self):
+        return sum(self.contagens.values())
+
+    def percentil(self, percentual):
+        """Valor abaixo do qual ficam ``percentual``% das medidas (``None`` se vazio)."""
+        total = self.total
+        if not total:
+            return None
+        alvo = total * percentual / 100
+        acumulado = 0
+        for indice in sorted(self.contagens):
+            acumulado += self.contagens[indice]
+            if acumulado >= alvo:
+                inicio, fim = limites_do_balde(indice)
+                return (inicio + fim - 1) / 2
+        return None
+
+    def para_dict(self):
+        """Forma gravável em JSON (chaves em texto)."""
+        return {str(indice): quantidade for indice, quantidade in sorted(self.contagens.items())}
+
+
+# --------------------------------------------------
+# Coleta por requisição
+# --------------------------------------------------
+
+class ColetorConsultas:
+    """``execute_wrapper`` que conta consultas, tempo de SQL e SQL repetido."""
+
+    def __init__(self):
+        self.quantidade = 0
+        self.tempo = 0.0
+        self.sqls = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tempo += time.perf_counter() - inicio
+            self.quantidade += 1
+            self.sqls[sql] += 1
+
+    @property
+    def duplicadas(self):
+        """Execuções de um SQL já executado na requisição (parâmetros ignorados)."""
+        return sum(vezes - 1 for vezes in self.sqls.values())
+
+
+class AgregadorDesempenho:
+    """Histogramas por view acumulados no processo até a próxima gravação."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+        self.ultima_gravacao = time.monotonic()
+
+    def registrar(self, view_nome, **medidas):
+        with self._lock:
+            requisicoes, histogramas = self._views.get(view_nome, (0, None))
+            if histogramas is None:
+                histogramas = {campo: Histograma() for campo in METRICAS}
+            for campo, valor in medidas.items():
+                if valor is not None:
+                    histogramas[campo].registrar(valor)
+            self._views[view_nome] = (requisicoes + 1, histogramas)
+
+    def esvaziar(self):
+        """Retira e devolve o acumulado ``{view: (requisicoes, histogramas)}``."""
+        with self._lock:
+            pendentes, self._views = self._views, {}
+            self.ultima_gravacao = time.monotonic()
+        return pendentes
+
+    def devolver(self, pendentes):
+        """Recoloca medidas que não puderam ser gravadas."""
+        with self._lock:
+            for view_nome, (requisicoes, histogramas) in pendentes.items():
+                atuais, existentes = self._views.get(view_nome, (0, None))
+                if existentes is not None:
+                    for campo, histograma in existentes.items():
+                        histogramas[campo].mesclar(histograma)
+                self._views[view_nome] = (requisicoes + atuais, histogramas)
+
+    def gravacao_vencida(self):
+        return time.monotonic() - self.ultima_gravacao >= _intervalo_gravacao()
+
+
+agregador = AgregadorDesempenho()
+
+
+def gravar_metricas(pendentes, agora=None):
+    """Soma o acumulado às linhas da hora em ``MetricaDesempenho``.
+
+    Uma linha por view e hora, atualizada sob ``select_for_update``; linhas
+    além da retenção são removidas.
+    """
+    agora = agora or timezone.now()
+    periodo = agora.replace(minute=0, second=0, microsecond=0)
+    with transaction.atomic():
+        for view_nome, (requisicoes, histogramas) in sorted(pendentes.items()):
+            metrica, _ = MetricaDesempenho.objects.select_for_update().get_or_create(
+                view_nome=view_nome, periodo_inicio=periodo
+            )
+            metrica.requisicoes += requisicoes
+            for campo, histograma in histogramas.items():
+                setattr(metrica, campo, Histograma(getattr(metrica, campo)).mesclar(histograma).para_dict())
+            metrica.save()
+        MetricaDesempenho.objects.filter(periodo_inicio__lt=periodo - timedelta(days=_retencao_dias())).delete()
+
+
+def gravar_pendentes():
+    """Grava o acumulado do processo; em caso de erro as medidas voltam ao agregador."""
+    pendentes = agregador.esvaziar()
+    if not pendentes:
+        return
+    try:
+        gravar_metricas(pendentes)
+    except DatabaseError:
+        logger.exception('Falha ao gravar as métricas de desempenho')
+        agregador.devolver(pendentes)
+
+
+def estatisticas_por_view(desde):
+    """p50/p95/p99 de cada métrica por view, das linhas a partir de ``desde``.
+
+    Ordenado pelo p95 da latência, da view mais lenta para a mais rápida.
+    """
+    por_view = {}
+    for metrica in MetricaDesempenho.objects.filter(periodo_inicio__gte=desde).order_by():
+        requisicoes, histogramas = por_view.get(metrica.view_nome, (0, None))
+        if histogramas is None:
+            histogramas = {campo: Histograma() for campo in METRICAS}
+        for campo in METRICAS:
+            histogramas[campo].mesclar(Histograma(getattr(metrica, campo)))
+        por_view[metrica.view_nome] = (requisicoes + metrica.requisicoes, histogramas)
+
+    estatisticas = []
+    for view_nome, (requisicoes, histogramas) in por_view.items():
+        linha = {'view': view_nome, 'requisicoes': requisicoes}
+        for campo, (chave, divisor) in METRICAS.items():
+            linha[chave] = {}
+            for percentual in PERCENTIS:
+                valor = histogramas[campo].percentil(percentual)
+                linha[chave][f'p{percentual}'] = round(valor / divisor, 2) if valor is not None else None
+        estatisticas.append(linha)
+    estatisticas.sort(key=lambda linha: linha['latencia_ms']['p95'] or 0, reverse=True)
+    return estatisticas
+
+
+# --------------------------------------------------
+# Middleware
+# --------------------------------------------------
+
+class PerfilamentoMiddleware:
+    """Mede latência, consultas e tamanho da resposta por rota (opt-in)."""
+
+    def __init__(self, get_response):
+        if not perfilamento_ativo():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        coletor = ColetorConsultas()
+        inicio = time.perf_counter()
+        with ExitStack() as pilha:
+            for conexao in connections.all():
+                pilha.enter_context(conexao.execute_wrapper(coletor))
+            response = self.get_response(request)
+        latencia = time.perf_counter() - inicio
+
+        correspondencia = getattr(request, 'resolver_match', None)
+        if correspondencia is not None:
+            agregador.registrar(
+                correspondencia.view_name,
+                latencia_us=latencia * 1_000_000,
+                consultas=coletor.quantidade,
+                tempo_sql_us=coletor.tempo * 1_000_000,
+                consultas_duplicadas=coletor.duplicadas,
+                tamanho_resposta=None if response.streaming else len(response.content),
+            )
+        # Fora da medição: a gravação não entra nas consultas da requisição
+        if agregador.gravacao_vencida():
+            gravar_pendentes()
+        return response
@@ -2,15 +2,33 @@ from django import forms
 from .models import Pizzaria
 
 
+FUSOS_HORARIOS = [
+    ('America/Sao_Paulo', 'Brasília (America/Sao_Paulo)'),
+    ('America/Bahia', 'Bahia (America/Bahia)'),
+    ('America/Fortaleza', 'Nordeste (America/Fortaleza)'),
+    ('America/Recife', 'Pernambuco (America/Recife)'),
+    ('America/Belem', 'Pará/Amapá (America/Belem)'),
+    ('America/Manaus', 'Amazonas (America/Manaus)'),
+    ('America/Cuiaba', 'Mato Grosso (America/Cuiaba)'),
+    ('America/Campo_Grande', 'Mato Grosso do Sul (America/Campo_Grande)'),
+    ('America/Porto_Velho', 'Rondônia (America/Porto_Velho)'),
+    ('America/Boa_Vista', 'Roraima (America/Boa_Vista)'),
+    ('America/Rio_Branco', 'Acre (America/Rio_Branco)'),
+    ('America/Noronha', 'Fernando de Noronha (America/Noronha)'),
+]
+
+
 class PizzariaForm(forms.ModelForm):
     class Meta:
         model = Pizzaria
-        fields = ['nome', 'cnpj', 'telefone', 'endereco', 'ativa']
+        fields = ['nome', 'cnpj', 'telefone', 'endereco', 'fuso_horario', 'hora_fechamento', 'ativa']
         labels = {
             'nome': 'Nome da Pizzaria',
             'cnpj': 'CNPJ',
             'telefone': 'Telefone',
             'endereco': 'Endereço',
+            'fuso_horario': 'Fuso horário',
+            'hora_fechamento': 'Fechamento do dia',
             'ativa': 'Ativa',
         }
         widgets = {
@@ -18,5 +36,20 @@ class PizzariaForm(forms.ModelForm):
             'cnpj': forms.TextInput(attrs={'class': 'form-control'}),
             'telefone': forms.TextInput(attrs={'class': 'form-control'}),
             'endereco': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
+            'fuso_horario': forms.Select(choices=FUSOS_HORARIOS, attrs={'class': 'form-select'}),
+            'hora_fechamento': forms.TimeInput(attrs={'class': 'form-control', 'type': 'time'}, format='%H:%M'),
             'ativa': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
-        }
\ No newline at end of file
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Campos opcionais no cadastro: em branco usam o padrão do modelo
+        self.fields['fuso_horario'].required = False
+        self.fields['hora_fechamento'].required = False
+
+    def clean_fuso_horario(self):
+        return self.cleaned_data.get('fuso_horario') or Pizzaria._meta.get_field('fuso_horario').default
+
+    def clean_hora_fechamento(self):
+        hora = self.cleaned_data.get('hora_fechamento')
+        return hora if hora is not None else Pizzaria._meta.get_field('hora_fechamento').default
\ No newline at end of file
@@ -0,0 +1,199 @@
+"""Listagens da API restritas à pizzaria do usuário e paginadas por cursor.
+
+``ListagemAPIView`` é a base dos ``*ListView`` das apps. A consulta é
+filtrada pelo tenant da requisição (``campo_pizzaria``), ordenada do mais
+recente para o mais antigo em ``(campo_criacao, id)`` (só ``id`` nos
+modelos sem data de criação, onde a ordem de inserção é a mesma) e lida
+com ``.values()`` apenas nas colunas de ``campos``: caminhos com ``__``
+viram JOINs na mesma consulta, no lugar de ``select_related``/``only()``.
+Cada página é um keyset com ``limite + 1`` linhas, então memória e tempo
+não crescem com a tabela.
+
+Antes da página, ``versao`` (por padrão ``COUNT`` e ``MAX`` de cada um dos
+``campos_atualizacao`` nas linhas da pizzaria) vira o ``ETag`` da resposta:
+se o cliente já tem essa versão, recebe um 304 sem a consulta da página.
+
+``codificar_cursor``/``decodificar_cursor`` também servem às paginações
+das telas (clientes e histórico de pedidos).
+"""
+import base64
+import json
+from datetime import datetime
+
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .condicional import calcular_etag, marcar_versao, nao_modificado, versao_linhas
+
+
+# Itens por página nas listagens da API (padrão e máximo pedido em ``limite``)
+TAMANHO_PAGINA_API = 50
+LIMITE_MAXIMO_API = 200
+
+PARAMETROS_LISTAGEM = [
+    OpenApiParameter(
+        name='cursor',
+        type=OpenApiTypes.STR,
+        location=OpenApiParameter.QUERY,
+        description='Valor de proximo_cursor da página anterior',
+        required=False
+    ),
+    OpenApiParameter(
+        name='limite',
+        type=OpenApiTypes.INT,
+        location=OpenApiParameter.QUERY,
+        description=f'Itens por página (padrão {TAMANHO_PAGINA_API}, máximo {LIMITE_MAXIMO_API})',
+        required=False
+    ),
+]
+
+
+def codificar_cursor(*valores):
+    """Cursor opaco com a posição (valores da ordenação) do último item da página."""
+    return base64.urlsafe_b64encode(json.dumps(valores).encode()).decode()
+
+
+def decodificar_cursor(cursor, *tipos):
+    """Valores de um cursor, conferidos contra ``tipos``; ``ValueError`` se for inválido."""
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (TypeError, ValueError):
+        raise ValueError('Cursor inválido')
+    if (
+        not isinstance(valores, list)
+        or len(valores) != len(tipos)
+        or not all(isinstance(valor, tipo) for valor, tipo in zip(valores, tipos))
+    ):
+        raise ValueError('Cursor inválido')
+    return valores
+
+
+def reais(centavos):
+    """Centavos → reais no JSON (``None`` continua ``None``)."""
+    return centavos / 100 if centavos is not None else None
+
+
+def data_iso(valor):
+    """Data (ou dia de um datetime) como ``AAAA-MM-DD``."""
+    return valor.strftime('%Y-%m-%d') if valor else None
+
+
+class ListagemAPIView(APIView):
+    """``GET`` paginado por cursor de um modelo, restrito à pizzaria do usuário.
+
+    As subclasses declaram ``model``, ``chave`` (nome da lista na resposta),
+    ``campos`` (chave na resposta → caminho no ``.values()``, que pode ser
+    uma anotação de ``get_queryset``) e, se preciso, ``conversoes`` (chave na
+    resposta → função aplicada ao valor). ``campo_pizzaria = None`` lista um
+    cadastro global. ``campos_atualizacao`` são as colunas de atualização da
+    linha e das relações exibidas em ``campos``, usadas em ``versao``.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    model = None
+    chave = None
+    campos = {}
+    conversoes = {}
+    campo_pizzaria = 'pizzaria'
+    campo_criacao = None
+    campos_atualizacao = ()
+
+    def consulta_tenant(self, pizzaria):
+        consulta = self.model._default_manager.all()
+        if self.campo_pizzaria:
+            consulta = consulta.filter(**{self.campo_pizzaria: pizzaria})
+        return consulta
+
+    def get_queryset(self, pizzaria):
+        return self.consulta_tenant(pizzaria)
+
+    def versao(self, pizzaria):
+        """Partes da versão das linhas listadas (uma consulta agregada)."""
+        return versao_linhas(self.consulta_tenant(pizzaria), *self.campos_atualizacao)
+
+    def get(self, request):
+        pizzaria = None
+        if self.campo_pizzaria:
+            usuario_pizzaria = request.tenant.usuario_pizzaria
+            if not usuario_pizzaria or not usuario_pizzaria.pizzaria:
+                return Response({
+                    'error': 'Usuário sem pizzaria associada'
+                }, status=status.HTTP_403_FORBIDDEN)
+            pizzaria = usuario_pizzaria.pizzaria
+
+        cursor = request.query_params.get('cursor')
+        try:
+            limite = self._limite(request.query_params.get('limite'))
+            consulta = self._a_partir_do_cursor(self.get_queryset(pizzaria), cursor)
+        except ValueError as erro:
+            return Response({'error': str(erro)}, status=status.HTTP_400_BAD_REQUEST)
+
+        etag = calcular_etag(self.chave, pizzaria.pk if pizzaria else None, *self.versao(pizzaria), cursor, limite)
+        resposta = nao_modificado(request, etag)
+        if resposta is not None:
+            return resposta
+
+        linhas = list(consulta.order_by(*self._ordem()).values(*self._colunas())[:limite + 1])
+        proximo_cursor = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo_cursor = self._cursor(linhas[-1])
+
+        return marcar_versao(Response({
+            self.chave: [self.serializar(linha) for linha in linhas],
+            'proximo_cursor': proximo_cursor,
+        }), etag)
+
+    def serializar(self, linha):
+        item = {}
+        for saida, caminho in self.campos.items():
+            conversao = self.conversoes.get(saida)
+            item[saida] = conversao(linha[caminho]) if conversao else linha[caminho]
+        return item
+
+    def _limite(self, valor):
+        if valor in (None, ''):
+            return TAMANHO_PAGINA_API
+        try:
+            limite = int(valor)
+        except ValueError:
+            limite = 0
+        if limite < 1:
+            raise ValueError('Parâmetro limite inválido')
+        return min(limite, LIMITE_MAXIMO_API)
+
+    def _ordem(self):
+        if self.campo_criacao:
+            return [f'-{self.campo_criacao}', '-pk']
+        return ['-pk']
+
+    def _colunas(self):
+        colunas = dict.fromkeys(self.campos.values())
+        colunas.update(dict.fromkeys(c for c in ('pk', self.campo_criacao) if c))
+        return list(colunas)
+
+    def _a_partir_do_cursor(self, consulta, cursor):
+        """Linhas depois do cursor: ``(criação, id) < (criação, id) do cursor``."""
+        if not cursor:
+            return consulta
+        if not self.campo_criacao:
+            (pk,) = decodificar_cursor(cursor, int)
+            return consulta.filter(pk__lt=pk)
+
+        momento, pk = decodificar_cursor(cursor, str, int)
+        try:
+            momento = datetime.fromisoformat(momento)
+        except ValueError:
+            raise ValueError('Cursor inválido')
+        campo = self.campo_criacao
+        return consulta.filter(**{f'{campo}__lte': momento}).exclude(**{campo: momento, 'pk__gte': pk})
+
+    def _cursor(self, linha):
+        if not self.campo_criacao:
+            return codificar_cursor(linha['pk'])
+        return codificar_cursor(linha[self.campo_criacao].isoformat(), linha['pk'])
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:47
+
+import autenticacao.models
+import datetime
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pizzaria',
+            name='fuso_horario',
+            field=models.CharField(default='America/Sao_Paulo', help_text='Fuso horário da pizzaria (ex.: America/Sao_Paulo)', max_length=50, validators=[autenticacao.models.validar_fuso_horario]),
+        ),
+        migrations.AddField(
+            model_name='pizzaria',
+            name='hora_fechamento',
+            field=models.TimeField(default=datetime.time(0, 0), help_text='Fim do dia de operação: com 04:00, vendas até 03:59 contam no dia anterior'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0002_pizzaria_data_negocio'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MetricaDesempenho',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('view_nome', models.CharField(max_length=200)),
+                ('periodo_inicio', models.DateTimeField(help_text='Início da hora agregada')),
+                ('requisicoes', models.PositiveIntegerField(default=0)),
+                ('latencia_us', models.JSONField(default=dict, help_text='Latência da requisição (µs)')),
+                ('consultas', models.JSONField(default=dict, help_text='Consultas SQL por requisição')),
+                ('tempo_sql_us', models.JSONField(default=dict, help_text='Tempo total de SQL por requisição (µs)')),
+                ('consultas_duplicadas', models.JSONField(default=dict, help_text='Consultas com SQL repetido (N+1)')),
+                ('tamanho_resposta', models.JSONField(default=dict, help_text='Tamanho da resposta (bytes)')),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Métrica de Desempenho',
+                'verbose_name_plural': 'Métricas de Desempenho',
+                'ordering': ['-periodo_inicio', 'view_nome'],
+                'indexes': [models.Index(fields=['periodo_inicio'], name='metrica_periodo')],
+                'constraints': [models.UniqueConstraint(fields=('view_nome', 'periodo_inicio'), name='metrica_view_periodo_unica')],
+            },
+        ),
+    ]
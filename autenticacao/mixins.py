@@ -0,0 +1,67 @@
+class RastreamentoCamposMixin:
+    """Guarda os valores carregados do banco para detectar alterações sem novo SELECT.
+
+    Os valores dos campos listados em ``campos_rastreados`` (pelo ``attname``,
+    ex.: ``cliente_id``) são registrados em ``from_db`` e atualizados após cada
+    ``save``. Assim é possível saber, em ``save`` ou nos signals, se um campo
+    mudou e qual era o valor anterior.
+
+    Uso:
+        class Pedido(RastreamentoCamposMixin, models.Model):
+            campos_rastreados = ("status",)
+
+            def save(self, *args, **kwargs):
+                if self.mudou_para("status", "PRONTO"):
+                    ...
+    """
+
+    campos_rastreados = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._registrar_valores_originais()
+        return instance
+
+    def refresh_from_db(self, *args, **kwargs):
+        super().refresh_from_db(*args, **kwargs)
+        self._registrar_valores_originais(kwargs.get("fields"))
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self._registrar_valores_originais(kwargs.get("update_fields"))
+
+    def _registrar_valores_originais(self, campos=None):
+        """Registra os valores atuais como originais (todos ou apenas ``campos``)."""
+        originais = self.__dict__.setdefault("_valores_originais", {})
+        for campo in self.campos_rastreados:
+            if campos is not None and campo not in campos and campo.removesuffix("_id") not in campos:
+                continue
+            # Campos adiados (defer/only) não são conhecidos
+            if campo in self.__dict__:
+                originais[campo] = self.__dict__[campo]
+
+    def tem_valor_original(self, campo):
+        """Indica se o valor do campo no banco é conhecido sem nova consulta."""
+        return campo in self.__dict__.get("_valores_originais", {})
+
+    def valor_original(self, campo, padrao=None):
+        """Valor do campo no último carregamento/salvamento (``padrao`` se desconhecido)."""
+        return self.__dict__.get("_valores_originais", {}).get(campo, padrao)
+
+    def campo_alterado(self, campo):
+        """Indica se o campo mudou desde o último carregamento/salvamento.
+
+        Objetos novos (ou com valor original desconhecido) são considerados alterados.
+        """
+        if not self.tem_valor_original(campo):
+            return True
+        return self.valor_original(campo) != getattr(self, campo)
+
+    def campos_alterados(self):
+        """Lista os campos rastreados que mudaram."""
+        return [campo for campo in self.campos_rastreados if self.campo_alterado(campo)]
+
+    def mudou_para(self, campo, valor):
+        """Indica se o campo acabou de passar a ter ``valor``."""
+        return getattr(self, campo) == valor and self.campo_alterado(campo)
@@ -1,15 +1,62 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import DateTimeField, ExpressionWrapper, F, Value
+from django.db.models.functions import TruncDate
 from django.contrib.auth.models import User
+from django.utils import timezone
+
+from .mixins import RastreamentoCamposMixin
 
 # Create your models here.
 
-class Pizzaria(models.Model):
+FUSO_HORARIO_PADRAO = 'America/Sao_Paulo'
+
+
+def validar_fuso_horario(valor):
+    """Valida um nome de fuso horário da base IANA (ex.: America/Sao_Paulo)."""
+    try:
+        ZoneInfo(valor)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValidationError(f'Fuso horário inválido: {valor}')
+
+
+def expressao_data_negocio(campo, fuso_horario, hora_fechamento):
+    """Expressão SQL da data de negócio de um campo datetime.
+
+    Equivalente a ``Pizzaria.data_negocio`` calculado no banco, para
+    atualizar muitas linhas com um único ``UPDATE``.
+    """
+    fechamento = timedelta(hours=hora_fechamento.hour, minutes=hora_fechamento.minute)
+    return TruncDate(
+        ExpressionWrapper(F(campo) - Value(fechamento), output_field=DateTimeField()),
+        tzinfo=ZoneInfo(fuso_horario),
+    )
+
+
+class Pizzaria(RastreamentoCamposMixin, models.Model):
     nome = models.CharField(max_length=100)
     cnpj = models.CharField(max_length=14, unique=True)
     endereco = models.TextField()
     telefone = models.CharField(max_length=15)
     ativa = models.BooleanField(default=True)
     criada_em = models.DateTimeField(auto_now_add=True)
+
+    # Dia de operação usado nos relatórios (data de negócio)
+    fuso_horario = models.CharField(
+        max_length=50,
+        default=FUSO_HORARIO_PADRAO,
+        validators=[validar_fuso_horario],
+        help_text="Fuso horário da pizzaria (ex.: America/Sao_Paulo)"
+    )
+    hora_fechamento = models.TimeField(
+        default=time(0, 0),
+        help_text="Fim do dia de operação: com 04:00, vendas até 03:59 contam no dia anterior"
+    )
+
+    campos_rastreados = ('fuso_horario', 'hora_fechamento')
     
     class Meta:
         verbose_name = "Pizzaria"
@@ -18,6 +65,26 @@ class Pizzaria(models.Model):
     
     def __str__(self):
         return self.nome
+
+    def data_negocio(self, momento=None):
+        """Dia de operação de um instante (padrão: agora) no fuso da pizzaria.
+
+        Instantes antes de ``hora_fechamento`` pertencem ao dia anterior.
+        """
+        momento = momento or timezone.now()
+        if timezone.is_naive(momento):
+            momento = timezone.make_aware(momento)
+        local = timezone.localtime(momento, ZoneInfo(self.fuso_horario))
+        return (local - timedelta(hours=self.hora_fechamento.hour, minutes=self.hora_fechamento.minute)).date()
+
+    def inicio_data_negocio(self, dia):
+        """Instante em que começa o dia de operação ``dia`` (``hora_fechamento`` no fuso da pizzaria)."""
+        fechamento = timedelta(hours=self.hora_fechamento.hour, minutes=self.hora_fechamento.minute)
+        return datetime.combine(dia, time.min, tzinfo=ZoneInfo(self.fuso_horario)) + fechamento
+
+    def expressao_data_negocio(self, campo):
+        """Expressão SQL de ``data_negocio`` para o campo datetime ``campo``."""
+        return expressao_data_negocio(campo, self.fuso_horario, self.hora_fechamento)
     
     # Futuro: configurações específicas da pizzaria
     # cor_tema, logo, configurações_delivery, etc.
@@ -54,3 +121,35 @@ class UsuarioPizzaria(models.Model):
             return f"{self.usuario.username} - {self.get_papel_display()} - {self.pizzaria.nome}"
         else:
             return f"{self.usuario.username} - {self.get_papel_display()}"
+
+
+class MetricaDesempenho(models.Model):
+    """Histogramas de desempenho de uma view em uma hora (perfilamento opt-in).
+
+    Cada campo JSON guarda um histograma log-linear ``{balde: contagem}``
+    (ver ``autenticacao.desempenho.Histograma``), somável entre processos e
+    períodos.
+    """
+    view_nome = models.CharField(max_length=200)
+    periodo_inicio = models.DateTimeField(help_text="Início da hora agregada")
+    requisicoes = models.PositiveIntegerField(default=0)
+    latencia_us = models.JSONField(default=dict, help_text="Latência da requisição (µs)")
+    consultas = models.JSONField(default=dict, help_text="Consultas SQL por requisição")
+    tempo_sql_us = models.JSONField(default=dict, help_text="Tempo total de SQL por requisição (µs)")
+    consultas_duplicadas = models.JSONField(default=dict, help_text="Consultas com SQL repetido (N+1)")
+    tamanho_resposta = models.JSONField(default=dict, help_text="Tamanho da resposta (bytes)")
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Métrica de Desempenho"
+        verbose_name_plural = "Métricas de Desempenho"
+        ordering = ['-periodo_inicio', 'view_nome']
+        constraints = [
+            models.UniqueConstraint(fields=['view_nome', 'periodo_inicio'], name='metrica_view_periodo_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['periodo_inicio'], name='metrica_periodo'),
+        ]
+
+    def __str__(self):
+        return f"{self.view_nome} - {self.periodo_inicio:%d/%m/%Y %H:%M}"
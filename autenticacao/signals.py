@@ -0,0 +1,20 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Pizzaria, UsuarioPizzaria
+from .tenant import invalidar_tenant
+
+
+@receiver([post_save, post_delete], sender=UsuarioPizzaria)
+def invalidar_tenant_vinculo(sender, instance, **kwargs):
+    """Descarta o tenant em cache do usuário quando o vínculo muda."""
+    invalidar_tenant(instance.usuario_id)
+
+
+@receiver([post_save, post_delete], sender=Pizzaria)
+def invalidar_tenant_pizzaria(sender, instance, created=False, **kwargs):
+    """Descarta o tenant em cache dos usuários da pizzaria quando ela muda."""
+    if created:
+        return
+    for usuario_id in UsuarioPizzaria.objects.filter(pizzaria=instance).values_list('usuario_id', flat=True):
+        invalidar_tenant(usuario_id)
@@ -0,0 +1,248 @@
+"""Resolução do tenant (vínculo ativo do usuário) uma vez por requisição.
+
+O ``TenantMiddleware`` expõe ``request.tenant``, um ``ContextoTenant`` com o
+``UsuarioPizzaria`` ativo do usuário e a sua ``Pizzaria``. O vínculo é
+resolvido no primeiro acesso (depois da autenticação do DRF, nas APIs) e
+reaproveitado por decorators e views no resto da requisição.
+
+Entre requisições os dados do vínculo ficam em dois níveis de cache: um LRU
+local ao processo, por id do usuário, e a sessão. Ambos guardam os valores
+dos campos (não instâncias), marcados com a versão do tenant do usuário no
+cache do Django (``autenticacao:tenant:versao:<usuario_id>``). Os signals de
+``UsuarioPizzaria`` e ``Pizzaria`` trocam essa versão, descartando as cópias
+antigas. Com o cache aquecido, resolver o tenant não consulta o banco.
+
+A troca de versão só chega a todos os processos com um cache compartilhado
+(Redis, Memcached). Com o ``LocMemCache`` padrão ela fica no worker que
+salvou, então as cópias também expiram após ``AUTENTICACAO_TENANT_CACHE_TTL``
+segundos: um vínculo desativado ou alterado deixa de valer em todos os
+workers no máximo nesse prazo.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+from .models import Pizzaria, UsuarioPizzaria
+
+
+CHAVE_VERSAO_TENANT = 'autenticacao:tenant:versao:{}'
+CHAVE_SESSAO_TENANT = '_tenant'
+
+_lru = OrderedDict()
+_lru_lock = threading.Lock()
+
+
+def _tamanho_lru():
+    return getattr(settings, 'AUTENTICACAO_TENANT_CACHE_MAX_USUARIOS', 1024)
+
+
+def _validade():
+    return getattr(settings, 'AUTENTICACAO_TENANT_CACHE_TTL', 30)
+
+
+def _nova_versao():
+    return time.time_ns()
+
+
+def versao_tenant(usuario_id):
+    """Versão atual do tenant do usuário."""
+    chave = CHAVE_VERSAO_TENANT.format(usuario_id)
+    versao = cache.get(chave)
+    if versao is None:
+        cache.add(chave, _nova_versao(), None)
+        versao = cache.get(chave)
+    return versao
+
+
+def _incrementar_versao(usuario_id):
+    chave = CHAVE_VERSAO_TENANT.format(usuario_id)
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, _nova_versao(), None)
+
+
+def invalidar_tenant(usuario_id):
+    """Descarta o tenant em cache do usuário (agora e quando a transação confirmar).
+
+    A troca imediata atende a própria transação; a do commit impede que
+    outra requisição guarde o vínculo lido antes da confirmação.
+    """
+    with _lru_lock:
+        _lru.pop(usuario_id, None)
+    _incrementar_versao(usuario_id)
+    transaction.on_commit(lambda: _incrementar_versao(usuario_id))
+
+
+def limpar_cache_local():
+    """Esvazia o LRU do processo."""
+    with _lru_lock:
+        _lru.clear()
+
+
+# --------------------------------------------------
+# (De)serialização dos campos
+# --------------------------------------------------
+
+def _serializar(instancia):
+    """Valores dos campos concretos, em texto (compatível com a sessão JSON)."""
+    return [
+        None if campo.value_from_object(instancia) is None else campo.value_to_string(instancia)
+        for campo in instancia._meta.concrete_fields
+    ]
+
+
+def _desserializar(model, valores):
+    """Instância nova a partir de ``_serializar``, como se lida do banco."""
+    campos = model._meta.concrete_fields
+    return model.from_db(
+        'default',
+        [campo.attname for campo in campos],
+        [campo.to_python(valor) for campo, valor in zip(campos, valores)],
+    )
+
+
+def _serializar_vinculo(usuario_pizzaria):
+    if usuario_pizzaria is None:
+        return None
+    pizzaria = usuario_pizzaria.pizzaria
+    return {
+        'usuario_pizzaria': _serializar(usuario_pizzaria),
+        'pizzaria': _serializar(pizzaria) if pizzaria is not None else None,
+    }
+
+
+def _desserializar_vinculo(dados, usuario):
+    if dados is None:
+        return None
+    usuario_pizzaria = _desserializar(UsuarioPizzaria, dados['usuario_pizzaria'])
+    usuario_pizzaria.usuario = usuario
+    usuario_pizzaria.pizzaria = (
+        _desserializar(Pizzaria, dados['pizzaria']) if dados['pizzaria'] is not None else None
+    )
+    return usuario_pizzaria
+
+
+# --------------------------------------------------
+# Resolução
+# --------------------------------------------------
+
+def _consultar_vinculo(usuario):
+    return (
+        UsuarioPizzaria.objects.filter(usuario=usuario, ativo=True)
+        .select_related('pizzaria')
+        .order_by('pk')
+        .first()
+    )
+
+
+def _dados_em_cache(usuario_id, versao, sessao):
+    agora = time.time()
+    with _lru_lock:
+        entrada = _lru.get(usuario_id)
+        if entrada is not None and entrada[0] == versao and entrada[1] > agora:
+            _lru.move_to_end(usuario_id)
+            return True, entrada[2]
+
+    if sessao is not None:
+        entrada = sessao.get(CHAVE_SESSAO_TENANT)
+        if (
+            entrada
+            and entrada.get('usuario_id') == usuario_id
+            and entrada.get('versao') == versao
+            and entrada.get('expira_em', 0) > agora
+        ):
+            # A cópia da sessão mantém a validade original
+            _guardar_no_lru(usuario_id, versao, entrada['expira_em'], entrada['dados'])
+            return True, entrada['dados']
+    return False, None
+
+
+def _guardar_no_lru(usuario_id, versao, expira_em, dados):
+    with _lru_lock:
+        _lru[usuario_id] = (versao, expira_em, dados)
+        _lru.move_to_end(usuario_id)
+        while len(_lru) > _tamanho_lru():
+            _lru.popitem(last=False)
+
+
+def resolver_vinculo(usuario, sessao=None):
+    """``UsuarioPizzaria`` ativo do usuário (com a pizzaria carregada) ou ``None``.
+
+    Lê o LRU do processo, depois a sessão e, por último, o banco (uma
+    consulta), regravando os caches. Cópias vencidas são ignoradas.
+    """
+    if not usuario.is_authenticated:
+        return None
+
+    versao = versao_tenant(usuario.pk)
+    encontrado, dados = _dados_em_cache(usuario.pk, versao, sessao)
+    if encontrado:
+        return _desserializar_vinculo(dados, usuario)
+
+    usuario_pizzaria = _consultar_vinculo(usuario)
+    dados = _serializar_vinculo(usuario_pizzaria)
+    expira_em = time.time() + _validade()
+    _guardar_no_lru(usuario.pk, versao, expira_em, dados)
+    if sessao is not None:
+        sessao[CHAVE_SESSAO_TENANT] = {
+            'usuario_id': usuario.pk, 'versao': versao, 'expira_em': expira_em, 'dados': dados,
+        }
+    return usuario_pizzaria
+
+
+class ContextoTenant:
+    """Vínculo ativo do usuário da requisição, resolvido no primeiro acesso."""
+
+    def __init__(self, request):
+        self._request = request
+        self._usuario_id = None
+        self._usuario_pizzaria = None
+
+    @property
+    def usuario_pizzaria(self):
+        usuario = self._request.user
+        # Resolve de novo se o usuário da requisição mudar (login/logout)
+        if self._usuario_id != usuario.pk:
+            self._usuario_pizzaria = resolver_vinculo(usuario, getattr(self._request, 'session', None))
+            self._usuario_id = usuario.pk
+        return self._usuario_pizzaria
+
+    @property
+    def pizzaria(self):
+        usuario_pizzaria = self.usuario_pizzaria
+        return usuario_pizzaria.pizzaria if usuario_pizzaria is not None else None
+
+    def is_super_admin(self):
+        usuario_pizzaria = self.usuario_pizzaria
+        return usuario_pizzaria is not None and usuario_pizzaria.is_super_admin()
+
+    def is_dono_pizzaria(self):
+        usuario_pizzaria = self.usuario_pizzaria
+        return usuario_pizzaria is not None and usuario_pizzaria.is_dono_pizzaria()
+
+    def obter_ou_404(self):
+        """``UsuarioPizzaria`` ativo, ou ``Http404`` se o usuário não tiver vínculo."""
+        usuario_pizzaria = self.usuario_pizzaria
+        if usuario_pizzaria is None:
+            raise Http404('Usuário sem pizzaria associada')
+        return usuario_pizzaria
+
+    def __bool__(self):
+        return self.usuario_pizzaria is not None
+
+
+class TenantMiddleware:
+    """Expõe ``request.tenant`` (``ContextoTenant``) em todas as requisições."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.tenant = ContextoTenant(request)
+        return self.get_response(request)
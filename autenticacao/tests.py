@@ -1,3 +1,425 @@
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+import time
 
-# Create your tests here.
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from clientes.models import Cliente
+from estoque.models import CompraIngrediente
+from financeiro.models import MetaVenda, VendaDiaria
+from ingredientes.models import Ingrediente
+from pedidos.models import Pedido
+from produtos.models import PrecoProduto, Produto
+from .desempenho import ColetorConsultas, Histograma, agregador, gravar_pendentes, horas_retencao
+from .models import MetricaDesempenho, Pizzaria, UsuarioPizzaria
+from .listagem import LIMITE_MAXIMO_API
+from .tenant import limpar_cache_local, resolver_vinculo
+
+
+class TenantMiddlewareTestCase(TestCase):
+    """Testes para a resolução e o cache do tenant da requisição."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        limpar_cache_local()
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        self.vinculo = UsuarioPizzaria.objects.create(
+            usuario=self.user, pizzaria=self.pizzaria, papel="dono_pizzaria"
+        )
+        self.client.force_login(self.user)
+
+    def _consultas_ao_vinculo(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        return response, [q for q in consultas if 'autenticacao_' in q['sql']]
+
+    def test_vinculo_resolvido_uma_vez(self):
+        """Testa que o vínculo é consultado uma vez e depois vem do cache."""
+        response, consultas = self._consultas_ao_vinculo(reverse('boas_vindas_pizzaria'))
+        self.assertEqual(response.context['pizzaria'], self.pizzaria)
+        self.assertEqual(len(consultas), 1)
+
+        response, consultas = self._consultas_ao_vinculo(reverse('boas_vindas_pizzaria'))
+        self.assertEqual(response.context['pizzaria'].nome, "Pizzaria Teste")
+        self.assertEqual(consultas, [])
+
+        # Processo novo (LRU vazio): a sessão ainda evita a consulta
+        limpar_cache_local()
+        response, consultas = self._consultas_ao_vinculo(reverse('boas_vindas_pizzaria'))
+        self.assertEqual(response.context['pizzaria'].pk, self.pizzaria.pk)
+        self.assertEqual(consultas, [])
+
+    def test_decorator_usa_o_tenant(self):
+        """Testa que o pizzaria_required e a view compartilham a mesma resolução."""
+        response, consultas = self._consultas_ao_vinculo(reverse('estoque:dashboard_estoque'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(consultas), 1)
+
+    def test_alteracoes_invalidam_o_cache(self):
+        """Testa que salvar o vínculo ou a pizzaria descarta o tenant em cache."""
+        self.client.get(reverse('boas_vindas_pizzaria'))
+
+        self.pizzaria.nome = "Pizzaria Renomeada"
+        self.pizzaria.save()
+        response = self.client.get(reverse('boas_vindas_pizzaria'))
+        self.assertEqual(response.context['pizzaria'].nome, "Pizzaria Renomeada")
+
+        self.vinculo.ativo = False
+        self.vinculo.save()
+        response = self.client.get(reverse('estoque:dashboard_estoque'))
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+
+    def test_cache_expira_sem_a_troca_de_versao(self):
+        """Testa que o tenant em cache expira mesmo sem a troca de versão (alteração em outro processo)."""
+        sessao = {}
+        self.assertEqual(resolver_vinculo(self.user, sessao), self.vinculo)
+        sessao_do_outro_processo = dict(sessao)
+
+        # Desativado por outro worker: a versão deste processo não muda
+        UsuarioPizzaria.objects.filter(pk=self.vinculo.pk).update(ativo=False)
+        self.assertEqual(resolver_vinculo(self.user, sessao), self.vinculo)
+
+        expirado = time.time() + settings.AUTENTICACAO_TENANT_CACHE_TTL + 1
+        with mock.patch('autenticacao.tenant.time.time', return_value=expirado):
+            self.assertIsNone(resolver_vinculo(self.user, sessao))
+
+            # Segundo processo: LRU próprio, vazio, e a cópia antiga da sessão
+            limpar_cache_local()
+            self.assertIsNone(resolver_vinculo(self.user, sessao_do_outro_processo))
+
+    def test_api_com_usuario_do_drf(self):
+        """Testa que o tenant usa o usuário autenticado pelo DRF."""
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+
+        response = client.get(reverse('produtos_api:cardapio'))
+
+        self.assertEqual(response.status_code, 200)
+
+
+class HistogramaTestCase(TestCase):
+    """Testes para os histogramas e a contagem de consultas do perfilamento."""
+
+    def test_percentis_com_erro_limitado(self):
+        """Testa percentis exatos em valores pequenos e com erro de até ~3% nos grandes."""
+        pequenos = Histograma()
+        for valor in range(1, 11):
+            pequenos.registrar(valor)
+        self.assertEqual(pequenos.percentil(50), 5)
+        self.assertEqual(pequenos.percentil(99), 10)
+
+        grandes = Histograma()
+        for valor in range(1, 100001):
+            grandes.registrar(valor)
+        for percentual in (50, 95, 99):
+            esperado = percentual * 1000
+            self.assertAlmostEqual(grandes.percentil(percentual), esperado, delta=esperado * 0.03)
+
+    def test_mesclar_equivale_a_registrar_tudo(self):
+        """Testa que histogramas gravados em JSON podem ser somados."""
+        primeiro, segundo, todos = Histograma(), Histograma(), Histograma()
+        for valor in (3, 150, 4000):
+            primeiro.registrar(valor)
+            todos.registrar(valor)
+        for valor in (70, 150000):
+            segundo.registrar(valor)
+            todos.registrar(valor)
+
+        mesclado = Histograma(primeiro.para_dict()).mesclar(Histograma(segundo.para_dict()))
+
+        self.assertEqual(mesclado.contagens, todos.contagens)
+        self.assertEqual(mesclado.total, 5)
+
+    def test_coletor_detecta_sql_repetido(self):
+        """Testa a contagem de consultas e de SQL repetido (N+1)."""
+        coletor = ColetorConsultas()
+        with connection.execute_wrapper(coletor):
+            for pk in (1, 2, 3):
+                list(Pizzaria.objects.filter(pk=pk))
+            Pizzaria.objects.count()
+
+        self.assertEqual(coletor.quantidade, 4)
+        self.assertEqual(coletor.duplicadas, 2)
+        self.assertGreater(coletor.tempo, 0)
+
+
+@override_settings(DESEMPENHO_PERFILAMENTO_ATIVO=True, DESEMPENHO_INTERVALO_GRAVACAO=3600)
+class PerfilamentoMiddlewareTestCase(TestCase):
+    """Testes para o middleware de perfilamento e a consulta das estatísticas."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        limpar_cache_local()
+        agregador.esvaziar()
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.dono = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=self.dono, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.admin = get_user_model().objects.create_user(username="admin", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=self.admin, papel="super_admin")
+
+    def test_medidas_gravadas_por_view(self):
+        """Testa que as requisições são agregadas por rota e somadas na linha da hora."""
+        self.client.force_login(self.dono)
+        for _ in range(3):
+            self.client.get(reverse('boas_vindas_pizzaria'))
+        gravar_pendentes()
+        self.client.get(reverse('boas_vindas_pizzaria'))
+        gravar_pendentes()
+
+        metrica = MetricaDesempenho.objects.get(view_nome='boas_vindas_pizzaria')
+        self.assertEqual(metrica.requisicoes, 4)
+        self.assertEqual(Histograma(metrica.latencia_us).total, 4)
+        self.assertEqual(Histograma(metrica.tamanho_resposta).total, 4)
+        # Com o tenant em cache as requisições seguintes consultam só sessão e usuário
+        self.assertGreaterEqual(Histograma(metrica.consultas).percentil(50), 2)
+
+    def test_api_e_pagina_do_super_admin(self):
+        """Testa os percentis na API e na página, restritas ao Super Admin."""
+        self.client.force_login(self.dono)
+        self.client.get(reverse('boas_vindas_pizzaria'))
+        response = self.client.get(reverse('autenticacao_api:desempenho_views'))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('autenticacao_api:desempenho_views'), {'horas': 1})
+        self.assertEqual(response.status_code, 200)
+        linha = next(linha for linha in response.json()['views'] if linha['view'] == 'boas_vindas_pizzaria')
+        self.assertEqual(linha['requisicoes'], 1)
+        self.assertEqual(set(linha['latencia_ms']), {'p50', 'p95', 'p99'})
+        self.assertIsNotNone(linha['consultas']['p99'])
+
+        response = self.client.get(reverse('autenticacao_api:desempenho_views'), {'horas': 'x'})
+        self.assertEqual(response.status_code, 400)
+        # Janelas além da retenção não têm dados e estourariam o timedelta
+        response = self.client.get(reverse('autenticacao_api:desempenho_views'), {'horas': 1000000000})
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get(reverse('desempenho_views'))
+        self.assertContains(response, 'boas_vindas_pizzaria')
+        response = self.client.get(reverse('desempenho_views'), {'horas': 1000000000})
+        self.assertEqual(response.context['horas'], horas_retencao())
+
+
+class ListagemAPITestCase(TestCase):
+    """Testes para as listagens da API restritas à pizzaria e paginadas por cursor."""
+
+    LISTAGENS = [
+        'produtos_api:produtos_list', 'produtos_api:categorias_list', 'pedidos_api:pedidos_list',
+        'clientes_api:clientes_list', 'ingredientes_api:ingredientes_list', 'estoque_api:estoque_list',
+        'estoque_api:fornecedores_list', 'estoque_api:compras_list', 'financeiro_api:despesas_list',
+        'financeiro_api:tipos_despesa_list', 'financeiro_api:metas_venda_list',
+    ]
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        limpar_cache_local()
+        self.pizzaria = Pizzaria.objects.create(nome="Pizzaria Teste", cnpj="12345678000190", endereco="Rua A, 1")
+        self.outra = Pizzaria.objects.create(nome="Outra", cnpj="98765432000110", endereco="Rua B, 2")
+        self.user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=self.user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def _clientes(self, pizzaria, quantidade):
+        return Cliente.objects.bulk_create([
+            Cliente(pizzaria=pizzaria, nome=f"Cliente {i}", telefone=f"1190000{i:04d}") for i in range(quantidade)
+        ])
+
+    def _paginas(self, url, **parametros):
+        itens, cursor = [], None
+        while True:
+            resposta = self.client.get(url, {**parametros, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(resposta.status_code, 200)
+            itens += resposta.json()['clientes']
+            cursor = resposta.json()['proximo_cursor']
+            if not cursor:
+                return itens
+
+    def test_todas_as_listagens_respondem(self):
+        """Testa que todas as listagens respondem com a lista e o cursor."""
+        for nome in self.LISTAGENS:
+            with self.subTest(listagem=nome):
+                resposta = self.client.get(reverse(nome))
+                self.assertEqual(resposta.status_code, 200)
+                self.assertIn('proximo_cursor', resposta.json())
+
+    def test_paginas_restritas_a_pizzaria(self):
+        """Testa que as páginas cobrem só os clientes da pizzaria, dos mais recentes aos mais antigos."""
+        proprios = self._clientes(self.pizzaria, 7)
+        self._clientes(self.outra, 3)
+
+        itens = self._paginas(reverse('clientes_api:clientes_list'), limite=3)
+
+        esperado = sorted(proprios, key=lambda cliente: (cliente.data_cadastro, cliente.pk), reverse=True)
+        self.assertEqual([item['id'] for item in itens], [cliente.pk for cliente in esperado])
+
+    def test_consultas_constantes(self):
+        """Testa que o custo da página não depende do tamanho da tabela."""
+        url = reverse('pedidos_api:pedidos_list')
+        cliente = self._clientes(self.pizzaria, 1)[0]
+        Pedido.objects.create(pizzaria=self.pizzaria, cliente=cliente, forma_pagamento="PIX", total=Decimal("10"))
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as antes:
+            self.client.get(url)
+
+        for _ in range(5):
+            Pedido.objects.create(pizzaria=self.pizzaria, cliente_nome="Avulso", forma_pagamento="PIX", total=1)
+        with CaptureQueriesContext(connection) as depois:
+            resposta = self.client.get(url, {'limite': 4})
+
+        self.assertEqual(len(depois), len(antes))
+        self.assertEqual(len(resposta.json()['pedidos']), 4)
+        self.assertEqual(resposta.json()['pedidos'][0]['cliente'], "Avulso")
+
+    def test_valores_convertidos(self):
+        """Testa os campos relacionados, anotados e convertidos de centavos."""
+        ingrediente = Ingrediente.objects.create(pizzaria=self.pizzaria, nome="Queijo")
+        CompraIngrediente.objects.create(
+            ingrediente=ingrediente, quantidade=Decimal("2"), unidade="kg",
+            preco_unitario_centavos=2500, valor_total_centavos=5000, data_compra=date(2025, 3, 1),
+        )
+        MetaVenda.objects.create(
+            pizzaria=self.pizzaria, ano=2025, mes=3, meta_receita_centavos=20000, meta_ticket_medio_centavos=5000
+        )
+        VendaDiaria.objects.create(
+            pizzaria=self.pizzaria, data=date(2025, 3, 10), forma_pagamento="PIX", receita_centavos=5000
+        )
+
+        compra = self.client.get(reverse('estoque_api:compras_list')).json()['compras'][0]
+        meta = self.client.get(reverse('financeiro_api:metas_venda_list')).json()['metas'][0]
+
+        self.assertEqual(
+            (compra['ingrediente'], compra['valor_total'], compra['data_compra']), ("Queijo", 50.0, "2025-03-01")
+        )
+        self.assertEqual((meta['valor_meta'], meta['valor_realizado'], meta['percentual']), (200.0, 50.0, 25.0))
+
+    def test_parametros_invalidos_e_sem_pizzaria(self):
+        """Testa cursor e limite inválidos, o limite máximo e o usuário sem pizzaria."""
+        url = reverse('clientes_api:clientes_list')
+        self.assertEqual(self.client.get(url, {'cursor': 'x'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limite': '0'}).status_code, 400)
+
+        self._clientes(self.pizzaria, LIMITE_MAXIMO_API + 1)
+        self.assertEqual(len(self.client.get(url, {'limite': 1000}).json()['clientes']), LIMITE_MAXIMO_API)
+
+        sem_pizzaria = get_user_model().objects.create_user(username="avulso", password="testpass123")
+        self.client.force_authenticate(user=sem_pizzaria)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+
+class ConsultaCondicionalTestCase(TestCase):
+    """Testes para as respostas 304 com ``ETag``/``Last-Modified`` nas leituras."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        limpar_cache_local()
+        self.pizzaria = Pizzaria.objects.create(nome="Pizzaria Teste", cnpj="12345678000190", endereco="Rua A, 1")
+        self.user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=self.user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.cliente = Cliente.objects.create(pizzaria=self.pizzaria, nome="Maria Silva", telefone="11999990000")
+        self.pedido = Pedido.objects.create(
+            pizzaria=self.pizzaria, cliente=self.cliente, forma_pagamento="PIX", total=Decimal("10")
+        )
+
+    def _revalidar(self, url, etag, **parametros):
+        return self.client.get(url, parametros, HTTP_IF_NONE_MATCH=etag)
+
+    def test_listagem_nao_modificada_sem_consultar_a_pagina(self):
+        """Testa o 304 da listagem sem corpo e com uma consulta a menos que a resposta completa."""
+        url = reverse('pedidos_api:pedidos_list')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as completa:
+            resposta = self.client.get(url)
+        with CaptureQueriesContext(connection) as revalidada:
+            nao_modificada = self._revalidar(url, resposta['ETag'])
+
+        self.assertEqual(nao_modificada.status_code, 304)
+        self.assertEqual(nao_modificada.content, b'')
+        self.assertEqual(nao_modificada['ETag'], resposta['ETag'])
+        self.assertEqual(len(revalidada), len(completa) - 1)
+        self.assertIn('no-cache', resposta['Cache-Control'])
+
+    def test_etag_da_listagem_muda_com_alteracao_e_exclusao(self):
+        """Testa que edição, exclusão e o nome do cliente exibido mudam o ETag da lista."""
+        url = reverse('pedidos_api:pedidos_list')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self._revalidar(url, etag).status_code, 304)
+        self.assertEqual(self._revalidar(url, etag, limite=1).status_code, 200)
+
+        self.cliente.nome = "Maria Souza"
+        self.cliente.save()
+        resposta = self._revalidar(url, etag)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['pedidos'][0]['cliente'], "Maria Souza")
+
+        etag = resposta['ETag']
+        self.pedido.delete()
+        self.assertEqual(self._revalidar(url, etag).status_code, 200)
+
+    def test_detalhe_com_last_modified(self):
+        """Testa ``If-Modified-Since`` e ``If-None-Match`` no detalhe do pedido."""
+        url = reverse('pedidos_api:pedido_detail', args=[self.pedido.pk])
+        resposta = self.client.get(url)
+        self.assertIn('Last-Modified', resposta)
+
+        nao_modificada = self.client.get(url, HTTP_IF_MODIFIED_SINCE=resposta['Last-Modified'])
+        self.assertEqual(nao_modificada.status_code, 304)
+
+        self.pedido.status = "PRONTO"
+        self.pedido.save()
+        self.assertEqual(self._revalidar(url, resposta['ETag']).status_code, 200)
+        self.assertEqual(self.client.get(reverse('pedidos_api:pedido_detail', args=[0])).status_code, 404)
+
+    def test_cardapio_revalidado_com_uma_consulta(self):
+        """Testa que o cardápio revalida com a versão em cache e uma consulta agregada."""
+        url = reverse('produtos_api:cardapio')
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self._revalidar(url, etag).status_code, 304)
+
+    def test_etag_do_cardapio_muda_sem_a_versao_deste_processo(self):
+        """Testa que um preço novo muda os ETags de produtos mesmo sem o incremento da versão do cardápio."""
+        produto = Produto.objects.create(pizzaria=self.pizzaria, nome="Margherita")
+        PrecoProduto.objects.create(produto=produto, preco_base_centavos=3000, preco_venda_centavos=3000)
+        urls = [reverse('produtos_api:cardapio'), reverse('produtos_api:produtos_list')]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+
+        # Sem executar os on_commit: a versão do cardápio deste processo não muda (como em outro worker)
+        PrecoProduto.objects.filter(produto=produto).update(data_fim=date(2024, 1, 1))
+        PrecoProduto.objects.create(produto=produto, preco_base_centavos=3000, preco_venda_centavos=3500)
+
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self._revalidar(url, etags[url]).status_code, 200)
+        lista = self.client.get(urls[1]).json()['produtos']
+        self.assertEqual(lista[0]['preco_venda'], 35.0)
+
+    def test_busca_de_clientes_muda_com_endereco(self):
+        """Testa que salvar um endereço muda o ETag da busca de clientes."""
+        self.client.force_login(self.user)
+        url = reverse('buscar_clientes')
+        etag = self.client.get(url, {'termo': 'Maria'})['ETag']
+        self.assertEqual(self._revalidar(url, etag, termo='Maria').status_code, 304)
+
+        self.cliente.enderecos.create(
+            nome="Casa", cep="01000-000", rua="Rua A", numero="1", bairro="Centro", cidade="São Paulo", estado="SP"
+        )
+        self.assertEqual(self._revalidar(url, etag, termo='Maria').status_code, 200)
@@ -10,6 +10,7 @@ urlpatterns = [
     path('pizzarias/nova/', views.cadastro_pizzaria, name='cadastro_pizzaria'),
     path('pizzarias/nova/ajax/', views.cadastro_pizzaria_ajax, name='cadastro_pizzaria_ajax'),
     path('pizzarias/', views.lista_pizzarias, name='lista_pizzarias'),
+    path('desempenho/', views.desempenho_views, name='desempenho_views'),
     path('boas-vindas/', views.boas_vindas_pizzaria, name='boas_vindas_pizzaria'),
     path('pizzarias/<int:pizzaria_id>/boas-vindas/', views.visualizar_pizzaria, name='visualizar_pizzaria'),
 ]
\ No newline at end of file
@@ -2,6 +2,9 @@ from django.shortcuts import render, redirect
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.utils import timezone
+from datetime import timedelta
+from .desempenho import estatisticas_por_view, gravar_pendentes, horas_retencao, perfilamento_ativo
 from .models import UsuarioPizzaria, Pizzaria
 from .forms import PizzariaForm
 
@@ -51,7 +54,7 @@ def logout_view(request):
 @login_required
 def boas_vindas_pizzaria(request):
     """Página de boas-vindas para o dono da pizzaria"""
-    usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
 
     if not usuario_pizzaria or not usuario_pizzaria.is_dono_pizzaria():
         messages.error(request, 'Acesso permitido apenas para donos de pizzaria.')
@@ -71,7 +74,7 @@ def visualizar_pizzaria(request, pizzaria_id):
     • Super Admin pode visualizar qualquer pizzaria
     • Dono de pizzaria só pode visualizar sua própria pizzaria
     """
-    usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
 
     if not usuario_pizzaria:
         messages.error(request, 'Usuário sem perfil ativo no sistema. Entre em contato com o administrador.')
@@ -101,7 +104,7 @@ def dashboard(request):
     if request.user.is_superuser:
         return redirect('dashboard_super_admin')
     
-    usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
     
     if not usuario_pizzaria:
         messages.error(request, 'Usuário sem permissões no sistema.')
@@ -120,7 +123,7 @@ def dashboard(request):
 @login_required
 def cadastro_pizzaria(request):
     """Cadastro de nova pizzaria (apenas Super Admin)"""
-    usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
 
     if not usuario_pizzaria:
         messages.error(request, 'Usuário sem perfil ativo no sistema. Entre em contato com o administrador.')
@@ -148,7 +151,7 @@ def cadastro_pizzaria(request):
 @login_required
 def lista_pizzarias(request):
     """Lista completa de pizzarias (apenas Super Admin)"""
-    usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
 
     if not usuario_pizzaria:
         messages.error(request, 'Usuário sem perfil ativo no sistema. Entre em contato com o administrador.')
@@ -173,7 +176,7 @@ def dashboard_super_admin(request):
         # Superusuário Django tem acesso total
         pass
     else:
-        usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+        usuario_pizzaria = request.tenant.usuario_pizzaria
         if not usuario_pizzaria or not usuario_pizzaria.is_super_admin():
             messages.error(request, 'Permissão negada. Apenas Super Admin pode acessar.')
             return redirect('dashboard')
@@ -195,12 +198,36 @@ def dashboard_super_admin(request):
     return render(request, 'autenticacao/dashboard_super_admin.html', context)
 
 
+@login_required
+def desempenho_views(request):
+    """Percentis de latência e consultas por view (apenas Super Admin)"""
+    if not request.user.is_superuser and not request.tenant.is_super_admin():
+        messages.error(request, 'Permissão negada. Apenas Super Admin pode acessar.')
+        return redirect('dashboard')
+
+    try:
+        horas = min(max(int(request.GET.get('horas', 24)), 1), horas_retencao())
+    except ValueError:
+        horas = 24
+
+    # Inclui as medidas ainda em memória neste processo
+    if perfilamento_ativo():
+        gravar_pendentes()
+
+    context = {
+        'estatisticas': estatisticas_por_view(timezone.now() - timedelta(hours=horas)),
+        'horas': horas,
+        'perfilamento_ativo': perfilamento_ativo(),
+    }
+    return render(request, 'autenticacao/desempenho_views.html', context)
+
+
 @login_required
 def cadastro_pizzaria_ajax(request):
     """Cadastro de nova pizzaria via AJAX (apenas Super Admin)"""
     from django.http import JsonResponse
     
-    usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
 
     if not usuario_pizzaria:
         return JsonResponse({
@@ -9,10 +9,13 @@ class EnderecoClienteInline(admin.TabularInline):
 
 @admin.register(Cliente)
 class ClienteAdmin(admin.ModelAdmin):
-    list_display = ('nome', 'telefone', 'email', 'pizzaria', 'ativo', 'data_cadastro')
+    list_display = ('nome', 'telefone', 'email', 'pizzaria', 'total_pedidos', 'ativo', 'data_cadastro')
     list_filter = ('ativo', 'pizzaria', 'data_cadastro')
     search_fields = ('nome', 'telefone', 'email')
-    readonly_fields = ('data_cadastro', 'data_atualizacao')
+    readonly_fields = (
+        'data_cadastro', 'data_atualizacao',
+        'total_pedidos', 'total_gasto_centavos', 'ticket_medio_centavos', 'ultimo_pedido_em',
+    )
     inlines = [EnderecoClienteInline]
     
     fieldsets = (
@@ -22,6 +25,9 @@ class ClienteAdmin(admin.ModelAdmin):
         ('Informações Adicionais', {
             'fields': ('data_nascimento', 'endereco_principal', 'observacoes')
         }),
+        ('Estatísticas', {
+            'fields': ('total_pedidos', 'total_gasto_centavos', 'ticket_medio_centavos', 'ultimo_pedido_em')
+        }),
         ('Controle', {
             'fields': ('ativo', 'data_cadastro', 'data_atualizacao')
         }),
@@ -4,14 +4,16 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
+from autenticacao.listagem import PARAMETROS_LISTAGEM, ListagemAPIView, reais
 from .models import Cliente, EnderecoCliente
 from .forms import ClienteForm, EnderecoClienteForm
 
 
 @extend_schema(
     tags=['clientes'],
-    summary='Listar todos os clientes',
-    description='Retorna uma lista de todos os clientes cadastrados no sistema',
+    summary='Listar os clientes',
+    description='Retorna os clientes da pizzaria do usuário, dos cadastros mais recentes aos mais antigos, paginados por cursor',
+    parameters=PARAMETROS_LISTAGEM,
     responses={
         200: {
             'description': 'Lista de clientes retornada com sucesso',
@@ -27,30 +29,39 @@ from .forms import ClienteForm, EnderecoClienteForm
                             'email': {'type': 'string'},
                             'telefone': {'type': 'string'},
                             'ativo': {'type': 'boolean'},
+                            'total_pedidos': {'type': 'integer'},
+                            'total_gasto': {'type': 'number'},
+                            'ticket_medio': {'type': 'number'},
+                            'ultimo_pedido_em': {'type': 'string', 'format': 'date-time', 'nullable': True},
                         }
                     }
-                }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
             }
-        }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'},
     }
 )
-class ClientesListView(APIView):
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        """Lista todos os clientes"""
-        clientes = Cliente.objects.all()
-        data = []
-        for cliente in clientes:
-            data.append({
-                'id': cliente.id,
-                'nome': cliente.nome,
-                'email': cliente.email,
-                'telefone': cliente.telefone,
-                'ativo': cliente.ativo,
-            })
-        
-        return Response({'clientes': data})
+class ClientesListView(ListagemAPIView):
+    """Lista os clientes da pizzaria com as estatísticas de pedidos"""
+
+    model = Cliente
+    chave = 'clientes'
+    campo_criacao = 'data_cadastro'
+    campos_atualizacao = ('data_atualizacao',)
+    campos = {
+        'id': 'id',
+        'nome': 'nome',
+        'email': 'email',
+        'telefone': 'telefone',
+        'ativo': 'ativo',
+        'total_pedidos': 'total_pedidos',
+        'total_gasto': 'total_gasto_centavos',
+        'ticket_medio': 'ticket_medio_centavos',
+        'ultimo_pedido_em': 'ultimo_pedido_em',
+    }
+    conversoes = {'total_gasto': reais, 'ticket_medio': reais}
 
 
 @extend_schema(
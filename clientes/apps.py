@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ClientesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'clientes'
+
+    def ready(self):
+        """Registra os sinais quando o app é carregado."""
+        import clientes.signals  # noqa: F401
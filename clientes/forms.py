@@ -1,5 +1,5 @@
 from django import forms
-from .models import Cliente, EnderecoCliente
+from .models import Cliente, EnderecoCliente, normalizar_telefone
 
 
 class ClienteForm(forms.ModelForm):
@@ -43,9 +43,12 @@ class ClienteForm(forms.ModelForm):
 
     def clean_telefone(self):
         telefone = self.cleaned_data['telefone']
+        telefone_normalizado = normalizar_telefone(telefone)
+        if not telefone_normalizado:
+            raise forms.ValidationError('Informe um telefone válido.')
         if self.pizzaria:
-            # Verifica se já existe outro cliente com o mesmo telefone na pizzaria
-            qs = Cliente.objects.filter(pizzaria=self.pizzaria, telefone=telefone)
+            # Verifica se já existe outro cliente com o mesmo telefone (mesmos dígitos) na pizzaria
+            qs = Cliente.objects.filter(pizzaria=self.pizzaria, telefone_normalizado=telefone_normalizado)
             if self.instance.pk:
                 qs = qs.exclude(pk=self.instance.pk)
             if qs.exists():
@@ -0,0 +1,183 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from autenticacao.desempenho import ColetorConsultas
+from autenticacao.models import Pizzaria
+from clientes.models import Cliente, normalizar_telefone
+from clientes.services import ResolvedorCliente
+
+
+PRIMEIROS_NOMES = [
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor', 'Isabela', 'João',
+    'Karina', 'Lucas', 'Mariana', 'Nicolas', 'Olívia', 'Pedro', 'Rafaela', 'Samuel', 'Tatiane', 'Vitor',
+]
+SOBRENOMES = [
+    'Almeida', 'Barbosa', 'Cardoso', 'Dias', 'Ferreira', 'Gomes', 'Lima', 'Martins', 'Nunes', 'Oliveira',
+    'Pereira', 'Ribeiro', 'Santos', 'Silva', 'Souza', 'Teixeira',
+]
+
+
+class Descartar(Exception):
+    """Desfaz a transação do benchmark."""
+
+
+def cascata_anterior(pizzaria, nome, telefone):
+    """Busca feita pelas views antes do ``ResolvedorCliente`` (até quatro consultas)."""
+    telefone_normalizado = normalizar_telefone(telefone)
+    clientes = Cliente.objects.filter(pizzaria=pizzaria)
+    if nome:
+        cliente = clientes.filter(nome__iexact=nome).first()
+        if not cliente and telefone_normalizado:
+            cliente = clientes.filter(telefone_normalizado=telefone_normalizado).first()
+        if not cliente:
+            similares = clientes.filter(nome__icontains=nome.split()[0])
+            if similares.count() == 1:
+                cliente = similares.first()
+        return cliente
+    if telefone_normalizado:
+        return clientes.filter(telefone_normalizado=telefone_normalizado).first()
+    return None
+
+
+class Command(BaseCommand):
+    help = (
+        'Popula uma tabela grande de clientes e compara tempo e consultas da busca anterior das '
+        'views de pedido com o ResolvedorCliente, por tipo de dado digitado. Tudo roda em uma '
+        'transação desfeita ao final.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=100000, help='Clientes gerados (padrão: 100000)')
+        parser.add_argument('--pizzarias', type=int, default=5, help='Pizzarias geradas (padrão: 5)')
+        parser.add_argument('--buscas', type=int, default=200, help='Buscas por tipo (padrão: 200)')
+        parser.add_argument('--sem-explain', action='store_true', help='Mostra apenas os tempos')
+        parser.add_argument('--semente', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('O benchmark usa EXPLAIN ANALYZE e requer PostgreSQL.')
+
+        self.opcoes = options
+        self.aleatorio = random.Random(options['semente'])
+        try:
+            with transaction.atomic():
+                inicio = time.perf_counter()
+                pizzaria, clientes = self._popular()
+                self.stdout.write(f'Massa de dados gerada em {time.perf_counter() - inicio:.1f}s')
+
+                casos = self._casos(clientes)
+                resolvedor = ResolvedorCliente(pizzaria)
+                antes = self._medir(casos, lambda nome, telefone: cascata_anterior(pizzaria, nome, telefone),
+                                    'Busca anterior (cascata)')
+                depois = self._medir(casos, lambda nome, telefone: resolvedor.resolver(nome=nome, telefone=telefone),
+                                     'ResolvedorCliente')
+                if not self.opcoes['sem_explain']:
+                    self._explicar(resolvedor, casos)
+
+                self._resumo(antes, depois)
+                raise Descartar
+        except Descartar:
+            self.stdout.write(self.style.SUCCESS('\nDados do benchmark descartados (rollback).'))
+
+    # --------------------------------------------------
+    # Massa de dados
+    # --------------------------------------------------
+
+    def _popular(self):
+        """Gera os clientes com ``bulk_create``; a primeira pizzaria fica com a maior parte."""
+        aleatorio = self.aleatorio
+        pizzarias = Pizzaria.objects.bulk_create([
+            Pizzaria(nome=f'Benchmark {indice}', cnpj=f'9{indice:013d}', endereco='-', telefone='-')
+            for indice in range(self.opcoes['pizzarias'])
+        ])
+        total = self.opcoes['clientes']
+        telefones = aleatorio.sample(range(10 ** 8), total)
+
+        def cliente(indice):
+            pizzaria = pizzarias[0] if indice % 2 == 0 else aleatorio.choice(pizzarias)
+            telefone = f'119{telefones[indice]:08d}'
+            return Cliente(
+                pizzaria=pizzaria,
+                nome=' '.join([
+                    aleatorio.choice(PRIMEIROS_NOMES), aleatorio.choice(SOBRENOMES), aleatorio.choice(SOBRENOMES),
+                ]),
+                telefone=f'({telefone[:2]}) {telefone[2:7]}-{telefone[7:]}',
+                telefone_normalizado=telefone,
+                ativo=aleatorio.random() < 0.95,
+            )
+
+        Cliente.objects.bulk_create((cliente(indice) for indice in range(total)), batch_size=5000)
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute(f'ANALYZE {connection.ops.quote_name(Cliente._meta.db_table)}')
+        clientes = list(
+            Cliente.objects.filter(pizzaria=pizzarias[0]).values_list('nome', 'telefone')
+        )
+        return pizzarias[0], clientes
+
+    def _casos(self, clientes):
+        """Entradas ``(nome, telefone)`` por tipo de dado digitado no pedido."""
+        aleatorio = self.aleatorio
+        amostra = aleatorio.sample(clientes, min(self.opcoes['buscas'], len(clientes)))
+        return {
+            'nome_exato': [(nome, '') for nome, _ in amostra],
+            'nome_e_telefone': [(nome, telefone) for nome, telefone in amostra],
+            'telefone': [('', telefone) for _, telefone in amostra],
+            'primeiro_nome': [(nome.split()[0], '') for nome, _ in amostra],
+            'sem_cadastro': [
+                (f'Zélia {indice}', f'(21) 90000-{indice:04d}') for indice in range(len(amostra))
+            ],
+        }
+
+    # --------------------------------------------------
+    # Medição
+    # --------------------------------------------------
+
+    def _medir(self, casos, busca, titulo):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {titulo} ==='))
+        resultados = {}
+        for nome_caso, entradas in casos.items():
+            busca(*entradas[0])  # aquecimento do cache
+            medicoes = []
+            coletor = ColetorConsultas()
+            with connection.execute_wrapper(coletor):
+                for nome, telefone in entradas:
+                    inicio = time.perf_counter()
+                    busca(nome, telefone)
+                    medicoes.append((time.perf_counter() - inicio) * 1000)
+            resultados[nome_caso] = (statistics.median(medicoes), coletor.quantidade / len(entradas))
+            self.stdout.write(
+                f'{nome_caso}: {resultados[nome_caso][0]:.2f} ms (mediana), '
+                f'{resultados[nome_caso][1]:.1f} consulta(s) por busca'
+            )
+        return resultados
+
+    def _explicar(self, resolvedor, casos):
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Planos do ResolvedorCliente ==='))
+        nome, telefone = casos['nome_e_telefone'][0]
+        self.stdout.write(self.style.SUCCESS('\nnome_e_telefone:'))
+        self.stdout.write(
+            resolvedor.consulta_por_nome(nome, normalizar_telefone(telefone))[:2].explain(analyze=True)
+        )
+        self.stdout.write(self.style.SUCCESS('\ntelefone:'))
+        self.stdout.write(
+            resolvedor.clientes().filter(telefone_normalizado=normalizar_telefone(telefone))[:1]
+            .explain(analyze=True)
+        )
+
+    def _resumo(self, antes, depois):
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Resumo ==='))
+        self.stdout.write(
+            f"{'busca':<16} {'anterior':>11} {'resolvedor':>11} {'ganho':>7} {'consultas':>11}"
+        )
+        for nome in antes:
+            (tempo_antes, consultas_antes), (tempo_depois, consultas_depois) = antes[nome], depois[nome]
+            ganho = tempo_antes / tempo_depois if tempo_depois else 0
+            self.stdout.write(
+                f'{nome:<16} {tempo_antes:>8.2f} ms {tempo_depois:>8.2f} ms {ganho:>6.1f}x '
+                f'{consultas_antes:>5.1f} → {consultas_depois:.1f}'
+            )
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from autenticacao.models import Pizzaria
+from clientes.services import reconstruir_estatisticas_clientes
+
+
+class Command(BaseCommand):
+    help = 'Recalcula as estatísticas de pedidos gravadas nos clientes a partir dos pedidos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pizzaria-id',
+            type=int,
+            help='ID da pizzaria específica (opcional)',
+        )
+
+    def handle(self, *args, **options):
+        if options['pizzaria_id']:
+            pizzarias = Pizzaria.objects.filter(id=options['pizzaria_id'])
+        else:
+            pizzarias = Pizzaria.objects.all()
+
+        total_clientes = 0
+        for pizzaria in pizzarias:
+            clientes = reconstruir_estatisticas_clientes(pizzaria)
+            total_clientes += clientes
+            self.stdout.write(f'  {pizzaria.nome}: {clientes} cliente(s)')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Estatísticas reconstruídas: {total_clientes} cliente(s).')
+        )
@@ -0,0 +1,67 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:04
+
+from django.db import migrations, models
+from django.db.models import BigIntegerField, Count, F, IntegerField, Max, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, NullIf, Round
+
+
+def preencher_estatisticas(apps, schema_editor):
+    Cliente = apps.get_model('clientes', 'Cliente')
+    Pedido = apps.get_model('pedidos', 'Pedido')
+    por_cliente = (
+        Pedido.objects.filter(cliente=OuterRef('pk'))
+        .exclude(status='CANCELADO')
+        .order_by()
+        .values('cliente')
+    )
+    Cliente.objects.update(
+        total_pedidos=Coalesce(
+            Subquery(por_cliente.annotate(n=Count('pk')).values('n')), Value(0),
+            output_field=IntegerField(),
+        ),
+        total_gasto_centavos=Coalesce(
+            Subquery(por_cliente.annotate(
+                soma=Cast(Round(Sum('total') * 100), BigIntegerField())
+            ).values('soma')),
+            Value(0),
+            output_field=BigIntegerField(),
+        ),
+        ultimo_pedido_em=Subquery(por_cliente.annotate(ultimo=Max('data_criacao')).values('ultimo')),
+    )
+    Cliente.objects.update(ticket_medio_centavos=Coalesce(
+        F('total_gasto_centavos') / NullIf(F('total_pedidos'), Value(0)),
+        Value(0),
+        output_field=BigIntegerField(),
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        ('pedidos', '0006_pedido_data_negocio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='ticket_medio_centavos',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='total_gasto_centavos',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='total_pedidos',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='ultimo_pedido_em',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(preencher_estatisticas, migrations.RunPython.noop),
+    ]
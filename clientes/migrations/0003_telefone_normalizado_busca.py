@@ -0,0 +1,83 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:07
+
+import re
+
+import django.contrib.postgres.indexes
+import django.db.models.functions.text
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations, models
+
+
+def _consultar(schema_editor, sql):
+    if schema_editor.connection.vendor != 'postgresql':
+        return False
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(sql)
+        return cursor.fetchone() is not None
+
+
+class CriarExtensaoTrigramas(TrigramExtension):
+    """Instala o pg_trgm quando o servidor o oferece (sem ele a busca usa o fallback)."""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if _consultar(schema_editor, "SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'"):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+
+class AddIndexTrigramas(migrations.AddIndex):
+    """``AddIndex`` aplicado só com o pg_trgm instalado (o estado é o mesmo em todos os bancos)."""
+
+    def _trigramas(self, schema_editor):
+        return _consultar(schema_editor, "SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if self._trigramas(schema_editor):
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if self._trigramas(schema_editor):
+            schema_editor.execute(f'DROP INDEX IF EXISTS "{self.index.name}"')
+
+
+def preencher_telefone_normalizado(apps, schema_editor):
+    """Grava os dígitos do telefone; repetições na pizzaria ficam vazias até serem corrigidas."""
+    Cliente = apps.get_model('clientes', 'Cliente')
+    vistos = set()
+    alterados = []
+    for cliente in Cliente.objects.only('pk', 'pizzaria_id', 'telefone').order_by('pk').iterator(chunk_size=2000):
+        digitos = re.sub(r'\D', '', cliente.telefone or '')
+        if (cliente.pizzaria_id, digitos) in vistos:
+            continue
+        vistos.add((cliente.pizzaria_id, digitos))
+        cliente.telefone_normalizado = digitos
+        alterados.append(cliente)
+    Cliente.objects.bulk_update(alterados, ['telefone_normalizado'], batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0002_estatisticas_cliente'),
+    ]
+
+    operations = [
+        CriarExtensaoTrigramas(),
+        migrations.AlterUniqueTogether(
+            name='cliente',
+            unique_together=set(),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='telefone_normalizado',
+            field=models.CharField(blank=True, editable=False, max_length=20),
+        ),
+        migrations.RunPython(preencher_telefone_normalizado, migrations.RunPython.noop),
+        AddIndexTrigramas(
+            model_name='cliente',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.indexes.OpClass(django.db.models.functions.text.Upper('nome'), name='gin_trgm_ops'), name='cliente_nome_trgm'),
+        ),
+        migrations.AddConstraint(
+            model_name='cliente',
+            constraint=models.UniqueConstraint(condition=models.Q(('telefone_normalizado', ''), _negated=True), fields=('pizzaria', 'telefone_normalizado'), name='cliente_pizzaria_telefone_norm', opclasses=('int8_ops', 'varchar_pattern_ops')),
+        ),
+    ]
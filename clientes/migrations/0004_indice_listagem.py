@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0003_metrica_desempenho'),
+        ('clientes', '0003_telefone_normalizado_busca'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(condition=models.Q(('ativo', True)), fields=['pizzaria', 'nome', 'id'], name='cliente_ativo_nome'),
+        ),
+    ]
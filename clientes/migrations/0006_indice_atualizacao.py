@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0003_metrica_desempenho'),
+        ('clientes', '0005_indice_listagem_api'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cliente',
+            index=models.Index(fields=['pizzaria', 'data_atualizacao'], name='cliente_pizzaria_atualizacao'),
+        ),
+    ]
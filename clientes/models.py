@@ -1,10 +1,24 @@
+import re
+
+from django.contrib.postgres.indexes import GinIndex, OpClass
 from django.db import models
+from django.db.models.functions import Upper
 from django.utils import timezone
+
+from autenticacao.mixins import RastreamentoCamposMixin
 from autenticacao.models import Pizzaria
 
 
-class Cliente(models.Model):
+def normalizar_telefone(telefone):
+    """Somente os dígitos do telefone (``"(11) 99999-0000"`` → ``"11999990000"``)."""
+    return re.sub(r'\D', '', telefone or '')
+
+
+class Cliente(RastreamentoCamposMixin, models.Model):
     """Cliente de uma pizzaria específica."""
+
+    # Atualizados só pelos signals de Pedido e pela reconstrução (UPDATE direto)
+    CAMPOS_ESTATISTICAS = ('total_pedidos', 'total_gasto_centavos', 'ticket_medio_centavos', 'ultimo_pedido_em')
     
     pizzaria = models.ForeignKey(
         Pizzaria,
@@ -13,6 +27,8 @@ class Cliente(models.Model):
     )
     nome = models.CharField(max_length=120)
     telefone = models.CharField(max_length=20)
+    # Dígitos do telefone, preenchido no save (busca e unicidade por pizzaria)
+    telefone_normalizado = models.CharField(max_length=20, blank=True, editable=False)
     email = models.EmailField(blank=True)
     
     # Endereço principal (referência para o endereço padrão)
@@ -32,26 +48,68 @@ class Cliente(models.Model):
     ativo = models.BooleanField(default=True)
     data_cadastro = models.DateTimeField(default=timezone.now)
     data_atualizacao = models.DateTimeField(auto_now=True)
+
+    # Estatísticas de pedidos (exceto cancelados), mantidas pelos signals de Pedido
+    total_pedidos = models.PositiveIntegerField(default=0, editable=False)
+    total_gasto_centavos = models.BigIntegerField(default=0, editable=False)
+    ticket_medio_centavos = models.BigIntegerField(default=0, editable=False)
+    ultimo_pedido_em = models.DateTimeField(null=True, blank=True, editable=False)
     
     class Meta:
         verbose_name = "Cliente"
         verbose_name_plural = "Clientes"
-        unique_together = ('pizzaria', 'telefone')  # Telefone único por pizzaria
         ordering = ('nome',)
+        constraints = [
+            # Telefone único por pizzaria; o opclass permite buscar por prefixo no mesmo índice
+            models.UniqueConstraint(
+                fields=('pizzaria', 'telefone_normalizado'),
+                condition=~models.Q(telefone_normalizado=''),
+                opclasses=('int8_ops', 'varchar_pattern_ops'),
+                name='cliente_pizzaria_telefone_norm',
+            ),
+        ]
+        indexes = [
+            # Listagem por keyset em (nome, id) dos clientes ativos
+            models.Index(
+                fields=('pizzaria', 'nome', 'id'), condition=models.Q(ativo=True), name='cliente_ativo_nome',
+            ),
+            # Listagem da API por cursor em (data_cadastro, id)
+            models.Index(fields=('pizzaria', 'data_cadastro', 'id'), name='cliente_pizzaria_cadastro'),
+            # Versão (COUNT/MAX da atualização) das leituras condicionais
+            models.Index(fields=('pizzaria', 'data_atualizacao'), name='cliente_pizzaria_atualizacao'),
+            # Busca por trecho do nome (icontains = UPPER(nome) LIKE); criado só no PostgreSQL (pg_trgm)
+            GinIndex(OpClass(Upper('nome'), name='gin_trgm_ops'), name='cliente_nome_trgm'),
+        ]
     
     def __str__(self):
         return f"{self.nome} - {self.telefone}"
-    
+
+    campos_rastreados = ('telefone',)
+
+    def save(self, *args, **kwargs):
+        """Normaliza o telefone e, ao editar, não regrava as estatísticas lidas na instância."""
+        update_fields = kwargs.get('update_fields')
+        if self._state.adding or self.campo_alterado('telefone'):
+            self.telefone_normalizado = normalizar_telefone(self.telefone)
+            if update_fields is not None and 'telefone' in update_fields:
+                kwargs['update_fields'] = {*update_fields, 'telefone_normalizado'}
+        if not self._state.adding and update_fields is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_ESTATISTICAS
+            ]
+        super().save(*args, **kwargs)
+    
+    @property
     def total_gasto(self):
-        """Retorna o total gasto pelo cliente"""
-        return self.pedidos.aggregate(
-            total=models.Sum('total')
-        )['total'] or 0
-    
-    def total_pedidos(self):
-        """Retorna o número total de pedidos"""
-        return self.pedidos.count()
-    
+        """Retorna o total gasto pelo cliente em reais."""
+        return self.total_gasto_centavos / 100
+
+    @property
+    def ticket_medio(self):
+        """Retorna o ticket médio do cliente em reais."""
+        return self.ticket_medio_centavos / 100
+
     def ultimo_pedido(self):
         """Retorna o último pedido do cliente"""
         return self.pedidos.order_by('-data_criacao').first()
@@ -62,13 +120,6 @@ class Cliente(models.Model):
             count=models.Count('id')
         )
     
-    def ticket_medio(self):
-        """Retorna o ticket médio do cliente"""
-        total_pedidos = self.total_pedidos()
-        if total_pedidos == 0:
-            return 0
-        return self.total_gasto() / total_pedidos
-    
     def produtos_favoritos(self, limit=3):
         """Retorna os produtos mais pedidos pelo cliente"""
         from pedidos.models import ItemPedido
@@ -0,0 +1,337 @@
+"""Estatísticas de pedidos gravadas no ``Cliente``.
+
+``total_pedidos``, ``total_gasto_centavos``, ``ticket_medio_centavos`` e
+``ultimo_pedido_em`` consideram os pedidos do cliente que não estão
+cancelados. Os signals de ``Pedido`` aplicam a diferença de cada criação,
+mudança de status, total, data ou cliente e exclusão com um ``UPDATE`` de
+expressões ``F()``; ``ultimo_pedido_em`` só é reconsultado (subconsulta no
+mesmo ``UPDATE``) quando um pedido sai da conta ou tem a data alterada.
+``reconstruir_estatisticas_clientes`` recalcula tudo a partir dos pedidos.
+
+``pesquisar_clientes`` é a busca do autocomplete: telefone pelo início dos
+dígitos (``telefone_normalizado``, índice por pizzaria com
+``varchar_pattern_ops``) e nome por trecho (índice GIN pg_trgm sobre ``UPPER(nome)``, quando o
+servidor oferece a extensão).
+
+``pagina_clientes`` monta a listagem por keyset em ``(nome, id)``: cada
+página é uma faixa do índice parcial de clientes ativos, com custo
+independente da posição e da quantidade de pedidos. ``historico_pedidos``
+pagina do mesmo jeito os pedidos de um cliente.
+
+``ResolvedorCliente`` casa o nome/telefone digitado num pedido com um
+cliente cadastrado: uma consulta ordenada por confiança (ou só o índice do
+telefone normalizado, quando não há nome), compartilhada pelas telas e pela
+API de pedidos.
+"""
+import re
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import (
+    BigIntegerField, Case, Count, F, FloatField, IntegerField, Max, OuterRef, Q, Subquery, Sum,
+    Value, When,
+)
+from django.db.models.functions import Cast, Coalesce, Greatest, NullIf, Round
+from django.utils import timezone
+
+from autenticacao.listagem import codificar_cursor, decodificar_cursor
+from .models import Cliente, normalizar_telefone
+
+
+# Pedidos com estes status não entram nas estatísticas do cliente
+STATUS_FORA_DAS_ESTATISTICAS = ('CANCELADO',)
+
+# Marca para ``atualizar_estatisticas``: reconsultar o último pedido
+RECONSULTAR = object()
+
+# Termo de busca tratado como telefone: dígitos e pontuação, com ao menos dois dígitos
+TERMO_TELEFONE = re.compile(r'[\s()+.-]*(\d[\s()+.-]*){2,}')
+
+# Clientes por página na listagem
+TAMANHO_PAGINA = 20
+
+# Confiança do cliente encontrado pelo ``ResolvedorCliente``
+CONFIANCA_ID = 1.0
+CONFIANCA_NOME_E_TELEFONE = 1.0
+CONFIANCA_NOME = 0.9
+CONFIANCA_TELEFONE = 0.8
+CONFIANCA_PRIMEIRO_NOME = 0.5
+
+# Por alias de banco: o pg_trgm está instalado?
+_trigramas = {}
+
+
+def total_em_centavos(total):
+    """Converte o ``total`` (reais) de um pedido para centavos."""
+    return int((Decimal(str(total or 0)) * 100).to_integral_value())
+
+
+def conta_nas_estatisticas(status):
+    return status not in STATUS_FORA_DAS_ESTATISTICAS
+
+
+def _pedidos_do_cliente():
+    from pedidos.models import Pedido  # import local para evitar ciclos
+
+    return (
+        Pedido.objects.filter(cliente=OuterRef('pk'))
+        .exclude(status__in=STATUS_FORA_DAS_ESTATISTICAS)
+        .order_by()
+    )
+
+
+def _ultimo_pedido_em():
+    return Subquery(
+        _pedidos_do_cliente().order_by('-data_criacao').values('data_criacao')[:1]
+    )
+
+
+def _ticket_medio(total_pedidos, total_gasto_centavos):
+    return Coalesce(
+        total_gasto_centavos / NullIf(total_pedidos, Value(0)),
+        Value(0),
+        output_field=BigIntegerField(),
+    )
+
+
+def atualizar_estatisticas(cliente_id, pedidos=0, centavos=0, ultimo_pedido_em=None):
+    """Soma ``pedidos`` e ``centavos`` às estatísticas do cliente (um ``UPDATE``).
+
+    ``ultimo_pedido_em`` pode ser ``None`` (mantém), um datetime (fica o
+    mais recente) ou ``RECONSULTAR``.
+    """
+    total_pedidos = F('total_pedidos') + pedidos
+    total_gasto_centavos = F('total_gasto_centavos') + centavos
+    campos = {
+        'total_pedidos': total_pedidos,
+        'total_gasto_centavos': total_gasto_centavos,
+        # Num UPDATE as colunas à direita ainda têm os valores antigos
+        'ticket_medio_centavos': _ticket_medio(total_pedidos, total_gasto_centavos),
+        'data_atualizacao': timezone.now(),
+    }
+    if ultimo_pedido_em is RECONSULTAR:
+        campos['ultimo_pedido_em'] = _ultimo_pedido_em()
+    elif ultimo_pedido_em is not None:
+        campos['ultimo_pedido_em'] = Coalesce(
+            Greatest('ultimo_pedido_em', Value(ultimo_pedido_em)), Value(ultimo_pedido_em)
+        )
+    Cliente.objects.filter(pk=cliente_id).update(**campos)
+
+
+def reconstruir_estatisticas_clientes(pizzaria=None, cliente_ids=None):
+    """Recalcula as estatísticas dos clientes (todos, de uma pizzaria ou os ``cliente_ids``).
+
+    Dois ``UPDATE``: contagem, soma e último pedido por subconsultas
+    correlacionadas e, em seguida, o ticket médio. Retorna a quantidade de
+    clientes atualizados.
+    """
+    por_cliente = _pedidos_do_cliente().values('cliente')
+    clientes = Cliente.objects.all()
+    if pizzaria is not None:
+        clientes = clientes.filter(pizzaria=pizzaria)
+    if cliente_ids is not None:
+        clientes = clientes.filter(pk__in=cliente_ids)
+
+    with transaction.atomic():
+        atualizados = clientes.update(
+            total_pedidos=Coalesce(
+                Subquery(por_cliente.annotate(n=Count('pk')).values('n')), Value(0),
+                output_field=IntegerField(),
+            ),
+            total_gasto_centavos=Coalesce(
+                Subquery(por_cliente.annotate(
+                    soma=Cast(Round(Sum('total') * 100), BigIntegerField())
+                ).values('soma')),
+                Value(0),
+                output_field=BigIntegerField(),
+            ),
+            ultimo_pedido_em=Subquery(por_cliente.annotate(ultimo=Max('data_criacao')).values('ultimo')),
+            data_atualizacao=timezone.now(),
+        )
+        clientes.update(
+            ticket_medio_centavos=_ticket_medio(F('total_pedidos'), F('total_gasto_centavos'))
+        )
+    return atualizados
+
+
+def trigramas_disponiveis():
+    """Indica se o banco tem o pg_trgm (similaridade e índice GIN do nome); consultado uma vez."""
+    if connection.vendor != 'postgresql':
+        return False
+    if connection.alias not in _trigramas:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigramas[connection.alias] = cursor.fetchone() is not None
+    return _trigramas[connection.alias]
+
+
+def pesquisar_clientes(pizzaria, termo, limite=10):
+    """Clientes ativos da pizzaria que casam com ``termo``, dos mais relevantes.
+
+    Um termo só com dígitos e pontuação de telefone busca pelo início do
+    telefone (exato antes de prefixo); os demais buscam trecho do nome,
+    ordenados pela similaridade (trigramas com o pg_trgm; sem ele, ou no
+    SQLite, os nomes que começam pelo termo vêm primeiro). Cada consulta usa
+    um único índice.
+    """
+    termo = termo.strip()
+    clientes = Cliente.objects.filter(pizzaria=pizzaria, ativo=True).select_related('endereco_principal')
+
+    if TERMO_TELEFONE.fullmatch(termo):
+        digitos = normalizar_telefone(termo)
+        # Em ordem de telefone o número exato vem antes dos que só começam por ele.
+        # O índice parcial (pizzaria, telefone_normalizado varchar_pattern_ops) atende
+        # só o filtro de prefixo (a condição ``<> ''`` deixa o planner usá-lo): um índice
+        # pattern_ops não entrega a ordem do ORDER BY, então o PostgreSQL ordena as linhas
+        # encontradas (top-N limitado a ``limite``, barato para um prefixo de telefone).
+        return (
+            clientes.filter(telefone_normalizado__startswith=digitos)
+            .exclude(telefone_normalizado='')
+            .order_by('telefone_normalizado')[:limite]
+        )
+
+    if trigramas_disponiveis():
+        from django.contrib.postgres.search import TrigramSimilarity
+
+        similaridade = TrigramSimilarity('nome', termo)
+    else:
+        similaridade = Case(
+            When(nome__istartswith=termo, then=Value(1.0)),
+            default=Value(0.0),
+            output_field=FloatField(),
+        )
+    return (
+        clientes.filter(nome__icontains=termo)
+        .annotate(similaridade=similaridade)
+        .order_by('-similaridade', 'nome', 'pk')[:limite]
+    )
+
+
+def pagina_clientes(pizzaria, busca='', cursor=None, limite=TAMANHO_PAGINA):
+    """Página de clientes ativos em ordem de ``(nome, id)`` a partir do ``cursor``.
+
+    Retorna ``(clientes, proximo_cursor)``; ``proximo_cursor`` é ``None`` na
+    última página. Uma consulta, com uma linha a mais para saber se há
+    próxima página.
+    """
+    clientes = Cliente.objects.filter(pizzaria=pizzaria, ativo=True)
+
+    busca = busca.strip()
+    if busca:
+        filtro = Q(nome__icontains=busca) | Q(email__icontains=busca)
+        digitos = normalizar_telefone(busca)
+        if digitos:
+            filtro |= Q(telefone_normalizado__contains=digitos)
+        clientes = clientes.filter(filtro)
+
+    if cursor:
+        nome, pk = decodificar_cursor(cursor, str, int)
+        # (nome, id) > (nome do cursor, id do cursor): faixa do índice a partir do nome
+        clientes = clientes.filter(nome__gte=nome).exclude(nome=nome, pk__lte=pk)
+
+    pagina = list(
+        clientes.select_related('endereco_principal').order_by('nome', 'pk')[:limite + 1]
+    )
+    if len(pagina) <= limite:
+        return pagina, None
+    pagina = pagina[:limite]
+    return pagina, codificar_cursor(pagina[-1].nome, pagina[-1].pk)
+
+
+def historico_pedidos(cliente, cursor=None, data_inicio=None, data_fim=None, limite=TAMANHO_PAGINA):
+    """Página do histórico de pedidos do cliente, do mais recente ao mais antigo.
+
+    Keyset em ``(data_criacao, id)`` decrescente, sobre o índice
+    ``(cliente, -data_criacao)``; o período filtra ``data_negocio``. A
+    quantidade de itens vem de um ``Count`` na mesma consulta. Retorna
+    ``(pedidos, proximo_cursor)``.
+    """
+    pedidos = cliente.pedidos.all()
+    if data_inicio is not None:
+        pedidos = pedidos.filter(data_negocio__gte=data_inicio)
+    if data_fim is not None:
+        pedidos = pedidos.filter(data_negocio__lte=data_fim)
+
+    if cursor:
+        momento, pk = decodificar_cursor(cursor, str, int)
+        try:
+            momento = datetime.fromisoformat(momento)
+        except ValueError:
+            raise ValueError('Cursor inválido')
+        pedidos = pedidos.filter(data_criacao__lte=momento).exclude(data_criacao=momento, pk__gte=pk)
+
+    pagina = list(
+        pedidos.annotate(itens_count=Count('itens'))
+        .order_by('-data_criacao', '-pk')[:limite + 1]
+    )
+    if len(pagina) <= limite:
+        return pagina, None
+    pagina = pagina[:limite]
+    return pagina, codificar_cursor(pagina[-1].data_criacao.isoformat(), pagina[-1].pk)
+
+
+class ResolvedorCliente:
+    """Encontra o cliente da pizzaria de um pedido digitado sem selecionar cadastro.
+
+    ``resolver`` retorna ``(cliente, confianca)`` (``(None, 0.0)`` sem
+    candidato). A ordem de preferência é a de sempre: nome exato (acima
+    dele só nome e telefone do mesmo cliente), telefone e, por último, o
+    primeiro nome, aceito só quando um único cliente o contém.
+    """
+
+    def __init__(self, pizzaria):
+        self.pizzaria = pizzaria
+
+    def clientes(self):
+        return Cliente.objects.filter(pizzaria=self.pizzaria)
+
+    def resolver(self, cliente_id=None, nome='', telefone=''):
+        if cliente_id:
+            cliente = self.clientes().filter(pk=cliente_id).first()
+            return (cliente, CONFIANCA_ID) if cliente else (None, 0.0)
+
+        nome = (nome or '').strip()
+        digitos = normalizar_telefone(telefone)
+        if nome:
+            return self._por_nome(nome, digitos)
+        if digitos:
+            # Uma busca no índice único (pizzaria, telefone_normalizado)
+            cliente = self.clientes().filter(telefone_normalizado=digitos).first()
+            return (cliente, CONFIANCA_TELEFONE) if cliente else (None, 0.0)
+        return None, 0.0
+
+    def consulta_por_nome(self, nome, digitos=''):
+        """Candidatos pelo primeiro nome ou pelo telefone, anotados e ordenados por ``confianca``.
+
+        O nome completo contém o primeiro nome, então ``icontains`` do
+        primeiro nome já traz os de nome exato.
+        """
+        nome_exato = Q(nome__iexact=nome)
+        filtro = Q(nome__icontains=nome.split()[0])
+        quando = [When(nome_exato, then=Value(CONFIANCA_NOME))]
+        if digitos:
+            telefone_igual = Q(telefone_normalizado=digitos)
+            filtro |= telefone_igual
+            quando = [
+                When(nome_exato & telefone_igual, then=Value(CONFIANCA_NOME_E_TELEFONE)),
+                *quando,
+                When(telefone_igual, then=Value(CONFIANCA_TELEFONE)),
+            ]
+        return (
+            self.clientes().filter(filtro)
+            .annotate(confianca=Case(
+                *quando, default=Value(CONFIANCA_PRIMEIRO_NOME), output_field=FloatField(),
+            ))
+            .order_by('-confianca', '-ativo', 'nome', 'pk')
+        )
+
+    def _por_nome(self, nome, digitos):
+        # O segundo candidato só serve para recusar um primeiro nome ambíguo
+        candidatos = list(self.consulta_por_nome(nome, digitos)[:2])
+        if not candidatos:
+            return None, 0.0
+        melhor = candidatos[0]
+        if melhor.confianca == CONFIANCA_PRIMEIRO_NOME and len(candidatos) > 1:
+            return None, 0.0
+        return melhor, melhor.confianca
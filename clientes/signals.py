@@ -0,0 +1,67 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from pedidos.models import Pedido
+from .models import Cliente, EnderecoCliente
+from .services import (
+    RECONSULTAR, atualizar_estatisticas, conta_nas_estatisticas, reconstruir_estatisticas_clientes,
+    total_em_centavos,
+)
+
+
+CAMPOS_ESTATISTICAS = ('cliente_id', 'status', 'total', 'data_criacao')
+
+
+@receiver(post_save, sender=Pedido)
+def atualizar_estatisticas_cliente(sender, instance, created, **kwargs):
+    """Aplica às estatísticas do cliente a diferença trazida pelo pedido salvo."""
+    if not created and not all(instance.tem_valor_original(campo) for campo in CAMPOS_ESTATISTICAS):
+        # Valores anteriores desconhecidos (ex.: carregado com only()): recalcula o cliente
+        if instance.cliente_id:
+            reconstruir_estatisticas_clientes(cliente_ids=[instance.cliente_id])
+        return
+    if not created and not any(instance.campo_alterado(campo) for campo in CAMPOS_ESTATISTICAS):
+        return
+
+    deltas = {}
+    conta_agora = bool(instance.cliente_id) and conta_nas_estatisticas(instance.status)
+    if conta_agora:
+        deltas[instance.cliente_id] = [1, total_em_centavos(instance.total), instance.data_criacao]
+
+    cliente_anterior = None if created else instance.valor_original('cliente_id')
+    if cliente_anterior and conta_nas_estatisticas(instance.valor_original('status')):
+        pedidos, centavos, ultimo = deltas.get(cliente_anterior, [0, 0, None])
+        # O último pedido só precisa ser reconsultado se este saiu da conta ou ficou mais antigo
+        continua = ultimo is not None and ultimo >= instance.valor_original('data_criacao')
+        deltas[cliente_anterior] = [
+            pedidos - 1,
+            centavos - total_em_centavos(instance.valor_original('total')),
+            ultimo if continua else RECONSULTAR,
+        ]
+
+    data_alterada = instance.campo_alterado('data_criacao')
+    for cliente_id, (pedidos, centavos, ultimo) in deltas.items():
+        # Ex.: RECEBIDO → PRONTO não muda nada e não gera UPDATE
+        if pedidos or centavos or ultimo is RECONSULTAR or data_alterada:
+            atualizar_estatisticas(cliente_id, pedidos, centavos, ultimo)
+
+
+@receiver(post_delete, sender=Pedido)
+def remover_das_estatisticas_cliente(sender, instance, **kwargs):
+    """Retira das estatísticas do cliente um pedido excluído."""
+    cliente_id = instance.valor_original('cliente_id', instance.cliente_id)
+    if cliente_id and conta_nas_estatisticas(instance.valor_original('status', instance.status)):
+        atualizar_estatisticas(
+            cliente_id,
+            pedidos=-1,
+            centavos=-total_em_centavos(instance.valor_original('total', instance.total)),
+            ultimo_pedido_em=RECONSULTAR,
+        )
+
+
+@receiver(post_save, sender=EnderecoCliente)
+@receiver(post_delete, sender=EnderecoCliente)
+def tocar_cliente_do_endereco(sender, instance, **kwargs):
+    """Endereços aparecem na busca de clientes: a alteração muda a versão do cliente."""
+    Cliente.objects.filter(pk=instance.cliente_id).update(data_atualizacao=timezone.now())
@@ -1,3 +1,395 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from autenticacao.models import Pizzaria, UsuarioPizzaria
+from pedidos.models import ItemPedido, Pedido
+from produtos.models import Produto
+from .forms import ClienteForm
+from .models import Cliente
+from .services import (
+    CONFIANCA_NOME, CONFIANCA_NOME_E_TELEFONE, CONFIANCA_PRIMEIRO_NOME, CONFIANCA_TELEFONE,
+    ResolvedorCliente, pesquisar_clientes,
+)
+
+
+class EstatisticasClienteTestCase(TestCase):
+    """Testes para as estatísticas de pedidos gravadas no cliente."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.cliente = Cliente.objects.create(pizzaria=self.pizzaria, nome="Ana", telefone="11999990000")
+        self.outro = Cliente.objects.create(pizzaria=self.pizzaria, nome="Bruno", telefone="11999990001")
+        self.agora = timezone.now()
+
+    def _pedido(self, total, cliente=None, dias_atras=0, status="RECEBIDO"):
+        return Pedido.objects.create(
+            pizzaria=self.pizzaria,
+            cliente=cliente or self.cliente,
+            forma_pagamento="PIX",
+            status=status,
+            total=Decimal(total),
+            data_criacao=self.agora - timedelta(days=dias_atras),
+        )
+
+    def _estatisticas(self, cliente=None):
+        cliente = Cliente.objects.get(pk=(cliente or self.cliente).pk)
+        return (
+            cliente.total_pedidos, cliente.total_gasto_centavos,
+            cliente.ticket_medio_centavos, cliente.ultimo_pedido_em,
+        )
+
+    def test_criacao_total_e_exclusao(self):
+        """Testa a atualização incremental ao criar, alterar o total e excluir pedidos."""
+        antigo = self._pedido("30.00", dias_atras=3)
+        recente = self._pedido("50.50", dias_atras=1)
+        self.assertEqual(self._estatisticas(), (2, 8050, 4025, recente.data_criacao))
+
+        antigo.total = Decimal("45.00")
+        antigo.save(update_fields=["total"])
+        self.assertEqual(self._estatisticas(), (2, 9550, 4775, recente.data_criacao))
+
+        recente.delete()
+        self.assertEqual(self._estatisticas(), (1, 4500, 4500, antigo.data_criacao))
+
+        antigo.delete()
+        self.assertEqual(self._estatisticas(), (0, 0, 0, None))
+
+    def test_cancelamento_e_troca_de_cliente(self):
+        """Testa que pedidos cancelados saem da conta e que a troca de cliente move os valores."""
+        antigo = self._pedido("20.00", dias_atras=2)
+        recente = self._pedido("40.00")
+
+        recente.status = "CANCELADO"
+        recente.save()
+        self.assertEqual(self._estatisticas(), (1, 2000, 2000, antigo.data_criacao))
+
+        recente.status = "RECEBIDO"
+        recente.save()
+        recente.cliente = self.outro
+        recente.save()
+        self.assertEqual(self._estatisticas(), (1, 2000, 2000, antigo.data_criacao))
+        self.assertEqual(self._estatisticas(self.outro), (1, 4000, 4000, recente.data_criacao))
+
+        self._pedido("99.00", status="CANCELADO")
+        self.assertEqual(self._estatisticas(), (1, 2000, 2000, antigo.data_criacao))
+
+    def test_salvar_sem_mudanca_relevante_nao_atualiza(self):
+        """Testa que mudanças de status dentro da conta não tocam no cliente."""
+        pedido = self._pedido("20.00")
+        pedido.status = "EM_PREPARO"
+        with CaptureQueriesContext(connection) as consultas:
+            pedido.save()
+        self.assertFalse([q for q in consultas if 'clientes_cliente' in q['sql']])
+
+    def test_editar_cliente_nao_sobrescreve_estatisticas(self):
+        """Testa que salvar uma instância antiga do cliente preserva as estatísticas."""
+        cliente = Cliente.objects.get(pk=self.cliente.pk)
+        self._pedido("25.00")
+
+        cliente.nome = "Ana Maria"
+        cliente.save()
+
+        self.assertEqual(self._estatisticas()[:3], (1, 2500, 2500))
+        self.assertEqual(Cliente.objects.get(pk=self.cliente.pk).nome, "Ana Maria")
+
+    def test_comando_reconstroi_estatisticas(self):
+        """Testa a reconstrução a partir dos pedidos."""
+        self._pedido("10.10", dias_atras=1)
+        ultimo = self._pedido("20.20")
+        self._pedido("5.00", status="CANCELADO")
+        Cliente.objects.update(total_pedidos=0, total_gasto_centavos=0, ticket_medio_centavos=0, ultimo_pedido_em=None)
+
+        saida = StringIO()
+        call_command("reconstruir_estatisticas_clientes", pizzaria_id=self.pizzaria.id, stdout=saida)
+
+        self.assertIn("2 cliente(s)", saida.getvalue())
+        self.assertEqual(self._estatisticas(), (2, 3030, 1515, ultimo.data_criacao))
+        self.assertEqual(self._estatisticas(self.outro), (0, 0, 0, None))
+
+
+class BuscarClientesTestCase(TestCase):
+    """Testes para a busca de clientes usada na tela de pedidos."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=self.user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client.force_login(self.user)
+        # Aquece o tenant em cache (e a verificação do pg_trgm)
+        self.client.get(reverse('buscar_clientes'), {'termo': 'Silva'})
+
+    def _criar_clientes(self, quantidade):
+        for indice in range(Cliente.objects.count(), Cliente.objects.count() + quantidade):
+            cliente = Cliente.objects.create(
+                pizzaria=self.pizzaria, nome=f"Silva {indice}", telefone=f"1190000{indice:04d}"
+            )
+            Pedido.objects.create(
+                pizzaria=self.pizzaria, cliente=cliente, forma_pagamento="DIN", total=Decimal("32.50")
+            )
+
+    def test_consultas_constantes(self):
+        """Testa que a busca não faz consultas por cliente encontrado."""
+        self._criar_clientes(2)
+        with CaptureQueriesContext(connection) as poucos:
+            self.client.get(reverse('buscar_clientes'), {'termo': 'Silva'})
+
+        self._criar_clientes(8)
+        with CaptureQueriesContext(connection) as muitos:
+            response = self.client.get(reverse('buscar_clientes'), {'termo': 'Silva'})
+
+        self.assertEqual(len(muitos), len(poucos))
+        clientes = response.json()['clientes']
+        self.assertEqual(len(clientes), 10)
+        self.assertEqual(clientes[0]['total_pedidos'], 1)
+        self.assertEqual(clientes[0]['total_gasto'], 32.5)
+
+
+class PesquisaClientesTestCase(TestCase):
+    """Testes para o telefone normalizado e a busca ordenada por relevância."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+
+    def _cliente(self, nome, telefone):
+        return Cliente.objects.create(pizzaria=self.pizzaria, nome=nome, telefone=telefone)
+
+    def test_telefone_normalizado_unico_por_pizzaria(self):
+        """Testa que variações de formato do mesmo número contam como o mesmo telefone."""
+        cliente = self._cliente("Ana", "(11) 99999-0000")
+        self.assertEqual(cliente.telefone_normalizado, "11999990000")
+
+        form = ClienteForm(
+            data={"nome": "Outra Ana", "telefone": "11 999990000"}, pizzaria=self.pizzaria
+        )
+        self.assertFalse(form.is_valid())
+        self.assertIn("telefone", form.errors)
+
+        cliente.telefone = "11 98888-7777"
+        cliente.save(update_fields=["telefone"])
+        self.assertEqual(Cliente.objects.get(pk=cliente.pk).telefone_normalizado, "11988887777")
+
+    def test_telefone_exato_antes_do_prefixo(self):
+        """Testa a busca por telefone em qualquer formato, com o número exato primeiro."""
+        prefixo = self._cliente("Bruno", "(11) 99000-1234")
+        exato = self._cliente("Ana", "1199")
+        self._cliente("Carlos 1199", "21 3333-4444")
+
+        resultado = list(pesquisar_clientes(self.pizzaria, "(11) 99"))
+
+        self.assertEqual(resultado, [exato, prefixo])
+
+    def test_nome_mais_parecido_primeiro(self):
+        """Testa que, entre nomes, os mais parecidos com o termo vêm antes."""
+        self._cliente("Mariana Souza", "1100000001")
+        maria = self._cliente("Maria", "1100000002")
+        self._cliente("Rosa", "1100000003")
+
+        resultado = list(pesquisar_clientes(self.pizzaria, "maria"))
+
+        self.assertEqual(len(resultado), 2)
+        self.assertEqual(resultado[0], maria)
+
+
+class ResolvedorClienteTestCase(TestCase):
+    """Testes para a associação do nome/telefone digitado no pedido a um cliente."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.ana = Cliente.objects.create(pizzaria=self.pizzaria, nome="Ana Souza", telefone="(11) 99999-0000")
+        self.bruno = Cliente.objects.create(pizzaria=self.pizzaria, nome="Bruno Lima", telefone="11988887777")
+        self.bruna = Cliente.objects.create(pizzaria=self.pizzaria, nome="Bruna Dias", telefone="11977776666")
+        self.resolvedor = ResolvedorCliente(self.pizzaria)
+
+    def _resolver(self, **dados):
+        with self.assertNumQueries(1):
+            return self.resolvedor.resolver(**dados)
+
+    def test_ordem_de_preferencia(self):
+        """Testa nome exato acima de telefone, e os dois juntos acima de tudo."""
+        self.assertEqual(
+            self._resolver(nome="ana souza", telefone="11 99999 0000"), (self.ana, CONFIANCA_NOME_E_TELEFONE)
+        )
+        self.assertEqual(self._resolver(nome="Ana Souza", telefone="11988887777"), (self.ana, CONFIANCA_NOME))
+        self.assertEqual(self._resolver(nome="Fulano", telefone="11988887777"), (self.bruno, CONFIANCA_TELEFONE))
+        self.assertEqual(self._resolver(telefone="(11) 98888-7777"), (self.bruno, CONFIANCA_TELEFONE))
+
+    def test_primeiro_nome_so_quando_unico(self):
+        """Testa que o primeiro nome só associa o cliente quando não é ambíguo."""
+        self.assertEqual(self._resolver(nome="Ana Paula"), (self.ana, CONFIANCA_PRIMEIRO_NOME))
+        self.assertEqual(self._resolver(nome="Brun"), (None, 0.0))
+        self.assertEqual(self._resolver(nome="Carlos", telefone="21 3333-4444"), (None, 0.0))
+
+    def test_restrito_a_pizzaria(self):
+        """Testa que clientes de outra pizzaria não são encontrados."""
+        outra = Pizzaria.objects.create(nome="Outra", cnpj="98765432000110", endereco="Rua B, 1")
+        self.assertEqual(ResolvedorCliente(outra).resolver(nome="Ana Souza", telefone="11999990000"), (None, 0.0))
+        self.assertEqual(ResolvedorCliente(outra).resolver(cliente_id=self.ana.pk), (None, 0.0))
+
+    def test_benchmark_descarta_dados(self):
+        """Testa que o benchmark compara as duas buscas e desfaz a massa de dados."""
+        if connection.vendor != "postgresql":
+            self.skipTest("O benchmark requer PostgreSQL")
+        saida = StringIO()
+        call_command("benchmark_resolvedor_clientes", clientes=300, pizzarias=2, buscas=5, stdout=saida)
+
+        self.assertIn("ResolvedorCliente", saida.getvalue())
+        self.assertIn("sem_cadastro", saida.getvalue())
+        self.assertFalse(Pizzaria.objects.filter(nome__startswith="Benchmark").exists())
+        self.assertEqual(Cliente.objects.count(), 3)
+
+
+class ListaClientesTestCase(TestCase):
+    """Testes para a listagem de clientes paginada por keyset."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=self.user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client.force_login(self.user)
+        # Nomes repetidos atravessam a divisa das páginas
+        for indice in range(45):
+            Cliente.objects.create(
+                pizzaria=self.pizzaria, nome=f"Cliente {indice // 3:02d}", telefone=f"11 9000-{indice:04d}"
+            )
+        Cliente.objects.create(pizzaria=self.pizzaria, nome="Inativo", telefone="11 8000-0000", ativo=False)
+
+    def _todas_as_paginas(self, **params):
+        response = self.client.get(reverse('lista_clientes'), params)
+        ids = [cliente.id for cliente in response.context['clientes']]
+        cursor = response.context['proximo_cursor']
+        while cursor:
+            dados = self.client.get(reverse('pagina_lista_clientes'), {**params, 'cursor': cursor}).json()
+            ids += [cliente['id'] for cliente in dados['clientes']]
+            cursor = dados['proximo_cursor']
+        return ids
+
+    def test_paginas_cobrem_todos_em_ordem(self):
+        """Testa que as páginas trazem cada cliente ativo uma vez, em ordem de (nome, id)."""
+        esperado = list(
+            Cliente.objects.filter(ativo=True).order_by('nome', 'id').values_list('id', flat=True)
+        )
+        self.assertEqual(self._todas_as_paginas(), esperado)
+
+    def test_busca_e_cursor_invalido(self):
+        """Testa a busca por dígitos do telefone e a rejeição de cursor inválido."""
+        ids = self._todas_as_paginas(busca="9000-001")
+        self.assertEqual(len(ids), 10)
+
+        response = self.client.get(reverse('pagina_lista_clientes'), {'cursor': 'xyz'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_custo_da_pagina_nao_cresce(self):
+        """Testa que a página seguinte custa o mesmo número de consultas que a primeira."""
+        primeira = self.client.get(reverse('pagina_lista_clientes'), {'cursor': ''}).json()
+        with CaptureQueriesContext(connection) as inicio:
+            self.client.get(reverse('pagina_lista_clientes'), {'cursor': ''})
+        with CaptureQueriesContext(connection) as seguinte:
+            dados = self.client.get(
+                reverse('pagina_lista_clientes'), {'cursor': primeira['proximo_cursor']}
+            ).json()
+
+        self.assertEqual(len(seguinte), len(inicio))
+        self.assertEqual(len(dados['clientes']), 20)
+        self.assertEqual(dados['clientes'][0]['total_pedidos'], 0)
+
+
+class HistoricoPedidosClienteTestCase(TestCase):
+    """Testes para os detalhes do cliente e o histórico de pedidos paginado."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=self.user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client.force_login(self.user)
+        self.cliente = Cliente.objects.create(pizzaria=self.pizzaria, nome="Ana", telefone="11999990000")
+        self.produto = Produto.objects.create(pizzaria=self.pizzaria, nome="Margherita")
+        agora = timezone.now()
+        self.pedidos = []
+        for indice in range(25):
+            pedido = Pedido.objects.create(
+                pizzaria=self.pizzaria, cliente=self.cliente, forma_pagamento="PIX",
+                total=Decimal("40.00"),
+                # Pares com o mesmo horário testam o desempate pelo id
+                data_criacao=agora - timedelta(days=indice // 2),
+            )
+            ItemPedido.objects.create(pedido=pedido, produto=self.produto, quantidade=1, valor_unitario=Decimal("20.00"))
+            ItemPedido.objects.create(pedido=pedido, produto=self.produto, quantidade=2, valor_unitario=Decimal("10.00"))
+            self.pedidos.append(pedido)
+
+    def test_detalhes_usam_estatisticas_gravadas(self):
+        """Testa que os detalhes não trazem o histórico e leem as estatísticas do cliente."""
+        response = self.client.get(reverse('detalhes_cliente', args=[self.cliente.id]))
+
+        dados = response.json()
+        self.assertNotIn('todos_pedidos', dados)
+        self.assertEqual(dados['stats']['total_pedidos'], 25)
+        self.assertEqual(dados['stats']['total_gasto'], "R$ 1000.00")
+
+    def test_paginas_do_historico(self):
+        """Testa a paginação por cursor, do mais recente ao mais antigo, com consultas constantes."""
+        url = reverse('historico_pedidos_cliente', args=[self.cliente.id])
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as primeira_consultas:
+            primeira = self.client.get(url).json()
+        with CaptureQueriesContext(connection) as segunda_consultas:
+            segunda = self.client.get(url, {'cursor': primeira['proximo_cursor']}).json()
+
+        self.assertEqual(len(segunda_consultas), len(primeira_consultas))
+        self.assertIsNone(segunda['proximo_cursor'])
+        ids = [pedido['id'] for pedido in primeira['pedidos'] + segunda['pedidos']]
+        esperado = sorted(self.pedidos, key=lambda pedido: (pedido.data_criacao, pedido.id), reverse=True)
+        self.assertEqual(ids, [pedido.id for pedido in esperado])
+        self.assertEqual(primeira['pedidos'][0]['itens_count'], 2)
+
+    def test_filtro_por_periodo_e_parametros_invalidos(self):
+        """Testa o filtro por data de negócio e a rejeição de data ou cursor inválidos."""
+        url = reverse('historico_pedidos_cliente', args=[self.cliente.id])
+        dia = self.pedidos[0].data_negocio
+
+        dados = self.client.get(url, {'data_inicio': dia.isoformat(), 'data_fim': dia.isoformat()}).json()
+        self.assertEqual(
+            {pedido['id'] for pedido in dados['pedidos']},
+            {pedido.id for pedido in self.pedidos if pedido.data_negocio == dia},
+        )
 
-# Create your tests here.
+        self.assertEqual(self.client.get(url, {'data_inicio': '17/10/2026'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'abc'}).status_code, 400)
@@ -4,7 +4,9 @@ from . import views
 urlpatterns = [
     # ==================== ROTAS DE CLIENTES ====================
     path("", views.lista_clientes, name="lista_clientes"),
+    path("pagina/", views.pagina_lista_clientes, name="pagina_lista_clientes"),
     path("<int:cliente_id>/detalhes/", views.detalhes_cliente, name="detalhes_cliente"),
+    path("<int:cliente_id>/pedidos/", views.historico_pedidos_cliente, name="historico_pedidos_cliente"),
     path("<int:cliente_id>/editar/", views.editar_cliente, name="editar_cliente"),
     path("<int:cliente_id>/excluir/", views.excluir_cliente, name="excluir_cliente"),
     
@@ -1,41 +1,22 @@
+from datetime import date
+
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
-from django.db.models import Q, Sum, Count
-from django.core.paginator import Paginator
 
-from autenticacao.models import UsuarioPizzaria
+from autenticacao.condicional import calcular_etag, marcar_versao, nao_modificado, versao_linhas
 from .models import Cliente, EnderecoCliente
 from .forms import ClienteForm, EnderecoClienteForm
+from .services import historico_pedidos, pagina_clientes, pesquisar_clientes
 
 
 @login_required
 def lista_clientes(request):
     """Lista clientes da pizzaria com busca e paginação."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
     
-    # Busca
-    busca = request.GET.get('busca', '')
-    clientes = Cliente.objects.filter(pizzaria=pizzaria, ativo=True)
-    
-    if busca:
-        clientes = clientes.filter(
-            Q(nome__icontains=busca) |
-            Q(telefone__icontains=busca) |
-            Q(email__icontains=busca)
-        )
-    
-    # Ordenação
-    clientes = clientes.select_related('endereco_principal').prefetch_related('pedidos')
-    clientes = clientes.order_by('nome')
-    
-    # Paginação
-    paginator = Paginator(clientes, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
     # Processar cadastro via modal
     if request.method == 'POST':
         form = ClienteForm(request.POST, pizzaria=pizzaria)
@@ -102,34 +83,61 @@ def lista_clientes(request):
     else:
         form = ClienteForm(pizzaria=pizzaria)
     
+    # Primeira página (as seguintes vêm de pagina_lista_clientes)
+    busca = request.GET.get('busca', '')
+    clientes, proximo_cursor = pagina_clientes(pizzaria, busca)
+    
     context = {
-        'clientes': page_obj,
+        'clientes': clientes,
+        'proximo_cursor': proximo_cursor,
         'form': form,
         'busca': busca,
-        'total_clientes': clientes.count() if not busca else Cliente.objects.filter(pizzaria=pizzaria, ativo=True).count(),
+        'total_clientes': Cliente.objects.filter(pizzaria=pizzaria, ativo=True).count(),
     }
     
     return render(request, 'clientes/lista_clientes.html', context)
 
 
+def _cliente_da_listagem(cliente):
+    return {
+        'id': cliente.id,
+        'nome': cliente.nome,
+        'telefone': cliente.telefone,
+        'email': cliente.email,
+        'data_nascimento': cliente.data_nascimento.strftime('%d/%m/%Y') if cliente.data_nascimento else '',
+        'endereco_principal': cliente.endereco_principal.endereco_completo() if cliente.endereco_principal else '',
+        'total_pedidos': cliente.total_pedidos,
+        'total_gasto': cliente.total_gasto,
+    }
+
+
 @login_required
-def detalhes_cliente(request, cliente_id):
-    """Retorna detalhes do cliente em JSON para modal."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+def pagina_lista_clientes(request):
+    """Próxima página da lista de clientes em JSON (rolagem infinita)."""
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
-    cliente = get_object_or_404(Cliente, id=cliente_id, pizzaria=pizzaria)
     
-    # Buscar TODOS os pedidos do cliente
-    todos_pedidos = cliente.pedidos.order_by('-data_criacao')
+    try:
+        clientes, proximo_cursor = pagina_clientes(
+            pizzaria, request.GET.get('busca', ''), request.GET.get('cursor')
+        )
+    except ValueError:
+        return JsonResponse({'error': 'Cursor inválido'}, status=400)
     
-    # Estatísticas atualizadas
-    stats = {
-        'total_pedidos': cliente.total_pedidos(),
-        'total_gasto': cliente.total_gasto(),
-        'ticket_medio': cliente.ticket_medio(),
-        'ultimo_pedido': cliente.ultimo_pedido(),
-        'pedidos_por_status': cliente.pedidos_por_status()
-    }
+    return JsonResponse({
+        'clientes': [_cliente_da_listagem(cliente) for cliente in clientes],
+        'proximo_cursor': proximo_cursor,
+    })
+
+
+@login_required
+def detalhes_cliente(request, cliente_id):
+    """Retorna detalhes do cliente em JSON para modal (o histórico vem de historico_pedidos_cliente)."""
+    usuario_pizzaria = request.tenant.obter_ou_404()
+    pizzaria = usuario_pizzaria.pizzaria
+    cliente = get_object_or_404(
+        Cliente.objects.select_related('endereco_principal'), id=cliente_id, pizzaria=pizzaria
+    )
     
     data = {
         'id': cliente.id,
@@ -141,13 +149,42 @@ def detalhes_cliente(request, cliente_id):
         'data_cadastro': cliente.data_cadastro.strftime('%d/%m/%Y às %H:%M'),
         'endereco_principal': cliente.endereco_principal.endereco_completo() if cliente.endereco_principal else 'Nenhum endereço cadastrado',
         'stats': {
-            'total_pedidos': stats['total_pedidos'],
-            'total_gasto': f"R$ {float(stats['total_gasto']) if stats['total_gasto'] else 0:.2f}",
-            'ticket_medio': f"R$ {float(stats['ticket_medio']) if stats['ticket_medio'] else 0:.2f}",
-            'ultimo_pedido': stats['ultimo_pedido'].data_criacao.strftime('%d/%m/%Y às %H:%M') if stats['ultimo_pedido'] else 'Nunca',
-            'pedidos_por_status': {item['status']: item['count'] for item in stats['pedidos_por_status']}
+            'total_pedidos': cliente.total_pedidos,
+            'total_gasto': f"R$ {cliente.total_gasto:.2f}",
+            'ticket_medio': f"R$ {cliente.ticket_medio:.2f}",
+            'ultimo_pedido': cliente.ultimo_pedido_em.strftime('%d/%m/%Y às %H:%M') if cliente.ultimo_pedido_em else 'Nunca',
         },
-        'todos_pedidos': [{
+        'enderecos': [{
+            'id': endereco.id,
+            'nome': endereco.nome,
+            'endereco': endereco.endereco_completo()
+        } for endereco in cliente.enderecos.all()]
+    }
+    
+    return JsonResponse(data)
+
+
+@login_required
+def historico_pedidos_cliente(request, cliente_id):
+    """Histórico de pedidos do cliente em JSON, paginado por cursor e filtrável por período."""
+    usuario_pizzaria = request.tenant.obter_ou_404()
+    pizzaria = usuario_pizzaria.pizzaria
+    cliente = get_object_or_404(Cliente, id=cliente_id, pizzaria=pizzaria)
+    
+    try:
+        datas = {
+            campo: date.fromisoformat(request.GET[campo]) if request.GET.get(campo) else None
+            for campo in ('data_inicio', 'data_fim')
+        }
+    except ValueError:
+        return JsonResponse({'error': 'Data inválida (use AAAA-MM-DD)'}, status=400)
+    try:
+        pedidos, proximo_cursor = historico_pedidos(cliente, request.GET.get('cursor'), **datas)
+    except ValueError:
+        return JsonResponse({'error': 'Cursor inválido'}, status=400)
+    
+    return JsonResponse({
+        'pedidos': [{
             'id': pedido.id,
             'data': pedido.data_criacao.strftime('%d/%m/%Y'),
             'hora': pedido.data_criacao.strftime('%H:%M'),
@@ -158,22 +195,16 @@ def detalhes_cliente(request, cliente_id):
             'status_display': pedido.get_status_display(),
             'forma_pagamento': pedido.get_forma_pagamento_display(),
             'observacoes': pedido.observacoes or '',
-            'itens_count': pedido.itens.count()
-        } for pedido in todos_pedidos],
-        'enderecos': [{
-            'id': endereco.id,
-            'nome': endereco.nome,
-            'endereco': endereco.endereco_completo()
-        } for endereco in cliente.enderecos.all()]
-    }
-    
-    return JsonResponse(data)
+            'itens_count': pedido.itens_count,
+        } for pedido in pedidos],
+        'proximo_cursor': proximo_cursor,
+    })
 
 
 @login_required
 def editar_cliente(request, cliente_id):
     """Edita um cliente existente."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
     cliente = get_object_or_404(Cliente, id=cliente_id, pizzaria=pizzaria)
     
@@ -222,7 +253,7 @@ def editar_cliente(request, cliente_id):
 @login_required
 def excluir_cliente(request, cliente_id):
     """Exclui (desativa) um cliente."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
     cliente = get_object_or_404(Cliente, id=cliente_id, pizzaria=pizzaria)
     
@@ -242,7 +273,7 @@ def excluir_cliente(request, cliente_id):
 @login_required
 def adicionar_endereco(request, cliente_id):
     """Adiciona um novo endereço para o cliente."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
     cliente = get_object_or_404(Cliente, id=cliente_id, pizzaria=pizzaria)
     
@@ -297,7 +328,7 @@ def adicionar_endereco(request, cliente_id):
 def editar_endereco(request, endereco_id):
     """Edita um endereço existente."""
     endereco = get_object_or_404(EnderecoCliente, id=endereco_id)
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
     
     # Verifica se o endereço pertence à pizzaria do usuário
@@ -329,7 +360,7 @@ def editar_endereco(request, endereco_id):
 def excluir_endereco(request, endereco_id):
     """Exclui um endereço do cliente."""
     endereco = get_object_or_404(EnderecoCliente, id=endereco_id)
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
     
     # Verifica se o endereço pertence à pizzaria do usuário
@@ -356,7 +387,7 @@ def excluir_endereco(request, endereco_id):
 def definir_endereco_principal(request, endereco_id):
     """Define um endereço como principal."""
     endereco = get_object_or_404(EnderecoCliente, id=endereco_id)
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
     
     # Verifica se o endereço pertence à pizzaria do usuário
@@ -378,20 +409,23 @@ def definir_endereco_principal(request, endereco_id):
 @login_required
 def buscar_clientes(request):
     """API para buscar clientes (usado no sistema de pedidos)."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
     termo = request.GET.get('termo', '')
     
     if len(termo) < 2:
         return JsonResponse({'clientes': []})
-    
-    clientes = Cliente.objects.filter(
-        pizzaria=pizzaria,
-        ativo=True
-    ).filter(
-        Q(nome__icontains=termo) |
-        Q(telefone__icontains=termo)
-    )[:10]
+
+    # Endereços salvos também atualizam o cliente (clientes.signals)
+    etag = calcular_etag(
+        'buscar_clientes', pizzaria.pk, termo,
+        *versao_linhas(Cliente.objects.filter(pizzaria=pizzaria), 'data_atualizacao'),
+    )
+    resposta = nao_modificado(request, etag)
+    if resposta is not None:
+        return resposta
+
+    clientes = pesquisar_clientes(pizzaria, termo)
     
     data = {
         'clientes': [{
@@ -399,9 +433,9 @@ def buscar_clientes(request):
             'nome': cliente.nome,
             'telefone': cliente.telefone,
             'endereco_principal': cliente.endereco_principal.endereco_completo() if cliente.endereco_principal else '',
-            'total_pedidos': cliente.total_pedidos(),
-            'total_gasto': float(cliente.total_gasto()) if cliente.total_gasto() else 0.0
+            'total_pedidos': cliente.total_pedidos,
+            'total_gasto': cliente.total_gasto
         } for cliente in clientes]
     }
     
-    return JsonResponse(data)
\ No newline at end of file
+    return marcar_versao(JsonResponse(data), etag)
\ No newline at end of file
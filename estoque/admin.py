@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Fornecedor, EstoqueIngrediente, CompraIngrediente, HistoricoPrecoCompra
+from .models import (
+    Fornecedor, EstoqueIngrediente, CompraIngrediente, HistoricoPrecoCompra, MovimentacaoEstoque, PrevisaoConsumo,
+    ItemSugestaoCompra, SugestaoCompra,
+)
 
 @admin.register(Fornecedor)
 class FornecedorAdmin(admin.ModelAdmin):
@@ -12,6 +15,8 @@ class EstoqueIngredienteAdmin(admin.ModelAdmin):
     list_display = ['ingrediente', 'quantidade_atual', 'unidade_medida', 'estoque_minimo', 'get_preco_compra']
     list_filter = ['ingrediente__pizzaria', 'unidade_medida']
     search_fields = ['ingrediente__nome']
+    # O saldo muda apenas por lançamentos no razão (MovimentacaoEstoque)
+    readonly_fields = ['quantidade_atual']
     
     def get_preco_compra(self, obj):
         return f"R$ {obj.preco_compra_atual_centavos / 100:.2f}"
@@ -36,3 +41,42 @@ class HistoricoPrecoCompraAdmin(admin.ModelAdmin):
     def get_preco(self, obj):
         return f"R$ {obj.preco_centavos / 100:.2f}"
     get_preco.short_description = 'Preço'
+
+@admin.register(MovimentacaoEstoque)
+class MovimentacaoEstoqueAdmin(admin.ModelAdmin):
+    list_display = ['ingrediente', 'tipo', 'quantidade', 'unidade', 'pedido', 'compra', 'criado_em']
+    list_filter = ['tipo', 'ingrediente__pizzaria']
+    search_fields = ['ingrediente__nome', 'observacao']
+
+    # Lançamentos são feitos pelos serviços de estoque, que também atualizam o saldo
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(PrevisaoConsumo)
+class PrevisaoConsumoAdmin(admin.ModelAdmin):
+    list_display = ['ingrediente', 'consumo_diario', 'quantidade_atual', 'dias_ate_ruptura', 'data_ruptura', 'calculado_em']
+    list_filter = ['pizzaria']
+    search_fields = ['ingrediente__nome']
+    readonly_fields = ['calculado_em']
+
+
+class ItemSugestaoCompraInline(admin.TabularInline):
+    model = ItemSugestaoCompra
+    extra = 0
+    readonly_fields = ['ingrediente', 'quantidade', 'unidade', 'preco_unitario_centavos', 'valor_total_centavos',
+                       'quantidade_atual', 'quantidade_projetada', 'consumo_diario']
+
+
+@admin.register(SugestaoCompra)
+class SugestaoCompraAdmin(admin.ModelAdmin):
+    list_display = ['fornecedor', 'pizzaria', 'prazo_entrega_dias', 'valor_total_centavos', 'gerada_em']
+    list_filter = ['pizzaria']
+    search_fields = ['fornecedor__nome']
+    inlines = [ItemSugestaoCompraInline]
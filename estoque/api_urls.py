@@ -13,4 +13,9 @@ urlpatterns = [
     
     # Compras
     path('compras/', api_views.ComprasListView.as_view(), name='compras_list'),
+    path('compras/importar/', api_views.ImportarComprasView.as_view(), name='compras_importar'),
+    path('compras/sugestoes/', api_views.SugestoesCompraListView.as_view(), name='sugestoes_compra'),
+    
+    # Previsão de consumo
+    path('estoque/previsao/', api_views.PrevisaoConsumoListView.as_view(), name='previsao_consumo'),
 ]
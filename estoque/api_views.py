@@ -1,17 +1,22 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from django.core.exceptions import ValidationError
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
-from .models import EstoqueIngrediente, Fornecedor, CompraIngrediente
+from autenticacao.listagem import PARAMETROS_LISTAGEM, ListagemAPIView, data_iso, reais
+from .importacao import importar_compras, ler_arquivo, validar_linhas
+from .models import EstoqueIngrediente, Fornecedor, CompraIngrediente, PrevisaoConsumo, SugestaoCompra
 from .forms import EstoqueIngredienteForm, FornecedorForm, CompraIngredienteForm
 
 
 @extend_schema(
     tags=['estoque'],
-    summary='Listar todos os itens do estoque',
-    description='Retorna uma lista de todos os itens do estoque',
+    summary='Listar os itens do estoque',
+    description='Retorna o estoque dos ingredientes da pizzaria do usuário, paginado por cursor',
+    parameters=PARAMETROS_LISTAGEM,
     responses={
         200: {
             'description': 'Lista de itens do estoque retornada com sucesso',
@@ -23,36 +28,39 @@ from .forms import EstoqueIngredienteForm, FornecedorForm, CompraIngredienteForm
                         'type': 'object',
                         'properties': {
                             'id': {'type': 'integer'},
+                            'ingrediente_id': {'type': 'integer'},
                             'nome': {'type': 'string'},
                             'quantidade': {'type': 'number'},
                             'unidade': {'type': 'string'},
+                            'estoque_minimo': {'type': 'number'},
                             'preco_unitario': {'type': 'number'},
-                            'ativo': {'type': 'boolean'},
                         }
                     }
-                }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
             }
-        }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'},
     }
 )
-class EstoqueListView(APIView):
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        """Lista todos os itens do estoque"""
-        itens = EstoqueIngrediente.objects.all()
-        data = []
-        for item in itens:
-            data.append({
-                'id': item.id,
-                'nome': item.nome,
-                'quantidade': float(item.quantidade) if item.quantidade else 0,
-                'unidade': item.unidade,
-                'preco_unitario': float(item.preco_unitario) if item.preco_unitario else 0,
-                'ativo': item.ativo,
-            })
-        
-        return Response({'itens': data})
+class EstoqueListView(ListagemAPIView):
+    """Lista o estoque dos ingredientes da pizzaria"""
+
+    model = EstoqueIngrediente
+    chave = 'itens'
+    campo_pizzaria = 'ingrediente__pizzaria'
+    campos_atualizacao = ('data_atualizacao', 'ingrediente__atualizado_em')
+    campos = {
+        'id': 'id',
+        'ingrediente_id': 'ingrediente_id',
+        'nome': 'ingrediente__nome',
+        'quantidade': 'quantidade_atual',
+        'unidade': 'unidade_medida',
+        'estoque_minimo': 'estoque_minimo',
+        'preco_unitario': 'preco_compra_atual_centavos',
+    }
+    conversoes = {'quantidade': float, 'estoque_minimo': float, 'preco_unitario': reais}
 
 
 @extend_schema(
@@ -122,8 +130,9 @@ class EstoqueCreateView(APIView):
 
 @extend_schema(
     tags=['fornecedores'],
-    summary='Listar todos os fornecedores',
-    description='Retorna uma lista de todos os fornecedores cadastrados',
+    summary='Listar os fornecedores',
+    description='Retorna os fornecedores da pizzaria do usuário, dos cadastros mais recentes aos mais antigos, paginados por cursor',
+    parameters=PARAMETROS_LISTAGEM,
     responses={
         200: {
             'description': 'Lista de fornecedores retornada com sucesso',
@@ -142,71 +151,325 @@ class EstoqueCreateView(APIView):
                             'ativo': {'type': 'boolean'},
                         }
                     }
-                }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
             }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'},
+    }
+)
+class FornecedoresListView(ListagemAPIView):
+    """Lista os fornecedores da pizzaria"""
+
+    model = Fornecedor
+    chave = 'fornecedores'
+    campo_criacao = 'criado_em'
+    campos_atualizacao = ('atualizado_em',)
+    campos = {
+        'id': 'id',
+        'nome': 'nome',
+        'cnpj': 'cnpj',
+        'telefone': 'telefone',
+        'email': 'email',
+        'ativo': 'ativo',
+    }
+
+
+@extend_schema(
+    tags=['compras'],
+    summary='Listar as compras',
+    description='Retorna as compras de ingredientes da pizzaria do usuário, das mais recentes às mais antigas, paginadas por cursor',
+    parameters=PARAMETROS_LISTAGEM,
+    responses={
+        200: {
+            'description': 'Lista de compras retornada com sucesso',
+            'type': 'object',
+            'properties': {
+                'compras': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'id': {'type': 'integer'},
+                            'ingrediente': {'type': 'string'},
+                            'fornecedor': {'type': 'string', 'nullable': True},
+                            'data_compra': {'type': 'string', 'format': 'date'},
+                            'quantidade': {'type': 'number'},
+                            'unidade': {'type': 'string'},
+                            'valor_total': {'type': 'number'},
+                        }
+                    }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
+            }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'},
+    }
+)
+class ComprasListView(ListagemAPIView):
+    """Lista as compras de ingredientes da pizzaria"""
+
+    model = CompraIngrediente
+    chave = 'compras'
+    campo_pizzaria = 'ingrediente__pizzaria'
+    campo_criacao = 'criado_em'
+    campos_atualizacao = ('atualizado_em', 'ingrediente__atualizado_em', 'fornecedor__atualizado_em')
+    campos = {
+        'id': 'id',
+        'ingrediente': 'ingrediente__nome',
+        'fornecedor': 'fornecedor__nome',
+        'data_compra': 'data_compra',
+        'quantidade': 'quantidade',
+        'unidade': 'unidade',
+        'valor_total': 'valor_total_centavos',
+    }
+    conversoes = {'data_compra': data_iso, 'quantidade': float, 'valor_total': reais}
+
+
+@extend_schema(
+    tags=['estoque'],
+    summary='Importar compras em lote',
+    description=(
+        'Importa as linhas de um CSV (ingrediente;quantidade;unidade;preco_unitario'
+        '[;fornecedor;data_compra;numero_nota]) ou de um XML de NF-e. Todas as linhas são '
+        'validadas antes da gravação: havendo qualquer erro, nada é gravado.'
+    ),
+    request={
+        'multipart/form-data': {
+            'type': 'object',
+            'properties': {
+                'arquivo': {'type': 'string', 'format': 'binary', 'description': 'CSV ou XML da NF-e'},
+                'formato': {'type': 'string', 'enum': ['csv', 'nfe'], 'description': 'Padrão: pela extensão'},
+                'fornecedor': {'type': 'integer', 'description': 'Fornecedor das linhas sem fornecedor'},
+            },
+            'required': ['arquivo']
         }
+    },
+    responses={
+        201: {
+            'description': 'Compras importadas com sucesso',
+            'type': 'object',
+            'properties': {
+                'importadas': {'type': 'integer'},
+                'valor_total': {'type': 'number'},
+                'compras': {'type': 'array', 'items': {'type': 'integer'}},
+            }
+        },
+        400: {'description': 'Arquivo inválido; lista de erros por linha'},
+        403: {'description': 'Usuário sem pizzaria associada'}
     }
 )
-class FornecedoresListView(APIView):
+class ImportarComprasView(APIView):
     permission_classes = [IsAuthenticated]
-    
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        """Importa compras de um arquivo"""
+        usuario_pizzaria = request.tenant.usuario_pizzaria
+        if not usuario_pizzaria or not usuario_pizzaria.pizzaria:
+            return Response({
+                'error': 'Usuário sem pizzaria associada'
+            }, status=status.HTTP_403_FORBIDDEN)
+        pizzaria = usuario_pizzaria.pizzaria
+
+        arquivo = request.FILES.get('arquivo')
+        if arquivo is None:
+            return Response({'error': 'Envie o arquivo no campo "arquivo"'}, status=status.HTTP_400_BAD_REQUEST)
+
+        fornecedor = None
+        if request.data.get('fornecedor'):
+            fornecedor = Fornecedor.objects.filter(pizzaria=pizzaria, pk=request.data['fornecedor']).first()
+            if fornecedor is None:
+                return Response({'error': 'Fornecedor não encontrado'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            linhas = ler_arquivo(arquivo, request.data.get('formato') or None)
+            compras = importar_compras(pizzaria, validar_linhas(pizzaria, linhas, fornecedor=fornecedor))
+        except ValidationError as e:
+            return Response({
+                'error': 'Arquivo inválido',
+                'details': e.messages
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'importadas': len(compras),
+            'valor_total': sum(compra.valor_total_centavos for compra in compras) / 100,
+            'compras': [compra.id for compra in compras],
+        }, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(
+    tags=['estoque'],
+    summary='Previsão de consumo e ruptura',
+    description=(
+        'Retorna a taxa de consumo diário (média móvel exponencial) e os dias até a ruptura '
+        'de cada ingrediente da pizzaria, calculados pelo comando calcular_previsao_consumo. '
+        'Ordenado pelos ingredientes que acabam primeiro.'
+    ),
+    parameters=[
+        OpenApiParameter(
+            name='dias',
+            type=OpenApiTypes.INT,
+            location=OpenApiParameter.QUERY,
+            description='Apenas ingredientes que acabam em até N dias'
+        ),
+    ],
+    responses={
+        200: {
+            'description': 'Previsões retornadas com sucesso',
+            'type': 'object',
+            'properties': {
+                'previsoes': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'ingrediente_id': {'type': 'integer'},
+                            'ingrediente': {'type': 'string'},
+                            'unidade': {'type': 'string'},
+                            'quantidade_atual': {'type': 'number'},
+                            'consumo_diario': {'type': 'number'},
+                            'consumo_medio_7d': {'type': 'number'},
+                            'consumo_medio_28d': {'type': 'number'},
+                            'dias_ate_ruptura': {'type': 'number', 'nullable': True},
+                            'data_ruptura': {'type': 'string', 'format': 'date', 'nullable': True},
+                            'calculado_em': {'type': 'string', 'format': 'date-time'},
+                        }
+                    }
+                }
+            }
+        },
+        400: {'description': 'Parâmetro dias inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'}
+    }
+)
+class PrevisaoConsumoListView(APIView):
+    permission_classes = [IsAuthenticated]
+
     def get(self, request):
-        """Lista todos os fornecedores"""
-        fornecedores = Fornecedor.objects.all()
+        """Lista as previsões de consumo da pizzaria"""
+        usuario_pizzaria = request.tenant.usuario_pizzaria
+        if not usuario_pizzaria or not usuario_pizzaria.pizzaria:
+            return Response({
+                'error': 'Usuário sem pizzaria associada'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        previsoes = PrevisaoConsumo.objects.filter(
+            pizzaria=usuario_pizzaria.pizzaria
+        ).select_related('ingrediente').order_by('dias_ate_ruptura', 'ingrediente__nome')
+
+        dias = request.query_params.get('dias')
+        if dias:
+            try:
+                previsoes = previsoes.filter(dias_ate_ruptura__lte=int(dias))
+            except ValueError:
+                return Response({'error': 'Parâmetro dias inválido'}, status=status.HTTP_400_BAD_REQUEST)
+
         data = []
-        for fornecedor in fornecedores:
+        for previsao in previsoes:
             data.append({
-                'id': fornecedor.id,
-                'nome': fornecedor.nome,
-                'cnpj': fornecedor.cnpj,
-                'telefone': fornecedor.telefone,
-                'email': fornecedor.email,
-                'ativo': fornecedor.ativo,
+                'ingrediente_id': previsao.ingrediente_id,
+                'ingrediente': previsao.ingrediente.nome,
+                'unidade': previsao.unidade,
+                'quantidade_atual': float(previsao.quantidade_atual),
+                'consumo_diario': float(previsao.consumo_diario),
+                'consumo_medio_7d': float(previsao.consumo_medio_7d),
+                'consumo_medio_28d': float(previsao.consumo_medio_28d),
+                'dias_ate_ruptura': float(previsao.dias_ate_ruptura) if previsao.dias_ate_ruptura is not None else None,
+                'data_ruptura': previsao.data_ruptura.strftime('%Y-%m-%d') if previsao.data_ruptura else None,
+                'calculado_em': previsao.calculado_em.isoformat(),
             })
-        
-        return Response({'fornecedores': data})
+
+        return Response({'previsoes': data})
 
 
 @extend_schema(
     tags=['compras'],
-    summary='Listar todas as compras',
-    description='Retorna uma lista de todas as compras realizadas',
+    summary='Sugestões de pedidos de compra',
+    description=(
+        'Retorna os pedidos de compra sugeridos por fornecedor, gerados pelo comando '
+        'gerar_sugestoes_compra: ingredientes cujo saldo previsto na entrega fica abaixo do '
+        'mínimo, com a quantidade que leva o estoque ao máximo e o último preço do fornecedor.'
+    ),
     responses={
         200: {
-            'description': 'Lista de compras retornada com sucesso',
+            'description': 'Sugestões retornadas com sucesso',
             'type': 'object',
             'properties': {
-                'compras': {
+                'sugestoes': {
                     'type': 'array',
                     'items': {
                         'type': 'object',
                         'properties': {
                             'id': {'type': 'integer'},
-                            'fornecedor': {'type': 'string'},
-                            'data_compra': {'type': 'string', 'format': 'date'},
+                            'fornecedor_id': {'type': 'integer', 'nullable': True},
+                            'fornecedor': {'type': 'string', 'nullable': True},
+                            'prazo_entrega_dias': {'type': 'integer'},
                             'valor_total': {'type': 'number'},
-                            'status': {'type': 'string'},
+                            'gerada_em': {'type': 'string', 'format': 'date-time'},
+                            'itens': {
+                                'type': 'array',
+                                'items': {
+                                    'type': 'object',
+                                    'properties': {
+                                        'ingrediente_id': {'type': 'integer'},
+                                        'ingrediente': {'type': 'string'},
+                                        'quantidade': {'type': 'number'},
+                                        'unidade': {'type': 'string'},
+                                        'preco_unitario': {'type': 'number'},
+                                        'valor_total': {'type': 'number'},
+                                        'quantidade_atual': {'type': 'number'},
+                                        'quantidade_projetada': {'type': 'number'},
+                                    }
+                                }
+                            },
                         }
                     }
                 }
             }
-        }
+        },
+        403: {'description': 'Usuário sem pizzaria associada'}
     }
 )
-class ComprasListView(APIView):
+class SugestoesCompraListView(APIView):
     permission_classes = [IsAuthenticated]
-    
+
     def get(self, request):
-        """Lista todas as compras"""
-        compras = CompraIngrediente.objects.all()
+        """Lista as sugestões de compra da pizzaria"""
+        usuario_pizzaria = request.tenant.usuario_pizzaria
+        if not usuario_pizzaria or not usuario_pizzaria.pizzaria:
+            return Response({
+                'error': 'Usuário sem pizzaria associada'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        sugestoes = SugestaoCompra.objects.filter(
+            pizzaria=usuario_pizzaria.pizzaria
+        ).select_related('fornecedor').prefetch_related('itens__ingrediente')
+
         data = []
-        for compra in compras:
+        for sugestao in sugestoes:
             data.append({
-                'id': compra.id,
-                'fornecedor': compra.fornecedor.nome if compra.fornecedor else None,
-                'data_compra': compra.data_compra.strftime('%Y-%m-%d') if compra.data_compra else None,
-                'valor_total': float(compra.valor_total) if compra.valor_total else 0,
-                'status': compra.get_status_display(),
+                'id': sugestao.id,
+                'fornecedor_id': sugestao.fornecedor_id,
+                'fornecedor': sugestao.fornecedor.nome if sugestao.fornecedor else None,
+                'prazo_entrega_dias': sugestao.prazo_entrega_dias,
+                'valor_total': sugestao.valor_total,
+                'gerada_em': sugestao.gerada_em.isoformat(),
+                'itens': [
+                    {
+                        'ingrediente_id': item.ingrediente_id,
+                        'ingrediente': item.ingrediente.nome,
+                        'quantidade': float(item.quantidade),
+                        'unidade': item.unidade,
+                        'preco_unitario': item.preco_unitario,
+                        'valor_total': item.valor_total,
+                        'quantidade_atual': float(item.quantidade_atual),
+                        'quantidade_projetada': float(item.quantidade_projetada),
+                    }
+                    for item in sugestao.itens.all()
+                ],
             })
-        
-        return Response({'compras': data})
+
+        return Response({'sugestoes': data})
@@ -1,9 +1,11 @@
 from django import forms
 from django.core.validators import MinValueValidator
+from django.db import transaction
 from decimal import Decimal
 
 from ingredientes.models import Ingrediente
 from .models import Fornecedor, EstoqueIngrediente, CompraIngrediente
+from .services import ajustar_saldo, trocar_unidade
 
 
 class FornecedorForm(forms.ModelForm):
@@ -11,7 +13,7 @@ class FornecedorForm(forms.ModelForm):
     
     class Meta:
         model = Fornecedor
-        fields = ['nome', 'cnpj', 'telefone', 'email', 'endereco', 'observacoes', 'ativo']
+        fields = ['nome', 'cnpj', 'telefone', 'email', 'prazo_entrega_dias', 'endereco', 'observacoes', 'ativo']
         widgets = {
             'nome': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -29,6 +31,10 @@ class FornecedorForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': 'email@fornecedor.com'
             }),
+            'prazo_entrega_dias': forms.NumberInput(attrs={
+                'class': 'form-control',
+                'min': '0'
+            }),
             'endereco': forms.Textarea(attrs={
                 'class': 'form-control',
                 'rows': 3,
@@ -44,6 +50,17 @@ class FornecedorForm(forms.ModelForm):
             }),
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['prazo_entrega_dias'].required = False
+
+    def clean_prazo_entrega_dias(self):
+        """Prazo em branco usa o padrão do modelo."""
+        prazo = self.cleaned_data.get('prazo_entrega_dias')
+        if prazo is None:
+            return Fornecedor._meta.get_field('prazo_entrega_dias').default
+        return prazo
+
 
 class EstoqueIngredienteForm(forms.ModelForm):
     """Form para edição de configurações de estoque."""
@@ -98,9 +115,19 @@ class EstoqueIngredienteForm(forms.ModelForm):
         instance.preco_compra_atual_centavos = int(preco_reais * 100)
         
         if commit:
-            instance.save()
-            # Recalcular custos dos produtos que usam este ingrediente
-            instance._recalcular_custos_produtos()
+            custo_alterado = instance.custo_alterado
+            preco_anterior = instance.preco_anterior_centavos
+            with transaction.atomic():
+                if instance.pk:
+                    # O saldo muda por lançamentos no razão, não pelo save
+                    trocar_unidade(instance, instance.unidade_medida)
+                    instance.save()
+                    ajustar_saldo(instance, self.cleaned_data['quantidade_atual'])
+                else:
+                    instance.save()
+            # Recalcular custos dos produtos que usam este ingrediente (se preço/unidade mudou)
+            if custo_alterado:
+                instance._recalcular_custos_produtos(preco_anterior)
         
         return instance
 
@@ -0,0 +1,389 @@
+"""Importação em lote de compras de ingredientes (CSV ou XML de NF-e).
+
+Registrar uma nota com centenas de linhas pelo formulário custa, por linha,
+o ``get_or_create`` do estoque, o save do estoque, o histórico de preço e a
+movimentação de caixa do signal financeiro. Aqui o arquivo é lido e validado
+inteiro em memória e gravado em poucas consultas, independente do número de
+linhas: ``bulk_create`` de compras, histórico de preços, movimentações de
+caixa e lançamentos no razão do estoque, e um único ``UPDATE`` com o
+incremento agregado de cada ingrediente.
+"""
+import csv
+import io
+import re
+import xml.etree.ElementTree as ET
+from datetime import datetime
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, DateField, DecimalField, F, IntegerField, Value, When
+from django.utils import timezone
+
+from ingredientes.models import Ingrediente
+from .models import (
+    CompraIngrediente,
+    EstoqueIngrediente,
+    Fornecedor,
+    HistoricoPrecoCompra,
+    MovimentacaoEstoque,
+)
+from .services import QUANTIDADE_ESTOQUE, converter_para_estoque
+
+
+NAMESPACE_NFE = {'nfe': 'http://www.portalfiscal.inf.br/nfe'}
+
+# Unidades comerciais da NF-e (uCom) aceitas, na unidade do sistema
+UNIDADES_NFE = {
+    'KG': 'kg', 'KGS': 'kg', 'QUILO': 'kg',
+    'G': 'g', 'GR': 'g', 'GRS': 'g', 'GRAMA': 'g',
+    'UN': 'un', 'UND': 'un', 'UNID': 'un', 'PC': 'un', 'PCT': 'un', 'CX': 'un', 'DZ': 'un',
+}
+
+UNIDADES_VALIDAS = {unidade for unidade, _ in CompraIngrediente.UNIDADES_CHOICES}
+
+
+# --------------------------------------------------
+# Leitura
+# --------------------------------------------------
+
+def _texto(arquivo):
+    conteudo = arquivo.read() if hasattr(arquivo, 'read') else arquivo
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            conteudo = conteudo.decode('latin-1')
+    return conteudo
+
+
+def ler_csv(arquivo):
+    """Lê as linhas de um CSV de compras.
+
+    Colunas: ``ingrediente``, ``quantidade``, ``unidade``, ``preco_unitario``
+    (em reais) e, opcionais, ``fornecedor`` (nome ou CNPJ), ``data_compra``
+    e ``numero_nota``. Aceita ``;`` ou ``,`` como separador.
+    """
+    texto = _texto(arquivo)
+    primeira_linha = texto.split('\n', 1)[0]
+    separador = ';' if primeira_linha.count(';') >= primeira_linha.count(',') else ','
+    leitor = csv.DictReader(io.StringIO(texto), delimiter=separador)
+    leitor.fieldnames = [(campo or '').strip().lower() for campo in leitor.fieldnames or []]
+    return [
+        {campo: (valor or '').strip() for campo, valor in linha.items() if campo}
+        for linha in leitor
+    ]
+
+
+def ler_nfe(arquivo):
+    """Lê os itens (``det/prod``) de um XML de NF-e.
+
+    Fornecedor (CNPJ e razão social do emitente), número e data de emissão
+    da nota são repetidos em cada linha.
+    """
+    texto = _texto(arquivo)
+    # Sem DTD: evita expansão de entidades em arquivos enviados por upload
+    if '<!DOCTYPE' in texto.upper():
+        raise ValidationError('XML da NF-e inválido: declarações DOCTYPE não são aceitas.')
+    try:
+        raiz = ET.fromstring(texto)
+    except ET.ParseError as e:
+        raise ValidationError(f'XML da NF-e inválido: {e}')
+
+    nota = raiz.find('.//nfe:infNFe', NAMESPACE_NFE)
+    if nota is None:
+        raise ValidationError('XML sem o grupo infNFe.')
+
+    def valor(elemento, caminho):
+        encontrado = elemento.find(caminho, NAMESPACE_NFE)
+        return (encontrado.text or '').strip() if encontrado is not None else ''
+
+    emissao = valor(nota, 'nfe:ide/nfe:dhEmi') or valor(nota, 'nfe:ide/nfe:dEmi')
+    cabecalho = {
+        'fornecedor': valor(nota, 'nfe:emit/nfe:CNPJ') or valor(nota, 'nfe:emit/nfe:xNome'),
+        'numero_nota': valor(nota, 'nfe:ide/nfe:nNF'),
+        'data_compra': emissao[:10],
+    }
+    linhas = []
+    for produto in nota.findall('nfe:det/nfe:prod', NAMESPACE_NFE):
+        unidade = valor(produto, 'nfe:uCom').upper()
+        linhas.append({
+            **cabecalho,
+            'ingrediente': valor(produto, 'nfe:xProd'),
+            'quantidade': valor(produto, 'nfe:qCom'),
+            'unidade': UNIDADES_NFE.get(unidade, unidade.lower()),
+            'preco_unitario': valor(produto, 'nfe:vUnCom'),
+        })
+    return linhas
+
+
+def ler_arquivo(arquivo, formato=None):
+    """Lê um arquivo de compras, detectando o formato pela extensão quando não informado."""
+    if formato is None:
+        nome = getattr(arquivo, 'name', '') or ''
+        formato = 'nfe' if nome.lower().endswith('.xml') else 'csv'
+    if formato == 'nfe':
+        return ler_nfe(arquivo)
+    if formato == 'csv':
+        return ler_csv(arquivo)
+    raise ValidationError(f'Formato de importação desconhecido: {formato}')
+
+
+# --------------------------------------------------
+# Validação
+# --------------------------------------------------
+
+def _decimal(texto):
+    texto = (texto or '').strip()
+    if ',' in texto:
+        # Formato brasileiro: 1.234,56
+        texto = texto.replace('.', '').replace(',', '.')
+    return Decimal(texto)
+
+
+def _data(texto, padrao):
+    if not texto:
+        return padrao
+    for formato in ('%Y-%m-%d', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(texto, formato).date()
+        except ValueError:
+            continue
+    raise ValueError(texto)
+
+
+def _somente_digitos(texto):
+    return re.sub(r'\D', '', texto or '')
+
+
+def validar_linhas(pizzaria, linhas, fornecedor=None, data_compra=None):
+    """Valida as linhas em memória e monta as compras (ainda não salvas).
+
+    Ingredientes e fornecedores da pizzaria são carregados em duas consultas
+    e resolvidos pelo nome (sem diferenciar maiúsculas) ou pelo CNPJ. Um
+    ``fornecedor`` informado vale para as linhas sem fornecedor. Levanta
+    ``ValidationError`` com todos os erros encontrados, por linha.
+    """
+    data_padrao = data_compra or timezone.localdate()
+    ingredientes = {
+        ingrediente.nome.strip().lower(): ingrediente
+        for ingrediente in Ingrediente.objects.filter(pizzaria=pizzaria)
+    }
+    fornecedores = {}
+    for item in Fornecedor.objects.filter(pizzaria=pizzaria):
+        fornecedores[item.nome.strip().lower()] = item
+        if _somente_digitos(item.cnpj):
+            fornecedores[_somente_digitos(item.cnpj)] = item
+
+    compras = []
+    erros = []
+    for numero, linha in enumerate(linhas, start=1):
+        problemas = []
+
+        ingrediente = ingredientes.get(linha.get('ingrediente', '').strip().lower())
+        if ingrediente is None:
+            problemas.append(f"ingrediente '{linha.get('ingrediente', '')}' não cadastrado")
+
+        unidade = linha.get('unidade', '').strip().lower()
+        if unidade not in UNIDADES_VALIDAS:
+            problemas.append(f"unidade '{linha.get('unidade', '')}' inválida")
+
+        try:
+            quantidade = _decimal(linha.get('quantidade')).quantize(QUANTIDADE_ESTOQUE)
+            if quantidade < QUANTIDADE_ESTOQUE:
+                problemas.append('quantidade deve ser positiva')
+        except InvalidOperation:
+            problemas.append(f"quantidade '{linha.get('quantidade', '')}' inválida")
+
+        try:
+            preco_centavos = int((_decimal(linha.get('preco_unitario')) * 100).quantize(
+                Decimal('1'), rounding=ROUND_HALF_UP
+            ))
+            if preco_centavos <= 0:
+                problemas.append('preço unitário deve ser positivo')
+        except InvalidOperation:
+            problemas.append(f"preço unitário '{linha.get('preco_unitario', '')}' inválido")
+
+        try:
+            data = _data(linha.get('data_compra'), data_padrao)
+        except ValueError:
+            problemas.append(f"data '{linha.get('data_compra')}' inválida")
+
+        fornecedor_linha = fornecedor
+        identificacao = linha.get('fornecedor', '').strip()
+        if identificacao:
+            fornecedor_linha = (
+                fornecedores.get(_somente_digitos(identificacao))
+                or fornecedores.get(identificacao.lower())
+            )
+            if fornecedor_linha is None:
+                problemas.append(f"fornecedor '{identificacao}' não cadastrado")
+
+        if problemas:
+            erros.append(f"Linha {numero}: {'; '.join(problemas)}")
+            continue
+
+        compras.append(CompraIngrediente(
+            ingrediente=ingrediente,
+            fornecedor=fornecedor_linha,
+            quantidade=quantidade,
+            unidade=unidade,
+            preco_unitario_centavos=preco_centavos,
+            valor_total_centavos=int(quantidade * preco_centavos),
+            data_compra=data,
+            numero_nota=linha.get('numero_nota', '')[:50],
+        ))
+
+    if not linhas:
+        erros.append('Arquivo sem linhas de compra.')
+    if erros:
+        raise ValidationError(erros)
+    return compras
+
+
+# --------------------------------------------------
+# Gravação
+# --------------------------------------------------
+
+def _preco_para_estoque(compra, unidade_estoque):
+    """Preço unitário da compra na unidade do estoque (mesma regra do save)."""
+    if compra.unidade == 'g' and unidade_estoque == 'kg':
+        return compra.preco_unitario_centavos * 1000
+    if compra.unidade == 'kg' and unidade_estoque == 'g':
+        return compra.preco_unitario_centavos // 1000
+    return compra.preco_unitario_centavos
+
+
+def importar_compras(pizzaria, compras):
+    """Grava as compras validadas em lote, em uma transação.
+
+    Estoques inexistentes são criados na unidade da primeira compra do
+    ingrediente. Linhas em unidade não conversível para a do estoque
+    (unidade ↔ peso) são rejeitadas. Cada ingrediente recebe a soma das
+    quantidades e o preço da última linha da nota, em um único ``UPDATE``.
+    Retorna as compras criadas.
+    """
+    from financeiro.models import MovimentacaoCaixa
+    from financeiro.services import invalidar_dashboard
+    from produtos.custos import recalcular_custos
+
+    if not compras:
+        return []
+
+    with transaction.atomic():
+        ingrediente_ids = {compra.ingrediente_id for compra in compras}
+        estoques = {
+            estoque.ingrediente_id: estoque
+            for estoque in EstoqueIngrediente.objects.select_for_update().filter(
+                ingrediente_id__in=ingrediente_ids
+            ).order_by('pk')
+        }
+
+        novos = []
+        for compra in compras:
+            if compra.ingrediente_id not in estoques:
+                estoque = EstoqueIngrediente(
+                    ingrediente_id=compra.ingrediente_id,
+                    quantidade_atual=0,
+                    unidade_medida=compra.unidade,
+                    preco_compra_atual_centavos=compra.preco_unitario_centavos,
+                )
+                estoques[compra.ingrediente_id] = estoque
+                novos.append(estoque)
+        EstoqueIngrediente.objects.bulk_create(novos)
+
+        # Agregação por ingrediente: quantidade na unidade do estoque e preço/data da compra mais recente
+        entradas = {}
+        quantidades = []
+        erros = []
+        for numero, compra in enumerate(compras, start=1):
+            estoque = estoques[compra.ingrediente_id]
+            quantidade = converter_para_estoque(compra.quantidade, compra.unidade, estoque.unidade_medida)
+            if quantidade is None:
+                erros.append(
+                    f'Linha {numero}: {compra.ingrediente.nome} em {compra.unidade} não converte '
+                    f'para a unidade do estoque ({estoque.unidade_medida})'
+                )
+                continue
+            # O estoque recebe a soma das mesmas quantidades arredondadas gravadas no razão
+            quantidade = quantidade.quantize(QUANTIDADE_ESTOQUE)
+            entrada = entradas.setdefault(estoque.pk, {'estoque': estoque, 'quantidade': Decimal('0'), 'data': None})
+            entrada['quantidade'] += quantidade
+            # Linhas fora de ordem não fazem a data/preço voltarem; no empate vale a linha posterior
+            if entrada['data'] is None or compra.data_compra >= entrada['data']:
+                entrada['preco'] = _preco_para_estoque(compra, estoque.unidade_medida)
+                entrada['data'] = compra.data_compra
+            quantidades.append(quantidade)
+        if erros:
+            raise ValidationError(erros)
+
+        CompraIngrediente.objects.bulk_create(compras, batch_size=500)
+
+        HistoricoPrecoCompra.objects.bulk_create([
+            HistoricoPrecoCompra(
+                ingrediente_id=compra.ingrediente_id,
+                preco_centavos=compra.preco_unitario_centavos,
+                data_preco=compra.data_compra,
+                fornecedor=compra.fornecedor.nome if compra.fornecedor else "Não informado",
+                compra=compra,
+            )
+            for compra in compras
+        ], batch_size=500)
+
+        agora = timezone.now()
+        MovimentacaoCaixa.objects.bulk_create([
+            MovimentacaoCaixa(
+                pizzaria=pizzaria,
+                tipo='SAIDA',
+                origem='COMPRA',
+                descricao=(
+                    f'Compra - {compra.ingrediente.nome} '
+                    f'({compra.fornecedor.nome if compra.fornecedor else "Fornecedor não informado"})'
+                ),
+                valor_centavos=compra.valor_total_centavos,
+                forma_pagamento='DIN',  # Padrão, como no registro individual
+                data_movimentacao=agora.replace(
+                    year=compra.data_compra.year, month=compra.data_compra.month, day=compra.data_compra.day
+                ),
+                data_negocio=compra.data_compra,
+                compra_estoque=compra,
+            )
+            for compra in compras
+        ], batch_size=500)
+
+        MovimentacaoEstoque.objects.bulk_create([
+            MovimentacaoEstoque(
+                ingrediente_id=compra.ingrediente_id,
+                tipo=MovimentacaoEstoque.TIPO_COMPRA,
+                quantidade=quantidade,
+                unidade=estoques[compra.ingrediente_id].unidade_medida,
+                compra=compra,
+            )
+            for compra, quantidade in zip(compras, quantidades)
+        ], batch_size=500)
+
+        def por_estoque(chave, campo):
+            return Case(
+                *[When(pk=pk, then=Value(entrada[chave])) for pk, entrada in entradas.items()],
+                output_field=campo,
+            )
+
+        EstoqueIngrediente.objects.filter(pk__in=entradas.keys()).update(
+            quantidade_atual=F('quantidade_atual') + por_estoque(
+                'quantidade', DecimalField(max_digits=10, decimal_places=3)
+            ),
+            preco_compra_atual_centavos=por_estoque('preco', IntegerField()),
+            data_ultima_compra=por_estoque('data', DateField()),
+            data_atualizacao=agora,
+        )
+
+        # Custo armazenado dos produtos acompanha os novos preços de compra
+        alterados = [
+            entrada['estoque'].ingrediente_id for entrada in entradas.values()
+            if entrada['estoque'] in novos or entrada['preco'] != entrada['estoque'].preco_compra_atual_centavos
+        ]
+        if alterados:
+            recalcular_custos(ingredientes=alterados)
+
+        invalidar_dashboard(pizzaria.pk)
+    return compras
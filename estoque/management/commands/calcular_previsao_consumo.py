@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from autenticacao.models import Pizzaria
+from estoque.previsao import JANELA_DIAS, atualizar_previsoes
+
+
+class Command(BaseCommand):
+    help = 'Recalcula a previsão de consumo e de ruptura dos estoques (execução noturna)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pizzaria',
+            type=int,
+            help='ID da pizzaria (opcional, se não informado calcula todas em uma passada)',
+        )
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=JANELA_DIAS,
+            help=f'Dias de histórico de uso considerados (padrão: {JANELA_DIAS})',
+        )
+
+    def handle(self, *args, **options):
+        pizzaria = None
+        if options['pizzaria']:
+            pizzaria = Pizzaria.objects.filter(id=options['pizzaria']).first()
+            if pizzaria is None:
+                self.stdout.write(self.style.ERROR(f"Pizzaria {options['pizzaria']} não encontrada"))
+                return
+
+        total = atualizar_previsoes(pizzaria, janela=options['dias'])
+        self.stdout.write(self.style.SUCCESS(f'{total} previsão(ões) de consumo atualizada(s).'))
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from autenticacao.models import Pizzaria
+from estoque.previsao import atualizar_previsoes
+from estoque.sugestoes import gerar_sugestoes
+
+
+class Command(BaseCommand):
+    help = 'Gera as sugestões de pedidos de compra por fornecedor (execução noturna)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pizzaria',
+            type=int,
+            help='ID da pizzaria (opcional, se não informado gera para todas em uma passada)',
+        )
+        parser.add_argument(
+            '--recalcular-previsao',
+            action='store_true',
+            help='Recalcula a previsão de consumo antes de gerar as sugestões',
+        )
+
+    def handle(self, *args, **options):
+        pizzaria = None
+        if options['pizzaria']:
+            pizzaria = Pizzaria.objects.filter(id=options['pizzaria']).first()
+            if pizzaria is None:
+                self.stdout.write(self.style.ERROR(f"Pizzaria {options['pizzaria']} não encontrada"))
+                return
+
+        if options['recalcular_previsao']:
+            atualizar_previsoes(pizzaria)
+
+        sugestoes = gerar_sugestoes(pizzaria)
+        total = sum(sugestao.valor_total_centavos for sugestao in sugestoes) / 100
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(sugestoes)} sugestão(ões) de compra gerada(s), total de R$ {total:.2f}.'
+        ))
@@ -0,0 +1,61 @@
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from autenticacao.models import Pizzaria
+from estoque.importacao import importar_compras, ler_arquivo, validar_linhas
+from estoque.models import Fornecedor
+
+
+class Command(BaseCommand):
+    help = 'Importa em lote compras de ingredientes de um CSV ou XML de NF-e'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Caminho do arquivo CSV ou XML da NF-e')
+        parser.add_argument('--pizzaria', type=int, required=True, help='ID da pizzaria')
+        parser.add_argument(
+            '--formato',
+            choices=['csv', 'nfe'],
+            help='Formato do arquivo (padrão: pela extensão, .xml = NF-e)',
+        )
+        parser.add_argument(
+            '--fornecedor',
+            type=int,
+            help='ID do fornecedor para as linhas sem fornecedor',
+        )
+        parser.add_argument(
+            '--validar',
+            action='store_true',
+            help='Apenas valida o arquivo, sem gravar',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            pizzaria = Pizzaria.objects.get(pk=options['pizzaria'])
+        except Pizzaria.DoesNotExist:
+            raise CommandError(f"Pizzaria {options['pizzaria']} não encontrada")
+
+        fornecedor = None
+        if options['fornecedor']:
+            fornecedor = Fornecedor.objects.filter(pizzaria=pizzaria, pk=options['fornecedor']).first()
+            if fornecedor is None:
+                raise CommandError(f"Fornecedor {options['fornecedor']} não encontrado")
+
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                linhas = ler_arquivo(arquivo, options['formato'])
+            compras = validar_linhas(pizzaria, linhas, fornecedor=fornecedor)
+            if options['validar']:
+                self.stdout.write(self.style.SUCCESS(f'{len(compras)} linha(s) válida(s).'))
+                return
+            compras = importar_compras(pizzaria, compras)
+        except OSError as e:
+            raise CommandError(f'Não foi possível ler o arquivo: {e}')
+        except ValidationError as e:
+            for mensagem in e.messages:
+                self.stdout.write(self.style.ERROR(f'✗ {mensagem}'))
+            raise CommandError('Importação cancelada: nenhuma compra foi gravada.')
+
+        total = sum(compra.valor_total_centavos for compra in compras)
+        self.stdout.write(
+            self.style.SUCCESS(f'{len(compras)} compra(s) importada(s), total R$ {total / 100:.2f}.')
+        )
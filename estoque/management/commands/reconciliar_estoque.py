@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand
+
+from ingredientes.models import Ingrediente
+from estoque.services import corrigir_divergencias, divergencias_estoque
+
+
+class Command(BaseCommand):
+    help = 'Confere o saldo dos estoques com a soma do razão de movimentações'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pizzaria',
+            type=int,
+            help='ID da pizzaria para conferir (opcional, se não informado confere todas)',
+        )
+        parser.add_argument(
+            '--corrigir',
+            action='store_true',
+            help='Reconstrói o saldo dos estoques divergentes a partir do razão',
+        )
+
+    def handle(self, *args, **options):
+        ingredientes = None
+        if options['pizzaria']:
+            ingredientes = Ingrediente.objects.filter(pizzaria_id=options['pizzaria'])
+
+        divergencias = divergencias_estoque(ingredientes)
+        for estoque, armazenado, razao in divergencias:
+            self.stdout.write(
+                self.style.WARNING(
+                    f'✗ {estoque.ingrediente.nome} (#{estoque.ingrediente_id}): '
+                    f'saldo {armazenado} {estoque.unidade_medida}, razão {razao} {estoque.unidade_medida} '
+                    f'(diferença {armazenado - razao})'
+                )
+            )
+
+        if divergencias and options['corrigir']:
+            # Confere de novo com as linhas bloqueadas: lançamentos feitos
+            # durante a leitura acima não são divergência
+            corrigidos = corrigir_divergencias(divergencias)
+            self.stdout.write(self.style.SUCCESS(f'{len(corrigidos)} saldo(s) reconstruído(s) a partir do razão'))
+
+        if divergencias:
+            self.stdout.write(self.style.WARNING(f'\n{len(divergencias)} estoque(s) com saldo divergente.'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Saldos dos estoques conferem com o razão.'))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0005_historicousoingrediente'),
+        ('ingredientes', '0001_initial'),
+        ('pedidos', '0004_eventopedido'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimentacaoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('COMPRA', 'Compra'), ('CONSUMO', 'Consumo'), ('AJUSTE', 'Ajuste')], max_length=10)),
+                ('quantidade', models.DecimalField(decimal_places=3, help_text='Positiva para entradas, negativa para saídas', max_digits=12)),
+                ('unidade', models.CharField(choices=[('g', 'Gramas (g)'), ('kg', 'Quilos (kg)'), ('un', 'Unidade')], max_length=10)),
+                ('observacao', models.CharField(blank=True, max_length=255)),
+                ('criado_em', models.DateTimeField(auto_now_add=True)),
+                ('compra', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimentacoes_estoque', to='estoque.compraingrediente')),
+                ('ingrediente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='movimentacoes_estoque', to='ingredientes.ingrediente')),
+                ('pedido', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='movimentacoes_estoque', to='pedidos.pedido')),
+            ],
+            options={
+                'verbose_name': 'Movimentação de Estoque',
+                'verbose_name_plural': 'Movimentações de Estoque',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['ingrediente', 'unidade'], name='mov_estoque_ingrediente_un')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated manually
+
+from django.db import migrations
+
+
+def lancar_saldo_inicial(apps, schema_editor):
+    """Abre o razão de cada estoque com o saldo atual (lançamento de ajuste)."""
+    EstoqueIngrediente = apps.get_model('estoque', 'EstoqueIngrediente')
+    MovimentacaoEstoque = apps.get_model('estoque', 'MovimentacaoEstoque')
+
+    MovimentacaoEstoque.objects.bulk_create(
+        (
+            MovimentacaoEstoque(
+                ingrediente_id=ingrediente_id,
+                tipo='AJUSTE',
+                quantidade=quantidade,
+                unidade=unidade,
+                observacao='Saldo inicial',
+            )
+            for ingrediente_id, quantidade, unidade in EstoqueIngrediente.objects.exclude(
+                quantidade_atual=0
+            ).values_list('ingrediente_id', 'quantidade_atual', 'unidade_medida').iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+def remover_saldo_inicial(apps, schema_editor):
+    MovimentacaoEstoque = apps.get_model('estoque', 'MovimentacaoEstoque')
+    MovimentacaoEstoque.objects.filter(tipo='AJUSTE', observacao='Saldo inicial').delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0006_movimentacaoestoque'),
+    ]
+
+    operations = [
+        migrations.RunPython(lancar_saldo_inicial, remover_saldo_inicial),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0001_initial'),
+        ('estoque', '0007_saldo_inicial_razao'),
+        ('ingredientes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PrevisaoConsumo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unidade', models.CharField(choices=[('g', 'Gramas (g)'), ('kg', 'Quilos (kg)'), ('un', 'Unidade')], max_length=10)),
+                ('consumo_medio_7d', models.DecimalField(decimal_places=4, default=0, max_digits=12)),
+                ('consumo_medio_28d', models.DecimalField(decimal_places=4, default=0, max_digits=12)),
+                ('consumo_diario', models.DecimalField(decimal_places=4, default=0, help_text='Média móvel exponencial (EWMA) do consumo diário', max_digits=12)),
+                ('quantidade_atual', models.DecimalField(decimal_places=3, help_text='Saldo do estoque no momento do cálculo', max_digits=10)),
+                ('dias_ate_ruptura', models.DecimalField(blank=True, decimal_places=1, max_digits=8, null=True)),
+                ('data_ruptura', models.DateField(blank=True, null=True)),
+                ('dias_com_consumo', models.PositiveIntegerField(default=0)),
+                ('calculado_em', models.DateTimeField()),
+                ('ingrediente', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='previsao_consumo', to='ingredientes.ingrediente')),
+                ('pizzaria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='previsoes_consumo', to='autenticacao.pizzaria')),
+            ],
+            options={
+                'verbose_name': 'Previsão de Consumo',
+                'verbose_name_plural': 'Previsões de Consumo',
+                'ordering': ['dias_ate_ruptura'],
+                'indexes': [models.Index(fields=['pizzaria', 'dias_ate_ruptura'], name='previsao_pizzaria_ruptura')],
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0001_initial'),
+        ('estoque', '0008_previsaoconsumo'),
+        ('ingredientes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fornecedor',
+            name='prazo_entrega_dias',
+            field=models.PositiveIntegerField(default=2, help_text='Dias entre o pedido e a entrega (usado nas sugestões de compra)'),
+        ),
+        migrations.CreateModel(
+            name='SugestaoCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prazo_entrega_dias', models.PositiveIntegerField()),
+                ('valor_total_centavos', models.IntegerField(default=0)),
+                ('gerada_em', models.DateTimeField()),
+                ('fornecedor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sugestoes_compra', to='estoque.fornecedor')),
+                ('pizzaria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sugestoes_compra', to='autenticacao.pizzaria')),
+            ],
+            options={
+                'verbose_name': 'Sugestão de Compra',
+                'verbose_name_plural': 'Sugestões de Compra',
+                'ordering': ['pizzaria', 'fornecedor__nome'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemSugestaoCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade', models.DecimalField(decimal_places=3, max_digits=12)),
+                ('unidade', models.CharField(choices=[('g', 'Gramas (g)'), ('kg', 'Quilos (kg)'), ('un', 'Unidade')], max_length=10)),
+                ('preco_unitario_centavos', models.IntegerField(help_text='Último preço do fornecedor, na unidade do estoque')),
+                ('valor_total_centavos', models.IntegerField()),
+                ('quantidade_atual', models.DecimalField(decimal_places=3, max_digits=10)),
+                ('quantidade_projetada', models.DecimalField(decimal_places=3, help_text='Saldo previsto na data de entrega', max_digits=12)),
+                ('consumo_diario', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('ingrediente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sugestoes_compra', to='ingredientes.ingrediente')),
+                ('sugestao', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='estoque.sugestaocompra')),
+            ],
+            options={
+                'verbose_name': 'Item de Sugestão de Compra',
+                'verbose_name_plural': 'Itens de Sugestão de Compra',
+                'ordering': ['ingrediente__nome'],
+            },
+        ),
+    ]
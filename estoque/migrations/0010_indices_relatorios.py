@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0009_sugestoes_compra'),
+        ('ingredientes', '0001_initial'),
+        ('pedidos', '0005_indices_relatorios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='compraingrediente',
+            index=models.Index(fields=['data_compra'], name='compra_data'),
+        ),
+        migrations.AddIndex(
+            model_name='compraingrediente',
+            index=models.Index(fields=['ingrediente', 'data_compra'], name='compra_ingrediente_data'),
+        ),
+        migrations.AddIndex(
+            model_name='historicoprecocompra',
+            index=models.Index(fields=['ingrediente', '-data_preco', '-criado_em'], name='hist_preco_ingrediente_data'),
+        ),
+        migrations.AddIndex(
+            model_name='historicousoingrediente',
+            index=models.Index(fields=['ingrediente', '-data_utilizacao'], name='uso_ingrediente_data'),
+        ),
+        migrations.AddIndex(
+            model_name='historicousoingrediente',
+            index=models.Index(fields=['data_utilizacao'], name='uso_data'),
+        ),
+    ]
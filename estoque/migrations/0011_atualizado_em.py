@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estoque', '0010_indices_relatorios'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='compraingrediente',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='fornecedor',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -1,8 +1,9 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 
+from autenticacao.mixins import RastreamentoCamposMixin
 from autenticacao.models import Pizzaria
 from ingredientes.models import Ingrediente
 
@@ -21,8 +22,13 @@ class Fornecedor(models.Model):
     email = models.EmailField(blank=True)
     endereco = models.TextField(blank=True)
     observacoes = models.TextField(blank=True)
+    prazo_entrega_dias = models.PositiveIntegerField(
+        default=2,
+        help_text="Dias entre o pedido e a entrega (usado nas sugestões de compra)"
+    )
     ativo = models.BooleanField(default=True)
     criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Fornecedor"
@@ -34,7 +40,7 @@ class Fornecedor(models.Model):
         return f"{self.nome} - {self.pizzaria.nome}"
 
 
-class EstoqueIngrediente(models.Model):
+class EstoqueIngrediente(RastreamentoCamposMixin, models.Model):
     """Controle de estoque para cada ingrediente."""
     
     UNIDADES_CHOICES = [
@@ -81,6 +87,8 @@ class EstoqueIngrediente(models.Model):
     data_ultima_compra = models.DateField(null=True, blank=True)
     data_atualizacao = models.DateTimeField(auto_now=True)
 
+    campos_rastreados = ('quantidade_atual', 'unidade_medida', 'preco_compra_atual_centavos')
+
     class Meta:
         verbose_name = "Estoque de Ingrediente"
         verbose_name_plural = "Estoque de Ingredientes"
@@ -88,6 +96,33 @@ class EstoqueIngrediente(models.Model):
     def __str__(self):
         return f"{self.ingrediente.nome} - {self.quantidade_atual} {self.get_unidade_medida_display()}"
 
+    def save(self, *args, **kwargs):
+        """Salva o estoque sem sobrescrever o saldo.
+
+        O saldo (``quantidade_atual``) só muda por lançamentos no razão
+        (``estoque.services.registrar_movimentacao``), com incrementos ``F()``.
+        Em um estoque existente, ``save()`` sem ``update_fields`` grava os
+        demais campos; o saldo inicial de um estoque novo vira um lançamento
+        de ajuste.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'quantidade_atual'
+            ]
+        if not self._state.adding or not self.quantidade_atual:
+            return super().save(*args, **kwargs)
+
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            MovimentacaoEstoque.objects.create(
+                ingrediente_id=self.ingrediente_id,
+                tipo=MovimentacaoEstoque.TIPO_AJUSTE,
+                quantidade=self.quantidade_atual,
+                unidade=self.unidade_medida,
+                observacao='Saldo inicial',
+            )
+
     @property
     def preco_compra_atual(self):
         """Retorna preço em reais."""
@@ -136,27 +171,52 @@ class EstoqueIngrediente(models.Model):
         centavos = self.preco_por_kg_centavos
         return centavos / 100 if centavos is not None else None
 
+    @property
+    def custo_alterado(self):
+        """Indica se preço ou unidade mudaram desde o último carregamento/salvamento."""
+        return self.campo_alterado('preco_compra_atual_centavos') or self.campo_alterado('unidade_medida')
+
+    @property
+    def preco_anterior_centavos(self):
+        """Preço no banco antes da alteração, quando só o preço mudou.
+
+        ``None`` se a unidade mudou ou o valor anterior é desconhecido: nesses
+        casos o custo dos produtos precisa ser recalculado por completo.
+        """
+        if self.campo_alterado('unidade_medida') or not self.tem_valor_original('preco_compra_atual_centavos'):
+            return None
+        return self.valor_original('preco_compra_atual_centavos')
+
     def atualizar_preco(self, novo_preco_centavos):
         """Atualiza o preço atual e recalcula custos dos produtos."""
         self.preco_compra_atual_centavos = novo_preco_centavos
+        custo_alterado = self.custo_alterado
+        preco_anterior = self.preco_anterior_centavos
         self.save()
         
-        # Recalcular custo de todos os produtos que usam este ingrediente
-        self._recalcular_custos_produtos()
+        # Recalcular custo de todos os produtos que usam este ingrediente (se o preço mudou)
+        if custo_alterado:
+            self._recalcular_custos_produtos(preco_anterior)
 
-    def _recalcular_custos_produtos(self):
-        """Recalcula o custo de todos os produtos que usam este ingrediente."""
-        from produtos.models import Produto
-        
-        produtos_afetados = Produto.objects.filter(
-            produto_ingredientes__ingrediente=self.ingrediente
-        ).distinct()
-        
-        for produto in produtos_afetados:
-            produto.recalcular_custo()
+    def _recalcular_custos_produtos(self, preco_anterior_centavos=None):
+        """Atualiza o custo de todos os produtos que usam este ingrediente.
+
+        Com o preço anterior conhecido, aplica apenas a variação (um ``UPDATE``);
+        sem ele, recalcula os produtos afetados por completo.
+        """
+        from produtos.custos import propagar_variacao_preco, recalcular_custos  # import local para evitar ciclos
 
+        if preco_anterior_centavos is not None:
+            return propagar_variacao_preco(
+                self.ingrediente_id,
+                self.unidade_medida,
+                preco_anterior_centavos,
+                self.preco_compra_atual_centavos,
+            )
+        return recalcular_custos(ingredientes=[self.ingrediente_id])
 
-class CompraIngrediente(models.Model):
+
+class CompraIngrediente(RastreamentoCamposMixin, models.Model):
     """Registro de compras de ingredientes."""
     
     UNIDADES_CHOICES = [
@@ -202,11 +262,18 @@ class CompraIngrediente(models.Model):
     numero_nota = models.CharField(max_length=50, blank=True)
     observacoes = models.TextField(blank=True)
     criado_em = models.DateTimeField(auto_now_add=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    campos_rastreados = ('quantidade', 'unidade', 'preco_unitario_centavos')
 
     class Meta:
         verbose_name = "Compra de Ingrediente"
         verbose_name_plural = "Compras de Ingredientes"
         ordering = ['-data_compra']
+        indexes = [
+            models.Index(fields=['data_compra'], name='compra_data'),
+            models.Index(fields=['ingrediente', 'data_compra'], name='compra_ingrediente_data'),
+        ]
 
     def __str__(self):
         return f"{self.ingrediente.nome} - {self.quantidade} - {self.data_compra}"
@@ -254,16 +321,31 @@ class CompraIngrediente(models.Model):
         # Calcular valor total
         self.valor_total_centavos = int(self.quantidade * self.preco_unitario_centavos)
         
-        super().save(*args, **kwargs)
+        nova = self._state.adding
+        quantidade_alterada = self.campo_alterado('quantidade') or self.campo_alterado('unidade')
+        quantidade_anterior = self.valor_original('quantidade')
+        unidade_anterior = self.valor_original('unidade')
+        preco_alterado = self.campo_alterado('preco_unitario_centavos')
         
-        # Atualizar estoque
-        self._atualizar_estoque()
-        
-        # Criar histórico de preço
-        self._criar_historico_preco()
+        # Compra e lançamento no razão do estoque na mesma transação
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            if nova:
+                # Atualizar estoque
+                self._atualizar_estoque()
+            elif quantidade_alterada and quantidade_anterior is not None:
+                # Edição: aplicar apenas a diferença, sem somar a compra novamente
+                self._ajustar_estoque(quantidade_anterior, unidade_anterior)
+            
+            # Criar histórico de preço (apenas quando o preço é novo ou mudou)
+            if nova or preco_alterado:
+                self._criar_historico_preco()
 
     def _atualizar_estoque(self):
-        """Atualiza o estoque do ingrediente."""
+        """Lança a compra no razão do estoque e atualiza o preço de compra."""
+        from .services import registrar_movimentacao, trocar_unidade
+
         estoque, created = EstoqueIngrediente.objects.get_or_create(
             ingrediente=self.ingrediente,
             defaults={
@@ -272,42 +354,57 @@ class CompraIngrediente(models.Model):
                 'preco_compra_atual_centavos': self.preco_unitario_centavos
             }
         )
-        
-        # Se estoque foi criado agora, usar a unidade da compra
-        if created:
-            estoque.unidade_medida = self.unidade
-        
-        # Converter quantidade para a unidade do estoque
-        quantidade_convertida = self._converter_quantidade_para_estoque(estoque)
-        
-        # Adicionar quantidade ao estoque
-        estoque.quantidade_atual += quantidade_convertida
-        estoque.data_ultima_compra = self.data_compra
-        
+
+        # Unidade não conversível (unidade ↔ peso): o estoque passa a usar a unidade da compra
+        if self._converter_quantidade_para_estoque(estoque) is None:
+            trocar_unidade(estoque, self.unidade)
+
         # Atualizar preço (convertendo para a unidade do estoque)
-        preco_convertido = self._converter_preco_para_estoque(estoque)
-        estoque.preco_compra_atual_centavos = preco_convertido
-        estoque.save()
+        estoque.preco_compra_atual_centavos = self._converter_preco_para_estoque(estoque)
+        estoque.data_ultima_compra = self.data_compra
+        custo_alterado = estoque.custo_alterado
+        preco_anterior = None if created else estoque.preco_anterior_centavos
+        estoque.save(update_fields=['preco_compra_atual_centavos', 'data_ultima_compra', 'data_atualizacao'])
+
+        # Adicionar quantidade ao estoque
+        registrar_movimentacao(
+            estoque,
+            MovimentacaoEstoque.TIPO_COMPRA,
+            self._converter_quantidade_para_estoque(estoque),
+            compra=self,
+        )
+
+        # O custo dos produtos é armazenado: acompanha o novo preço de compra
+        if custo_alterado:
+            estoque._recalcular_custos_produtos(preco_anterior)
+
+    def _ajustar_estoque(self, quantidade_anterior, unidade_anterior):
+        """Lança no razão a diferença de quantidade de uma compra editada."""
+        from .services import converter_para_estoque, registrar_movimentacao
 
-    def _converter_quantidade_para_estoque(self, estoque):
-        """Converte quantidade da compra para a unidade do estoque."""
-        if self.unidade == estoque.unidade_medida:
-            return self.quantidade
-        
-        # Conversão entre unidades
         try:
-            if self.unidade == 'g' and estoque.unidade_medida == 'kg':
-                return self.quantidade / 1000
-            elif self.unidade == 'kg' and estoque.unidade_medida == 'g':
-                return self.quantidade * 1000
-            else:
-                # Não é possível converter entre unidade e peso
-                raise ValueError(f"Não é possível converter {self.unidade} para {estoque.unidade_medida}")
-        except ValueError:
-            # Se não conseguir converter, manter unidade da compra no estoque
-            estoque.unidade_medida = self.unidade
-            estoque.save()
-            return self.quantidade
+            estoque = self.ingrediente.estoque
+        except EstoqueIngrediente.DoesNotExist:
+            return
+
+        nova = converter_para_estoque(self.quantidade, self.unidade, estoque.unidade_medida)
+        anterior = converter_para_estoque(quantidade_anterior, unidade_anterior, estoque.unidade_medida)
+        if nova is None or anterior is None:
+            return
+
+        registrar_movimentacao(
+            estoque,
+            MovimentacaoEstoque.TIPO_AJUSTE,
+            nova - anterior,
+            compra=self,
+            observacao='Edição da compra',
+        )
+
+    def _converter_quantidade_para_estoque(self, estoque):
+        """Converte quantidade da compra para a unidade do estoque (``None`` se não conversível)."""
+        from .services import converter_para_estoque
+
+        return converter_para_estoque(self.quantidade, self.unidade, estoque.unidade_medida)
 
     def _converter_preco_para_estoque(self, estoque):
         """Converte preço da compra para a unidade do estoque."""
@@ -361,6 +458,10 @@ class HistoricoPrecoCompra(models.Model):
         verbose_name = "Histórico de Preço"
         verbose_name_plural = "Histórico de Preços"
         ordering = ['-data_preco']
+        indexes = [
+            # Último preço por ingrediente (sugestões de compra, relatórios)
+            models.Index(fields=['ingrediente', '-data_preco', '-criado_em'], name='hist_preco_ingrediente_data'),
+        ]
 
     def __str__(self):
         return f"{self.ingrediente.nome} - R$ {self.preco / 100:.2f} - {self.data_preco}"
@@ -403,10 +504,231 @@ class HistoricoUsoIngrediente(models.Model):
         verbose_name = "Uso de Ingrediente"
         verbose_name_plural = "Usos de Ingredientes"
         ordering = ["-data_utilizacao"]
+        indexes = [
+            models.Index(fields=["ingrediente", "-data_utilizacao"], name="uso_ingrediente_data"),
+            # Séries de consumo de todas as pizzarias (previsão de consumo)
+            models.Index(fields=["data_utilizacao"], name="uso_data"),
+        ]
 
     def __str__(self):
         origem = f"Pedido #{self.pedido_id}" if self.pedido_id else "Ajuste Manual"
         return (
             f"{self.ingrediente.nome} - {self.quantidade} {self.unidade} | "
             f"{origem} - {self.data_utilizacao:%d/%m/%Y %H:%M}"
-        )
\ No newline at end of file
+        )
+
+# -------------------------------------------------------------------
+# Razão de movimentações do estoque
+# -------------------------------------------------------------------
+
+
+class MovimentacaoEstoque(models.Model):
+    """Lançamento do razão de estoque (somente inclusão).
+
+    ``quantidade`` tem sinal (entradas positivas, saídas negativas) e está na
+    unidade do estoque no momento do lançamento. O saldo de
+    ``EstoqueIngrediente.quantidade_atual`` é a soma dos lançamentos, convertidos
+    para a unidade atual (ver o comando ``reconciliar_estoque``).
+    """
+
+    TIPO_COMPRA = 'COMPRA'
+    TIPO_CONSUMO = 'CONSUMO'
+    TIPO_AJUSTE = 'AJUSTE'
+    TIPO_CHOICES = [
+        (TIPO_COMPRA, 'Compra'),
+        (TIPO_CONSUMO, 'Consumo'),
+        (TIPO_AJUSTE, 'Ajuste'),
+    ]
+
+    ingrediente = models.ForeignKey(
+        Ingrediente,
+        on_delete=models.CASCADE,
+        related_name="movimentacoes_estoque",
+    )
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    quantidade = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        help_text="Positiva para entradas, negativa para saídas",
+    )
+    unidade = models.CharField(max_length=10, choices=EstoqueIngrediente.UNIDADES_CHOICES)
+    compra = models.ForeignKey(
+        CompraIngrediente,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="movimentacoes_estoque",
+    )
+    pedido = models.ForeignKey(
+        "pedidos.Pedido",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="movimentacoes_estoque",
+    )
+    observacao = models.CharField(max_length=255, blank=True)
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Movimentação de Estoque"
+        verbose_name_plural = "Movimentações de Estoque"
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["ingrediente", "unidade"], name="mov_estoque_ingrediente_un"),
+        ]
+
+    def __str__(self):
+        return f"{self.ingrediente.nome} - {self.get_tipo_display()} {self.quantidade} {self.unidade}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Movimentações de estoque não podem ser alteradas; lance um ajuste.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Movimentações de estoque não podem ser removidas; lance um ajuste.")
+
+
+# -------------------------------------------------------------------
+# Previsão de consumo (pré-calculada pelo comando calcular_previsao_consumo)
+# -------------------------------------------------------------------
+
+
+class PrevisaoConsumo(models.Model):
+    """Taxa de consumo diário e previsão de ruptura de um ingrediente.
+
+    Uma linha por ingrediente, recalculada todas as noites a partir de
+    ``HistoricoUsoIngrediente`` (ver ``estoque.previsao``). Quantidades na
+    unidade do estoque.
+    """
+
+    ingrediente = models.OneToOneField(
+        Ingrediente,
+        on_delete=models.CASCADE,
+        related_name="previsao_consumo",
+    )
+    pizzaria = models.ForeignKey(
+        Pizzaria,
+        on_delete=models.CASCADE,
+        related_name="previsoes_consumo",
+    )
+    unidade = models.CharField(max_length=10, choices=EstoqueIngrediente.UNIDADES_CHOICES)
+    consumo_medio_7d = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    consumo_medio_28d = models.DecimalField(max_digits=12, decimal_places=4, default=0)
+    consumo_diario = models.DecimalField(
+        max_digits=12,
+        decimal_places=4,
+        default=0,
+        help_text="Média móvel exponencial (EWMA) do consumo diário",
+    )
+    quantidade_atual = models.DecimalField(
+        max_digits=10,
+        decimal_places=3,
+        help_text="Saldo do estoque no momento do cálculo",
+    )
+    dias_ate_ruptura = models.DecimalField(max_digits=8, decimal_places=1, null=True, blank=True)
+    data_ruptura = models.DateField(null=True, blank=True)
+    dias_com_consumo = models.PositiveIntegerField(default=0)
+    calculado_em = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Previsão de Consumo"
+        verbose_name_plural = "Previsões de Consumo"
+        ordering = ["dias_ate_ruptura"]
+        indexes = [
+            models.Index(fields=["pizzaria", "dias_ate_ruptura"], name="previsao_pizzaria_ruptura"),
+        ]
+
+    def __str__(self):
+        dias = f"{self.dias_ate_ruptura} dias" if self.dias_ate_ruptura is not None else "sem consumo"
+        return f"{self.ingrediente.nome} - {self.consumo_diario} {self.unidade}/dia ({dias})"
+
+
+# -------------------------------------------------------------------
+# Sugestões de compra (geradas pelo comando gerar_sugestoes_compra)
+# -------------------------------------------------------------------
+
+
+class SugestaoCompra(models.Model):
+    """Pedido de compra sugerido para um fornecedor.
+
+    Agrupa os ingredientes cujo saldo projetado fica abaixo do mínimo dentro
+    do prazo de entrega do fornecedor (ver ``estoque.sugestoes``). Ingredientes
+    nunca comprados de um fornecedor ficam em uma sugestão sem fornecedor.
+    """
+
+    pizzaria = models.ForeignKey(
+        Pizzaria,
+        on_delete=models.CASCADE,
+        related_name="sugestoes_compra",
+    )
+    fornecedor = models.ForeignKey(
+        Fornecedor,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="sugestoes_compra",
+    )
+    prazo_entrega_dias = models.PositiveIntegerField()
+    valor_total_centavos = models.IntegerField(default=0)
+    gerada_em = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Sugestão de Compra"
+        verbose_name_plural = "Sugestões de Compra"
+        ordering = ["pizzaria", "fornecedor__nome"]
+
+    def __str__(self):
+        fornecedor = self.fornecedor.nome if self.fornecedor else "Sem fornecedor"
+        return f"{fornecedor} - R$ {self.valor_total:.2f}"
+
+    @property
+    def valor_total(self):
+        """Retorna valor total em reais."""
+        return self.valor_total_centavos / 100
+
+
+class ItemSugestaoCompra(models.Model):
+    """Ingrediente de uma sugestão de compra, na unidade do estoque."""
+
+    sugestao = models.ForeignKey(
+        SugestaoCompra,
+        on_delete=models.CASCADE,
+        related_name="itens",
+    )
+    ingrediente = models.ForeignKey(
+        Ingrediente,
+        on_delete=models.CASCADE,
+        related_name="sugestoes_compra",
+    )
+    quantidade = models.DecimalField(max_digits=12, decimal_places=3)
+    unidade = models.CharField(max_length=10, choices=EstoqueIngrediente.UNIDADES_CHOICES)
+    preco_unitario_centavos = models.IntegerField(
+        help_text="Último preço do fornecedor, na unidade do estoque"
+    )
+    valor_total_centavos = models.IntegerField()
+    quantidade_atual = models.DecimalField(max_digits=10, decimal_places=3)
+    quantidade_projetada = models.DecimalField(
+        max_digits=12,
+        decimal_places=3,
+        help_text="Saldo previsto na data de entrega",
+    )
+    consumo_diario = models.DecimalField(max_digits=12, decimal_places=4)
+
+    class Meta:
+        verbose_name = "Item de Sugestão de Compra"
+        verbose_name_plural = "Itens de Sugestão de Compra"
+        ordering = ["ingrediente__nome"]
+
+    def __str__(self):
+        return f"{self.ingrediente.nome} - {self.quantidade} {self.unidade}"
+
+    @property
+    def preco_unitario(self):
+        """Retorna preço unitário em reais."""
+        return self.preco_unitario_centavos / 100
+
+    @property
+    def valor_total(self):
+        """Retorna valor total em reais."""
+        return self.valor_total_centavos / 100
@@ -0,0 +1,183 @@
+"""Previsão de consumo de ingredientes e dias até a ruptura do estoque.
+
+O histórico de uso (``HistoricoUsoIngrediente``) é lido como uma série
+diária por ingrediente, agregada no banco pela data de negócio da pizzaria
+(fuso e ``hora_fechamento``): uma consulta por configuração de fuso e
+fechamento, normalmente uma só para todas as pizzarias. Sobre cada série são calculadas médias móveis (7 e 28 dias) e
+uma média móvel exponencial (EWMA), usada como taxa de consumo diário para
+projetar em quantos dias o saldo atual acaba. O resultado é gravado em
+``PrevisaoConsumo`` pelo comando noturno ``calcular_previsao_consumo``, de
+modo que o dashboard e a API só leem uma tabela pequena.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from autenticacao.models import Pizzaria
+from .models import EstoqueIngrediente, HistoricoUsoIngrediente, PrevisaoConsumo
+from .services import converter_para_estoque
+
+
+JANELA_DIAS = 56
+SPAN_EWMA = 14
+CASAS_CONSUMO = Decimal('0.0001')
+CASAS_DIAS = Decimal('0.1')
+# Acima disso a projeção não tem utilidade prática (e não cabe no campo)
+DIAS_MAXIMOS = Decimal('9999')
+
+
+def media_movel(serie, janela):
+    """Média dos últimos ``janela`` valores da série (0 para série vazia)."""
+    ultimos = serie[-janela:]
+    return sum(ultimos) / len(ultimos) if ultimos else 0.0
+
+
+def ewma(serie, span=SPAN_EWMA):
+    """Média móvel exponencial da série, com ``alpha = 2 / (span + 1)``."""
+    if not serie:
+        return 0.0
+    alpha = 2 / (span + 1)
+    media = serie[0]
+    for valor in serie[1:]:
+        media = alpha * valor + (1 - alpha) * media
+    return media
+
+
+def dias_ate_ruptura(quantidade, consumo_diario):
+    """Dias até o saldo acabar no ritmo ``consumo_diario`` (``None`` sem consumo)."""
+    if consumo_diario <= 0:
+        return None
+    return min(Decimal(quantidade) / Decimal(consumo_diario), DIAS_MAXIMOS).quantize(CASAS_DIAS)
+
+
+def series_de_consumo(inicio, fim, pizzaria, pizzaria_ids=None):
+    """Consumo diário por ingrediente nos dias de negócio ``[inicio, fim)``.
+
+    ``pizzaria`` define fuso e fechamento dos dias; ``pizzaria_ids`` estende
+    a consulta a outras pizzarias com a mesma configuração. Uma consulta
+    agregada por (ingrediente, unidade, dia), percorrida com ``iterator()``.
+    Retorna ``{ingrediente_id: {(unidade, dia): total}}``.
+    """
+    usos = HistoricoUsoIngrediente.objects.filter(
+        data_utilizacao__gte=pizzaria.inicio_data_negocio(inicio),
+        data_utilizacao__lt=pizzaria.inicio_data_negocio(fim),
+        ingrediente__pizzaria_id__in=pizzaria_ids or [pizzaria.pk],
+    )
+
+    series = {}
+    linhas = (
+        usos.annotate(dia=pizzaria.expressao_data_negocio('data_utilizacao'))
+        .values('ingrediente_id', 'unidade', 'dia')
+        .annotate(total=Sum('quantidade'))
+        .order_by()
+        .iterator(chunk_size=2000)
+    )
+    for linha in linhas:
+        series.setdefault(linha['ingrediente_id'], {})[(linha['unidade'], linha['dia'])] = linha['total']
+    return series
+
+
+def _serie_diaria(consumos, unidade_estoque, inicio, fim):
+    """Série diária (floats, na unidade do estoque) a partir do primeiro dia com consumo."""
+    por_dia = {}
+    for (unidade, dia), total in consumos.items():
+        convertido = converter_para_estoque(total, unidade, unidade_estoque)
+        if convertido is not None:
+            por_dia[dia] = por_dia.get(dia, 0.0) + float(convertido)
+    if not por_dia:
+        return []
+
+    # Ingredientes novos: a série começa no primeiro consumo, sem zeros anteriores
+    dia = max(inicio, min(por_dia))
+    serie = []
+    while dia < fim:
+        serie.append(por_dia.get(dia, 0.0))
+        dia += timedelta(days=1)
+    return serie
+
+
+def _grupos_por_dia_de_negocio(pizzaria):
+    """Pizzarias agrupadas por fuso e fechamento: ``[(pizzaria de referência, ids)]``."""
+    if pizzaria is not None:
+        return [(pizzaria, [pizzaria.pk])]
+    grupos = {}
+    for atual in Pizzaria.objects.only('fuso_horario', 'hora_fechamento').order_by('pk'):
+        grupos.setdefault((atual.fuso_horario, atual.hora_fechamento), (atual, []))[1].append(atual.pk)
+    return list(grupos.values())
+
+
+def calcular_previsoes(pizzaria=None, hoje=None, janela=JANELA_DIAS):
+    """Calcula as previsões (não salvas) de todos os estoques, ou os da pizzaria.
+
+    A série usa dias de negócio completos: de ``hoje - janela`` até ontem,
+    com ``hoje`` (padrão: a data de negócio atual) no fuso de cada pizzaria.
+    """
+    series = {}
+    hoje_por_pizzaria = {}
+    for referencia, pizzaria_ids in _grupos_por_dia_de_negocio(pizzaria):
+        hoje_grupo = hoje or referencia.data_negocio()
+        series.update(series_de_consumo(hoje_grupo - timedelta(days=janela), hoje_grupo, referencia, pizzaria_ids))
+        hoje_por_pizzaria.update(dict.fromkeys(pizzaria_ids, hoje_grupo))
+    agora = timezone.now()
+
+    estoques = EstoqueIngrediente.objects.values_list(
+        'ingrediente_id', 'ingrediente__pizzaria_id', 'quantidade_atual', 'unidade_medida'
+    )
+    if pizzaria is not None:
+        estoques = estoques.filter(ingrediente__pizzaria=pizzaria)
+
+    previsoes = []
+    for ingrediente_id, pizzaria_id, quantidade, unidade in estoques.iterator(chunk_size=2000):
+        hoje_pizzaria = hoje_por_pizzaria.get(pizzaria_id)
+        if hoje_pizzaria is None:
+            # Pizzaria criada durante o cálculo: entra na próxima execução
+            continue
+        serie = _serie_diaria(
+            series.get(ingrediente_id, {}), unidade, hoje_pizzaria - timedelta(days=janela), hoje_pizzaria
+        )
+        consumo = Decimal(str(ewma(serie))).quantize(CASAS_CONSUMO)
+        dias = dias_ate_ruptura(quantidade, consumo)
+        previsoes.append(PrevisaoConsumo(
+            ingrediente_id=ingrediente_id,
+            pizzaria_id=pizzaria_id,
+            unidade=unidade,
+            consumo_medio_7d=Decimal(str(media_movel(serie, 7))).quantize(CASAS_CONSUMO),
+            consumo_medio_28d=Decimal(str(media_movel(serie, 28))).quantize(CASAS_CONSUMO),
+            consumo_diario=consumo,
+            quantidade_atual=quantidade,
+            dias_ate_ruptura=dias,
+            data_ruptura=hoje_pizzaria + timedelta(days=int(dias)) if dias is not None else None,
+            dias_com_consumo=sum(1 for valor in serie if valor > 0),
+            calculado_em=agora,
+        ))
+    return previsoes
+
+
+def atualizar_previsoes(pizzaria=None, hoje=None, janela=JANELA_DIAS):
+    """Recalcula e grava as previsões com um upsert em lote.
+
+    Previsões de ingredientes que não têm mais estoque são removidas.
+    Retorna a quantidade de previsões gravadas.
+    """
+    previsoes = calcular_previsoes(pizzaria, hoje, janela)
+    campos = [
+        'pizzaria', 'unidade', 'consumo_medio_7d', 'consumo_medio_28d', 'consumo_diario',
+        'quantidade_atual', 'dias_ate_ruptura', 'data_ruptura', 'dias_com_consumo', 'calculado_em',
+    ]
+    antigas = PrevisaoConsumo.objects.filter(ingrediente__estoque__isnull=True)
+    if pizzaria is not None:
+        antigas = antigas.filter(pizzaria=pizzaria)
+
+    with transaction.atomic():
+        antigas.delete()
+        PrevisaoConsumo.objects.bulk_create(
+            previsoes,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['ingrediente'],
+            update_fields=campos,
+        )
+    return len(previsoes)
@@ -0,0 +1,292 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import EstoqueIngrediente, HistoricoUsoIngrediente, MovimentacaoEstoque
+
+
+QUANTIDADE_ESTOQUE = Decimal('0.001')
+
+
+def converter_para_estoque(quantidade, unidade_origem, unidade_estoque):
+    """Converte uma quantidade para a unidade do estoque (g ↔ kg).
+
+    Retorna ``None`` quando a conversão não é possível (ex.: unidade ↔ peso).
+    """
+    if unidade_origem == unidade_estoque:
+        return quantidade
+    if unidade_origem == 'g' and unidade_estoque == 'kg':
+        return quantidade / 1000
+    if unidade_origem == 'kg' and unidade_estoque == 'g':
+        return quantidade * 1000
+    return None
+
+
+# --------------------------------------------------
+# Razão do estoque
+# --------------------------------------------------
+
+def _saldo_bloqueado(estoque):
+    """Saldo e unidade do estoque no banco, com a linha bloqueada até o fim da transação."""
+    return EstoqueIngrediente.objects.select_for_update().filter(pk=estoque.pk).values_list(
+        'quantidade_atual', 'unidade_medida'
+    ).get()
+
+
+def registrar_movimentacao(estoque, tipo, quantidade, compra=None, pedido=None, observacao=''):
+    """Lança uma movimentação no razão e aplica no saldo com ``F()``.
+
+    Lançamento e incremento acontecem na mesma transação. Saídas são
+    limitadas ao saldo (o estoque não fica negativo): nesse caso a linha é
+    bloqueada e o lançamento registra a quantidade efetivamente baixada.
+    Retorna a movimentação, ou ``None`` se não houve variação.
+    """
+    quantidade = Decimal(quantidade).quantize(QUANTIDADE_ESTOQUE)
+    with transaction.atomic():
+        if quantidade < 0:
+            saldo, _ = _saldo_bloqueado(estoque)
+            quantidade = max(quantidade, -saldo)
+        if not quantidade:
+            return None
+
+        EstoqueIngrediente.objects.filter(pk=estoque.pk).update(
+            quantidade_atual=F('quantidade_atual') + quantidade,
+            data_atualizacao=timezone.now(),
+        )
+        return MovimentacaoEstoque.objects.create(
+            ingrediente_id=estoque.ingrediente_id,
+            tipo=tipo,
+            quantidade=quantidade,
+            unidade=estoque.unidade_medida,
+            compra=compra,
+            pedido=pedido,
+            observacao=observacao,
+        )
+
+
+def ajustar_saldo(estoque, quantidade, observacao='Ajuste manual'):
+    """Leva o saldo do estoque a ``quantidade`` com um lançamento de ajuste."""
+    with transaction.atomic():
+        saldo, _ = _saldo_bloqueado(estoque)
+        return registrar_movimentacao(
+            estoque, MovimentacaoEstoque.TIPO_AJUSTE, Decimal(quantidade) - saldo, observacao=observacao
+        )
+
+
+def trocar_unidade(estoque, nova_unidade):
+    """Troca a unidade do estoque convertendo o saldo.
+
+    Entre g e kg o saldo é convertido no próprio ``UPDATE`` e os lançamentos
+    anteriores continuam válidos (a reconciliação converte cada unidade).
+    Sem conversão possível (unidade ↔ peso) o número do saldo é mantido,
+    como antes: o saldo é encerrado na unidade antiga e reaberto na nova.
+    """
+    with transaction.atomic():
+        saldo, unidade = _saldo_bloqueado(estoque)
+        estoque.unidade_medida = nova_unidade
+        if unidade == nova_unidade:
+            return
+
+        if unidade == 'g' and nova_unidade == 'kg':
+            quantidade = F('quantidade_atual') / 1000
+        elif unidade == 'kg' and nova_unidade == 'g':
+            quantidade = F('quantidade_atual') * 1000
+        else:
+            quantidade = F('quantidade_atual')
+            if saldo:
+                MovimentacaoEstoque.objects.bulk_create([
+                    MovimentacaoEstoque(
+                        ingrediente_id=estoque.ingrediente_id, tipo=MovimentacaoEstoque.TIPO_AJUSTE,
+                        quantidade=-saldo, unidade=unidade, observacao=f'Troca de unidade para {nova_unidade}',
+                    ),
+                    MovimentacaoEstoque(
+                        ingrediente_id=estoque.ingrediente_id, tipo=MovimentacaoEstoque.TIPO_AJUSTE,
+                        quantidade=saldo, unidade=nova_unidade, observacao=f'Troca de unidade de {unidade}',
+                    ),
+                ])
+
+        EstoqueIngrediente.objects.filter(pk=estoque.pk).update(
+            quantidade_atual=quantidade,
+            unidade_medida=nova_unidade,
+            data_atualizacao=timezone.now(),
+        )
+
+
+def saldos_do_razao(ingredientes=None):
+    """Soma os lançamentos por ingrediente, convertidos para a unidade atual do estoque.
+
+    Agregação única no banco (por ingrediente e unidade), percorrida com
+    ``iterator()`` para não carregar o razão em memória. Lançamentos em
+    unidade não conversível para a atual são ignorados (foram encerrados
+    na troca de unidade). Retorna ``{ingrediente_id: saldo}``.
+    """
+    estoques = EstoqueIngrediente.objects.all()
+    movimentacoes = MovimentacaoEstoque.objects.all()
+    if ingredientes is not None:
+        estoques = estoques.filter(ingrediente__in=ingredientes)
+        movimentacoes = movimentacoes.filter(ingrediente__in=ingredientes)
+
+    unidades = dict(estoques.values_list('ingrediente_id', 'unidade_medida'))
+    saldos = dict.fromkeys(unidades, Decimal('0'))
+    linhas = (
+        movimentacoes.values('ingrediente_id', 'unidade')
+        .annotate(total=Sum('quantidade'))
+        .order_by()
+        .iterator(chunk_size=2000)
+    )
+    for linha in linhas:
+        unidade_estoque = unidades.get(linha['ingrediente_id'])
+        if unidade_estoque is None:
+            continue
+        convertida = converter_para_estoque(linha['total'], linha['unidade'], unidade_estoque)
+        if convertida is not None:
+            saldos[linha['ingrediente_id']] += convertida
+    return {ingrediente_id: saldo.quantize(QUANTIDADE_ESTOQUE) for ingrediente_id, saldo in saldos.items()}
+
+
+def divergencias_estoque(ingredientes=None):
+    """Estoques cujo saldo difere da soma do razão.
+
+    Retorna ``[(estoque, saldo_armazenado, saldo_do_razao)]``.
+    """
+    saldos = saldos_do_razao(ingredientes)
+    estoques = EstoqueIngrediente.objects.select_related('ingrediente')
+    if ingredientes is not None:
+        estoques = estoques.filter(ingrediente__in=ingredientes)
+    return [
+        (estoque, estoque.quantidade_atual, saldos[estoque.ingrediente_id])
+        for estoque in estoques.iterator(chunk_size=2000)
+        if estoque.quantidade_atual != saldos[estoque.ingrediente_id]
+    ]
+
+
+def corrigir_divergencias(divergencias):
+    """Reconstrói a partir do razão o saldo dos estoques divergentes.
+
+    ``divergencias_estoque`` lê razão e saldos sem bloqueio: um lançamento
+    confirmado entre as duas leituras aparece como divergência falsa. Aqui
+    as linhas dos estoques são bloqueadas antes e o razão é somado de novo;
+    como todo lançamento altera o saldo na mesma transação, nenhum outro
+    entra até o commit e o saldo gravado é o do razão. Retorna
+    ``[(estoque, saldo_armazenado, saldo_do_razao)]`` só dos que ainda
+    divergiam.
+    """
+    with transaction.atomic():
+        estoques = list(
+            EstoqueIngrediente.objects
+            .select_for_update()
+            .filter(pk__in=[estoque.pk for estoque, _, _ in divergencias])
+            .order_by('pk')
+        )
+        saldos = saldos_do_razao([estoque.ingrediente_id for estoque in estoques])
+
+        corrigidos = []
+        agora = timezone.now()
+        for estoque in estoques:
+            armazenado, razao = estoque.quantidade_atual, saldos[estoque.ingrediente_id]
+            if armazenado != razao:
+                estoque.quantidade_atual = razao
+                estoque.data_atualizacao = agora
+                corrigidos.append((estoque, armazenado, razao))
+        EstoqueIngrediente.objects.bulk_update(
+            [estoque for estoque, _, _ in corrigidos], ['quantidade_atual', 'data_atualizacao']
+        )
+    return corrigidos
+
+
+def demanda_ingredientes_pedido(pedido):
+    """Soma, em uma única consulta, a quantidade de cada ingrediente exigida pelo pedido.
+
+    Retorna um queryset de dicionários ``{ingrediente_id, unidade, total}``
+    já agregados por ingrediente e unidade da receita.
+    """
+    from produtos.models import ProdutoIngrediente  # import local para evitar ciclos
+
+    return (
+        ProdutoIngrediente.objects
+        .filter(produto__itempedido__pedido=pedido)
+        .values('ingrediente_id', 'unidade')
+        .annotate(total=Sum(F('quantidade') * F('produto__itempedido__quantidade')))
+        .order_by()
+    )
+
+
+def baixar_estoque_pedido(pedido):
+    """Abate do estoque todos os ingredientes usados no pedido.
+
+    O custo em consultas é fixo, independente do tamanho do pedido:
+    uma agregação da demanda, um ``SELECT ... FOR UPDATE`` dos estoques
+    envolvidos, um único ``UPDATE`` com decrementos ``F()`` e um
+    ``bulk_create`` para os lançamentos de consumo no razão e outro para o
+    histórico de uso.
+
+    Ingredientes sem estoque cadastrado ou com unidade não conversível
+    são ignorados, como no comportamento anterior.
+    """
+    demanda = {}
+    for linha in demanda_ingredientes_pedido(pedido):
+        demanda.setdefault(linha['ingrediente_id'], []).append((linha['unidade'], linha['total']))
+
+    if not demanda:
+        return []
+
+    with transaction.atomic():
+        estoques = list(
+            EstoqueIngrediente.objects
+            .select_for_update()
+            .filter(ingrediente_id__in=demanda.keys())
+            .order_by('pk')
+        )
+
+        baixas = []
+        for estoque in estoques:
+            quantidade = Decimal('0')
+            for unidade, total in demanda[estoque.ingrediente_id]:
+                convertida = converter_para_estoque(total, unidade, estoque.unidade_medida)
+                if convertida is not None:
+                    quantidade += convertida
+            quantidade = quantidade.quantize(QUANTIDADE_ESTOQUE)
+            if quantidade > 0:
+                baixas.append((estoque, quantidade))
+
+        if not baixas:
+            return []
+
+        decremento = Case(
+            *[When(pk=estoque.pk, then=Value(quantidade)) for estoque, quantidade in baixas],
+            output_field=DecimalField(max_digits=10, decimal_places=3),
+        )
+        EstoqueIngrediente.objects.filter(pk__in=[estoque.pk for estoque, _ in baixas]).update(
+            quantidade_atual=Greatest(F('quantidade_atual') - decremento, Value(Decimal('0'))),
+            data_atualizacao=timezone.now(),
+        )
+
+        historico = []
+        movimentacoes = []
+        for estoque, quantidade in baixas:
+            estoque_antes = estoque.quantidade_atual
+            estoque_depois = max(Decimal('0'), estoque_antes - quantidade)
+            estoque.quantidade_atual = estoque_depois
+            if estoque_depois != estoque_antes:
+                # O razão registra o que foi efetivamente baixado (o saldo não fica negativo)
+                movimentacoes.append(MovimentacaoEstoque(
+                    ingrediente_id=estoque.ingrediente_id,
+                    tipo=MovimentacaoEstoque.TIPO_CONSUMO,
+                    quantidade=estoque_depois - estoque_antes,
+                    unidade=estoque.unidade_medida,
+                    pedido=pedido,
+                ))
+            historico.append(HistoricoUsoIngrediente(
+                ingrediente_id=estoque.ingrediente_id,
+                pedido=pedido,
+                quantidade=quantidade,
+                unidade=estoque.unidade_medida,
+                estoque_antes=estoque_antes,
+                estoque_depois=estoque_depois,
+            ))
+
+        MovimentacaoEstoque.objects.bulk_create(movimentacoes)
+        return HistoricoUsoIngrediente.objects.bulk_create(historico)
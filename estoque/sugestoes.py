@@ -0,0 +1,162 @@
+"""Sugestões de pedidos de compra por fornecedor.
+
+Para cada ingrediente, o saldo é projetado até a data de entrega do
+fornecedor de quem foi comprado por último (``saldo - consumo_diario *
+prazo_entrega_dias``, com o consumo de ``PrevisaoConsumo``). Os que ficam
+abaixo do mínimo entram na sugestão desse fornecedor com a quantidade que
+leva o saldo de volta ao máximo, ao último preço pago a ele.
+
+Tudo é resolvido em uma consulta para todas as pizzarias: fornecedor,
+preço e prazo vêm de subconsultas correlacionadas sobre
+``HistoricoPrecoCompra`` e o filtro de ruptura é aplicado no banco. As
+sugestões são regravadas em lote a cada execução noturna.
+"""
+from decimal import Decimal, ROUND_CEILING, ROUND_UP
+
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import EstoqueIngrediente, HistoricoPrecoCompra, ItemSugestaoCompra, SugestaoCompra
+from .services import QUANTIDADE_ESTOQUE, converter_para_estoque
+
+
+# Prazo usado para ingredientes sem fornecedor conhecido
+PRAZO_SEM_FORNECEDOR = 2
+
+
+def preco_na_unidade_do_estoque(preco_centavos, unidade_compra, unidade_estoque):
+    """Converte um preço por ``unidade_compra`` para preço por ``unidade_estoque``.
+
+    Retorna ``None`` quando as unidades não são conversíveis (unidade ↔ peso).
+    """
+    fator = converter_para_estoque(Decimal(1), unidade_compra, unidade_estoque)
+    if not fator:
+        return None
+    return int((Decimal(preco_centavos) / fator).to_integral_value(rounding=ROUND_UP))
+
+
+def quantidade_para_pedido(quantidade, unidade):
+    """Arredonda a quantidade para cima (inteira para itens contados em unidades)."""
+    if unidade == 'un':
+        return quantidade.to_integral_value(rounding=ROUND_CEILING).quantize(QUANTIDADE_ESTOQUE)
+    return quantidade.quantize(QUANTIDADE_ESTOQUE, rounding=ROUND_CEILING)
+
+
+def estoques_a_repor(pizzaria=None):
+    """Estoques cujo saldo projetado na entrega fica abaixo do mínimo.
+
+    Uma única consulta; cada linha traz o último fornecedor ativo do
+    ingrediente (da mesma pizzaria), o preço pago a ele, a unidade dessa
+    compra, o prazo de entrega, o consumo diário e o saldo projetado.
+    """
+    ultimo_preco = HistoricoPrecoCompra.objects.filter(
+        ingrediente=OuterRef('ingrediente'),
+        compra__fornecedor__ativo=True,
+        compra__fornecedor__pizzaria=OuterRef('ingrediente__pizzaria'),
+    ).order_by('-data_preco', '-criado_em', '-id')
+
+    consumo = Coalesce(
+        F('ingrediente__previsao_consumo__consumo_diario'),
+        Value(Decimal('0')),
+        output_field=DecimalField(max_digits=12, decimal_places=4),
+    )
+    estoques = EstoqueIngrediente.objects.annotate(
+        fornecedor_id=Subquery(ultimo_preco.values('compra__fornecedor')[:1]),
+        preco_fornecedor_centavos=Subquery(ultimo_preco.values('preco_centavos')[:1]),
+        unidade_preco=Subquery(ultimo_preco.values('compra__unidade')[:1]),
+        prazo_entrega_dias=Coalesce(
+            Subquery(ultimo_preco.values('compra__fornecedor__prazo_entrega_dias')[:1]),
+            Value(PRAZO_SEM_FORNECEDOR),
+        ),
+        consumo_diario=consumo,
+    ).annotate(
+        quantidade_projetada=ExpressionWrapper(
+            F('quantidade_atual') - F('consumo_diario') * F('prazo_entrega_dias'),
+            output_field=DecimalField(max_digits=12, decimal_places=3),
+        ),
+        quantidade_alvo=Greatest('estoque_maximo', 'estoque_minimo'),
+    ).filter(
+        quantidade_projetada__lt=F('estoque_minimo'),
+    )
+    if pizzaria is not None:
+        estoques = estoques.filter(ingrediente__pizzaria=pizzaria)
+
+    return estoques.values(
+        'ingrediente_id', 'ingrediente__pizzaria_id', 'unidade_medida', 'quantidade_atual',
+        'preco_compra_atual_centavos', 'fornecedor_id', 'preco_fornecedor_centavos', 'unidade_preco',
+        'prazo_entrega_dias', 'consumo_diario', 'quantidade_projetada', 'quantidade_alvo',
+    ).order_by()
+
+
+def calcular_sugestoes(pizzaria=None):
+    """Monta as sugestões (não salvas) agrupadas por (pizzaria, fornecedor).
+
+    Retorna ``[(sugestao, itens)]``; ingredientes sem fornecedor conhecido
+    usam o preço de compra atual do estoque.
+    """
+    agora = timezone.now()
+    sugestoes = {}
+    for linha in estoques_a_repor(pizzaria).iterator(chunk_size=2000):
+        unidade = linha['unidade_medida']
+        projetada = Decimal(linha['quantidade_projetada'])
+        quantidade = quantidade_para_pedido(Decimal(linha['quantidade_alvo']) - projetada, unidade)
+        if quantidade <= 0:
+            continue
+
+        preco = None
+        if linha['fornecedor_id'] is not None:
+            preco = preco_na_unidade_do_estoque(
+                linha['preco_fornecedor_centavos'], linha['unidade_preco'], unidade
+            )
+        if preco is None:
+            preco = linha['preco_compra_atual_centavos']
+
+        chave = (linha['ingrediente__pizzaria_id'], linha['fornecedor_id'])
+        if chave not in sugestoes:
+            sugestoes[chave] = (SugestaoCompra(
+                pizzaria_id=chave[0],
+                fornecedor_id=chave[1],
+                prazo_entrega_dias=linha['prazo_entrega_dias'],
+                gerada_em=agora,
+            ), [])
+        sugestao, itens = sugestoes[chave]
+
+        item = ItemSugestaoCompra(
+            ingrediente_id=linha['ingrediente_id'],
+            quantidade=quantidade,
+            unidade=unidade,
+            preco_unitario_centavos=preco,
+            valor_total_centavos=int(quantidade * preco),
+            quantidade_atual=linha['quantidade_atual'],
+            quantidade_projetada=projetada.quantize(QUANTIDADE_ESTOQUE),
+            consumo_diario=linha['consumo_diario'],
+        )
+        sugestao.valor_total_centavos += item.valor_total_centavos
+        itens.append(item)
+    return list(sugestoes.values())
+
+
+def gerar_sugestoes(pizzaria=None):
+    """Recalcula e regrava as sugestões de compra (todas as pizzarias ou uma).
+
+    As sugestões anteriores do escopo são substituídas. Custa um número
+    fixo de consultas, independente de pizzarias e ingredientes. Retorna
+    as sugestões gravadas.
+    """
+    calculadas = calcular_sugestoes(pizzaria)
+    antigas = SugestaoCompra.objects.all()
+    if pizzaria is not None:
+        antigas = antigas.filter(pizzaria=pizzaria)
+
+    with transaction.atomic():
+        antigas.delete()
+        sugestoes = SugestaoCompra.objects.bulk_create([sugestao for sugestao, _ in calculadas])
+        itens = []
+        for sugestao, itens_sugestao in calculadas:
+            for item in itens_sugestao:
+                item.sugestao = sugestao
+                itens.append(item)
+        ItemSugestaoCompra.objects.bulk_create(itens, batch_size=1000)
+    return sugestoes
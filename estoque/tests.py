@@ -1,10 +1,18 @@
 from django.test import TestCase, Client, RequestFactory
+from django.test.utils import CaptureQueriesContext
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 from decimal import Decimal
-from datetime import date, timedelta
+from datetime import date, time, timedelta
 import json
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
 
 from autenticacao.models import Pizzaria, UsuarioPizzaria
 from ingredientes.models import Ingrediente
@@ -12,7 +20,11 @@ from .models import (
     Fornecedor, 
     EstoqueIngrediente, 
     CompraIngrediente, 
-    HistoricoPrecoCompra
+    HistoricoPrecoCompra,
+    HistoricoUsoIngrediente,
+    MovimentacaoEstoque,
+    PrevisaoConsumo,
+    SugestaoCompra,
 )
 from .forms import FornecedorForm, CompraIngredienteForm, EstoqueIngredienteForm
 from .views import dashboard_estoque, lista_estoque, editar_estoque
@@ -1185,3 +1197,731 @@ class EstoqueEdgeCasesTestCase(TestCase):
         
         self.assertIsNone(historico.compra)
         self.assertEqual(historico.preco_centavos, 2000)
+
+
+class BaixaEstoquePedidoTestCase(TestCase):
+    """Testes para a baixa de estoque em lote ao finalizar pedidos."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        from produtos.models import Produto, ProdutoIngrediente
+
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+
+        self.queijo = Ingrediente.objects.create(nome="Queijo", pizzaria=self.pizzaria)
+        self.molho = Ingrediente.objects.create(nome="Molho", pizzaria=self.pizzaria)
+        self.ovo = Ingrediente.objects.create(nome="Ovo", pizzaria=self.pizzaria)
+
+        self.estoque_queijo = EstoqueIngrediente.objects.create(
+            ingrediente=self.queijo,
+            quantidade_atual=Decimal('10.000'),
+            unidade_medida='kg',
+            preco_compra_atual_centavos=4000
+        )
+        self.estoque_molho = EstoqueIngrediente.objects.create(
+            ingrediente=self.molho,
+            quantidade_atual=Decimal('0.100'),
+            unidade_medida='kg',
+            preco_compra_atual_centavos=1500
+        )
+        # Unidade não conversível (receita em gramas, estoque em unidades)
+        self.estoque_ovo = EstoqueIngrediente.objects.create(
+            ingrediente=self.ovo,
+            quantidade_atual=Decimal('30.000'),
+            unidade_medida='un',
+            preco_compra_atual_centavos=100
+        )
+
+        self.mussarela = Produto.objects.create(pizzaria=self.pizzaria, nome="Mussarela")
+        self.portuguesa = Produto.objects.create(pizzaria=self.pizzaria, nome="Portuguesa")
+        ProdutoIngrediente.objects.create(produto=self.mussarela, ingrediente=self.queijo, quantidade=Decimal('200'), unidade='g')
+        ProdutoIngrediente.objects.create(produto=self.mussarela, ingrediente=self.molho, quantidade=Decimal('80'), unidade='g')
+        ProdutoIngrediente.objects.create(produto=self.portuguesa, ingrediente=self.queijo, quantidade=Decimal('0.15'), unidade='kg')
+        ProdutoIngrediente.objects.create(produto=self.portuguesa, ingrediente=self.ovo, quantidade=Decimal('50'), unidade='g')
+
+    def _criar_pedido(self):
+        from pedidos.models import Pedido, ItemPedido
+
+        pedido = Pedido.objects.create(pizzaria=self.pizzaria, forma_pagamento='DIN')
+        ItemPedido.objects.create(pedido=pedido, produto=self.mussarela, quantidade=2, valor_unitario=Decimal('40.00'))
+        ItemPedido.objects.create(pedido=pedido, produto=self.portuguesa, quantidade=1, valor_unitario=Decimal('45.00'))
+        ItemPedido.objects.create(pedido=pedido, produto=self.mussarela, quantidade=1, valor_unitario=Decimal('40.00'))
+        return pedido
+
+    def test_baixa_agrega_demanda_e_converte_unidades(self):
+        """Testa que a demanda é somada por ingrediente e convertida para a unidade do estoque."""
+        pedido = self._criar_pedido()
+        pedido.status = 'PRONTO'
+        pedido.save()
+
+        self.estoque_queijo.refresh_from_db()
+        self.estoque_molho.refresh_from_db()
+        self.estoque_ovo.refresh_from_db()
+
+        # 3 × 200 g + 1 × 0,15 kg = 0,75 kg
+        self.assertEqual(self.estoque_queijo.quantidade_atual, Decimal('9.250'))
+        # 3 × 80 g = 0,24 kg, limitado a zero
+        self.assertEqual(self.estoque_molho.quantidade_atual, Decimal('0.000'))
+        # Gramas → unidade não é convertível: estoque intacto
+        self.assertEqual(self.estoque_ovo.quantidade_atual, Decimal('30.000'))
+
+        usos = HistoricoUsoIngrediente.objects.filter(pedido=pedido)
+        self.assertEqual(usos.count(), 2)
+        uso_queijo = usos.get(ingrediente=self.queijo)
+        self.assertEqual(uso_queijo.quantidade, Decimal('0.750'))
+        self.assertEqual(uso_queijo.estoque_antes, Decimal('10.000'))
+        self.assertEqual(uso_queijo.estoque_depois, Decimal('9.250'))
+
+        pedido.refresh_from_db()
+        self.assertTrue(pedido.estoque_baixado)
+
+    def test_baixa_com_numero_fixo_de_consultas(self):
+        """Testa que a baixa não cresce em consultas com o tamanho do pedido."""
+        from estoque.services import baixar_estoque_pedido
+
+        pedido = self._criar_pedido()
+
+        # agregação + SELECT FOR UPDATE + UPDATE + INSERTs em lote (razão e histórico) (+ savepoint)
+        with self.assertNumQueries(7):
+            baixar_estoque_pedido(pedido)
+
+    def test_baixa_executada_apenas_uma_vez(self):
+        """Testa que salvar novamente o pedido não baixa o estoque de novo."""
+        pedido = self._criar_pedido()
+        pedido.status = 'PRONTO'
+        pedido.save()
+        pedido.status = 'ENTREGUE'
+        pedido.save()
+
+        self.estoque_queijo.refresh_from_db()
+        self.assertEqual(self.estoque_queijo.quantidade_atual, Decimal('9.250'))
+        self.assertEqual(HistoricoUsoIngrediente.objects.filter(pedido=pedido).count(), 2)
+
+
+class RazaoEstoqueTestCase(TestCase):
+    """Testes para o razão de movimentações do estoque."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.queijo = Ingrediente.objects.create(nome="Queijo", pizzaria=self.pizzaria)
+        self.estoque = EstoqueIngrediente.objects.create(
+            ingrediente=self.queijo,
+            quantidade_atual=Decimal('10.000'),
+            unidade_medida='kg',
+            preco_compra_atual_centavos=4000
+        )
+
+    def _saldo(self):
+        self.estoque.refresh_from_db()
+        return self.estoque.quantidade_atual
+
+    def _razao(self):
+        return list(MovimentacaoEstoque.objects.values_list('tipo', 'quantidade', 'unidade'))
+
+    def test_compra_lanca_no_razao(self):
+        """Testa que a compra entra no razão e incrementa o saldo."""
+        compra = CompraIngrediente.objects.create(
+            ingrediente=self.queijo,
+            quantidade=Decimal('500'),
+            unidade='g',
+            preco_unitario_centavos=5
+        )
+
+        self.assertEqual(self._saldo(), Decimal('10.500'))
+        movimentacao = MovimentacaoEstoque.objects.get(compra=compra)
+        self.assertEqual(
+            (movimentacao.tipo, movimentacao.quantidade, movimentacao.unidade),
+            ('COMPRA', Decimal('0.500'), 'kg'),
+        )
+
+        compra.quantidade = Decimal('1000')
+        compra.save()
+
+        self.assertEqual(self._saldo(), Decimal('11.000'))
+        self.assertEqual(self._razao()[-1], ('AJUSTE', Decimal('0.500'), 'kg'))
+
+    def test_save_do_estoque_nao_sobrescreve_saldo(self):
+        """Testa que um objeto desatualizado não desfaz movimentações concorrentes."""
+        from estoque.services import registrar_movimentacao
+
+        desatualizado = EstoqueIngrediente.objects.get(pk=self.estoque.pk)
+        registrar_movimentacao(self.estoque, MovimentacaoEstoque.TIPO_CONSUMO, Decimal('-2'))
+
+        desatualizado.estoque_minimo = Decimal('1')
+        desatualizado.save()
+
+        self.assertEqual(self._saldo(), Decimal('8.000'))
+        self.assertEqual(self.estoque.estoque_minimo, Decimal('1.000'))
+
+    def test_saida_limitada_ao_saldo(self):
+        """Testa que a saída não deixa saldo negativo e lança o que foi baixado."""
+        from estoque.services import registrar_movimentacao
+
+        movimentacao = registrar_movimentacao(self.estoque, MovimentacaoEstoque.TIPO_CONSUMO, Decimal('-12'))
+
+        self.assertEqual(movimentacao.quantidade, Decimal('-10.000'))
+        self.assertEqual(self._saldo(), Decimal('0.000'))
+
+    def test_formulario_ajusta_saldo_e_unidade(self):
+        """Testa que a edição do estoque vira ajuste no razão, inclusive com troca de unidade."""
+        form = EstoqueIngredienteForm(
+            data={
+                'quantidade_atual': '12000',
+                'estoque_minimo': '0',
+                'estoque_maximo': '0',
+                'unidade_medida': 'g',
+                'preco_compra_reais': '0.04',
+            },
+            instance=self.estoque,
+        )
+        self.assertTrue(form.is_valid(), form.errors)
+        form.save()
+
+        self.assertEqual(self._saldo(), Decimal('12000.000'))
+        self.assertEqual(self.estoque.unidade_medida, 'g')
+        self.assertEqual(self._razao()[-1], ('AJUSTE', Decimal('2000.000'), 'g'))
+
+        saida = StringIO()
+        call_command('reconciliar_estoque', stdout=saida)
+        self.assertIn('conferem', saida.getvalue())
+
+    def test_reconciliar_estoque_reporta_e_corrige_divergencia(self):
+        """Testa o comando que reconstrói os saldos a partir do razão."""
+        CompraIngrediente.objects.create(
+            ingrediente=self.queijo,
+            quantidade=Decimal('2'),
+            unidade='kg',
+            preco_unitario_centavos=4000
+        )
+        # Escrita fora do razão (ex.: UPDATE manual no banco)
+        EstoqueIngrediente.objects.filter(pk=self.estoque.pk).update(quantidade_atual=Decimal('5'))
+
+        saida = StringIO()
+        call_command('reconciliar_estoque', '--corrigir', stdout=saida)
+
+        self.assertIn('Queijo', saida.getvalue())
+        self.assertEqual(self._saldo(), Decimal('12.000'))
+
+        saida = StringIO()
+        call_command('reconciliar_estoque', '--pizzaria', str(self.pizzaria.id), stdout=saida)
+        self.assertIn('conferem', saida.getvalue())
+
+    def test_reconciliar_estoque_ignora_lancamento_entre_as_leituras(self):
+        """Testa que um lançamento entre a soma do razão e a leitura dos saldos não corrompe o saldo."""
+        from unittest import mock
+        from estoque import services
+
+        saldos_do_razao = services.saldos_do_razao
+        lancados = []
+
+        def saldos_com_lancamento_concorrente(*args, **kwargs):
+            saldos = saldos_do_razao(*args, **kwargs)
+            if not lancados:
+                lancados.append(services.registrar_movimentacao(
+                    self.estoque, MovimentacaoEstoque.TIPO_CONSUMO, Decimal('-3')
+                ))
+            return saldos
+
+        saida = StringIO()
+        with mock.patch.object(services, 'saldos_do_razao', saldos_com_lancamento_concorrente):
+            call_command('reconciliar_estoque', '--corrigir', stdout=saida)
+
+        self.assertIn('0 saldo(s) reconstruído(s)', saida.getvalue())
+        self.assertEqual(self._saldo(), Decimal('7.000'))
+        self.assertEqual(services.divergencias_estoque(), [])
+
+
+NFE_EXEMPLO = """<?xml version="1.0" encoding="UTF-8"?>
+<nfeProc xmlns="http://www.portalfiscal.inf.br/nfe" versao="4.00">
+  <NFe>
+    <infNFe Id="NFe35240112345678000190550010000012341000012345" versao="4.00">
+      <ide><nNF>1234</nNF><dhEmi>2024-01-15T10:30:00-03:00</dhEmi></ide>
+      <emit><CNPJ>11222333000144</CNPJ><xNome>Laticínios Boa Vista LTDA</xNome></emit>
+      <det nItem="1">
+        <prod><xProd>QUEIJO</xProd><uCom>KG</uCom><qCom>5.0000</qCom><vUnCom>42.5000</vUnCom></prod>
+      </det>
+      <det nItem="2">
+        <prod><xProd>Ovo</xProd><uCom>UN</uCom><qCom>60.0000</qCom><vUnCom>0.8000</vUnCom></prod>
+      </det>
+    </infNFe>
+  </NFe>
+</nfeProc>
+"""
+
+
+class ImportacaoComprasTestCase(TestCase):
+    """Testes para a importação de compras em lote."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.fornecedor = Fornecedor.objects.create(
+            pizzaria=self.pizzaria,
+            nome="Laticínios Boa Vista",
+            cnpj="11.222.333/0001-44"
+        )
+        self.queijo = Ingrediente.objects.create(nome="Queijo", pizzaria=self.pizzaria)
+        self.molho = Ingrediente.objects.create(nome="Molho", pizzaria=self.pizzaria)
+        self.ovo = Ingrediente.objects.create(nome="Ovo", pizzaria=self.pizzaria)
+        self.estoque_queijo = EstoqueIngrediente.objects.create(
+            ingrediente=self.queijo,
+            quantidade_atual=Decimal('2.000'),
+            unidade_medida='kg',
+            preco_compra_atual_centavos=4000
+        )
+
+    def _importar(self, conteudo, nome='compras.csv'):
+        from estoque.importacao import importar_compras, ler_arquivo, validar_linhas
+
+        arquivo = SimpleUploadedFile(nome, conteudo.encode('utf-8'))
+        return importar_compras(self.pizzaria, validar_linhas(self.pizzaria, ler_arquivo(arquivo)))
+
+    def _csv(self, repeticoes=1):
+        linhas = ['ingrediente;quantidade;unidade;preco_unitario;fornecedor;data_compra;numero_nota']
+        for _ in range(repeticoes):
+            linhas += [
+                'queijo;500;g;0,05;Laticínios Boa Vista;15/01/2024;99',
+                'Molho;3;kg;12,00;;2024-01-15;99',
+                'Queijo;1,5;kg;45,00;11222333000144;2024-01-16;99',
+            ]
+        return '\n'.join(linhas)
+
+    def test_importa_csv_agregando_por_ingrediente(self):
+        """Testa compras, histórico, caixa, razão e estoque gravados em lote."""
+        from financeiro.models import MovimentacaoCaixa
+        from estoque.services import divergencias_estoque
+
+        compras = self._importar(self._csv())
+
+        self.assertEqual(len(compras), 3)
+        self.assertEqual(CompraIngrediente.objects.filter(numero_nota='99').count(), 3)
+        self.assertEqual(HistoricoPrecoCompra.objects.count(), 3)
+        self.assertEqual(MovimentacaoCaixa.objects.filter(origem='COMPRA').count(), 3)
+        self.assertEqual(
+            sum(MovimentacaoCaixa.objects.values_list('valor_centavos', flat=True)),
+            2500 + 3600 + 6750,
+        )
+
+        self.estoque_queijo.refresh_from_db()
+        self.assertEqual(self.estoque_queijo.quantidade_atual, Decimal('4.000'))
+        # Preço da última linha, na unidade do estoque
+        self.assertEqual(self.estoque_queijo.preco_compra_atual_centavos, 4500)
+        self.assertEqual(self.estoque_queijo.data_ultima_compra, date(2024, 1, 16))
+
+        estoque_molho = EstoqueIngrediente.objects.get(ingrediente=self.molho)
+        self.assertEqual((estoque_molho.quantidade_atual, estoque_molho.unidade_medida), (Decimal('3.000'), 'kg'))
+        self.assertEqual(divergencias_estoque(), [])
+
+    def test_fracoes_e_linhas_fora_de_ordem(self):
+        """Testa razão e estoque iguais com conversões fracionárias e a compra mais recente fora de ordem."""
+        from estoque.services import divergencias_estoque
+
+        self._importar(
+            'ingrediente;quantidade;unidade;preco_unitario;data_compra\n'
+            'Queijo;0,6;g;0,04;2024-01-20\n'
+            'Queijo;0,6;g;0,05;2024-01-10\n'
+            'Queijo;0,6;g;0,06;2024-01-12\n'
+        )
+
+        self.estoque_queijo.refresh_from_db()
+        self.assertEqual(self.estoque_queijo.quantidade_atual, Decimal('2.003'))
+        self.assertEqual(self.estoque_queijo.data_ultima_compra, date(2024, 1, 20))
+        self.assertEqual(self.estoque_queijo.preco_compra_atual_centavos, 4000)
+        self.assertEqual(divergencias_estoque(), [])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Outros bancos dividem o bulk_create em vários INSERTs')
+    def test_consultas_nao_crescem_com_as_linhas(self):
+        """Testa que uma nota com muitas linhas custa as mesmas consultas que uma pequena."""
+        # Primeira importação cria o estoque do molho e recalcula custos
+        self._importar(self._csv(1))
+
+        with CaptureQueriesContext(connection) as pequena:
+            self._importar(self._csv(1))
+        with CaptureQueriesContext(connection) as grande:
+            self._importar(self._csv(100))
+
+        self.assertEqual(len(grande), len(pequena))
+        self.assertLessEqual(len(grande), 15)
+        self.assertEqual(CompraIngrediente.objects.count(), 306)
+
+    def test_linhas_invalidas_nao_gravam_nada(self):
+        """Testa que qualquer erro de validação cancela a importação inteira."""
+        conteudo = (
+            'ingrediente;quantidade;unidade;preco_unitario\n'
+            'Queijo;1;kg;40,00\n'
+            'Tomate;1;kg;8,00\n'
+            'Molho;abc;litro;0\n'
+        )
+
+        with self.assertRaises(ValidationError) as contexto:
+            self._importar(conteudo)
+
+        mensagens = contexto.exception.messages
+        self.assertEqual(len(mensagens), 2)
+        self.assertIn("Linha 2: ingrediente 'Tomate' não cadastrado", mensagens)
+        self.assertTrue(mensagens[1].startswith('Linha 3:'))
+        self.assertFalse(CompraIngrediente.objects.exists())
+
+    def test_importa_nfe(self):
+        """Testa a leitura dos itens e do emitente de uma NF-e."""
+        compras = self._importar(NFE_EXEMPLO, nome='nota.xml')
+
+        self.assertEqual(len(compras), 2)
+        queijo = CompraIngrediente.objects.get(ingrediente=self.queijo)
+        self.assertEqual(queijo.fornecedor, self.fornecedor)
+        self.assertEqual(queijo.numero_nota, '1234')
+        self.assertEqual(queijo.data_compra, date(2024, 1, 15))
+        self.assertEqual(queijo.valor_total_centavos, 21250)
+        estoque_ovo = EstoqueIngrediente.objects.get(ingrediente=self.ovo)
+        self.assertEqual((estoque_ovo.quantidade_atual, estoque_ovo.unidade_medida), (Decimal('60.000'), 'un'))
+
+    def test_endpoint_de_upload(self):
+        """Testa o upload do arquivo pela API."""
+        user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client.force_login(user)
+
+        response = self.client.post(
+            reverse('estoque_api:compras_importar'),
+            {'arquivo': SimpleUploadedFile('compras.csv', self._csv().encode('utf-8'))},
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['importadas'], 3)
+
+        response = self.client.post(
+            reverse('estoque_api:compras_importar'),
+            {'arquivo': SimpleUploadedFile('compras.csv', b'ingrediente;quantidade;unidade;preco_unitario\nX;1;kg;1')},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()['details']), 1)
+
+
+class PrevisaoConsumoTestCase(TestCase):
+    """Testes para a previsão de consumo e dias até a ruptura."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.client = Client()
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="testuser",
+            password="testpass123"
+        )
+        UsuarioPizzaria.objects.create(
+            usuario=self.user,
+            pizzaria=self.pizzaria,
+            papel="dono_pizzaria"
+        )
+        self.queijo = Ingrediente.objects.create(nome="Queijo", pizzaria=self.pizzaria)
+        self.molho = Ingrediente.objects.create(nome="Molho", pizzaria=self.pizzaria)
+        self.estoque_queijo = EstoqueIngrediente.objects.create(
+            ingrediente=self.queijo,
+            quantidade_atual=Decimal('10.000'),
+            unidade_medida='kg',
+            preco_compra_atual_centavos=4000
+        )
+        self.estoque_molho = EstoqueIngrediente.objects.create(
+            ingrediente=self.molho,
+            quantidade_atual=Decimal('5.000'),
+            unidade_medida='kg',
+            preco_compra_atual_centavos=1200
+        )
+        self.hoje = self.pizzaria.data_negocio()
+
+    def _registrar_uso(self, ingrediente, dias_atras, quantidade, unidade='kg', horas=20):
+        uso = HistoricoUsoIngrediente.objects.create(
+            ingrediente=ingrediente,
+            quantidade=Decimal(quantidade),
+            unidade=unidade,
+            estoque_antes=Decimal('0'),
+            estoque_depois=Decimal('0'),
+        )
+        # data_utilizacao é auto_now_add: o passado só pode ser gravado via update
+        momento = self.pizzaria.inicio_data_negocio(self.hoje - timedelta(days=dias_atras)) + timedelta(hours=horas)
+        HistoricoUsoIngrediente.objects.filter(pk=uso.pk).update(data_utilizacao=momento)
+
+    def test_medias(self):
+        """Testa média móvel e média móvel exponencial."""
+        from estoque.previsao import dias_ate_ruptura, ewma, media_movel
+
+        self.assertEqual(media_movel([], 7), 0.0)
+        self.assertEqual(media_movel([1, 2, 3, 4], 2), 3.5)
+        self.assertEqual(ewma([2.0] * 10), 2.0)
+        # alpha = 2 / (3 + 1) = 0.5
+        self.assertAlmostEqual(ewma([0.0, 4.0], span=3), 2.0)
+        self.assertEqual(dias_ate_ruptura(Decimal('10'), Decimal('0')), None)
+        self.assertEqual(dias_ate_ruptura(Decimal('10'), Decimal('4')), Decimal('2.5'))
+
+    def test_comando_calcula_e_atualiza_previsoes(self):
+        """Testa o cálculo pelo histórico e o upsert ao recalcular."""
+        for dias_atras in range(1, 8):
+            self._registrar_uso(self.queijo, dias_atras, '500', unidade='g')
+            self._registrar_uso(self.queijo, dias_atras, '1.5')
+        # Uso de hoje fica fora da série (dia incompleto)
+        self._registrar_uso(self.queijo, 0, '50')
+
+        saida = StringIO()
+        call_command('calcular_previsao_consumo', stdout=saida)
+        self.assertIn('2', saida.getvalue())
+
+        previsao = PrevisaoConsumo.objects.get(ingrediente=self.queijo)
+        self.assertEqual(previsao.pizzaria, self.pizzaria)
+        self.assertEqual(previsao.consumo_diario, Decimal('2.0000'))
+        self.assertEqual(previsao.consumo_medio_7d, Decimal('2.0000'))
+        self.assertEqual(previsao.dias_com_consumo, 7)
+        self.assertEqual(previsao.dias_ate_ruptura, Decimal('5.0'))
+        self.assertEqual(previsao.data_ruptura, self.hoje + timedelta(days=5))
+
+        sem_consumo = PrevisaoConsumo.objects.get(ingrediente=self.molho)
+        self.assertEqual(sem_consumo.consumo_diario, Decimal('0'))
+        self.assertIsNone(sem_consumo.dias_ate_ruptura)
+
+        EstoqueIngrediente.objects.filter(pk=self.estoque_queijo.pk).update(quantidade_atual=Decimal('1.000'))
+        call_command('calcular_previsao_consumo', stdout=StringIO())
+        self.assertEqual(PrevisaoConsumo.objects.count(), 2)
+        self.assertEqual(PrevisaoConsumo.objects.get(ingrediente=self.queijo).dias_ate_ruptura, Decimal('0.5'))
+
+    def test_consumo_de_madrugada_conta_no_dia_de_negocio(self):
+        """Testa que o uso antes do fechamento entra no dia de operação anterior, no fuso da pizzaria."""
+        from estoque.previsao import series_de_consumo
+
+        self.pizzaria.hora_fechamento = time(4)
+        self.pizzaria.save()
+        # 02:00 (horário de Brasília) do dia seguinte ao de três dias atrás: 05:00 UTC
+        self._registrar_uso(self.queijo, 3, '2', horas=22)
+        self._registrar_uso(self.queijo, 3, '1', horas=10)
+
+        series = series_de_consumo(self.hoje - timedelta(days=7), self.hoje, self.pizzaria)
+
+        self.assertEqual(series[self.queijo.pk], {('kg', self.hoje - timedelta(days=3)): Decimal('3.000')})
+
+    def test_calculo_em_consultas_constantes(self):
+        """Testa que o número de consultas não cresce com os ingredientes."""
+        from estoque.previsao import atualizar_previsoes
+
+        self._registrar_uso(self.queijo, 1, '1')
+        with CaptureQueriesContext(connection) as poucos:
+            atualizar_previsoes(hoje=self.hoje)
+
+        for indice in range(5):
+            ingrediente = Ingrediente.objects.create(nome=f"Extra {indice}", pizzaria=self.pizzaria)
+            EstoqueIngrediente.objects.create(ingrediente=ingrediente, unidade_medida='kg')
+            self._registrar_uso(ingrediente, 2, '1')
+        with CaptureQueriesContext(connection) as muitos:
+            atualizar_previsoes(hoje=self.hoje)
+
+        self.assertEqual(len(poucos), len(muitos))
+        self.assertEqual(PrevisaoConsumo.objects.count(), 7)
+
+    def test_dashboard_e_api(self):
+        """Testa a exibição no dashboard e o endpoint da API."""
+        from estoque.previsao import atualizar_previsoes
+
+        for dias_atras in range(1, 4):
+            self._registrar_uso(self.queijo, dias_atras, '4')
+            self._registrar_uso(self.molho, dias_atras, '0.5')
+        atualizar_previsoes(pizzaria=self.pizzaria)
+
+        self.client.login(username="testuser", password="testpass123")
+        response = self.client.get(reverse('estoque:dashboard_estoque'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [previsao.ingrediente for previsao in response.context['previsoes_ruptura']],
+            [self.queijo, self.molho],
+        )
+        self.assertContains(response, 'Previsão de Ruptura')
+
+        response = self.client.get(reverse('estoque_api:previsao_consumo'))
+        self.assertEqual(response.status_code, 200)
+        previsoes = response.json()['previsoes']
+        self.assertEqual([p['ingrediente'] for p in previsoes], ['Queijo', 'Molho'])
+        self.assertEqual(previsoes[0]['consumo_diario'], 4.0)
+        self.assertEqual(previsoes[0]['dias_ate_ruptura'], 2.5)
+
+        response = self.client.get(reverse('estoque_api:previsao_consumo'), {'dias': 5})
+        self.assertEqual([p['ingrediente'] for p in response.json()['previsoes']], ['Queijo'])
+
+        response = self.client.get(reverse('estoque_api:previsao_consumo'), {'dias': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class SugestoesCompraTestCase(TestCase):
+    """Testes para as sugestões de pedidos de compra por fornecedor."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.client = Client()
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="testuser",
+            password="testpass123"
+        )
+        UsuarioPizzaria.objects.create(
+            usuario=self.user,
+            pizzaria=self.pizzaria,
+            papel="dono_pizzaria"
+        )
+        self.laticinios = Fornecedor.objects.create(
+            pizzaria=self.pizzaria, nome="Laticínios", prazo_entrega_dias=3
+        )
+        self.atacado = Fornecedor.objects.create(
+            pizzaria=self.pizzaria, nome="Atacado", prazo_entrega_dias=1
+        )
+        self.queijo = self._ingrediente("Queijo")
+        self.molho = self._ingrediente("Molho")
+        self.ovo = self._ingrediente("Ovo")
+
+        self._comprar(self.queijo, self.atacado, '1', 'kg', 3800, date(2024, 1, 5))
+        # Última compra: por grama, ao Laticínios (R$ 0,05/g = R$ 50,00/kg)
+        self._comprar(self.queijo, self.laticinios, '500', 'g', 5, date(2024, 2, 1))
+        self._comprar(self.molho, self.atacado, '2', 'kg', 1200, date(2024, 2, 1))
+        EstoqueIngrediente.objects.create(
+            ingrediente=self.ovo,
+            unidade_medida='un',
+            preco_compra_atual_centavos=80,
+        )
+
+        self._configurar(self.queijo, atual='10', minimo='5', maximo='20', consumo='2')
+        self._configurar(self.molho, atual='3', minimo='2', maximo='10', consumo='0.5')
+        self._configurar(self.ovo, atual='1', minimo='6', maximo='12', consumo='0')
+
+    def _ingrediente(self, nome, pizzaria=None):
+        return Ingrediente.objects.create(nome=nome, pizzaria=pizzaria or self.pizzaria)
+
+    def _comprar(self, ingrediente, fornecedor, quantidade, unidade, preco_centavos, data_compra):
+        return CompraIngrediente.objects.create(
+            ingrediente=ingrediente,
+            fornecedor=fornecedor,
+            quantidade=Decimal(quantidade),
+            unidade=unidade,
+            preco_unitario_centavos=preco_centavos,
+            data_compra=data_compra,
+        )
+
+    def _configurar(self, ingrediente, atual, minimo, maximo, consumo):
+        estoque = EstoqueIngrediente.objects.filter(ingrediente=ingrediente)
+        estoque.update(
+            quantidade_atual=Decimal(atual),
+            estoque_minimo=Decimal(minimo),
+            estoque_maximo=Decimal(maximo),
+        )
+        PrevisaoConsumo.objects.update_or_create(
+            ingrediente=ingrediente,
+            defaults=dict(
+                pizzaria=ingrediente.pizzaria,
+                unidade=estoque.get().unidade_medida,
+                consumo_diario=Decimal(consumo),
+                quantidade_atual=Decimal(atual),
+                calculado_em=timezone.now(),
+            ),
+        )
+
+    def _itens(self, sugestao):
+        return {
+            item.ingrediente.nome: (item.quantidade, item.preco_unitario_centavos, item.valor_total_centavos)
+            for item in sugestao.itens.select_related('ingrediente')
+        }
+
+    def test_sugestoes_por_fornecedor(self):
+        """Testa seleção pelo prazo, quantidade até o máximo e último preço do fornecedor."""
+        from estoque.sugestoes import gerar_sugestoes
+
+        sugestoes = gerar_sugestoes()
+
+        self.assertEqual(len(sugestoes), 2)
+        laticinios = SugestaoCompra.objects.get(fornecedor=self.laticinios)
+        self.assertEqual(laticinios.prazo_entrega_dias, 3)
+        # Saldo na entrega: 10 - 2 * 3 = 4 kg, abaixo do mínimo; repõe até 20 kg
+        self.assertEqual(self._itens(laticinios), {'Queijo': (Decimal('16.000'), 5000, 80000)})
+        self.assertEqual(laticinios.valor_total_centavos, 80000)
+
+        # Molho: 3 - 0,5 * 1 = 2,5 kg, acima do mínimo, não entra
+        self.assertFalse(SugestaoCompra.objects.filter(fornecedor=self.atacado).exists())
+
+        sem_fornecedor = SugestaoCompra.objects.get(fornecedor__isnull=True)
+        self.assertEqual(self._itens(sem_fornecedor), {'Ovo': (Decimal('11.000'), 80, 880)})
+
+    def test_regerar_substitui_sugestoes(self):
+        """Testa que uma nova execução substitui as sugestões anteriores."""
+        saida = StringIO()
+        call_command('gerar_sugestoes_compra', stdout=saida)
+        self.assertIn('2 sugestão(ões)', saida.getvalue())
+
+        self._configurar(self.molho, atual='2.2', minimo='2', maximo='10', consumo='0.5')
+        call_command('gerar_sugestoes_compra', stdout=StringIO())
+
+        self.assertEqual(SugestaoCompra.objects.count(), 3)
+        atacado = SugestaoCompra.objects.get(fornecedor=self.atacado)
+        self.assertEqual(self._itens(atacado), {'Molho': (Decimal('8.300'), 1200, 9960)})
+
+    def test_todas_as_pizzarias_em_consultas_constantes(self):
+        """Testa que o número de consultas não cresce com pizzarias e ingredientes."""
+        from estoque.sugestoes import gerar_sugestoes
+
+        # Nas execuções seguintes há sugestões anteriores a remover
+        gerar_sugestoes()
+        with CaptureQueriesContext(connection) as poucos:
+            gerar_sugestoes()
+
+        for indice in range(3):
+            pizzaria = Pizzaria.objects.create(nome=f"Filial {indice}", cnpj=f"9999999900019{indice}")
+            fornecedor = Fornecedor.objects.create(pizzaria=pizzaria, nome="Laticínios")
+            for nome in ("Queijo", "Farinha"):
+                ingrediente = self._ingrediente(nome, pizzaria)
+                self._comprar(ingrediente, fornecedor, '1', 'kg', 1000, date(2024, 2, 1))
+                self._configurar(ingrediente, atual='1', minimo='5', maximo='10', consumo='1')
+
+        with CaptureQueriesContext(connection) as muitos:
+            sugestoes = gerar_sugestoes()
+
+        self.assertEqual(len(poucos), len(muitos))
+        self.assertEqual(len(sugestoes), 5)
+        # Cada filial recebe a sugestão do seu próprio fornecedor
+        for sugestao in SugestaoCompra.objects.exclude(pizzaria=self.pizzaria).select_related('fornecedor'):
+            self.assertEqual(sugestao.fornecedor.pizzaria_id, sugestao.pizzaria_id)
+            self.assertEqual(self._itens(sugestao), {
+                'Queijo': (Decimal('11.000'), 1000, 11000),
+                'Farinha': (Decimal('11.000'), 1000, 11000),
+            })
+
+    def test_api_sugestoes(self):
+        """Testa o endpoint de sugestões, restrito à pizzaria do usuário."""
+        from estoque.sugestoes import gerar_sugestoes
+
+        outra = Pizzaria.objects.create(nome="Outra", cnpj="98765432000110")
+        ingrediente = self._ingrediente("Queijo", outra)
+        EstoqueIngrediente.objects.create(ingrediente=ingrediente, estoque_minimo=Decimal('1'), estoque_maximo=Decimal('2'))
+        gerar_sugestoes()
+
+        self.client.login(username="testuser", password="testpass123")
+        response = self.client.get(reverse('estoque_api:sugestoes_compra'))
+        self.assertEqual(response.status_code, 200)
+        sugestoes = response.json()['sugestoes']
+        self.assertEqual(len(sugestoes), 2)
+        laticinios = next(s for s in sugestoes if s['fornecedor'] == 'Laticínios')
+        self.assertEqual(laticinios['valor_total'], 800.0)
+        self.assertEqual(laticinios['itens'][0]['quantidade'], 16.0)
+        self.assertEqual(laticinios['itens'][0]['quantidade_projetada'], 4.0)
+
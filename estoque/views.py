@@ -8,7 +8,9 @@ from decimal import Decimal
 from autenticacao.decorators import super_admin_required
 from autenticacao.models import Pizzaria
 from ingredientes.models import Ingrediente
-from .models import Fornecedor, EstoqueIngrediente, CompraIngrediente, HistoricoPrecoCompra, HistoricoUsoIngrediente
+from .models import (
+    Fornecedor, EstoqueIngrediente, CompraIngrediente, HistoricoPrecoCompra, HistoricoUsoIngrediente, PrevisaoConsumo
+)
 from .forms import FornecedorForm, CompraIngredienteForm, EstoqueIngredienteForm
 from autenticacao.decorators import pizzaria_required
 
@@ -16,7 +18,7 @@ from autenticacao.decorators import pizzaria_required
 @pizzaria_required
 def dashboard_estoque(request):
     """Dashboard principal do estoque."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
     # Estatísticas gerais
     total_ingredientes = EstoqueIngrediente.objects.filter(
@@ -45,12 +47,19 @@ def dashboard_estoque(request):
         quantidade_atual__lte=F('estoque_minimo')
     ).select_related('ingrediente')[:10]
     
+    # Previsão de ruptura (pré-calculada pelo comando calcular_previsao_consumo)
+    previsoes_ruptura = PrevisaoConsumo.objects.filter(
+        pizzaria=pizzaria,
+        dias_ate_ruptura__isnull=False
+    ).select_related('ingrediente').order_by('dias_ate_ruptura')[:10]
+    
     context = {
         'total_ingredientes': total_ingredientes,
         'ingredientes_baixo_estoque': ingredientes_baixo_estoque,
         'valor_total_estoque': valor_total_estoque / 100,  # Converter para reais
         'ultimas_compras': ultimas_compras,
         'estoque_baixo': estoque_baixo,
+        'previsoes_ruptura': previsoes_ruptura,
     }
     
     return render(request, 'estoque/dashboard.html', context)
@@ -60,7 +69,7 @@ def dashboard_estoque(request):
 def lista_estoque(request, pizzaria_id=None):
     """Lista todos os ingredientes em estoque."""
     # Se super_admin e pizzaria_id fornecido, usar essa pizzaria
-    if pizzaria_id and request.user.usuarios_pizzaria.filter(ativo=True, papel='super_admin').exists():
+    if pizzaria_id and request.tenant.is_super_admin():
         try:
             pizzaria = Pizzaria.objects.get(id=pizzaria_id)
         except Pizzaria.DoesNotExist:
@@ -68,7 +77,7 @@ def lista_estoque(request, pizzaria_id=None):
             return redirect('estoque:lista_estoque')
     else:
         # Usar pizzaria do usuário logado
-        pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+        pizzaria = request.tenant.pizzaria
         
         # Se pizzaria_id foi fornecido mas usuário não é super_admin, redirecionar
         if pizzaria_id and pizzaria.id != pizzaria_id:
@@ -99,7 +108,7 @@ def lista_estoque(request, pizzaria_id=None):
         'busca': busca,
         'filtro_estoque': filtro_estoque,
         'pizzaria_atual': pizzaria,
-        'is_super_admin': request.user.usuarios_pizzaria.filter(ativo=True, papel='super_admin').exists(),
+        'is_super_admin': request.tenant.is_super_admin(),
     }
     
     return render(request, 'estoque/lista_estoque.html', context)
@@ -108,7 +117,7 @@ def lista_estoque(request, pizzaria_id=None):
 @pizzaria_required
 def editar_estoque(request, estoque_id):
     """Edita configurações de estoque de um ingrediente."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     estoque = get_object_or_404(
         EstoqueIngrediente, 
         id=estoque_id,
@@ -134,7 +143,7 @@ def editar_estoque(request, estoque_id):
 
 def lista_fornecedores(request):
     """Lista todos os fornecedores."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
     busca = request.GET.get('busca', '')
     
@@ -158,7 +167,7 @@ def lista_fornecedores(request):
 
 def adicionar_fornecedor(request):
     """Adiciona novo fornecedor."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
     if request.method == 'POST':
         form = FornecedorForm(request.POST)
@@ -181,7 +190,7 @@ def adicionar_fornecedor(request):
 
 def editar_fornecedor(request, fornecedor_id):
     """Edita fornecedor."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     fornecedor = get_object_or_404(Fornecedor, id=fornecedor_id, pizzaria=pizzaria)
     
     if request.method == 'POST':
@@ -205,7 +214,7 @@ def editar_fornecedor(request, fornecedor_id):
 @pizzaria_required
 def lista_compras(request):
     """Lista histórico de compras."""
-    usuario_pizzaria = request.user.usuarios_pizzaria.first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
     if not usuario_pizzaria or not usuario_pizzaria.pizzaria:
         messages.error(request, 'Usuário não tem pizzaria associada.')
         return redirect('autenticacao:dashboard')
@@ -254,7 +263,7 @@ def lista_compras(request):
 
 def registrar_compra(request):
     """Registra nova compra de ingrediente."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
     if request.method == 'POST':
         form = CompraIngredienteForm(request.POST, pizzaria=pizzaria)
@@ -275,7 +284,7 @@ def registrar_compra(request):
 
 def historico_precos(request, ingrediente_id):
     """Mostra histórico de preços de um ingrediente."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     ingrediente = get_object_or_404(Ingrediente, id=ingrediente_id, pizzaria=pizzaria)
     
     historico = HistoricoPrecoCompra.objects.filter(
@@ -306,32 +315,28 @@ def historico_precos(request, ingrediente_id):
 
 def relatorio_custos(request):
     """Relatório de custos dos produtos."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
-    
-    # Buscar todos os produtos da pizzaria
-    from produtos.models import Produto
-    
-    produtos = Produto.objects.filter(pizzaria=pizzaria).prefetch_related(
-        'produto_ingredientes__ingrediente__estoque'
-    )
-    
-    # Recalcular custos de todos os produtos
-    for produto in produtos:
-        produto.recalcular_custo()
-    
-    # Buscar preços atualizados
-    produtos_com_precos = []
-    for produto in produtos:
-        preco_atual = produto.preco_atual
-        if preco_atual:
-            produtos_com_precos.append({
-                'produto': produto,
-                'preco_base': preco_atual.preco_base,
-                'preco_custo': preco_atual.preco_custo,
-                'preco_venda': preco_atual.preco_venda,
-                'margem': preco_atual.margem_percentual,
-                'lucro': preco_atual.lucro,
-            })
+    pizzaria = request.tenant.pizzaria
+    
+    # Custos armazenados nos preços vigentes (mantidos por produtos.custos
+    # quando receitas ou preços de compra mudam): leitura apenas
+    from produtos.models import PrecoProduto
+    
+    precos = PrecoProduto.objects.filter(
+        produto__pizzaria=pizzaria,
+        data_fim__isnull=True
+    ).select_related('produto__categoria')
+    
+    produtos_com_precos = [
+        {
+            'produto': preco_atual.produto,
+            'preco_base': preco_atual.preco_base,
+            'preco_custo': preco_atual.preco_custo,
+            'preco_venda': preco_atual.preco_venda,
+            'margem': preco_atual.margem_percentual,
+            'lucro': preco_atual.lucro,
+        }
+        for preco_atual in precos
+    ]
     
     # Ordenar por margem (menor para maior)
     produtos_com_precos.sort(key=lambda x: x['margem'])
@@ -351,7 +356,7 @@ def relatorio_custos(request):
 @pizzaria_required
 def historico_uso_estoque(request):
     """Lista geral de utilização de ingredientes (saídas de estoque)."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
 
     # Filtros
     busca = request.GET.get('busca', '')
@@ -391,7 +396,7 @@ def historico_uso_estoque(request):
 @pizzaria_required
 def historico_uso_ingrediente(request, ingrediente_id):
     """Histórico de utilização para um ingrediente específico."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
 
     ingrediente = get_object_or_404(Ingrediente, id=ingrediente_id, pizzaria=pizzaria)
 
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.db.models import Sum
-from .models import TipoDespesa, DespesaOperacional, MovimentacaoCaixa, MetaVenda
+from .models import TipoDespesa, DespesaOperacional, MovimentacaoCaixa, MetaVenda, VendaDiaria
 
 
 @admin.register(TipoDespesa)
@@ -66,4 +66,13 @@ class MetaVendaAdmin(admin.ModelAdmin):
     ]
     list_filter = ['ano', 'mes', 'pizzaria']
     search_fields = ['pizzaria__nome']
-    ordering = ['-ano', '-mes']
\ No newline at end of file
+    ordering = ['-ano', '-mes']
+
+@admin.register(VendaDiaria)
+class VendaDiariaAdmin(admin.ModelAdmin):
+    list_display = [
+        'pizzaria', 'data', 'forma_pagamento', 'receita', 'quantidade_pedidos', 'quantidade_itens'
+    ]
+    list_filter = ['forma_pagamento', 'pizzaria']
+    date_hierarchy = 'data'
+    ordering = ['-data']
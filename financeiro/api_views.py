@@ -4,14 +4,20 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
-from .models import DespesaOperacional, TipoDespesa, MetaVenda
+from django.db.models import BigIntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from autenticacao.condicional import versao_linhas
+from autenticacao.listagem import PARAMETROS_LISTAGEM, ListagemAPIView, data_iso, reais
+from .models import DespesaOperacional, TipoDespesa, MetaVenda, VendaDiaria
 from .forms import DespesaOperacionalForm, TipoDespesaForm
 
 
 @extend_schema(
     tags=['financeiro'],
-    summary='Listar todas as despesas',
-    description='Retorna uma lista de todas as despesas cadastradas',
+    summary='Listar as despesas',
+    description='Retorna as despesas da pizzaria do usuário, das cadastradas mais recentemente às mais antigas, paginadas por cursor',
+    parameters=PARAMETROS_LISTAGEM,
     responses={
         200: {
             'description': 'Lista de despesas retornada com sucesso',
@@ -26,33 +32,40 @@ from .forms import DespesaOperacionalForm, TipoDespesaForm
                             'descricao': {'type': 'string'},
                             'valor': {'type': 'number'},
                             'data_vencimento': {'type': 'string', 'format': 'date'},
-                            'status': {'type': 'string'},
+                            'pago': {'type': 'boolean'},
                             'tipo': {'type': 'string'},
+                            'tipo_despesa': {'type': 'string'},
                         }
                     }
-                }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
             }
-        }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'},
     }
 )
-class DespesasListView(APIView):
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        """Lista todas as despesas"""
-        despesas = DespesaOperacional.objects.all()
-        data = []
-        for despesa in despesas:
-            data.append({
-                'id': despesa.id,
-                'descricao': despesa.descricao,
-                'valor': float(despesa.valor) if despesa.valor else 0,
-                'data_vencimento': despesa.data_vencimento.strftime('%Y-%m-%d') if despesa.data_vencimento else None,
-                'status': despesa.get_status_display(),
-                'tipo': despesa.tipo.nome if despesa.tipo else None,
-            })
-        
-        return Response({'despesas': data})
+class DespesasListView(ListagemAPIView):
+    """Lista as despesas da pizzaria"""
+
+    model = DespesaOperacional
+    chave = 'despesas'
+    campo_criacao = 'criado_em'
+    campos_atualizacao = ('atualizado_em', 'tipo_despesa__atualizado_em')
+    campos = {
+        'id': 'id',
+        'descricao': 'descricao',
+        'valor': 'valor_centavos',
+        'data_vencimento': 'data_vencimento',
+        'pago': 'pago',
+        'tipo': 'tipo',
+        'tipo_despesa': 'tipo_despesa__nome',
+    }
+    conversoes = {
+        'valor': reais,
+        'data_vencimento': data_iso,
+        'tipo': dict(DespesaOperacional.TIPO_DESPESA_CHOICES).get,
+    }
 
 
 @extend_schema(
@@ -122,8 +135,9 @@ class DespesaCreateView(APIView):
 
 @extend_schema(
     tags=['financeiro'],
-    summary='Listar tipos de despesa',
-    description='Retorna uma lista de todos os tipos de despesa cadastrados',
+    summary='Listar os tipos de despesa',
+    description='Retorna os tipos de despesa (cadastro comum a todas as pizzarias), paginados por cursor',
+    parameters=PARAMETROS_LISTAGEM,
     responses={
         200: {
             'description': 'Lista de tipos de despesa retornada com sucesso',
@@ -140,33 +154,31 @@ class DespesaCreateView(APIView):
                             'ativo': {'type': 'boolean'},
                         }
                     }
-                }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
             }
-        }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
     }
 )
-class TiposDespesaListView(APIView):
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        """Lista todos os tipos de despesa"""
-        tipos = TipoDespesa.objects.all()
-        data = []
-        for tipo in tipos:
-            data.append({
-                'id': tipo.id,
-                'nome': tipo.nome,
-                'descricao': tipo.descricao,
-                'ativo': tipo.ativo,
-            })
-        
-        return Response({'tipos': data})
+class TiposDespesaListView(ListagemAPIView):
+    """Lista os tipos de despesa"""
+
+    model = TipoDespesa
+    chave = 'tipos'
+    campo_pizzaria = None
+    campos_atualizacao = ('atualizado_em',)
+    campos = {'id': 'id', 'nome': 'nome', 'descricao': 'descricao', 'ativo': 'ativo'}
 
 
 @extend_schema(
     tags=['financeiro'],
-    summary='Listar metas de venda',
-    description='Retorna uma lista de todas as metas de venda cadastradas',
+    summary='Listar as metas de venda',
+    description=(
+        'Retorna as metas de venda da pizzaria do usuário, das cadastradas mais recentemente às mais '
+        'antigas, com a receita realizada no mês (resumo diário de vendas), paginadas por cursor'
+    ),
+    parameters=PARAMETROS_LISTAGEM,
     responses={
         200: {
             'description': 'Lista de metas de venda retornada com sucesso',
@@ -178,33 +190,56 @@ class TiposDespesaListView(APIView):
                         'type': 'object',
                         'properties': {
                             'id': {'type': 'integer'},
-                            'mes': {'type': 'string'},
+                            'mes': {'type': 'integer'},
                             'ano': {'type': 'integer'},
                             'valor_meta': {'type': 'number'},
+                            'ticket_medio_meta': {'type': 'number'},
                             'valor_realizado': {'type': 'number'},
                             'percentual': {'type': 'number'},
                         }
                     }
-                }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
             }
-        }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'},
     }
 )
-class MetasVendaListView(APIView):
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        """Lista todas as metas de venda"""
-        metas = MetaVenda.objects.all()
-        data = []
-        for meta in metas:
-            data.append({
-                'id': meta.id,
-                'mes': meta.get_mes_display(),
-                'ano': meta.ano,
-                'valor_meta': float(meta.valor_meta) if meta.valor_meta else 0,
-                'valor_realizado': float(meta.valor_realizado) if meta.valor_realizado else 0,
-                'percentual': float(meta.percentual) if meta.percentual else 0,
-            })
-        
-        return Response({'metas': data})
+class MetasVendaListView(ListagemAPIView):
+    """Lista as metas de venda da pizzaria"""
+
+    model = MetaVenda
+    chave = 'metas'
+    campo_criacao = 'criado_em'
+    campos_atualizacao = ('atualizado_em',)
+    campos = {
+        'id': 'id',
+        'mes': 'mes',
+        'ano': 'ano',
+        'valor_meta': 'meta_receita_centavos',
+        'ticket_medio_meta': 'meta_ticket_medio_centavos',
+        'valor_realizado': 'realizado_centavos',
+    }
+    conversoes = {'valor_meta': reais, 'ticket_medio_meta': reais, 'valor_realizado': reais}
+
+    def get_queryset(self, pizzaria):
+        receita_do_mes = VendaDiaria.objects.filter(
+            pizzaria=OuterRef('pizzaria'), data__year=OuterRef('ano'), data__month=OuterRef('mes')
+        ).order_by().values('pizzaria').annotate(total=Sum('receita_centavos')).values('total')
+        return super().get_queryset(pizzaria).annotate(
+            realizado_centavos=Coalesce(Subquery(receita_do_mes), Value(0), output_field=BigIntegerField())
+        )
+
+    def versao(self, pizzaria):
+        # O realizado vem do resumo de vendas: a última venda registrada entra na versão
+        ultima_venda = VendaDiaria.objects.filter(pizzaria=pizzaria).order_by('-atualizado_em')
+        return versao_linhas(
+            self.consulta_tenant(pizzaria), 'atualizado_em', Subquery(ultima_venda.values('atualizado_em')[:1])
+        )
+
+    def serializar(self, linha):
+        item = super().serializar(linha)
+        meta = linha['meta_receita_centavos']
+        item['percentual'] = round(linha['realizado_centavos'] / meta * 100, 2) if meta else 0
+        return item
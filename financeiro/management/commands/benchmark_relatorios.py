@@ -0,0 +1,275 @@
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from autenticacao.models import Pizzaria
+from estoque.models import CompraIngrediente, HistoricoPrecoCompra, HistoricoUsoIngrediente
+from financeiro.models import DespesaOperacional, MovimentacaoCaixa, TipoDespesa
+from ingredientes.models import Ingrediente
+from pedidos.models import Pedido
+
+
+# Índices de tenant/data avaliados (declarados no Meta de cada modelo)
+INDICES = [
+    (Pedido, 'pedido_pizzaria_status_data'),
+    (Pedido, 'pedido_pizzaria_data'),
+    (Pedido, 'pedido_cliente_data'),
+    (Pedido, 'pedido_entregue_negocio'),
+    (MovimentacaoCaixa, 'mov_caixa_pizzaria_data'),
+    (MovimentacaoCaixa, 'mov_caixa_pizzaria_negocio'),
+    (DespesaOperacional, 'despesa_pizzaria_venc_pago'),
+    (DespesaOperacional, 'despesa_pendente_venc'),
+    (CompraIngrediente, 'compra_data'),
+    (CompraIngrediente, 'compra_ingrediente_data'),
+    (HistoricoPrecoCompra, 'hist_preco_ingrediente_data'),
+    (HistoricoUsoIngrediente, 'uso_ingrediente_data'),
+    (HistoricoUsoIngrediente, 'uso_data'),
+]
+
+
+class Descartar(Exception):
+    """Desfaz a transação do benchmark."""
+
+
+@contextmanager
+def sem_auto_now_add(model, campo):
+    """Permite gravar datas passadas em um campo ``auto_now_add``."""
+    field = model._meta.get_field(campo)
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    help = (
+        'Popula uma massa de dados de teste e compara planos (EXPLAIN ANALYZE) e tempos das '
+        'consultas dos relatórios sem e com os índices de pizzaria/data. Tudo roda em uma '
+        'transação desfeita ao final; use em desenvolvimento/homologação (remove índices '
+        'temporariamente, com bloqueio das tabelas).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pedidos', type=int, default=50000, help='Pedidos gerados (padrão: 50000)')
+        parser.add_argument('--pizzarias', type=int, default=20, help='Pizzarias geradas (padrão: 20)')
+        parser.add_argument('--dias', type=int, default=365, help='Dias de histórico gerado (padrão: 365)')
+        parser.add_argument('--repeticoes', type=int, default=5, help='Execuções por consulta (padrão: 5)')
+        parser.add_argument('--sem-explain', action='store_true', help='Mostra apenas os tempos')
+        parser.add_argument('--semente', type=int, default=42, help='Semente do gerador aleatório')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('O benchmark usa EXPLAIN ANALYZE e requer PostgreSQL.')
+
+        self.opcoes = options
+        self.aleatorio = random.Random(options['semente'])
+        try:
+            with transaction.atomic():
+                inicio = time.perf_counter()
+                pizzaria, ingrediente = self._popular()
+                self.stdout.write(f'Massa de dados gerada em {time.perf_counter() - inicio:.1f}s')
+                self.stdout.write('Índices avaliados: ' + ', '.join(nome for _, nome in INDICES) + '\n')
+                consultas = self._consultas(pizzaria, ingrediente)
+
+                self._alterar_indices(remover=True)
+                antes = self._medir(consultas, 'SEM os índices')
+                self._alterar_indices(remover=False)
+                depois = self._medir(consultas, 'COM os índices')
+
+                self._resumo(antes, depois)
+                raise Descartar
+        except Descartar:
+            self.stdout.write(self.style.SUCCESS('\nDados do benchmark descartados (rollback).'))
+
+    # --------------------------------------------------
+    # Massa de dados
+    # --------------------------------------------------
+
+    def _popular(self):
+        """Gera pedidos, caixa, despesas, compras e usos com ``bulk_create``."""
+        aleatorio = self.aleatorio
+        total_pedidos = self.opcoes['pedidos']
+        dias = self.opcoes['dias']
+        agora = timezone.now()
+
+        def momento():
+            return agora - timedelta(seconds=aleatorio.randrange(dias * 86400))
+
+        pizzarias = Pizzaria.objects.bulk_create([
+            Pizzaria(nome=f'Benchmark {indice}', cnpj=f'9{indice:013d}', endereco='-', telefone='-')
+            for indice in range(self.opcoes['pizzarias'])
+        ])
+        ingredientes = Ingrediente.objects.bulk_create([
+            Ingrediente(pizzaria=pizzaria, nome=f'Ingrediente {indice}')
+            for pizzaria in pizzarias
+            for indice in range(20)
+        ])
+        tipo_despesa, _ = TipoDespesa.objects.get_or_create(nome='Benchmark')
+
+        status = ['ENTREGUE'] * 7 + ['CANCELADO', 'RECEBIDO', 'EM_PREPARO', 'PRONTO']
+        formas = [forma for forma, _ in Pedido.FORMA_PAGAMENTO_CHOICES]
+
+        def pedido():
+            pizzaria, data = aleatorio.choice(pizzarias), momento()
+            return Pedido(
+                pizzaria=pizzaria,
+                forma_pagamento=aleatorio.choice(formas),
+                status=aleatorio.choice(status),
+                total=Decimal(aleatorio.randrange(2000, 15000)) / 100,
+                data_criacao=data,
+                data_negocio=pizzaria.data_negocio(data),
+            )
+
+        def movimentacao():
+            pizzaria, data = aleatorio.choice(pizzarias), momento()
+            return MovimentacaoCaixa(
+                pizzaria=pizzaria,
+                tipo=aleatorio.choice(['ENTRADA', 'SAIDA']),
+                origem='OUTROS',
+                descricao='Benchmark',
+                valor_centavos=aleatorio.randrange(100, 50000),
+                forma_pagamento=aleatorio.choice(formas),
+                data_movimentacao=data,
+                data_negocio=pizzaria.data_negocio(data),
+            )
+
+        Pedido.objects.bulk_create((pedido() for _ in range(total_pedidos)), batch_size=5000)
+        MovimentacaoCaixa.objects.bulk_create((movimentacao() for _ in range(total_pedidos)), batch_size=5000)
+        DespesaOperacional.objects.bulk_create((
+            DespesaOperacional(
+                pizzaria=aleatorio.choice(pizzarias),
+                tipo_despesa=tipo_despesa,
+                descricao='Benchmark',
+                valor_centavos=aleatorio.randrange(1000, 500000),
+                tipo='VARIAVEL',
+                forma_pagamento='PIX',
+                data_vencimento=momento().date(),
+                pago=aleatorio.random() < 0.8,
+            )
+            for _ in range(total_pedidos // 10)
+        ), batch_size=5000)
+        CompraIngrediente.objects.bulk_create((
+            CompraIngrediente(
+                ingrediente=aleatorio.choice(ingredientes),
+                quantidade=Decimal(aleatorio.randrange(1, 20)),
+                unidade='kg',
+                preco_unitario_centavos=aleatorio.randrange(500, 8000),
+                valor_total_centavos=aleatorio.randrange(500, 160000),
+                data_compra=momento().date(),
+            )
+            for _ in range(total_pedidos // 5)
+        ), batch_size=5000)
+        with sem_auto_now_add(HistoricoUsoIngrediente, 'data_utilizacao'):
+            HistoricoUsoIngrediente.objects.bulk_create((
+                HistoricoUsoIngrediente(
+                    ingrediente=aleatorio.choice(ingredientes),
+                    quantidade=Decimal(aleatorio.randrange(50, 500)) / 1000,
+                    unidade='kg',
+                    estoque_antes=0,
+                    estoque_depois=0,
+                    data_utilizacao=momento(),
+                )
+                for _ in range(total_pedidos * 2)
+            ), batch_size=5000)
+
+        # Checa agora as FKs adiadas: o Postgres não altera índices com checagens pendentes
+        with connection.cursor() as cursor:
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        return pizzarias[0], ingredientes[0]
+
+    # --------------------------------------------------
+    # Consultas dos relatórios
+    # --------------------------------------------------
+
+    def _consultas(self, pizzaria, ingrediente):
+        """Consultas equivalentes às das telas de relatório, por nome."""
+        hoje = pizzaria.data_negocio()
+        data_inicio = hoje - timedelta(days=30)
+
+        vendas = Pedido.objects.filter(
+            pizzaria=pizzaria, status='ENTREGUE', data_negocio__gte=data_inicio, data_negocio__lte=hoje
+        )
+        return {
+            'relatorio_vendas': vendas.order_by('-data_criacao'),
+            'vendas_por_dia': vendas.values('data_negocio').annotate(
+                receita=Sum('total'), pedidos=Count('id')
+            ).order_by('data_negocio'),
+            'lista_pedidos': Pedido.objects.filter(pizzaria=pizzaria).order_by('-data_criacao')[:50],
+            'pedidos_em_aberto': Pedido.objects.filter(
+                pizzaria=pizzaria, status__in=['RECEBIDO', 'EM_PREPARO', 'PRONTO']
+            ).order_by('-data_criacao'),
+            'fluxo_caixa': MovimentacaoCaixa.objects.filter(
+                pizzaria=pizzaria,
+                data_negocio__gte=data_inicio,
+                data_negocio__lte=hoje,
+            ).order_by('-data_movimentacao'),
+            'despesas_periodo': DespesaOperacional.objects.filter(
+                pizzaria=pizzaria, data_vencimento__gte=data_inicio, data_vencimento__lte=hoje
+            ).order_by('-data_vencimento'),
+            'despesas_atraso': DespesaOperacional.objects.filter(
+                pizzaria=pizzaria, pago=False, data_vencimento__lt=hoje
+            ).values('pizzaria').annotate(total=Sum('valor_centavos')).order_by(),
+            'custo_estoque': CompraIngrediente.objects.filter(
+                ingrediente__pizzaria=pizzaria, data_compra__gte=data_inicio, data_compra__lte=hoje
+            ).values('ingrediente__pizzaria').annotate(total=Sum('valor_total_centavos')).order_by(),
+            'usos_ingrediente': HistoricoUsoIngrediente.objects.filter(
+                ingrediente=ingrediente
+            ).order_by('-data_utilizacao')[:50],
+            'series_consumo': HistoricoUsoIngrediente.objects.filter(
+                data_utilizacao__gte=timezone.now() - timedelta(days=56)
+            ).annotate(dia=TruncDate('data_utilizacao')).values('ingrediente_id', 'dia').annotate(
+                total=Sum('quantidade')
+            ).order_by(),
+        }
+
+    # --------------------------------------------------
+    # Medição
+    # --------------------------------------------------
+
+    def _alterar_indices(self, remover):
+        with connection.schema_editor() as editor:
+            for model, nome in INDICES:
+                indice = next(indice for indice in model._meta.indexes if indice.name == nome)
+                if remover:
+                    editor.remove_index(model, indice)
+                else:
+                    editor.add_index(model, indice)
+        with connection.cursor() as cursor:
+            for tabela in sorted({model._meta.db_table for model, _ in INDICES}):
+                cursor.execute(f'ANALYZE {connection.ops.quote_name(tabela)}')
+
+    def _medir(self, consultas, titulo):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'\n=== {titulo} ==='))
+        tempos = {}
+        for nome, consulta in consultas.items():
+            list(consulta.all())  # aquecimento do cache
+            medicoes = []
+            for _ in range(self.opcoes['repeticoes']):
+                inicio = time.perf_counter()
+                list(consulta.all())
+                medicoes.append((time.perf_counter() - inicio) * 1000)
+            tempos[nome] = statistics.median(medicoes)
+
+            self.stdout.write(self.style.SUCCESS(f'\n{nome}: {tempos[nome]:.2f} ms (mediana)'))
+            if not self.opcoes['sem_explain']:
+                self.stdout.write(consulta.explain(analyze=True))
+        return tempos
+
+    def _resumo(self, antes, depois):
+        self.stdout.write(self.style.MIGRATE_HEADING('\n=== Resumo ==='))
+        self.stdout.write(f"{'consulta':<20} {'sem índices':>14} {'com índices':>14} {'ganho':>8}")
+        for nome in antes:
+            ganho = antes[nome] / depois[nome] if depois[nome] else 0
+            self.stdout.write(
+                f'{nome:<20} {antes[nome]:>11.2f} ms {depois[nome]:>11.2f} ms {ganho:>7.1f}x'
+            )
@@ -78,7 +78,7 @@ class Command(BaseCommand):
         )
         
         if data_inicio:
-            pedidos_query = pedidos_query.filter(data_criacao__date__gte=data_inicio)
+            pedidos_query = pedidos_query.filter(data_negocio__gte=data_inicio)
         
         pedidos = pedidos_query.select_related('pizzaria')
         
@@ -95,6 +95,7 @@ class Command(BaseCommand):
                 valor_centavos=valor_centavos,
                 forma_pagamento=pedido.forma_pagamento,
                 data_movimentacao=pedido.data_criacao,
+                data_negocio=pedido.data_negocio,
                 pedido=pedido
             )
             movimentacoes_criadas.append(movimentacao)
@@ -136,6 +137,7 @@ class Command(BaseCommand):
                 valor_centavos=compra.valor_total_centavos,
                 forma_pagamento='DIN',  # Padrão, pode ser ajustado depois
                 data_movimentacao=data_movimentacao,
+                data_negocio=compra.data_compra,
                 compra_estoque=compra
             )
             movimentacoes_criadas.append(movimentacao)
@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from autenticacao.models import Pizzaria
+from financeiro.services import reconstruir_vendas_diarias
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o resumo diário de vendas (VendaDiaria) a partir dos pedidos entregues'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pizzaria-id',
+            type=int,
+            help='ID da pizzaria específica (opcional)',
+        )
+        parser.add_argument(
+            '--data-inicio',
+            help='Data inicial no formato AAAA-MM-DD (opcional)',
+        )
+        parser.add_argument(
+            '--data-fim',
+            help='Data final no formato AAAA-MM-DD (opcional)',
+        )
+
+    def _data(self, valor, nome):
+        if not valor:
+            return None
+        try:
+            return datetime.strptime(valor, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'{nome} inválida: {valor} (use AAAA-MM-DD)')
+
+    def handle(self, *args, **options):
+        data_inicio = self._data(options['data_inicio'], 'Data inicial')
+        data_fim = self._data(options['data_fim'], 'Data final')
+
+        if options['pizzaria_id']:
+            pizzarias = Pizzaria.objects.filter(id=options['pizzaria_id'])
+        else:
+            pizzarias = Pizzaria.objects.all()
+
+        total_linhas = 0
+        for pizzaria in pizzarias:
+            linhas = reconstruir_vendas_diarias(pizzaria, data_inicio, data_fim)
+            total_linhas += linhas
+            self.stdout.write(f'  {pizzaria.nome}: {linhas} linha(s) de resumo')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Resumo diário reconstruído: {total_linhas} linha(s).')
+        )
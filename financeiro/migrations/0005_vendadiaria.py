@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0001_initial'),
+        ('financeiro', '0004_alter_metavenda_options_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateField(help_text='Data local do pedido')),
+                ('forma_pagamento', models.CharField(choices=[('DIN', 'Dinheiro'), ('PIX', 'Pix'), ('TED', 'TED/DOC'), ('CC', 'Cartão Crédito'), ('CD', 'Cartão Débito'), ('BOL', 'Boleto'), ('DEB', 'Débito Automático')], max_length=3)),
+                ('receita_centavos', models.BigIntegerField(default=0)),
+                ('quantidade_pedidos', models.IntegerField(default=0)),
+                ('quantidade_itens', models.IntegerField(default=0)),
+                ('atualizado_em', models.DateTimeField(auto_now=True)),
+                ('pizzaria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='vendas_diarias', to='autenticacao.pizzaria')),
+            ],
+            options={
+                'verbose_name': 'Venda Diária',
+                'verbose_name_plural': 'Vendas Diárias',
+                'ordering': ['data', 'forma_pagamento'],
+                'constraints': [models.UniqueConstraint(fields=('pizzaria', 'data', 'forma_pagamento'), name='venda_diaria_unica')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0001_initial'),
+        ('estoque', '0010_indices_relatorios'),
+        ('financeiro', '0005_vendadiaria'),
+        ('pedidos', '0005_indices_relatorios'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='despesaoperacional',
+            index=models.Index(fields=['pizzaria', 'data_vencimento', 'pago'], name='despesa_pizzaria_venc_pago'),
+        ),
+        migrations.AddIndex(
+            model_name='despesaoperacional',
+            index=models.Index(condition=models.Q(('pago', False)), fields=['pizzaria', 'data_vencimento'], name='despesa_pendente_venc'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacaocaixa',
+            index=models.Index(fields=['pizzaria', 'data_movimentacao'], name='mov_caixa_pizzaria_data'),
+        ),
+    ]
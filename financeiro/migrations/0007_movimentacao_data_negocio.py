@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:47
+
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.db import migrations, models
+from django.db.models import DateTimeField, ExpressionWrapper, F, Value
+from django.db.models.functions import TruncDate
+
+
+def expressao_data_negocio(campo, fuso_horario, hora_fechamento):
+    # Cópia congelada de autenticacao.models.expressao_data_negocio na época desta migração
+    fechamento = timedelta(hours=hora_fechamento.hour, minutes=hora_fechamento.minute)
+    return TruncDate(
+        ExpressionWrapper(F(campo) - Value(fechamento), output_field=DateTimeField()),
+        tzinfo=ZoneInfo(fuso_horario),
+    )
+
+
+def preencher_data_negocio(apps, schema_editor):
+    MovimentacaoCaixa = apps.get_model('financeiro', 'MovimentacaoCaixa')
+    Pizzaria = apps.get_model('autenticacao', 'Pizzaria')
+    for pizzaria in Pizzaria.objects.all():
+        MovimentacaoCaixa.objects.filter(pizzaria=pizzaria).update(
+            data_negocio=expressao_data_negocio('data_movimentacao', pizzaria.fuso_horario, pizzaria.hora_fechamento)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0002_pizzaria_data_negocio'),
+        ('estoque', '0010_indices_relatorios'),
+        ('financeiro', '0006_indices_relatorios'),
+        ('pedidos', '0006_pedido_data_negocio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimentacaocaixa',
+            name='data_negocio',
+            field=models.DateField(editable=False, help_text='Dia de operação no fuso da pizzaria (calculado de data_movimentacao se não informado)', null=True),
+        ),
+        migrations.RunPython(preencher_data_negocio, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='movimentacaocaixa',
+            name='data_negocio',
+            field=models.DateField(editable=False, help_text='Dia de operação no fuso da pizzaria (calculado de data_movimentacao se não informado)'),
+        ),
+        migrations.AlterField(
+            model_name='vendadiaria',
+            name='data',
+            field=models.DateField(help_text='Dia de operação do pedido (Pedido.data_negocio)'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacaocaixa',
+            index=models.Index(fields=['pizzaria', 'data_negocio'], name='mov_caixa_pizzaria_negocio'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:20
+
+from datetime import timezone
+
+from django.db import migrations
+from django.db.models.functions import TruncDate
+
+
+def datar_pelo_documento(apps, schema_editor):
+    # A 0007 e trocas de fuso calcularam o dia de compras e despesas pelo fuso
+    # da pizzaria; o dia delas é o do documento, a data UTC de data_movimentacao
+    MovimentacaoCaixa = apps.get_model('financeiro', 'MovimentacaoCaixa')
+    MovimentacaoCaixa.objects.filter(origem__in=('COMPRA', 'DESPESA')).update(
+        data_negocio=TruncDate('data_movimentacao', tzinfo=timezone.utc)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('financeiro', '0008_atualizado_em'),
+    ]
+
+    operations = [
+        migrations.RunPython(datar_pelo_documento, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,11 @@
+from datetime import timezone as dt_timezone
+
 from django.db import models
 from django.utils import timezone
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
 
+from autenticacao.mixins import RastreamentoCamposMixin
 from autenticacao.models import Pizzaria
 
 
@@ -12,6 +15,7 @@ class TipoDespesa(models.Model):
     nome = models.CharField(max_length=100, unique=True)
     descricao = models.TextField(blank=True)
     ativo = models.BooleanField(default=True)
+    atualizado_em = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Tipo de Despesa"
@@ -22,7 +26,7 @@ class TipoDespesa(models.Model):
         return self.nome
 
 
-class DespesaOperacional(models.Model):
+class DespesaOperacional(RastreamentoCamposMixin, models.Model):
     """Despesas operacionais da pizzaria (incluindo fixas mensais)."""
     
     TIPO_DESPESA_CHOICES = [
@@ -93,10 +97,21 @@ class DespesaOperacional(models.Model):
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
     
+    campos_rastreados = ('pago', 'data_pagamento', 'valor_centavos')
+    
     class Meta:
         verbose_name = "Despesa Operacional"
         verbose_name_plural = "Despesas Operacionais"
         ordering = ['-data_vencimento']
+        indexes = [
+            models.Index(fields=['pizzaria', 'data_vencimento', 'pago'], name='despesa_pizzaria_venc_pago'),
+            # Contas a pagar e atrasos: só despesas pendentes
+            models.Index(
+                fields=['pizzaria', 'data_vencimento'],
+                name='despesa_pendente_venc',
+                condition=models.Q(pago=False),
+            ),
+        ]
     
     def __str__(self):
         if self.recorrente:
@@ -205,7 +220,7 @@ class DespesaOperacional(models.Model):
         return despesas_criadas
 
 
-class MovimentacaoCaixa(models.Model):
+class MovimentacaoCaixa(RastreamentoCamposMixin, models.Model):
     """Movimentações de caixa da pizzaria."""
     
     TIPO_CHOICES = [
@@ -219,6 +234,11 @@ class MovimentacaoCaixa(models.Model):
         ('DESPESA', 'Despesa Operacional'),
         ('OUTROS', 'Outros'),
     ]
+
+    # Compras e despesas ficam no dia do documento (data da compra / do
+    # pagamento), gravado como a data UTC de ``data_movimentacao``: não
+    # mudam de dia com o fuso ou o fechamento da pizzaria.
+    ORIGENS_DATA_DOCUMENTO = ('COMPRA', 'DESPESA')
     
     pizzaria = models.ForeignKey(
         Pizzaria,
@@ -234,6 +254,10 @@ class MovimentacaoCaixa(models.Model):
     
     forma_pagamento = models.CharField(max_length=3, choices=DespesaOperacional.FORMA_PAGAMENTO_CHOICES)
     data_movimentacao = models.DateTimeField()
+    data_negocio = models.DateField(
+        editable=False,
+        help_text="Dia de operação no fuso da pizzaria (calculado de data_movimentacao se não informado)"
+    )
     
     # Relacionamentos opcionais
     pedido = models.ForeignKey(
@@ -260,15 +284,41 @@ class MovimentacaoCaixa(models.Model):
     
     # Controle
     criado_em = models.DateTimeField(auto_now_add=True)
+
+    campos_rastreados = ('data_movimentacao',)
     
     class Meta:
         verbose_name = "Movimentação de Caixa"
         verbose_name_plural = "Movimentações de Caixa"
         ordering = ['-data_movimentacao']
+        indexes = [
+            models.Index(fields=['pizzaria', 'data_movimentacao'], name='mov_caixa_pizzaria_data'),
+            models.Index(fields=['pizzaria', 'data_negocio'], name='mov_caixa_pizzaria_negocio'),
+        ]
     
     def __str__(self):
         sinal = '+' if self.tipo == 'ENTRADA' else '-'
         return f"{sinal}R$ {self.valor:.2f} - {self.descricao}"
+
+    def calcular_data_negocio(self):
+        """Dia de operação a partir de ``data_movimentacao`` (ver ``ORIGENS_DATA_DOCUMENTO``)."""
+        if self.origem in self.ORIGENS_DATA_DOCUMENTO:
+            return self.data_movimentacao.astimezone(dt_timezone.utc).date()
+        return self.pizzaria.data_negocio(self.data_movimentacao)
+
+    def save(self, *args, **kwargs):
+        """Preenche o dia de operação quando não informado ou quando ``data_movimentacao`` muda."""
+        update_fields = kwargs.get('update_fields')
+        alterada = (
+            self.tem_valor_original('data_movimentacao')
+            and self.campo_alterado('data_movimentacao')
+            and (update_fields is None or 'data_movimentacao' in update_fields)
+        )
+        if self.data_negocio is None or alterada:
+            self.data_negocio = self.calcular_data_negocio()
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'data_negocio'}
+        super().save(*args, **kwargs)
     
     @property
     def valor(self):
@@ -323,3 +373,48 @@ class MetaVenda(models.Model):
     def meta_ticket_medio(self):
         """Retorna meta de ticket médio em reais."""
         return self.meta_ticket_medio_centavos / 100
+
+
+class VendaDiaria(models.Model):
+    """Resumo diário das vendas entregues por forma de pagamento.
+
+    Mantido incrementalmente pelos signals de ``Pedido`` (entrega,
+    cancelamento e exclusão) e reconstruído pelo comando
+    ``reconstruir_vendas_diarias``. Os relatórios leem daqui, então o custo
+    depende do número de dias do período, não do número de pedidos.
+    """
+
+    pizzaria = models.ForeignKey(
+        Pizzaria,
+        on_delete=models.CASCADE,
+        related_name="vendas_diarias"
+    )
+    data = models.DateField(help_text="Dia de operação do pedido (Pedido.data_negocio)")
+    forma_pagamento = models.CharField(max_length=3, choices=DespesaOperacional.FORMA_PAGAMENTO_CHOICES)
+
+    # Valores agregados
+    receita_centavos = models.BigIntegerField(default=0)
+    quantidade_pedidos = models.IntegerField(default=0)
+    quantidade_itens = models.IntegerField(default=0)
+
+    # Controle
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Venda Diária"
+        verbose_name_plural = "Vendas Diárias"
+        ordering = ['data', 'forma_pagamento']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['pizzaria', 'data', 'forma_pagamento'],
+                name='venda_diaria_unica',
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.data:%d/%m/%Y} {self.forma_pagamento} - R$ {self.receita:.2f} ({self.quantidade_pedidos} pedidos)"
+
+    @property
+    def receita(self):
+        """Retorna receita em reais."""
+        return self.receita_centavos / 100
@@ -0,0 +1,258 @@
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from estoque.models import CompraIngrediente
+from .models import DespesaOperacional, MovimentacaoCaixa, VendaDiaria
+
+
+CHAVE_CACHE_DASHBOARD = 'financeiro:dashboard:{}'
+
+
+def centavos(valor):
+    """Converte um valor em reais (Decimal) para centavos, arredondando."""
+    return int((Decimal(valor or 0) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def _aplicar_delta(pizzaria_id, data, forma_pagamento, receita_centavos, pedidos, itens):
+    """Soma os deltas na linha do dia com ``F()``, criando-a se necessário."""
+    chave = dict(pizzaria_id=pizzaria_id, data=data, forma_pagamento=forma_pagamento)
+    incremento = dict(
+        receita_centavos=F('receita_centavos') + receita_centavos,
+        quantidade_pedidos=F('quantidade_pedidos') + pedidos,
+        quantidade_itens=F('quantidade_itens') + itens,
+        atualizado_em=timezone.now(),
+    )
+    invalidar_dashboard(pizzaria_id)
+    if VendaDiaria.objects.filter(**chave).update(**incremento):
+        return
+    try:
+        with transaction.atomic():
+            VendaDiaria.objects.create(
+                **chave,
+                receita_centavos=receita_centavos,
+                quantidade_pedidos=pedidos,
+                quantidade_itens=itens,
+            )
+    except IntegrityError:
+        # Outra transação criou a linha do dia ao mesmo tempo
+        VendaDiaria.objects.filter(**chave).update(**incremento)
+
+
+def registrar_venda(pedido, sinal=1, valores_originais=False):
+    """Soma (``sinal=1``) ou subtrai (``sinal=-1``) o pedido do resumo do dia.
+
+    Com ``valores_originais`` usa total, forma de pagamento e data como
+    estavam no banco antes do save (ex.: pedido que deixou de ser entregue
+    e foi editado no mesmo save).
+    """
+    def valor(campo):
+        if valores_originais and pedido.tem_valor_original(campo):
+            return pedido.valor_original(campo)
+        return getattr(pedido, campo)
+
+    itens = pedido.itens.aggregate(total=Sum('quantidade'))['total'] or 0
+    _aplicar_delta(
+        pedido.pizzaria_id,
+        valor('data_negocio'),
+        valor('forma_pagamento'),
+        sinal * centavos(valor('total')),
+        sinal,
+        sinal * itens,
+    )
+
+
+def agregar_vendas(pedidos):
+    """Agrupa pedidos entregues por (pizzaria, dia de operação, forma de pagamento).
+
+    Retorna instâncias não salvas de ``VendaDiaria``.
+    """
+    linhas = (
+        pedidos.filter(status='ENTREGUE')
+        .values('pizzaria_id', 'forma_pagamento', data=F('data_negocio'))
+        .annotate(receita=Sum('total'), quantidade=Count('id'))
+        .order_by()
+    )
+    itens = (
+        pedidos.filter(status='ENTREGUE')
+        .values('pizzaria_id', 'forma_pagamento', data=F('data_negocio'))
+        .annotate(itens=Sum('itens__quantidade'))
+        .order_by()
+    )
+    itens_por_chave = {
+        (linha['pizzaria_id'], linha['data'], linha['forma_pagamento']): linha['itens'] or 0
+        for linha in itens
+    }
+    return [
+        VendaDiaria(
+            pizzaria_id=linha['pizzaria_id'],
+            data=linha['data'],
+            forma_pagamento=linha['forma_pagamento'],
+            receita_centavos=centavos(linha['receita']),
+            quantidade_pedidos=linha['quantidade'],
+            quantidade_itens=itens_por_chave.get(
+                (linha['pizzaria_id'], linha['data'], linha['forma_pagamento']), 0
+            ),
+        )
+        for linha in linhas
+    ]
+
+
+def reconstruir_vendas_diarias(pizzaria=None, data_inicio=None, data_fim=None):
+    """Recalcula o resumo a partir dos pedidos (todo o histórico ou um período).
+
+    Retorna a quantidade de linhas gravadas.
+    """
+    from pedidos.models import Pedido  # import local para evitar ciclos
+
+    pedidos = Pedido.objects.all()
+    resumo = VendaDiaria.objects.all()
+    if pizzaria is not None:
+        pedidos = pedidos.filter(pizzaria=pizzaria)
+        resumo = resumo.filter(pizzaria=pizzaria)
+    if data_inicio is not None:
+        pedidos = pedidos.filter(data_negocio__gte=data_inicio)
+        resumo = resumo.filter(data__gte=data_inicio)
+    if data_fim is not None:
+        pedidos = pedidos.filter(data_negocio__lte=data_fim)
+        resumo = resumo.filter(data__lte=data_fim)
+
+    linhas = agregar_vendas(pedidos)
+    with transaction.atomic():
+        resumo.delete()
+        VendaDiaria.objects.bulk_create(linhas, batch_size=1000)
+        if pizzaria is not None:
+            invalidar_dashboard(getattr(pizzaria, 'pk', pizzaria))
+    return len(linhas)
+
+
+def recalcular_venda_do_pedido(pedido):
+    """Recalcula os dias afetados por um pedido entregue que foi editado."""
+    datas = {pedido.data_negocio}
+    if pedido.tem_valor_original('data_negocio'):
+        datas.add(pedido.valor_original('data_negocio'))
+    for data in datas:
+        reconstruir_vendas_diarias(pedido.pizzaria_id, data, data)
+
+
+def recalcular_datas_negocio(pizzaria):
+    """Recalcula ``data_negocio`` de pedidos e caixa após mudar fuso ou fechamento.
+
+    Um ``UPDATE`` por tabela com a expressão da pizzaria; o resumo diário
+    de vendas é reconstruído em seguida.
+    """
+    from pedidos.models import Pedido  # import local para evitar ciclos
+
+    with transaction.atomic():
+        Pedido.objects.filter(pizzaria=pizzaria).update(
+            data_negocio=pizzaria.expressao_data_negocio('data_criacao')
+        )
+        # Compras e despesas ficam no dia do documento, que não depende do fuso
+        MovimentacaoCaixa.objects.filter(pizzaria=pizzaria).exclude(
+            origem__in=MovimentacaoCaixa.ORIGENS_DATA_DOCUMENTO
+        ).update(data_negocio=pizzaria.expressao_data_negocio('data_movimentacao'))
+        reconstruir_vendas_diarias(pizzaria)
+
+
+# --------------------------------------------------
+# Dashboard
+# --------------------------------------------------
+
+def invalidar_dashboard(pizzaria_id):
+    """Descarta as métricas em cache da pizzaria quando a transação confirmar."""
+    chave = CHAVE_CACHE_DASHBOARD.format(pizzaria_id)
+    transaction.on_commit(lambda: cache.delete(chave))
+
+
+def calcular_metricas_dashboard(pizzaria, hoje=None):
+    """Calcula as métricas do dashboard com uma agregação condicional por tabela."""
+    hoje = hoje or pizzaria.data_negocio()
+    data_inicio = hoje - timedelta(days=30)
+    mes_atual = hoje.replace(day=1)
+
+    vendas = VendaDiaria.objects.filter(
+        pizzaria=pizzaria,
+        data__gte=min(data_inicio, mes_atual)
+    ).aggregate(
+        receitas=Sum('receita_centavos', filter=Q(data__gte=data_inicio)),
+        receita_hoje=Sum('receita_centavos', filter=Q(data=hoje)),
+        pedidos_hoje=Sum('quantidade_pedidos', filter=Q(data=hoje)),
+        receita_mes=Sum('receita_centavos', filter=Q(data__gte=mes_atual)),
+        pedidos_mes=Sum('quantidade_pedidos', filter=Q(data__gte=mes_atual)),
+    )
+
+    despesas_operacionais = DespesaOperacional.objects.filter(pizzaria=pizzaria)
+    despesas = despesas_operacionais.aggregate(
+        despesas=Sum('valor_centavos', filter=Q(data_vencimento__gte=data_inicio)),
+        despesas_recorrentes=Sum('valor_centavos', filter=Q(recorrente=True)),
+        despesas_recorrentes_ativas=Count('id', filter=Q(recorrente=True)),
+        despesas_atraso=Count('id', filter=Q(data_vencimento__lt=hoje, pago=False)),
+    )
+    despesas_por_tipo = list(
+        despesas_operacionais.filter(data_vencimento__gte=data_inicio)
+        .values('tipo_despesa__nome')
+        .annotate(total=Sum('valor_centavos'))
+        .order_by('-total')
+    )
+
+    custo_mes = CompraIngrediente.objects.filter(
+        ingrediente__pizzaria=pizzaria,
+        data_compra__gte=mes_atual
+    ).aggregate(total=Sum('valor_total_centavos'))['total'] or 0
+
+    movimentacoes_recentes = list(
+        MovimentacaoCaixa.objects.filter(
+            pizzaria=pizzaria,
+            data_negocio__gte=hoje - timedelta(days=10)
+        ).order_by('-data_movimentacao')[:10]
+    )
+
+    receitas = (vendas['receitas'] or 0) / 100
+    despesas_total = (despesas['despesas'] or 0) / 100
+    receita_mes = (vendas['receita_mes'] or 0) / 100
+    pedidos_mes = vendas['pedidos_mes'] or 0
+    custo_mes = custo_mes / 100
+    lucro = receitas - despesas_total
+    lucro_mes = receita_mes - custo_mes
+
+    return {
+        'hoje': hoje,
+        'receitas': receitas,
+        'despesas': despesas_total,
+        'despesas_recorrentes': (despesas['despesas_recorrentes'] or 0) / 100,
+        'despesas_recorrentes_ativas': despesas['despesas_recorrentes_ativas'],
+        'despesas_atraso': despesas['despesas_atraso'],
+        'despesas_por_tipo': despesas_por_tipo,
+        'lucro': lucro,
+        'margem': (lucro / receitas * 100) if receitas > 0 else 0,
+        'receita_hoje': (vendas['receita_hoje'] or 0) / 100,
+        'pedidos_hoje': vendas['pedidos_hoje'] or 0,
+        'receita_mes': receita_mes,
+        'pedidos_mes': pedidos_mes,
+        'custo_mes': custo_mes,
+        'lucro_mes': lucro_mes,
+        'margem_mes': (lucro_mes / receita_mes * 100) if receita_mes > 0 else 0,
+        'ticket_medio_mes': (receita_mes / pedidos_mes) if pedidos_mes > 0 else 0,
+        'movimentacoes_recentes': movimentacoes_recentes,
+    }
+
+
+def metricas_dashboard(pizzaria):
+    """Métricas do dashboard, em cache por pizzaria.
+
+    O cache é curto (``FINANCEIRO_DASHBOARD_CACHE_TIMEOUT``) e é descartado
+    pelos signals financeiros sempre que vendas, compras, despesas ou
+    movimentações da pizzaria mudam.
+    """
+    chave = CHAVE_CACHE_DASHBOARD.format(pizzaria.pk)
+    hoje = pizzaria.data_negocio()
+    metricas = cache.get(chave)
+    if metricas is None or metricas['hoje'] != hoje:
+        metricas = calcular_metricas_dashboard(pizzaria, hoje)
+        cache.set(chave, metricas, getattr(settings, 'FINANCEIRO_DASHBOARD_CACHE_TIMEOUT', 60))
+    return metricas
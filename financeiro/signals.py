@@ -1,17 +1,22 @@
-from django.db.models.signals import post_save, post_delete
+from django.db.models.signals import post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.utils import timezone
 
+from autenticacao.models import Pizzaria
 from pedidos.models import Pedido
 from estoque.models import CompraIngrediente
 from .models import DespesaOperacional, MovimentacaoCaixa
+from .services import (
+    invalidar_dashboard, recalcular_datas_negocio, recalcular_venda_do_pedido, registrar_venda,
+)
 
 
 @receiver(post_save, sender=Pedido)
 def criar_movimentacao_venda(sender, instance, created, **kwargs):
     """Cria movimentação de entrada quando um pedido é entregue."""
-    if instance.status == 'ENTREGUE':
-        # Verificar se já existe movimentação para este pedido
+    # Só consulta o banco na transição para ENTREGUE, não em todo save
+    if instance.mudou_para('status', 'ENTREGUE'):
+        # Verificar se já existe movimentação para este pedido (ex.: pedido reaberto)
         if not MovimentacaoCaixa.objects.filter(pedido=instance).exists():
             # Converter total para centavos
             valor_centavos = int(float(instance.total) * 100)
@@ -24,39 +29,65 @@ def criar_movimentacao_venda(sender, instance, created, **kwargs):
                 valor_centavos=valor_centavos,
                 forma_pagamento=instance.forma_pagamento,
                 data_movimentacao=instance.data_criacao,
+                data_negocio=instance.data_negocio,
                 pedido=instance
             )
 
 
+@receiver(post_save, sender=Pedido)
+def atualizar_venda_diaria(sender, instance, created, **kwargs):
+    """Mantém o resumo diário de vendas nas transições de/para ENTREGUE."""
+    if not created and not instance.tem_valor_original('status'):
+        # Status anterior desconhecido (ex.: carregado com only()): recalcula o dia
+        if instance.status == 'ENTREGUE':
+            recalcular_venda_do_pedido(instance)
+        return
+
+    era_entregue = instance.valor_original('status') == 'ENTREGUE'
+    entregue = instance.status == 'ENTREGUE'
+
+    if entregue and not era_entregue:
+        registrar_venda(instance)
+    elif era_entregue and not entregue:
+        # Entregue → cancelado (ou reaberto): sai do resumo com os valores antigos
+        registrar_venda(instance, -1, valores_originais=True)
+    elif entregue and any(
+        instance.campo_alterado(campo) for campo in ('total', 'forma_pagamento', 'data_criacao')
+    ):
+        recalcular_venda_do_pedido(instance)
+
+
 @receiver(post_save, sender=CompraIngrediente)
 def criar_movimentacao_compra(sender, instance, created, **kwargs):
     """Cria movimentação de saída quando uma compra de estoque é registrada."""
-    if created:  # Só criar quando for uma nova compra
-        # Verificar se já existe movimentação para esta compra
-        if not MovimentacaoCaixa.objects.filter(compra_estoque=instance).exists():
-            # Usar timezone.now() para evitar warning de timezone
-            data_movimentacao = timezone.now().replace(
-                year=instance.data_compra.year,
-                month=instance.data_compra.month,
-                day=instance.data_compra.day
-            )
-            
-            MovimentacaoCaixa.objects.create(
-                pizzaria=instance.ingrediente.pizzaria,
-                tipo='SAIDA',
-                origem='COMPRA',
-                descricao=f'Compra - {instance.ingrediente.nome} ({instance.fornecedor.nome if instance.fornecedor else "Fornecedor não informado"})',
-                valor_centavos=instance.valor_total_centavos,
-                forma_pagamento='DIN',  # Padrão, pode ser ajustado depois
-                data_movimentacao=data_movimentacao,
-                compra_estoque=instance
-            )
+    if created:  # Só criar quando for uma nova compra (ainda sem movimentação)
+        # Usar timezone.now() para evitar warning de timezone
+        data_movimentacao = timezone.now().replace(
+            year=instance.data_compra.year,
+            month=instance.data_compra.month,
+            day=instance.data_compra.day
+        )
+        
+        MovimentacaoCaixa.objects.create(
+            pizzaria=instance.ingrediente.pizzaria,
+            tipo='SAIDA',
+            origem='COMPRA',
+            descricao=f'Compra - {instance.ingrediente.nome} ({instance.fornecedor.nome if instance.fornecedor else "Fornecedor não informado"})',
+            valor_centavos=instance.valor_total_centavos,
+            forma_pagamento='DIN',  # Padrão, pode ser ajustado depois
+            data_movimentacao=data_movimentacao,
+            data_negocio=instance.data_compra,
+            compra_estoque=instance
+        )
 
 
 @receiver(post_save, sender=DespesaOperacional)
 def criar_movimentacao_despesa(sender, instance, created, **kwargs):
     """Cria movimentação de saída quando uma despesa é marcada como paga."""
-    if instance.pago and instance.data_pagamento:
+    # Só consulta o banco quando o pagamento acabou de ser registrado
+    if instance.pago and instance.data_pagamento and (
+        instance.campo_alterado('pago') or instance.campo_alterado('data_pagamento')
+    ):
         # Verificar se já existe movimentação para esta despesa
         if not MovimentacaoCaixa.objects.filter(despesa=instance).exists():
             # Usar timezone.now() para evitar warning de timezone
@@ -74,6 +105,7 @@ def criar_movimentacao_despesa(sender, instance, created, **kwargs):
                 valor_centavos=instance.valor_centavos,
                 forma_pagamento=instance.forma_pagamento,
                 data_movimentacao=data_movimentacao,
+                data_negocio=instance.data_pagamento,
                 despesa=instance
             )
 
@@ -84,6 +116,14 @@ def remover_movimentacao_venda(sender, instance, **kwargs):
     MovimentacaoCaixa.objects.filter(pedido=instance).delete()
 
 
+@receiver(pre_delete, sender=Pedido)
+def remover_venda_diaria(sender, instance, **kwargs):
+    """Retira do resumo diário um pedido entregue que será excluído."""
+    # pre_delete: os itens ainda existem para a contagem
+    if instance.valor_original('status', instance.status) == 'ENTREGUE':
+        registrar_venda(instance, -1, valores_originais=True)
+
+
 @receiver(post_delete, sender=CompraIngrediente)
 def remover_movimentacao_compra(sender, instance, **kwargs):
     """Remove movimentação quando uma compra é excluída."""
@@ -94,3 +134,30 @@ def remover_movimentacao_compra(sender, instance, **kwargs):
 def remover_movimentacao_despesa(sender, instance, **kwargs):
     """Remove movimentação quando uma despesa é excluída."""
     MovimentacaoCaixa.objects.filter(despesa=instance).delete()
+
+
+@receiver([post_save, post_delete], sender=DespesaOperacional)
+def invalidar_dashboard_despesa(sender, instance, **kwargs):
+    """Descarta o dashboard em cache quando uma despesa muda."""
+    invalidar_dashboard(instance.pizzaria_id)
+
+
+@receiver([post_save, post_delete], sender=CompraIngrediente)
+def invalidar_dashboard_compra(sender, instance, **kwargs):
+    """Descarta o dashboard em cache quando uma compra muda."""
+    invalidar_dashboard(instance.ingrediente.pizzaria_id)
+
+
+@receiver([post_save, post_delete], sender=MovimentacaoCaixa)
+def invalidar_dashboard_movimentacao(sender, instance, **kwargs):
+    """Descarta o dashboard em cache quando o caixa muda."""
+    invalidar_dashboard(instance.pizzaria_id)
+
+
+@receiver(post_save, sender=Pizzaria)
+def recalcular_dia_de_operacao(sender, instance, created, **kwargs):
+    """Reagrupa pedidos e caixa quando o fuso ou o horário de fechamento mudam."""
+    if not created and (
+        instance.campo_alterado('fuso_horario') or instance.campo_alterado('hora_fechamento')
+    ):
+        recalcular_datas_negocio(instance)
@@ -1,3 +1,447 @@
+from decimal import Decimal
+from unittest import skipUnless
+from datetime import date, datetime, time
+from zoneinfo import ZoneInfo
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+
+from autenticacao.forms import PizzariaForm
+from autenticacao.models import Pizzaria, UsuarioPizzaria
+from pedidos.models import Pedido, ItemPedido
+from produtos.models import PrecoProduto, Produto
+from .models import DespesaOperacional, MovimentacaoCaixa, TipoDespesa, VendaDiaria, MetaVenda
+from .services import calcular_metricas_dashboard, metricas_dashboard
+
+
+class MovimentacaoSignalsTestCase(TestCase):
+    """Testes para a criação de movimentações de caixa a partir das transições."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.tipo_despesa = TipoDespesa.objects.create(nome="Aluguel")
+
+    def test_pedido_entregue_gera_uma_movimentacao(self):
+        """Testa que a venda é registrada uma única vez na transição para ENTREGUE."""
+        pedido = Pedido.objects.create(pizzaria=self.pizzaria, forma_pagamento='PIX', total=Decimal('50.00'))
+        self.assertFalse(MovimentacaoCaixa.objects.filter(pedido=pedido).exists())
+
+        pedido.status = 'ENTREGUE'
+        pedido.save()
+        pedido.observacoes = 'Sem cebola'
+        pedido.save()
+
+        movimentacao = MovimentacaoCaixa.objects.get(pedido=pedido)
+        self.assertEqual(movimentacao.valor_centavos, 5000)
+        self.assertEqual(movimentacao.forma_pagamento, 'PIX')
+
+    def test_save_sem_transicao_nao_consulta_o_banco(self):
+        """Testa que salvar um pedido já entregue executa apenas o UPDATE."""
+        pedido = Pedido.objects.create(pizzaria=self.pizzaria, forma_pagamento='DIN', status='ENTREGUE')
+        pedido = Pedido.objects.get(pk=pedido.pk)
+
+        self.assertFalse(pedido.campo_alterado('status'))
+        with self.assertNumQueries(1):
+            pedido.observacoes = 'Troco para 100'
+            pedido.save()
+
+    def test_rastreamento_de_status(self):
+        """Testa a detecção de transição de status sem nova consulta."""
+        pedido = Pedido.objects.create(pizzaria=self.pizzaria, forma_pagamento='DIN')
+        pedido = Pedido.objects.get(pk=pedido.pk)
+
+        pedido.status = 'EM_PREPARO'
+        self.assertTrue(pedido.mudou_para('status', 'EM_PREPARO'))
+        self.assertEqual(pedido.valor_original('status'), 'RECEBIDO')
+
+        pedido.save(update_fields=['status'])
+        self.assertFalse(pedido.campo_alterado('status'))
+        self.assertEqual(pedido.valor_original('status'), 'EM_PREPARO')
+
+    def test_despesa_paga_gera_uma_movimentacao(self):
+        """Testa que a despesa gera saída apenas quando é marcada como paga."""
+        despesa = DespesaOperacional.objects.create(
+            pizzaria=self.pizzaria,
+            tipo_despesa=self.tipo_despesa,
+            descricao="Aluguel",
+            valor_centavos=150000,
+            tipo='FIXA',
+            forma_pagamento='PIX',
+            data_vencimento=date.today(),
+        )
+        self.assertFalse(MovimentacaoCaixa.objects.filter(despesa=despesa).exists())
+
+        despesa.marcar_como_paga()
+        despesa.observacoes = 'Pago via app'
+        despesa.save()
+
+        self.assertEqual(MovimentacaoCaixa.objects.filter(despesa=despesa).count(), 1)
+
+
+class VendaDiariaTestCase(TestCase):
+    """Testes para o resumo diário de vendas."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        cache.clear()
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.produto = Produto.objects.create(pizzaria=self.pizzaria, nome="Margherita")
+        self.hoje = self.pizzaria.data_negocio()
+
+    def _pedido(self, total, forma_pagamento='PIX', itens=1):
+        pedido = Pedido.objects.create(
+            pizzaria=self.pizzaria,
+            forma_pagamento=forma_pagamento,
+            total=Decimal(total),
+        )
+        ItemPedido.objects.create(
+            pedido=pedido,
+            produto=self.produto,
+            quantidade=itens,
+            valor_unitario=Decimal(total) / itens,
+        )
+        return pedido
+
+    def _entregar(self, pedido):
+        pedido.status = 'ENTREGUE'
+        pedido.save(update_fields=['status'])
+
+    def _resumo(self, forma_pagamento='PIX'):
+        return VendaDiaria.objects.get(pizzaria=self.pizzaria, data=self.hoje, forma_pagamento=forma_pagamento)
+
+    def test_entrega_soma_no_resumo(self):
+        """Testa que cada entrega soma receita, pedidos e itens no dia."""
+        self._entregar(self._pedido('45.50', itens=2))
+        self._entregar(self._pedido('30.00', itens=1))
+        self._entregar(self._pedido('10.00', forma_pagamento='DIN'))
+
+        resumo = self._resumo()
+        self.assertEqual(resumo.receita_centavos, 7550)
+        self.assertEqual(resumo.quantidade_pedidos, 2)
+        self.assertEqual(resumo.quantidade_itens, 3)
+        self.assertEqual(self._resumo('DIN').receita_centavos, 1000)
+
+    def test_cancelamento_e_exclusao_subtraem(self):
+        """Testa que cancelar ou excluir um pedido entregue o retira do resumo."""
+        cancelado = self._pedido('40.00')
+        excluido = self._pedido('25.00', itens=3)
+        self._entregar(cancelado)
+        self._entregar(excluido)
+
+        cancelado.status = 'CANCELADO'
+        cancelado.save(update_fields=['status'])
+        Pedido.objects.filter(pk=excluido.pk).delete()
+
+        resumo = self._resumo()
+        self.assertEqual(resumo.receita_centavos, 0)
+        self.assertEqual(resumo.quantidade_pedidos, 0)
+        self.assertEqual(resumo.quantidade_itens, 0)
+
+    def test_pedido_do_servico_conta_os_itens(self):
+        """Testa que criar entregue ou editar só os itens de um pedido entregue atualiza a contagem de itens."""
+        from pedidos.services import atualizar_pedido, criar_pedido
+
+        PrecoProduto.objects.create(produto=self.produto, preco_base_centavos=3000, preco_venda_centavos=3000)
+        refrigerante = Produto.objects.create(pizzaria=self.pizzaria, nome="Refrigerante")
+        PrecoProduto.objects.create(produto=refrigerante, preco_base_centavos=1500, preco_venda_centavos=1500)
+
+        pedido = criar_pedido(
+            self.pizzaria, [{'produto_id': self.produto.id, 'quantidade': 3}],
+            status='ENTREGUE', forma_pagamento='PIX',
+        )
+        resumo = self._resumo()
+        self.assertEqual(
+            (resumo.receita_centavos, resumo.quantidade_pedidos, resumo.quantidade_itens), (9000, 1, 3)
+        )
+
+        # Mesmo total (R$ 90,00), um item a mais
+        atualizar_pedido(pedido, [
+            {'produto_id': self.produto.id, 'quantidade': 2},
+            {'produto_id': refrigerante.id, 'quantidade': 2},
+        ])
+        resumo = self._resumo()
+        self.assertEqual(
+            (resumo.receita_centavos, resumo.quantidade_pedidos, resumo.quantidade_itens), (9000, 1, 4)
+        )
+
+    def test_reconstrucao_igual_ao_incremental(self):
+        """Testa que o comando de reconstrução chega ao mesmo resumo."""
+        for total in ('12.34', '56.78', '90.00'):
+            self._entregar(self._pedido(total, itens=2))
+        self._pedido('99.00')  # não entregue
+        incremental = list(VendaDiaria.objects.values_list('data', 'forma_pagamento', 'receita_centavos', 'quantidade_pedidos', 'quantidade_itens'))
+
+        VendaDiaria.objects.all().delete()
+        call_command('reconstruir_vendas_diarias', stdout=StringIO())
+
+        reconstruido = list(VendaDiaria.objects.values_list('data', 'forma_pagamento', 'receita_centavos', 'quantidade_pedidos', 'quantidade_itens'))
+        self.assertEqual(reconstruido, incremental)
+        self.assertEqual(reconstruido[0][2], 15912)
+
+    def test_relatorio_e_dashboard_leem_o_resumo(self):
+        """Testa os totais do relatório de vendas e do dashboard a partir do resumo."""
+        user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client.force_login(user)
+        self._entregar(self._pedido('40.00'))
+        self._entregar(self._pedido('20.00', forma_pagamento='DIN'))
+
+        response = self.client.get(reverse('financeiro:relatorio_vendas'))
+        self.assertEqual(response.context['stats']['receita_total'], 60.0)
+        self.assertEqual(response.context['stats']['quantidade_pedidos'], 2)
+        self.assertEqual(response.context['vendas_por_pagamento'][0]['forma_pagamento_nome'], 'Pix')
+
+        response = self.client.get(reverse('financeiro:dashboard'))
+        self.assertEqual(response.context['receita_hoje'], 60.0)
+        self.assertEqual(response.context['pedidos_mes'], 2)
+
+    def test_metas_vendas_le_o_resumo(self):
+        """Testa que a realização das metas vem do resumo em consulta única."""
+        user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client.force_login(user)
+        for mes in range(1, 13):
+            MetaVenda.objects.create(
+                pizzaria=self.pizzaria,
+                ano=self.hoje.year,
+                mes=mes,
+                meta_receita_centavos=10000,
+                meta_ticket_medio_centavos=1000,
+            )
+        self._entregar(self._pedido('50.00'))
+
+        response = self.client.get(reverse('financeiro:metas_vendas'), {'ano': self.hoje.year})
+
+        meta = next(meta for meta in response.context['metas'] if meta.mes == self.hoje.month)
+        self.assertEqual(meta.receita_realizada, 50.0)
+        self.assertEqual(meta.percentual_realizacao, 50.0)
+
+
+class DataNegocioTestCase(TestCase):
+    """Testes para o dia de operação (fuso e horário de fechamento da pizzaria)."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        cache.clear()
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123",
+            fuso_horario="America/Sao_Paulo",
+            hora_fechamento=time(4, 0),
+        )
+        self.fuso = ZoneInfo("America/Sao_Paulo")
+
+    def _pedido_entregue(self, momento, total='50.00'):
+        pedido = Pedido.objects.create(
+            pizzaria=self.pizzaria,
+            forma_pagamento='PIX',
+            total=Decimal(total),
+            data_criacao=momento,
+        )
+        pedido.status = 'ENTREGUE'
+        pedido.save(update_fields=['status'])
+        return pedido
+
+    def test_madrugada_conta_no_dia_anterior(self):
+        """Testa que um pedido às 02:00 locais antes do fechamento fica no dia anterior."""
+        # 02:00 em São Paulo = 05:00 UTC, já dia 11 em UTC
+        pedido = self._pedido_entregue(datetime(2025, 3, 11, 2, 0, tzinfo=self.fuso))
+        depois = self._pedido_entregue(datetime(2025, 3, 11, 4, 0, tzinfo=self.fuso))
+
+        self.assertEqual(pedido.data_negocio, date(2025, 3, 10))
+        self.assertEqual(depois.data_negocio, date(2025, 3, 11))
+        self.assertEqual(
+            MovimentacaoCaixa.objects.get(pedido=pedido).data_negocio, date(2025, 3, 10)
+        )
+        self.assertEqual(
+            VendaDiaria.objects.get(pizzaria=self.pizzaria, data=date(2025, 3, 10)).receita_centavos, 5000
+        )
+
+    def test_expressao_igual_ao_calculo_em_python(self):
+        """Testa que o UPDATE em lote calcula o mesmo dia que ``Pizzaria.data_negocio``."""
+        momentos = [
+            datetime(2025, 3, 11, hora, 30, tzinfo=self.fuso) for hora in (0, 3, 4, 23)
+        ]
+        pedidos = [self._pedido_entregue(momento) for momento in momentos]
+        Pedido.objects.update(data_negocio=self.pizzaria.expressao_data_negocio('data_criacao'))
+
+        for pedido, momento in zip(pedidos, momentos):
+            pedido.refresh_from_db()
+            self.assertEqual(pedido.data_negocio, self.pizzaria.data_negocio(momento))
+
+    def test_relatorios_agrupam_pelo_dia_de_operacao(self):
+        """Testa que relatório de vendas e fluxo de caixa filtram pelo dia de operação."""
+        user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client.force_login(user)
+        self._pedido_entregue(datetime(2025, 3, 11, 1, 0, tzinfo=self.fuso), '30.00')
+        self._pedido_entregue(datetime(2025, 3, 11, 20, 0, tzinfo=self.fuso), '20.00')
+        periodo = {'data_inicio': '2025-03-10', 'data_fim': '2025-03-10'}
+
+        response = self.client.get(reverse('financeiro:relatorio_vendas'), periodo)
+        self.assertEqual(response.context['stats']['receita_total'], 30.0)
+        self.assertEqual(response.context['vendas_por_dia'][0]['data_criacao'], date(2025, 3, 10))
+
+        response = self.client.get(reverse('financeiro:fluxo_caixa'), periodo)
+        self.assertEqual(response.context['total_entradas'], 30.0)
+
+    def test_mudar_fechamento_recalcula_datas(self):
+        """Testa que mudar o horário de fechamento regrava as datas e o resumo diário."""
+        pedido = self._pedido_entregue(datetime(2025, 3, 11, 2, 0, tzinfo=self.fuso))
+
+        self.pizzaria.hora_fechamento = time(0, 0)
+        self.pizzaria.save()
+
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.data_negocio, date(2025, 3, 11))
+        self.assertEqual(MovimentacaoCaixa.objects.get(pedido=pedido).data_negocio, date(2025, 3, 11))
+        self.assertEqual(
+            list(VendaDiaria.objects.values_list('data', 'receita_centavos')), [(date(2025, 3, 11), 5000)]
+        )
+
+    def _movimentacao(self, origem, momento, **campos):
+        return MovimentacaoCaixa.objects.create(
+            pizzaria=self.pizzaria, tipo='SAIDA', origem=origem, descricao=origem,
+            valor_centavos=1000, forma_pagamento='DIN', data_movimentacao=momento, **campos
+        )
+
+    def test_compra_e_despesa_ficam_no_dia_do_documento(self):
+        """Testa que mudar o fuso não tira compras e despesas do dia do documento."""
+        # Como gravam os signals: a data do documento com a hora UTC do registro
+        # (02:00 UTC = 23:00 do dia anterior em São Paulo)
+        momento = datetime(2025, 3, 10, 2, 0, tzinfo=ZoneInfo("UTC"))
+        compra = self._movimentacao('COMPRA', momento, data_negocio=date(2025, 3, 10))
+        despesa = self._movimentacao('DESPESA', momento, data_negocio=date(2025, 3, 10))
+        outra = self._movimentacao('OUTROS', momento)
+        self.assertEqual(outra.data_negocio, date(2025, 3, 9))
+
+        self.pizzaria.fuso_horario = 'Asia/Tokyo'
+        self.pizzaria.save()
+
+        for movimentacao, dia in ((compra, 10), (despesa, 10), (outra, 10)):
+            movimentacao.refresh_from_db()
+            self.assertEqual(movimentacao.data_negocio, date(2025, 3, dia))
+
+        self.pizzaria.fuso_horario = 'America/Sao_Paulo'
+        self.pizzaria.save()
+        compra.refresh_from_db()
+        outra.refresh_from_db()
+        self.assertEqual((compra.data_negocio, outra.data_negocio), (date(2025, 3, 10), date(2025, 3, 9)))
+
+    def test_editar_data_movimentacao_recalcula_o_dia(self):
+        """Testa que alterar ``data_movimentacao`` de uma movimentação salva regrava ``data_negocio``."""
+        outra = self._movimentacao('OUTROS', datetime(2025, 3, 10, 12, 0, tzinfo=self.fuso))
+        compra = self._movimentacao(
+            'COMPRA', datetime(2025, 3, 10, 12, 0, tzinfo=ZoneInfo("UTC")), data_negocio=date(2025, 3, 10)
+        )
+
+        outra.data_movimentacao = datetime(2025, 3, 12, 2, 0, tzinfo=self.fuso)
+        outra.save(update_fields=['data_movimentacao'])
+        compra.data_movimentacao = datetime(2025, 3, 12, 1, 0, tzinfo=ZoneInfo("UTC"))
+        compra.save()
+
+        outra.refresh_from_db()
+        compra.refresh_from_db()
+        self.assertEqual(outra.data_negocio, date(2025, 3, 11))
+        self.assertEqual(compra.data_negocio, date(2025, 3, 12))
+
+    def test_formulario_usa_padroes(self):
+        """Testa que fuso e fechamento são opcionais no cadastro da pizzaria."""
+        form = PizzariaForm(data={
+            'nome': 'Nova', 'cnpj': '98765432000110', 'endereco': 'Rua A', 'telefone': '11999999999',
+            'ativa': True,
+        })
+
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.cleaned_data['fuso_horario'], 'America/Sao_Paulo')
+        self.assertEqual(form.cleaned_data['hora_fechamento'], time(0, 0))
+
+
+class DashboardFinanceiroTestCase(TestCase):
+    """Testes para as métricas e o cache do dashboard financeiro."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        cache.clear()
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123"
+        )
+        self.tipo_despesa = TipoDespesa.objects.create(nome="Aluguel")
+        DespesaOperacional.objects.create(
+            pizzaria=self.pizzaria,
+            tipo_despesa=self.tipo_despesa,
+            descricao="Aluguel",
+            valor_centavos=100000,
+            tipo='FIXA',
+            forma_pagamento='PIX',
+            data_vencimento=date.today(),
+            recorrente=True,
+        )
+
+    def _entregar_pedido(self, total):
+        pedido = Pedido.objects.create(pizzaria=self.pizzaria, forma_pagamento='PIX', total=Decimal(total))
+        pedido.status = 'ENTREGUE'
+        pedido.save(update_fields=['status'])
+        return pedido
+
+    def test_metricas_em_consultas_fixas(self):
+        """Testa que as métricas usam poucas consultas, independente do volume."""
+        for total in ('30.00', '45.00', '25.00'):
+            self._entregar_pedido(total)
+
+        with self.assertNumQueries(5):
+            metricas = calcular_metricas_dashboard(self.pizzaria)
+
+        self.assertEqual(metricas['receita_hoje'], 100.0)
+        self.assertEqual(metricas['pedidos_mes'], 3)
+        self.assertEqual(metricas['despesas'], 1000.0)
+        self.assertEqual(metricas['despesas_recorrentes_ativas'], 1)
+        self.assertEqual(metricas['lucro'], -900.0)
+        # Movimentações recentes vêm do caixa, já ordenadas
+        self.assertEqual(len(metricas['movimentacoes_recentes']), 3)
+        self.assertTrue(all(isinstance(mov, MovimentacaoCaixa) for mov in metricas['movimentacoes_recentes']))
+
+    def test_cache_invalidado_pelos_signals(self):
+        """Testa que o cache é usado e descartado quando uma venda é registrada."""
+        self.assertEqual(metricas_dashboard(self.pizzaria)['receita_hoje'], 0)
+        with self.assertNumQueries(0):
+            metricas_dashboard(self.pizzaria)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._entregar_pedido('40.00')
+
+        self.assertEqual(metricas_dashboard(self.pizzaria)['receita_hoje'], 40.0)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'O benchmark requer PostgreSQL')
+class BenchmarkRelatoriosTestCase(TestCase):
+    """Testes para o comando de benchmark dos índices dos relatórios."""
+
+    def test_benchmark_compara_e_descarta_dados(self):
+        """Testa que o benchmark mede sem/com índices e desfaz a massa de dados."""
+        saida = StringIO()
+        call_command('benchmark_relatorios', pedidos=200, pizzarias=2, repeticoes=1, stdout=saida)
 
-# Create your tests here.
+        self.assertIn('SEM os índices', saida.getvalue())
+        self.assertIn('COM os índices', saida.getvalue())
+        self.assertIn('relatorio_vendas', saida.getvalue())
+        self.assertIn('pedido_entregue_negocio', saida.getvalue())
+        self.assertFalse(Pizzaria.objects.filter(nome__startswith='Benchmark').exists())
+        self.assertFalse(Pedido.objects.exists())
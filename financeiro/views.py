@@ -3,8 +3,9 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.http import JsonResponse
 from django.db.models import Q, Sum, Count, Avg, F
+from django.db.models.functions import ExtractMonth
 from django.utils import timezone
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta
 import calendar
 
 from autenticacao.decorators import super_admin_required
@@ -12,182 +13,21 @@ from autenticacao.models import Pizzaria
 from pedidos.models import Pedido
 from estoque.models import CompraIngrediente
 from produtos.models import Produto
-from .models import DespesaOperacional, MovimentacaoCaixa, MetaVenda, TipoDespesa
+from .models import DespesaOperacional, MovimentacaoCaixa, MetaVenda, TipoDespesa, VendaDiaria
 from .forms import DespesaOperacionalForm, TipoDespesaForm
+from .services import metricas_dashboard
 
 
 @login_required
 def dashboard_financeiro(request):
     """Dashboard financeiro da pizzaria."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
-    # Período para análise (últimos 30 dias)
-    hoje = timezone.now().date()
-    data_inicio = hoje - timedelta(days=30)
-    
-    # Receitas (pedidos entregues)
-    receitas = Pedido.objects.filter(
-        pizzaria=pizzaria,
-        status='ENTREGUE',
-        data_criacao__gte=data_inicio
-    ).aggregate(total=Sum('total'))['total'] or 0
-    
-    # Converter para float se for Decimal
-    if hasattr(receitas, 'quantize'):
-        receitas = float(receitas)
-    
-    # Despesas operacionais
-    despesas = DespesaOperacional.objects.filter(
-        pizzaria=pizzaria,
-        data_vencimento__gte=data_inicio
-    ).aggregate(total=Sum('valor_centavos'))['total'] or 0
-    despesas = float(despesas) / 100
-    
-    # Despesas recorrentes (fixas mensais)
-    despesas_recorrentes = DespesaOperacional.objects.filter(
-        pizzaria=pizzaria,
-        recorrente=True
-    ).aggregate(total=Sum('valor_centavos'))['total'] or 0
-    despesas_recorrentes = float(despesas_recorrentes) / 100
-    
-    # Lucro
-    lucro = receitas - despesas
-    
-    # Margem de lucro
-    margem = (lucro / receitas * 100) if receitas > 0 else 0
-    
-    # Despesas por tipo
-    despesas_por_tipo = DespesaOperacional.objects.filter(
-        pizzaria=pizzaria,
-        data_vencimento__gte=data_inicio
-    ).values('tipo_despesa__nome').annotate(
-        total=Sum('valor_centavos')
-    ).order_by('-total')
-    
-    # Despesas recorrentes ativas
-    despesas_recorrentes_ativas = DespesaOperacional.objects.filter(
-        pizzaria=pizzaria,
-        recorrente=True
-    ).count()
-    
-    # Calcular métricas para hoje
-    hoje = timezone.now().date()
-    receita_hoje = Pedido.objects.filter(
-        pizzaria=pizzaria,
-        status='ENTREGUE',
-        data_criacao__date=hoje
-    ).aggregate(total=Sum('total'))['total'] or 0
-    
-    if hasattr(receita_hoje, 'quantize'):
-        receita_hoje = float(receita_hoje)
-    
-    pedidos_hoje = Pedido.objects.filter(
-        pizzaria=pizzaria,
-        status='ENTREGUE',
-        data_criacao__date=hoje
-    ).count()
-    
-    # Calcular métricas do mês
-    mes_atual = hoje.replace(day=1)
-    receita_mes = Pedido.objects.filter(
-        pizzaria=pizzaria,
-        status='ENTREGUE',
-        data_criacao__gte=mes_atual
-    ).aggregate(total=Sum('total'))['total'] or 0
-    
-    if hasattr(receita_mes, 'quantize'):
-        receita_mes = float(receita_mes)
-    
-    pedidos_mes = Pedido.objects.filter(
-        pizzaria=pizzaria,
-        status='ENTREGUE',
-        data_criacao__gte=mes_atual
-    ).count()
-    
-    # Custos do mês (compras de ingredientes)
-    custo_mes = CompraIngrediente.objects.filter(
-        ingrediente__pizzaria=pizzaria,
-        data_compra__gte=mes_atual
-    ).aggregate(total=Sum('valor_total_centavos'))['total'] or 0
-    custo_mes = float(custo_mes) / 100
-    
-    # Lucro e margem do mês
-    lucro_mes = receita_mes - custo_mes
-    margem_mes = (lucro_mes / receita_mes * 100) if receita_mes > 0 else 0
-    
-    # Ticket médio do mês
-    ticket_medio_mes = (receita_mes / pedidos_mes) if pedidos_mes > 0 else 0
-    
-    # Despesas em atraso
-    despesas_atraso = DespesaOperacional.objects.filter(
-        pizzaria=pizzaria,
-        data_vencimento__lt=hoje,
-        pago=False
-    ).count()
-    
-    # Movimentações recentes (últimos 10 dias)
-    data_inicio_recente = hoje - timedelta(days=10)
-    movimentacoes_recentes = []
-    
-    # Adicionar pedidos entregues como entradas
-    pedidos_recentes = Pedido.objects.filter(
-        pizzaria=pizzaria,
-        status='ENTREGUE',
-        data_criacao__gte=data_inicio_recente
-    ).order_by('-data_criacao')[:5]
-    
-    for pedido in pedidos_recentes:
-        movimentacoes_recentes.append({
-            'data_movimentacao': pedido.data_criacao,
-            'descricao': f'Venda - Pedido #{pedido.id}',
-            'tipo': 'ENTRADA',
-            'valor': pedido.total,
-            'forma_pagamento': 'Dinheiro'  # Default
-        })
-    
-    # Adicionar compras recentes como saídas
-    compras_recentes = CompraIngrediente.objects.filter(
-        ingrediente__pizzaria=pizzaria,
-        data_compra__gte=data_inicio_recente
-    ).order_by('-data_compra')[:5]
-    
-    for compra in compras_recentes:
-        movimentacoes_recentes.append({
-            'data_movimentacao': compra.data_compra,
-            'descricao': f'Compra - {compra.ingrediente.nome}',
-            'tipo': 'SAIDA',
-            'valor': compra.valor_total_centavos / 100,
-            'forma_pagamento': 'Dinheiro'  # Default
-        })
-    
-    # Ordenar por data (mais recente primeiro)
-    # Converter todas as datas para datetime para evitar problemas de comparação
-    for mov in movimentacoes_recentes:
-        if isinstance(mov['data_movimentacao'], date):
-            mov['data_movimentacao'] = datetime.combine(mov['data_movimentacao'], datetime.min.time())
-    
-    movimentacoes_recentes.sort(key=lambda x: x['data_movimentacao'], reverse=True)
-    movimentacoes_recentes = movimentacoes_recentes[:10]  # Limitar a 10
+    metricas = metricas_dashboard(pizzaria)
     
     context = {
-        'mes_atual': hoje.strftime('%B/%Y'),
-        'receita_hoje': receita_hoje,
-        'receita_mes': receita_mes,
-        'custo_mes': custo_mes,
-        'lucro_mes': lucro_mes,
-        'margem_mes': margem_mes,
-        'pedidos_hoje': pedidos_hoje,
-        'pedidos_mes': pedidos_mes,
-        'ticket_medio_mes': ticket_medio_mes,
-        'despesas_atraso': despesas_atraso,
-        'movimentacoes_recentes': movimentacoes_recentes,
-        'receitas': receitas,
-        'despesas': despesas,
-        'despesas_recorrentes': despesas_recorrentes,
-        'lucro': lucro,
-        'margem': margem,
-        'despesas_por_tipo': despesas_por_tipo,
-        'despesas_recorrentes_ativas': despesas_recorrentes_ativas,
+        **metricas,
+        'mes_atual': metricas['hoje'].strftime('%B/%Y'),
         'periodo_dias': 30
     }
     return render(request, 'financeiro/dashboard.html', context)
@@ -196,7 +36,7 @@ def dashboard_financeiro(request):
 @login_required
 def relatorio_vendas(request):
     """Relatório de vendas da pizzaria."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
     # Filtros
     data_inicio_str = request.GET.get('data_inicio')
@@ -208,84 +48,80 @@ def relatorio_vendas(request):
             data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
             data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
         except ValueError:
-            data_inicio = timezone.now().date() - timedelta(days=30)
-            data_fim = timezone.now().date()
+            data_inicio = pizzaria.data_negocio() - timedelta(days=30)
+            data_fim = pizzaria.data_negocio()
     else:
         # Período padrão (últimos 30 dias)
-        data_fim = timezone.now().date()
+        data_fim = pizzaria.data_negocio()
         data_inicio = data_fim - timedelta(days=30)
     
-    # Converter datas (date) para datetimes conscientes de fuso para comparar com DateTimeField
-    inicio_dt = timezone.make_aware(datetime.combine(data_inicio, datetime.min.time()))
-    fim_dt = timezone.make_aware(datetime.combine(data_fim, datetime.max.time()))
-    
-    # Pedidos entregues no período
+    # Pedidos entregues no período (dias de operação da pizzaria)
     pedidos = Pedido.objects.filter(
         pizzaria=pizzaria,
         status='ENTREGUE',
-        data_criacao__gte=inicio_dt,
-        data_criacao__lte=fim_dt
+        data_negocio__gte=data_inicio,
+        data_negocio__lte=data_fim
     ).order_by('-data_criacao')
-    print(pedidos)
     # Filtrar por categoria se especificado
     if categoria_id:
         try:
             categoria_id = int(categoria_id)
             pedidos = pedidos.filter(itens__produto__categoria_id=categoria_id).distinct()
         except ValueError:
-            pass
+            categoria_id = None
     
-    # Total de vendas
-    total_vendas = pedidos.aggregate(total=Sum('total'))['total'] or 0
-    
-    # Converter para float se for Decimal
-    if hasattr(total_vendas, 'quantize'):
-        total_vendas = float(total_vendas)
-    
-    # Quantidade de pedidos
-    quantidade_pedidos = pedidos.count()
+    if categoria_id:
+        # O resumo diário não é separado por categoria: agrega os pedidos filtrados
+        vendas_por_dia = [
+            {'data_criacao': venda['data_negocio'], 'receita': float(venda['receita']), 'pedidos': venda['pedidos']}
+            for venda in pedidos.values('data_negocio').annotate(
+                receita=Sum('total'),
+                pedidos=Count('id')
+            ).order_by('data_negocio')
+        ]
+        vendas_por_pagamento = [
+            {'forma_pagamento': venda['forma_pagamento'], 'receita': float(venda['receita']), 'quantidade': venda['quantidade']}
+            for venda in pedidos.values('forma_pagamento').annotate(
+                receita=Sum('total'),
+                quantidade=Count('id')
+            ).order_by('-receita')
+        ]
+    else:
+        # Resumo diário: custo proporcional ao número de dias do período
+        resumo = VendaDiaria.objects.filter(
+            pizzaria=pizzaria,
+            data__gte=data_inicio,
+            data__lte=data_fim
+        )
+        vendas_por_dia = [
+            {'data_criacao': venda['data'], 'receita': venda['receita'] / 100, 'pedidos': venda['pedidos']}
+            for venda in resumo.values('data').annotate(
+                receita=Sum('receita_centavos'),
+                pedidos=Sum('quantidade_pedidos')
+            ).order_by('data')
+        ]
+        vendas_por_pagamento = [
+            {'forma_pagamento': venda['forma_pagamento'], 'receita': venda['receita'] / 100, 'quantidade': venda['quantidade']}
+            for venda in resumo.values('forma_pagamento').annotate(
+                receita=Sum('receita_centavos'),
+                quantidade=Sum('quantidade_pedidos')
+            ).order_by('-receita')
+        ]
+    
+    # Total de vendas e quantidade de pedidos
+    total_vendas = sum(venda['receita'] for venda in vendas_por_dia)
+    quantidade_pedidos = sum(venda['pedidos'] for venda in vendas_por_dia)
     
     # Ticket médio
     ticket_medio = total_vendas / quantidade_pedidos if quantidade_pedidos > 0 else 0
     
-    # Vendas por dia
-    vendas_por_dia = pedidos.values('data_criacao__date').annotate(
-        receita=Sum('total'),
-        pedidos=Count('id')
-    ).order_by('data_criacao__date')
-    
     # Calcular ticket médio por dia
     for venda in vendas_por_dia:
-        if venda['pedidos'] > 0:
-            venda['ticket_medio_dia'] = venda['receita'] / venda['pedidos']
-        else:
-            venda['ticket_medio_dia'] = 0
-        # Adicionar campo data_criacao para o template
-        venda['data_criacao'] = venda['data_criacao__date']
-        # Converter para float se for Decimal
-        if hasattr(venda['receita'], 'quantize'):
-            venda['receita'] = float(venda['receita'])
-        if hasattr(venda['ticket_medio_dia'], 'quantize'):
-            venda['ticket_medio_dia'] = float(venda['ticket_medio_dia'])
-        # Converter para int se for Decimal
-        if hasattr(venda['pedidos'], 'quantize'):
-            venda['pedidos'] = int(venda['pedidos'])
-    
-    # Vendas por forma de pagamento
-    vendas_por_pagamento = pedidos.values('forma_pagamento').annotate(
-        receita=Sum('total'),  # Nome que o template espera
-        quantidade=Count('id')
-    ).order_by('-receita')
+        venda['ticket_medio_dia'] = venda['receita'] / venda['pedidos'] if venda['pedidos'] > 0 else 0
     
     # Adicionar nome da forma de pagamento para o template
     for venda in vendas_por_pagamento:
         venda['forma_pagamento_nome'] = dict(Pedido.FORMA_PAGAMENTO_CHOICES).get(venda['forma_pagamento'], venda['forma_pagamento'])
-        # Converter para float se for Decimal
-        if hasattr(venda['receita'], 'quantize'):
-            venda['receita'] = float(venda['receita'])
-        # Converter para int se for Decimal
-        if hasattr(venda['quantidade'], 'quantize'):
-            venda['quantidade'] = int(venda['quantidade'])
     
     # Top 10 produtos mais vendidos
     produtos_vendidos = pedidos.values('itens__produto__nome').annotate(
@@ -334,7 +170,7 @@ def relatorio_vendas(request):
 @login_required
 def relatorio_custos(request):
     """Relatório de custos da pizzaria."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
     # Filtros
     data_inicio_str = request.GET.get('data_inicio')
@@ -345,11 +181,11 @@ def relatorio_custos(request):
             data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
             data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
         except ValueError:
-            data_inicio = timezone.now().date() - timedelta(days=30)
-            data_fim = timezone.now().date()
+            data_inicio = pizzaria.data_negocio() - timedelta(days=30)
+            data_fim = pizzaria.data_negocio()
     else:
         # Período padrão (últimos 30 dias)
-        data_fim = timezone.now().date()
+        data_fim = pizzaria.data_negocio()
         data_inicio = data_fim - timedelta(days=30)
     
     # Despesas operacionais
@@ -382,7 +218,7 @@ def relatorio_custos(request):
     # Despesas em atraso
     despesas_atraso = despesas.filter(
         pago=False,
-        data_vencimento__lt=timezone.now().date()
+        data_vencimento__lt=pizzaria.data_negocio()
     ).aggregate(total=Sum('valor_centavos'))['total'] or 0
     despesas_atraso = float(despesas_atraso) / 100
     
@@ -429,7 +265,7 @@ def relatorio_custos(request):
 @login_required
 def fluxo_caixa(request):
     """Fluxo de caixa da pizzaria."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
     # Filtros
     data_inicio_str = request.GET.get('data_inicio')
@@ -440,18 +276,18 @@ def fluxo_caixa(request):
             data_inicio = datetime.strptime(data_inicio_str, '%Y-%m-%d').date()
             data_fim = datetime.strptime(data_fim_str, '%Y-%m-%d').date()
         except ValueError:
-            data_inicio = timezone.now().date() - timedelta(days=30)
-            data_fim = timezone.now().date()
+            data_inicio = pizzaria.data_negocio() - timedelta(days=30)
+            data_fim = pizzaria.data_negocio()
     else:
         # Período padrão (últimos 30 dias)
-        data_fim = timezone.now().date()
+        data_fim = pizzaria.data_negocio()
         data_inicio = data_fim - timedelta(days=30)
     
     # Movimentações de caixa
     movimentacoes = MovimentacaoCaixa.objects.filter(
         pizzaria=pizzaria,
-        data_movimentacao__date__gte=data_inicio,
-        data_movimentacao__date__lte=data_fim
+        data_negocio__gte=data_inicio,
+        data_negocio__lte=data_fim
     ).order_by('-data_movimentacao')
     
     # Total de entradas e saídas
@@ -495,7 +331,7 @@ def fluxo_caixa(request):
 @login_required
 def metas_vendas(request):
     """Gestão de metas de vendas."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
     # Ano atual
     ano_atual = timezone.now().year
@@ -551,19 +387,19 @@ def metas_vendas(request):
         except ValueError:
             pass
     
+    # Receita realizada por mês do ano, em uma consulta ao resumo diário
+    receita_por_mes = dict(
+        VendaDiaria.objects.filter(
+            pizzaria=pizzaria,
+            data__year=ano_selecionado
+        ).annotate(mes=ExtractMonth('data')).values('mes').annotate(
+            total=Sum('receita_centavos')
+        ).values_list('mes', 'total').order_by()
+    )
+    
     # Calcular realização para cada meta
     for meta in metas:
-        # Receita realizada no mês
-        receita_realizada = Pedido.objects.filter(
-            pizzaria=pizzaria,
-            status='ENTREGUE',
-            data_criacao__year=meta.ano,
-            data_criacao__month=meta.mes
-        ).aggregate(total=Sum('total'))['total'] or 0
-        
-        # Converter para float se for Decimal
-        if hasattr(receita_realizada, 'quantize'):
-            receita_realizada = float(receita_realizada)
+        receita_realizada = (receita_por_mes.get(meta.mes) or 0) / 100
         
         meta.receita_realizada = receita_realizada
         meta.percentual_realizacao = (receita_realizada / meta.meta_receita * 100) if meta.meta_receita > 0 else 0
@@ -590,7 +426,7 @@ def metas_vendas(request):
 @login_required
 def despesas_operacionais(request):
     """Gestão de despesas operacionais."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
     # Filtros
     status = request.GET.get('status', 'todas')
@@ -646,7 +482,7 @@ def despesas_operacionais(request):
 @login_required
 def adicionar_despesa(request):
     """Adicionar nova despesa operacional."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     
     if request.method == 'POST':
         form = DespesaOperacionalForm(request.POST)
@@ -685,7 +521,7 @@ def adicionar_despesa(request):
 @login_required
 def editar_despesa(request, despesa_id):
     """Editar despesa operacional existente."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     despesa = get_object_or_404(
         DespesaOperacional, 
         id=despesa_id, 
@@ -713,7 +549,7 @@ def editar_despesa(request, despesa_id):
 @login_required
 def excluir_despesa(request, despesa_id):
     """Excluir despesa operacional."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     despesa = get_object_or_404(
         DespesaOperacional, 
         id=despesa_id, 
@@ -735,7 +571,7 @@ def excluir_despesa(request, despesa_id):
 @login_required
 def marcar_despesa_paga(request, despesa_id):
     """Marca despesa como paga."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     despesa = get_object_or_404(
         DespesaOperacional, 
         id=despesa_id, 
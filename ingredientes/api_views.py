@@ -4,14 +4,17 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
+from autenticacao.condicional import calcular_etag, marcar_versao, nao_modificado
+from autenticacao.listagem import PARAMETROS_LISTAGEM, ListagemAPIView
 from .models import Ingrediente
 from .forms import IngredienteForm
 
 
 @extend_schema(
     tags=['ingredientes'],
-    summary='Listar todos os ingredientes',
-    description='Retorna uma lista de todos os ingredientes cadastrados no sistema',
+    summary='Listar os ingredientes',
+    description='Retorna os ingredientes da pizzaria do usuário, paginados por cursor',
+    parameters=PARAMETROS_LISTAGEM,
     responses={
         200: {
             'description': 'Lista de ingredientes retornada com sucesso',
@@ -31,30 +34,29 @@ from .forms import IngredienteForm
                             'contem_lactose': {'type': 'boolean'},
                         }
                     }
-                }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
             }
-        }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'},
     }
 )
-class IngredientesListView(APIView):
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        """Lista todos os ingredientes"""
-        ingredientes = Ingrediente.objects.all()
-        data = []
-        for ingrediente in ingredientes:
-            data.append({
-                'id': ingrediente.id,
-                'nome': ingrediente.nome,
-                'descricao': ingrediente.descricao,
-                'vegetariano': ingrediente.vegetariano,
-                'vegano': ingrediente.vegano,
-                'contem_gluten': ingrediente.contem_gluten,
-                'contem_lactose': ingrediente.contem_lactose,
-            })
-        
-        return Response({'ingredientes': data})
+class IngredientesListView(ListagemAPIView):
+    """Lista os ingredientes da pizzaria"""
+
+    model = Ingrediente
+    chave = 'ingredientes'
+    campos_atualizacao = ('atualizado_em',)
+    campos = {
+        'id': 'id',
+        'nome': 'nome',
+        'descricao': 'descricao',
+        'vegetariano': 'vegetariano',
+        'vegano': 'vegano',
+        'contem_gluten': 'contem_gluten',
+        'contem_lactose': 'contem_lactose',
+    }
 
 
 @extend_schema(
@@ -107,9 +109,8 @@ class IngredienteCreateView(APIView):
         if form.is_valid():
             ingrediente = form.save(commit=False)
             # Define a pizzaria do usuário logado
-            from autenticacao.models import UsuarioPizzaria
-            try:
-                usuario_pizzaria = UsuarioPizzaria.objects.get(usuario=request.user, ativo=True)
+            usuario_pizzaria = request.tenant.usuario_pizzaria
+            if usuario_pizzaria is not None:
                 ingrediente.pizzaria = usuario_pizzaria.pizzaria
                 ingrediente.save()
                 return Response({
@@ -124,7 +125,7 @@ class IngredienteCreateView(APIView):
                         'contem_lactose': ingrediente.contem_lactose,
                     }
                 }, status=status.HTTP_201_CREATED)
-            except UsuarioPizzaria.DoesNotExist:
+            else:
                 return Response({
                     'error': 'Usuário não está associado a uma pizzaria ativa'
                 }, status=status.HTTP_400_BAD_REQUEST)
@@ -175,6 +176,18 @@ class IngredienteDetailView(APIView):
     
     def get(self, request, ingrediente_id):
         """Exibe os detalhes de um ingrediente específico"""
+        ultima_alteracao = Ingrediente.objects.filter(id=ingrediente_id).values_list(
+            'atualizado_em', flat=True
+        ).first()
+        if ultima_alteracao is None:
+            return Response({
+                'error': 'Ingrediente não encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+        etag = calcular_etag('ingrediente', ingrediente_id, ultima_alteracao)
+        resposta = nao_modificado(request, etag, ultima_alteracao)
+        if resposta is not None:
+            return resposta
+
         try:
             ingrediente = Ingrediente.objects.get(id=ingrediente_id)
         except Ingrediente.DoesNotExist:
@@ -182,7 +195,7 @@ class IngredienteDetailView(APIView):
                 'error': 'Ingrediente não encontrado'
             }, status=status.HTTP_404_NOT_FOUND)
 
-        return Response({
+        return marcar_versao(Response({
             'ingrediente': {
                 'id': ingrediente.id,
                 'nome': ingrediente.nome,
@@ -192,4 +205,4 @@ class IngredienteDetailView(APIView):
                 'contem_gluten': ingrediente.contem_gluten,
                 'contem_lactose': ingrediente.contem_lactose,
             }
-        })
+        }), etag, ingrediente.atualizado_em)
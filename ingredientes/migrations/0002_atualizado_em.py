@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ingredientes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingrediente',
+            name='atualizado_em',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -12,6 +12,7 @@ class Ingrediente(models.Model):
     vegano = models.BooleanField(default=False)
     contem_gluten = models.BooleanField(default=False)
     contem_lactose = models.BooleanField(default=False)
+    atualizado_em = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Ingrediente"
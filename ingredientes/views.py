@@ -1,7 +1,7 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.shortcuts import render, redirect, get_object_or_404
-from autenticacao.models import UsuarioPizzaria
 from .models import Ingrediente
 from .forms import IngredienteForm
 
@@ -11,7 +11,7 @@ def lista_ingredientes(request):
     Lista os ingredientes da pizzaria do usuário logado e processa
     o formulário de adição de um novo ingrediente.
     """
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     
     if request.method == 'POST':
         form = IngredienteForm(request.POST)
@@ -31,7 +31,9 @@ def lista_ingredientes(request):
                 ingrediente.pizzaria = usuario_pizzaria.pizzaria
             
             try:
-                ingrediente.save()
+                # Savepoint: o erro de nome duplicado não invalida a transação da requisição
+                with transaction.atomic():
+                    ingrediente.save()
                 messages.success(request, f"Ingrediente '{ingrediente.nome}' salvo com sucesso!")
             except Exception:
                 messages.error(request, f"Já existe um ingrediente com o nome '{ingrediente.nome}'.")
@@ -60,7 +62,7 @@ def lista_ingredientes(request):
 @login_required
 def editar_ingrediente(request, ingrediente_id):
     """Edita um ingrediente existente."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     ingrediente = get_object_or_404(Ingrediente, id=ingrediente_id)
 
     # Verifica se o usuário tem permissão sobre esse ingrediente
@@ -89,7 +91,7 @@ def editar_ingrediente(request, ingrediente_id):
 @login_required
 def excluir_ingrediente(request, ingrediente_id):
     """Exclui um ingrediente após confirmação."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     ingrediente = get_object_or_404(Ingrediente, id=ingrediente_id)
 
     if not usuario_pizzaria.is_super_admin() and ingrediente.pizzaria != usuario_pizzaria.pizzaria:
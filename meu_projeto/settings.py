@@ -50,11 +50,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Opt-in (DESEMPENHO_PERFILAMENTO_ATIVO); o primeiro da lista mede todos os demais
+    'autenticacao.desempenho.PerfilamentoMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'autenticacao.tenant.TenantMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -94,6 +97,54 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# O LocMemCache é por processo: com vários workers, configure um backend
+# compartilhado (ex.: django.core.cache.backends.redis.RedisCache) para que
+# as invalidações cheguem a todos.
+
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='gestao-pizzarias'),
+    }
+}
+
+# Tempo (segundos) das métricas do dashboard financeiro em cache
+FINANCEIRO_DASHBOARD_CACHE_TIMEOUT = config('FINANCEIRO_DASHBOARD_CACHE_TIMEOUT', default=60, cast=int)
+
+# Tempo (segundos) de cada versão do cardápio compilado. Os signals de
+# produtos trocam a versão no cache; com o LocMemCache só o worker que salvou
+# vê a troca, e este tempo limita o atraso dos demais. Com cache compartilhado
+# pode ser aumentado.
+PRODUTOS_CARDAPIO_CACHE_TIMEOUT = config('PRODUTOS_CARDAPIO_CACHE_TIMEOUT', default=60, cast=int)
+
+# Usuários com o tenant (vínculo + pizzaria) no cache local de cada processo
+AUTENTICACAO_TENANT_CACHE_MAX_USUARIOS = config('AUTENTICACAO_TENANT_CACHE_MAX_USUARIOS', default=1024, cast=int)
+
+# Validade (segundos) do tenant no cache local e na sessão. Com o LocMemCache
+# a troca de versão não chega aos outros workers: é o prazo máximo para um
+# vínculo desativado ou alterado deixar de valer em todos eles.
+AUTENTICACAO_TENANT_CACHE_TTL = config('AUTENTICACAO_TENANT_CACHE_TTL', default=30, cast=int)
+
+# Feed de eventos dos pedidos. Cada requisição aberta no feed ocupa um worker
+# enquanto espera: o painel usa o long-poll JSON, que responde assim que há
+# eventos ou em até PEDIDOS_EVENTOS_ESPERA segundos. Com workers síncronos
+# (WSGI), dimensione os workers para os painéis abertos (ex.: 10+ terminais
+# por loja) ou rode com workers gevent/ASGI; o stream SSE prende o worker por
+# PEDIDOS_EVENTOS_DURACAO_STREAM segundos e só é indicado nesse caso.
+PEDIDOS_EVENTOS_ESPERA = config('PEDIDOS_EVENTOS_ESPERA', default=20, cast=int)
+PEDIDOS_EVENTOS_DURACAO_STREAM = config('PEDIDOS_EVENTOS_DURACAO_STREAM', default=25, cast=int)
+PEDIDOS_EVENTOS_INTERVALO = config('PEDIDOS_EVENTOS_INTERVALO', default=1, cast=int)
+
+# Perfilamento por view (latência, consultas SQL, N+1, tamanho da resposta).
+# Desligado por padrão; as medidas de cada processo são gravadas a cada
+# DESEMPENHO_INTERVALO_GRAVACAO segundos e mantidas por DESEMPENHO_RETENCAO_DIAS
+DESEMPENHO_PERFILAMENTO_ATIVO = config('DESEMPENHO_PERFILAMENTO_ATIVO', default=False, cast=bool)
+DESEMPENHO_INTERVALO_GRAVACAO = config('DESEMPENHO_INTERVALO_GRAVACAO', default=60, cast=int)
+DESEMPENHO_RETENCAO_DIAS = config('DESEMPENHO_RETENCAO_DIAS', default=30, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
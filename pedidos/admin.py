@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Pedido, ItemPedido
+from .models import Pedido, ItemPedido, EventoPedido
 
 class ItemPedidoInline(admin.TabularInline):
     model = ItemPedido
@@ -11,3 +11,9 @@ class PedidoAdmin(admin.ModelAdmin):
     list_display = ("id", "pizzaria", "cliente_nome", "status", "total", "data_criacao")
     list_filter = ("status", "pizzaria")
     inlines = [ItemPedidoInline]
+
+
+@admin.register(EventoPedido)
+class EventoPedidoAdmin(admin.ModelAdmin):
+    list_display = ("id", "pizzaria", "sequencia", "pedido", "tipo", "criado_em")
+    list_filter = ("tipo", "pizzaria")
@@ -1,17 +1,25 @@
+from django.core.exceptions import ValidationError
+from django.db.models import Max, Value
+from django.db.models.functions import Coalesce, NullIf
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
+from autenticacao.condicional import calcular_etag, marcar_versao, nao_modificado
+from autenticacao.listagem import PARAMETROS_LISTAGEM, ListagemAPIView, data_iso
+from clientes.services import CONFIANCA_ID, ResolvedorCliente
 from .models import Pedido, ItemPedido
 from .forms import PedidoForm, ItemPedidoForm
+from .services import criar_pedido
 
 
 @extend_schema(
     tags=['pedidos'],
-    summary='Listar todos os pedidos',
-    description='Retorna uma lista de todos os pedidos cadastrados no sistema',
+    summary='Listar os pedidos',
+    description='Retorna os pedidos da pizzaria do usuário, dos mais recentes aos mais antigos, paginados por cursor',
+    parameters=PARAMETROS_LISTAGEM,
     responses={
         200: {
             'description': 'Lista de pedidos retornada com sucesso',
@@ -29,28 +37,41 @@ from .forms import PedidoForm, ItemPedidoForm
                             'status': {'type': 'string'},
                         }
                     }
-                }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
             }
-        }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'},
     }
 )
-class PedidosListView(APIView):
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        """Lista todos os pedidos"""
-        pedidos = Pedido.objects.all()
-        data = []
-        for pedido in pedidos:
-            data.append({
-                'id': pedido.id,
-                'cliente': pedido.get_cliente_nome(),
-                'data_pedido': pedido.data_criacao.strftime('%Y-%m-%d') if pedido.data_criacao else None,
-                'valor_total': float(pedido.total) if pedido.total else 0,
-                'status': pedido.get_status_display(),
-            })
-        
-        return Response({'pedidos': data})
+class PedidosListView(ListagemAPIView):
+    """Lista os pedidos da pizzaria"""
+
+    model = Pedido
+    chave = 'pedidos'
+    campo_criacao = 'data_criacao'
+    campos_atualizacao = ('data_atualizacao', 'cliente__data_atualizacao')
+    campos = {
+        'id': 'id',
+        'cliente': 'cliente_exibido',
+        'data_pedido': 'data_criacao',
+        'valor_total': 'total',
+        'status': 'status',
+    }
+    conversoes = {
+        'data_pedido': data_iso,
+        'valor_total': float,
+        'status': dict(Pedido.STATUS_CHOICES).get,
+    }
+
+    def get_queryset(self, pizzaria):
+        # Mesmo texto de Pedido.get_cliente_nome, calculado no banco
+        return super().get_queryset(pizzaria).annotate(
+            cliente_exibido=Coalesce(
+                'cliente__nome', NullIf('cliente_nome', Value('')), Value('Cliente não informado')
+            )
+        )
 
 
 @extend_schema(
@@ -62,11 +83,30 @@ class PedidosListView(APIView):
             'type': 'object',
             'properties': {
                 'cliente': {'type': 'integer', 'description': 'ID do cliente (opcional)'},
-                'cliente_nome': {'type': 'string', 'description': 'Nome do cliente (para pedidos sem cadastro)'},
-                'cliente_telefone': {'type': 'string', 'description': 'Telefone do cliente (para pedidos sem cadastro)'},
+                'cliente_nome': {
+                    'type': 'string',
+                    'description': 'Nome do cliente; sem ``cliente``, é usado para encontrar o cadastro',
+                },
+                'cliente_telefone': {
+                    'type': 'string',
+                    'description': 'Telefone do cliente; sem ``cliente``, é usado para encontrar o cadastro',
+                },
                 'observacoes': {'type': 'string', 'description': 'Observações do pedido'},
                 'forma_pagamento': {'type': 'string', 'description': 'Forma de pagamento'},
                 'status': {'type': 'string', 'description': 'Status do pedido'},
+                'itens': {
+                    'type': 'array',
+                    'description': 'Itens do pedido (preço de venda vigente de cada produto)',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'produto': {'type': 'integer', 'description': 'ID do produto'},
+                            'quantidade': {'type': 'integer', 'description': 'Quantidade (padrão 1)'},
+                            'observacao': {'type': 'string', 'description': 'Observação do item'},
+                        },
+                        'required': ['produto']
+                    }
+                },
             },
             'required': ['forma_pagamento']
         }
@@ -82,6 +122,11 @@ class PedidosListView(APIView):
                     'properties': {
                         'id': {'type': 'integer'},
                         'cliente': {'type': 'string'},
+                        'cliente_id': {'type': 'integer', 'nullable': True},
+                        'confianca_cliente': {
+                            'type': 'number',
+                            'description': 'Confiança (0 a 1) do cliente associado; 0 sem cadastro',
+                        },
                         'data_pedido': {'type': 'string', 'format': 'date'},
                         'valor_total': {'type': 'number'},
                         'status': {'type': 'string'},
@@ -97,14 +142,56 @@ class PedidoCreateView(APIView):
     
     def post(self, request):
         """Cadastra um novo pedido"""
+        usuario_pizzaria = request.tenant.usuario_pizzaria
+        if not usuario_pizzaria or not usuario_pizzaria.pizzaria:
+            return Response({
+                'error': 'Usuário sem pizzaria associada'
+            }, status=status.HTTP_403_FORBIDDEN)
+        pizzaria = usuario_pizzaria.pizzaria
+
         form = PedidoForm(request.data)
         if form.is_valid():
-            pedido = form.save()
+            campos = form.cleaned_data
+            if campos.get('cliente') and campos['cliente'].pizzaria_id != pizzaria.id:
+                return Response({
+                    'error': 'Dados inválidos',
+                    'details': {'cliente': ['Cliente não pertence à pizzaria.']}
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            if campos.get('cliente'):
+                confianca = CONFIANCA_ID
+            else:
+                # Sem cadastro selecionado: associa o cliente encontrado pelo nome/telefone
+                cliente, confianca = ResolvedorCliente(pizzaria).resolver(
+                    nome=campos.get('cliente_nome', ''), telefone=campos.get('cliente_telefone', '')
+                )
+                if cliente:
+                    campos.update(cliente=cliente, cliente_nome='', cliente_telefone='')
+
+            itens = [
+                {
+                    'produto_id': item.get('produto'),
+                    'quantidade': item.get('quantidade', 1),
+                    'observacao': item.get('observacao', ''),
+                }
+                for item in request.data.get('itens') or []
+                if isinstance(item, dict)
+            ]
+            try:
+                pedido = criar_pedido(pizzaria, itens, **campos)
+            except ValidationError as e:
+                return Response({
+                    'error': 'Dados inválidos',
+                    'details': {'itens': e.messages}
+                }, status=status.HTTP_400_BAD_REQUEST)
+
             return Response({
                 'message': f'Pedido #{pedido.id} criado com sucesso!',
                 'pedido': {
                     'id': pedido.id,
                     'cliente': pedido.get_cliente_nome(),
+                    'cliente_id': pedido.cliente_id,
+                    'confianca_cliente': confianca,
                     'data_pedido': pedido.data_criacao.strftime('%Y-%m-%d') if pedido.data_criacao else None,
                     'valor_total': float(pedido.total) if pedido.total else 0,
                     'status': pedido.get_status_display(),
@@ -169,15 +256,29 @@ class PedidoDetailView(APIView):
     
     def get(self, request, pedido_id):
         """Exibe os detalhes de um pedido específico"""
+        # Itens só mudam com o pedido salvo; nomes de produto vêm da alteração dos produtos
+        versao = Pedido.objects.filter(id=pedido_id).annotate(
+            alteracao_produtos=Max('itens__produto__atualizado_em')
+        ).values_list('data_atualizacao', 'cliente__data_atualizacao', 'alteracao_produtos').first()
+        if versao is None:
+            return Response({
+                'error': 'Pedido não encontrado'
+            }, status=status.HTTP_404_NOT_FOUND)
+        ultima_alteracao, alteracao_cliente, alteracao_produtos = versao
+        etag = calcular_etag('pedido', pedido_id, ultima_alteracao, alteracao_cliente, alteracao_produtos)
+        resposta = nao_modificado(request, etag, ultima_alteracao)
+        if resposta is not None:
+            return resposta
+
         try:
-            pedido = Pedido.objects.get(id=pedido_id)
+            pedido = Pedido.objects.select_related('cliente').get(id=pedido_id)
         except Pedido.DoesNotExist:
             return Response({
                 'error': 'Pedido não encontrado'
             }, status=status.HTTP_404_NOT_FOUND)
 
         # Buscar itens do pedido
-        itens = ItemPedido.objects.filter(pedido=pedido)
+        itens = ItemPedido.objects.filter(pedido=pedido).select_related('produto')
         itens_data = []
         for item in itens:
             itens_data.append({
@@ -188,7 +289,7 @@ class PedidoDetailView(APIView):
                 'subtotal': float(item.subtotal) if item.subtotal else 0,
             })
 
-        return Response({
+        return marcar_versao(Response({
             'pedido': {
                 'id': pedido.id,
                 'cliente': pedido.get_cliente_nome(),
@@ -198,4 +299,4 @@ class PedidoDetailView(APIView):
                 'observacoes': pedido.observacoes,
                 'itens': itens_data
             }
-        })
+        }), etag, pedido.data_atualizacao)
@@ -0,0 +1,108 @@
+import json
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+
+from .models import EventoPedido
+
+
+LIMITE_LOTE = 200
+
+
+def _configuracao(nome, padrao):
+    return getattr(settings, nome, padrao)
+
+
+def ultimo_evento_id(pizzaria):
+    """Número (``sequencia``) do evento mais recente da pizzaria (0 se não houver)."""
+    ultimo = (
+        EventoPedido.objects.filter(pizzaria=pizzaria)
+        .order_by("-sequencia")
+        .values_list("sequencia", flat=True)
+        .first()
+    )
+    return ultimo or 0
+
+
+def eventos_desde(pizzaria, cursor, limite=LIMITE_LOTE):
+    """Eventos da pizzaria posteriores ao ``cursor``, em ordem.
+
+    O cursor é a ``sequencia`` do evento, numerada sob lock e confirmada em
+    ordem (ver ``SequenciaEventosPedido``): um evento visível garante que
+    todos os anteriores também estão, então nada fica para trás do cursor.
+    """
+    return list(
+        EventoPedido.objects.filter(pizzaria=pizzaria, sequencia__gt=cursor)
+        .order_by("sequencia")
+        .values("sequencia", "tipo", "dados", "criado_em")[:limite]
+    )
+
+
+def _liberar_conexao():
+    """A conexão não deve ficar presa à requisição durante a espera."""
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+def aguardar_eventos(pizzaria, cursor, espera, intervalo=None):
+    """Long-poll: eventos após o ``cursor``, esperando até ``espera`` segundos.
+
+    Responde assim que houver eventos; sem eventos, consulta de novo a cada
+    ``intervalo`` segundos até o fim da espera e devolve a lista vazia.
+    """
+    if intervalo is None:
+        intervalo = _configuracao("PEDIDOS_EVENTOS_INTERVALO", 1)
+    fim = time.monotonic() + espera
+    while True:
+        eventos = eventos_desde(pizzaria, cursor)
+        restante = fim - time.monotonic()
+        if eventos or restante <= 0:
+            return eventos
+        _liberar_conexao()
+        time.sleep(min(intervalo, restante))
+
+
+def serializar_evento(evento):
+    """Dicionário JSON do evento (usado no SSE e no long-poll)."""
+    return {
+        "id": evento["sequencia"],
+        "tipo": evento["tipo"],
+        "criado_em": evento["criado_em"].isoformat(),
+        **evento["dados"],
+    }
+
+
+def formatar_sse(evento):
+    """Formata um evento no protocolo Server-Sent Events."""
+    dados = json.dumps(serializar_evento(evento), ensure_ascii=False)
+    return f"id: {evento['sequencia']}\nevent: {evento['tipo']}\ndata: {dados}\n\n"
+
+
+def stream_eventos(pizzaria, cursor, duracao=None, intervalo=None):
+    """Gera o stream SSE a partir do ``cursor`` até ``duracao`` segundos.
+
+    Ao fim da duração a conexão é encerrada e o navegador reconecta
+    sozinho enviando ``Last-Event-ID``. Entre as consultas é enviado um
+    comentário de keep-alive para que proxies não derrubem a conexão ociosa.
+    O stream ocupa um worker durante toda a duração: com workers síncronos
+    prefira o long-poll (``aguardar_eventos``).
+    """
+    if duracao is None:
+        duracao = _configuracao("PEDIDOS_EVENTOS_DURACAO_STREAM", 25)
+    if intervalo is None:
+        intervalo = _configuracao("PEDIDOS_EVENTOS_INTERVALO", 1)
+    fim = time.monotonic() + duracao
+
+    yield f"retry: {int(intervalo * 1000)}\n\n"
+    while True:
+        eventos = eventos_desde(pizzaria, cursor)
+        for evento in eventos:
+            cursor = evento["sequencia"]
+            yield formatar_sse(evento)
+        _liberar_conexao()
+        if time.monotonic() >= fim:
+            break
+        if len(eventos) < LIMITE_LOTE:
+            yield ": keep-alive\n\n"
+            time.sleep(intervalo)
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pedidos.models import EventoPedido
+
+
+class Command(BaseCommand):
+    help = 'Remove eventos de pedidos antigos do feed dos painéis'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias',
+            type=int,
+            default=7,
+            help='Mantém os eventos dos últimos N dias (padrão: 7)',
+        )
+
+    def handle(self, *args, **options):
+        limite = timezone.now() - timedelta(days=options['dias'])
+        removidos, _ = EventoPedido.objects.filter(criado_em__lt=limite).delete()
+
+        self.stdout.write(
+            self.style.SUCCESS(f'{removidos} evento(s) anteriores a {limite:%d/%m/%Y %H:%M} removido(s).')
+        )
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0001_initial'),
+        ('pedidos', '0003_pedido_estoque_baixado'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('criado', 'Pedido criado'), ('status', 'Status alterado'), ('cancelado', 'Pedido cancelado')], max_length=10)),
+                ('dados', models.JSONField(default=dict)),
+                ('criado_em', models.DateTimeField(default=django.utils.timezone.now)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos', to='pedidos.pedido')),
+                ('pizzaria', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='eventos_pedidos', to='autenticacao.pizzaria')),
+            ],
+            options={
+                'verbose_name': 'Evento de Pedido',
+                'verbose_name_plural': 'Eventos de Pedido',
+                'ordering': ('id',),
+                'indexes': [models.Index(fields=['pizzaria', 'id'], name='evento_pedido_pizzaria_id')],
+            },
+        ),
+    ]
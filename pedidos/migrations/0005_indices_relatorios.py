@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0001_initial'),
+        ('clientes', '0001_initial'),
+        ('pedidos', '0004_eventopedido'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['pizzaria', 'status', 'data_criacao'], name='pedido_pizzaria_status_data'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['pizzaria', '-data_criacao'], name='pedido_pizzaria_data'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['cliente', '-data_criacao'], name='pedido_cliente_data'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('status', 'ENTREGUE')), fields=['pizzaria', 'data_criacao'], name='pedido_entregue_data'),
+        ),
+    ]
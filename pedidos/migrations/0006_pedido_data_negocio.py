@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:47
+
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+
+from django.db import migrations, models
+from django.db.models import DateTimeField, ExpressionWrapper, F, Value
+from django.db.models.functions import TruncDate
+
+
+def expressao_data_negocio(campo, fuso_horario, hora_fechamento):
+    # Cópia congelada de autenticacao.models.expressao_data_negocio na época desta migração
+    fechamento = timedelta(hours=hora_fechamento.hour, minutes=hora_fechamento.minute)
+    return TruncDate(
+        ExpressionWrapper(F(campo) - Value(fechamento), output_field=DateTimeField()),
+        tzinfo=ZoneInfo(fuso_horario),
+    )
+
+
+def preencher_data_negocio(apps, schema_editor):
+    Pedido = apps.get_model('pedidos', 'Pedido')
+    Pizzaria = apps.get_model('autenticacao', 'Pizzaria')
+    for pizzaria in Pizzaria.objects.all():
+        Pedido.objects.filter(pizzaria=pizzaria).update(
+            data_negocio=expressao_data_negocio('data_criacao', pizzaria.fuso_horario, pizzaria.hora_fechamento)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0002_pizzaria_data_negocio'),
+        ('clientes', '0001_initial'),
+        ('pedidos', '0005_indices_relatorios'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='pedido',
+            name='pedido_entregue_data',
+        ),
+        migrations.AddField(
+            model_name='pedido',
+            name='data_negocio',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(preencher_data_negocio, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='pedido',
+            name='data_negocio',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('status', 'ENTREGUE')), fields=['pizzaria', 'data_negocio'], name='pedido_entregue_negocio'),
+        ),
+    ]
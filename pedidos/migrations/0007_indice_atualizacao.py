@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0003_metrica_desempenho'),
+        ('clientes', '0006_indice_atualizacao'),
+        ('pedidos', '0006_pedido_data_negocio'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['pizzaria', 'data_atualizacao'], name='pedido_pizzaria_atualizacao'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-17 04:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def numerar_eventos(apps, schema_editor):
+    # Eventos existentes recebem o próprio id: os cursores já entregues continuam valendo
+    EventoPedido = apps.get_model('pedidos', 'EventoPedido')
+    SequenciaEventosPedido = apps.get_model('pedidos', 'SequenciaEventosPedido')
+    EventoPedido.objects.update(sequencia=F('id'))
+    SequenciaEventosPedido.objects.bulk_create([
+        SequenciaEventosPedido(pizzaria_id=linha['pizzaria_id'], ultimo=linha['ultimo'])
+        for linha in EventoPedido.objects.values('pizzaria_id').annotate(ultimo=Max('id')).order_by()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('autenticacao', '0003_metrica_desempenho'),
+        ('pedidos', '0007_indice_atualizacao'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SequenciaEventosPedido',
+            fields=[
+                ('pizzaria', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='sequencia_eventos_pedidos', serialize=False, to='autenticacao.pizzaria')),
+                ('ultimo', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Sequência de Eventos de Pedido',
+                'verbose_name_plural': 'Sequências de Eventos de Pedido',
+            },
+        ),
+        migrations.RemoveIndex(
+            model_name='eventopedido',
+            name='evento_pedido_pizzaria_id',
+        ),
+        migrations.AddField(
+            model_name='eventopedido',
+            name='sequencia',
+            field=models.PositiveBigIntegerField(null=True),
+        ),
+        migrations.RunPython(numerar_eventos, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='eventopedido',
+            name='sequencia',
+            field=models.PositiveBigIntegerField(),
+        ),
+        migrations.AddConstraint(
+            model_name='eventopedido',
+            constraint=models.UniqueConstraint(fields=('pizzaria', 'sequencia'), name='evento_pedido_sequencia'),
+        ),
+    ]
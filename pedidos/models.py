@@ -1,11 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
+from autenticacao.mixins import RastreamentoCamposMixin
 from autenticacao.models import Pizzaria
 from produtos.models import Produto
 
 
-class Pedido(models.Model):
+class Pedido(RastreamentoCamposMixin, models.Model):
     STATUS_CHOICES = [
         ("RASCUNHO", "Rascunho"),
         ("RECEBIDO", "Recebido"),
@@ -53,8 +54,27 @@ class Pedido(models.Model):
     data_criacao = models.DateTimeField(default=timezone.now)
     data_atualizacao = models.DateTimeField(auto_now=True)
 
+    # Dia de operação no fuso da pizzaria, preenchido no save (relatórios filtram e agrupam por ele)
+    data_negocio = models.DateField(editable=False)
+
+    campos_rastreados = ("status", "total", "forma_pagamento", "data_criacao", "data_negocio", "cliente_id")
+
     class Meta:
         ordering = ("-data_criacao",)
+        indexes = [
+            # Listagens e relatórios: pizzaria + status + período
+            models.Index(fields=("pizzaria", "status", "data_criacao"), name="pedido_pizzaria_status_data"),
+            models.Index(fields=("pizzaria", "-data_criacao"), name="pedido_pizzaria_data"),
+            models.Index(fields=("cliente", "-data_criacao"), name="pedido_cliente_data"),
+            # Versão (COUNT/MAX da atualização) das leituras condicionais da API
+            models.Index(fields=("pizzaria", "data_atualizacao"), name="pedido_pizzaria_atualizacao"),
+            # Relatórios de vendas só leem pedidos entregues, pelo dia de operação
+            models.Index(
+                fields=("pizzaria", "data_negocio"),
+                name="pedido_entregue_negocio",
+                condition=models.Q(status="ENTREGUE"),
+            ),
+        ]
 
     def __str__(self):
         return f"Pedido #{self.id} - {self.pizzaria.nome}"
@@ -68,94 +88,88 @@ class Pedido(models.Model):
     # Estoque
     # --------------------------------------------------
 
-    def _converter_unidade(self, quantidade, unidade_origem, unidade_destino):
-        """Converte quantidade entre g, kg e un.
+    def _baixar_estoque(self):
+        """Abate os ingredientes usados neste pedido do estoque."""
+        from estoque.services import baixar_estoque_pedido  # import local para evitar ciclos
 
-        A lógica é similar à utilizada em Produto/ProdutoIngrediente.
-        """
-        if unidade_origem == unidade_destino:
-            return quantidade
+        return baixar_estoque_pedido(self)
 
-        # Caso envolva unidade de peça não convertível
-        if unidade_origem == 'un' or unidade_destino == 'un':
-            raise ValueError("Não é possível converter entre unidade e peso.")
+    def _preencher_data_negocio(self, kwargs):
+        """Calcula ``data_negocio`` em pedidos novos e quando ``data_criacao`` é gravada alterada."""
+        update_fields = kwargs.get("update_fields")
+        if self.data_negocio is not None and not (
+            self.campo_alterado("data_criacao")
+            and (update_fields is None or "data_criacao" in update_fields)
+        ):
+            return
+        self.data_negocio = self.pizzaria.data_negocio(self.data_criacao)
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "data_negocio"}
 
-        if unidade_origem == 'g' and unidade_destino == 'kg':
-            return quantidade / 1000
-        if unidade_origem == 'kg' and unidade_destino == 'g':
-            return quantidade * 1000
+    def save(self, *args, **kwargs):
+        """Sobrescreve save para realizar baixa de estoque ao mudar status e registrar o evento do pedido."""
+        self._preencher_data_negocio(kwargs)
+
+        # O tipo do evento é decidido antes de salvar, enquanto o status original é conhecido
+        tipo_evento = self._tipo_evento()
+
+        # Se status está em PRONTO ou ENTREGUE e estoque ainda não foi baixado
+        baixar_estoque = self.status in {"PRONTO", "ENTREGUE"} and not self.estoque_baixado
+        update_fields = kwargs.get("update_fields")
+        if baixar_estoque and update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "estoque_baixado"}
+
+        # Linha e evento confirmam juntos: o feed não perde uma alteração salva.
+        # Sem savepoint, como o próprio save_base: um erro desfaz a transação toda.
+        with transaction.atomic(savepoint=False):
+            # Numerado antes da baixa: os locks são tomados sempre na ordem sequência → estoques
+            sequencia = SequenciaEventosPedido.proximo(self.pizzaria_id) if tipo_evento else None
+            if baixar_estoque:
+                # Pedidos novos ainda não têm itens: não há o que baixar.
+                # Para os existentes, a marcação condicional garante que não
+                # corra mais de uma vez, mesmo com requisições simultâneas.
+                if not self._state.adding and self.pk and Pedido.objects.filter(
+                    pk=self.pk, estoque_baixado=False
+                ).update(estoque_baixado=True):
+                    self._baixar_estoque()
+                self.estoque_baixado = True
+            super().save(*args, **kwargs)
+            self._registrar_evento(tipo_evento, sequencia)
 
-        raise ValueError(f"Conversão não suportada: {unidade_origem} → {unidade_destino}")
+    # --------------------------------------------------
+    # Eventos
+    # --------------------------------------------------
 
-    def _baixar_estoque(self):
-        """Abate os ingredientes usados neste pedido do estoque."""
-        from estoque.models import EstoqueIngrediente  # import local para evitar ciclos
-
-        for item in self.itens.select_related('produto').all():
-            produto = item.produto
-
-            # Percorrer ingredientes do produto
-            for prod_ing in produto.produto_ingredientes.select_related('ingrediente').all():
-                ingrediente = prod_ing.ingrediente
-
-                # Quantidade total necessária = quantidade por produto × quantidade de itens
-                quantidade_necessaria = prod_ing.quantidade * item.quantidade
-
-                try:
-                    estoque = ingrediente.estoque
-                except EstoqueIngrediente.DoesNotExist:
-                    # Se não houver estoque, simplesmente continuar
-                    continue
-
-                # Converter para unidade do estoque
-                try:
-                    quantidade_convertida = self._converter_unidade(
-                        quantidade_necessaria,
-                        prod_ing.unidade,
-                        estoque.unidade_medida,
-                    )
-                except Exception:
-                    # Se não conseguir converter, ignora este ingrediente
-                    continue
-
-                # Subtrair do estoque
-                estoque_antes = estoque.quantidade_atual
-                estoque.quantidade_atual = max(0, estoque.quantidade_atual - quantidade_convertida)
-                estoque.save(update_fields=["quantidade_atual", "data_atualizacao"])
-
-                # Registrar histórico de uso
-                from estoque.models import HistoricoUsoIngrediente
-
-                HistoricoUsoIngrediente.objects.create(
-                    ingrediente=ingrediente,
-                    pedido=self,
-                    quantidade=quantidade_convertida,
-                    unidade=estoque.unidade_medida,
-                    estoque_antes=estoque_antes,
-                    estoque_depois=estoque.quantidade_atual,
-                )
+    def _tipo_evento(self):
+        """Tipo do evento que o save atual deve gerar (ou ``None``)."""
+        if self._state.adding:
+            return EventoPedido.TIPO_CRIADO
+        if not self.tem_valor_original("status") or not self.campo_alterado("status"):
+            return None
+        if self.status == "CANCELADO":
+            return EventoPedido.TIPO_CANCELADO
+        return EventoPedido.TIPO_STATUS
+
+    def _registrar_evento(self, tipo, sequencia):
+        """Grava o evento, com o número ``sequencia``, na mesma transação do save."""
+        if tipo is None:
+            return None
+        dados = {
+            "pedido_id": self.pk,
+            "status": self.status,
+            "status_display": self.get_status_display(),
+            "total": str(self.total),
+        }
+        if tipo == EventoPedido.TIPO_CRIADO:
+            dados["cliente"] = self.get_cliente_nome()
+        return EventoPedido.objects.create(
+            pizzaria_id=self.pizzaria_id,
+            pedido_id=self.pk,
+            sequencia=sequencia,
+            tipo=tipo,
+            dados=dados,
+        )
 
-    def save(self, *args, **kwargs):
-        """Sobrescreve save para realizar baixa de estoque ao mudar status."""
-        # Verificar se o objeto já existe para detectar mudança de status
-        if self.pk:
-            original = Pedido.objects.get(pk=self.pk)
-            status_anterior = original.status
-        else:
-            status_anterior = None
-
-        super().save(*args, **kwargs)
-
-        # Se status mudou para PRONTO ou ENTREGUE e estoque ainda não foi baixado
-        if (
-            self.status in {"PRONTO", "ENTREGUE"}
-            and not self.estoque_baixado
-        ):
-            # Garantir que não corra mais de uma vez
-            self._baixar_estoque()
-            self.estoque_baixado = True
-            super().save(update_fields=["estoque_baixado"])
-    
     def get_cliente_nome(self):
         """Retorna o nome do cliente (cadastrado ou informado)"""
         if self.cliente:
@@ -190,3 +204,79 @@ class ItemPedido(models.Model):
 
     def __str__(self):
         return f"{self.quantidade}x {self.produto.nome} (Pedido {self.pedido.id})"
+
+
+class SequenciaEventosPedido(models.Model):
+    """Número do último evento de pedido de cada pizzaria.
+
+    A linha é bloqueada ao numerar um evento e só é liberada no commit: o
+    evento seguinte só recebe número depois que o anterior confirmou. Assim
+    os números ficam visíveis em ordem e sem lacunas, e o cursor do feed não
+    passa por cima de um evento ainda não confirmado (o que pode acontecer
+    com o ``id``, reservado na inserção).
+    """
+
+    pizzaria = models.OneToOneField(
+        Pizzaria,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="sequencia_eventos_pedidos",
+    )
+    ultimo = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Sequência de Eventos de Pedido"
+        verbose_name_plural = "Sequências de Eventos de Pedido"
+
+    @classmethod
+    def proximo(cls, pizzaria_id):
+        """Reserva o próximo número de evento da pizzaria (deve rodar em transação)."""
+        sequencia, _ = cls.objects.select_for_update().get_or_create(pizzaria_id=pizzaria_id)
+        sequencia.ultimo += 1
+        sequencia.save(update_fields=["ultimo"])
+        return sequencia.ultimo
+
+
+class EventoPedido(models.Model):
+    """Alteração de pedido publicada para os painéis (feed de eventos).
+
+    Gravado no mesmo save do ``Pedido``; a ``sequencia`` da pizzaria
+    (ver ``SequenciaEventosPedido``) serve de cursor para que clientes
+    reconectando recebam apenas o que perderam.
+    """
+
+    TIPO_CRIADO = "criado"
+    TIPO_STATUS = "status"
+    TIPO_CANCELADO = "cancelado"
+    TIPO_CHOICES = [
+        (TIPO_CRIADO, "Pedido criado"),
+        (TIPO_STATUS, "Status alterado"),
+        (TIPO_CANCELADO, "Pedido cancelado"),
+    ]
+
+    pizzaria = models.ForeignKey(
+        Pizzaria,
+        on_delete=models.CASCADE,
+        related_name="eventos_pedidos",
+    )
+    pedido = models.ForeignKey(
+        Pedido,
+        on_delete=models.CASCADE,
+        related_name="eventos",
+    )
+    sequencia = models.PositiveBigIntegerField()
+    tipo = models.CharField(max_length=10, choices=TIPO_CHOICES)
+    dados = models.JSONField(default=dict)
+    criado_em = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Evento de Pedido"
+        verbose_name_plural = "Eventos de Pedido"
+        ordering = ("id",)
+        constraints = [
+            # Também serve o feed: pizzaria + sequência após o cursor
+            models.UniqueConstraint(fields=("pizzaria", "sequencia"), name="evento_pedido_sequencia"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - Pedido #{self.pedido_id}"
@@ -0,0 +1,159 @@
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from produtos.models import PrecoProduto, Produto
+from .models import Pedido, ItemPedido
+
+
+def extrair_itens(dados):
+    """Lê os itens enviados pelo formulário de pedidos (``item_produto_N``, ``item_qtd_N``, ``item_obs_N``).
+
+    Retorna uma lista de dicionários ``{produto_id, quantidade, observacao}`` na ordem do formulário.
+    """
+    itens = []
+    for key, value in dados.items():
+        if key.startswith("item_produto_") and value:
+            idx = key.split("_")[2]
+            itens.append({
+                "produto_id": value,
+                "quantidade": dados.get(f"item_qtd_{idx}", 1),
+                "observacao": dados.get(f"item_obs_{idx}", ""),
+            })
+    return itens
+
+
+def carregar_produtos(pizzaria, produto_ids):
+    """Busca, em uma única consulta, os produtos da pizzaria com o preço de venda vigente (em centavos)."""
+    preco_vigente = PrecoProduto.objects.filter(
+        produto=OuterRef("pk"),
+        data_fim__isnull=True,
+    ).order_by("-data_inicio").values("preco_venda_centavos")[:1]
+
+    produtos = Produto.objects.filter(pizzaria=pizzaria, id__in=produto_ids).annotate(
+        preco_venda_vigente_centavos=Subquery(preco_vigente)
+    )
+    return {produto.id: produto for produto in produtos}
+
+
+def validar_itens(pizzaria, itens):
+    """Valida os itens em memória e retorna ``[(produto, quantidade, valor_unitario, observacao)]``.
+
+    Produtos inexistentes ou de outra pizzaria são ignorados; quantidades
+    inválidas geram ``ValidationError``.
+    """
+    produto_ids = set()
+    for item in itens:
+        try:
+            produto_ids.add(int(item["produto_id"]))
+        except (TypeError, ValueError):
+            continue
+
+    produtos = carregar_produtos(pizzaria, produto_ids) if produto_ids else {}
+
+    validados = []
+    for item in itens:
+        try:
+            produto = produtos.get(int(item["produto_id"]))
+        except (TypeError, ValueError):
+            produto = None
+        if produto is None:
+            continue
+
+        quantidade = item.get("quantidade")
+        try:
+            quantidade = 1 if quantidade in (None, "") else int(quantidade)
+        except (TypeError, ValueError):
+            raise ValidationError(f"Quantidade inválida para {produto.nome}.")
+        if quantidade < 1:
+            raise ValidationError(f"Quantidade inválida para {produto.nome}.")
+
+        valor_unitario = Decimal(produto.preco_venda_vigente_centavos or 0) / 100
+        validados.append((produto, quantidade, valor_unitario, item.get("observacao") or ""))
+
+    return validados
+
+
+def _recalcular_venda(pedido):
+    from financeiro.services import recalcular_venda_do_pedido  # import local para evitar ciclos
+
+    recalcular_venda_do_pedido(pedido)
+
+
+def criar_pedido(pizzaria, itens, **campos):
+    """Cria o pedido com todos os itens em uma única transação.
+
+    Produtos e preços são resolvidos em uma consulta, os itens são inseridos
+    com ``bulk_create`` e o total é calculado em memória.
+    """
+    validados = validar_itens(pizzaria, itens)
+    total = sum((valor * quantidade for _, quantidade, valor, _ in validados), Decimal("0"))
+
+    with transaction.atomic():
+        pedido = Pedido.objects.create(pizzaria=pizzaria, total=total, **campos)
+        ItemPedido.objects.bulk_create([
+            ItemPedido(
+                pedido=pedido,
+                produto=produto,
+                quantidade=quantidade,
+                valor_unitario=valor_unitario,
+                observacao_item=observacao,
+            )
+            for produto, quantidade, valor_unitario, observacao in validados
+        ])
+        if pedido.status == "ENTREGUE" and validados:
+            # O resumo diário foi lançado no save, antes dos itens existirem
+            _recalcular_venda(pedido)
+    return pedido
+
+
+def atualizar_pedido(pedido, itens):
+    """Salva o pedido aplicando apenas as diferenças nos itens.
+
+    Itens existentes são casados por produto e observação: os mantidos são
+    atualizados em lote (quando quantidade ou preço mudam), os que sobraram
+    são removidos e os novos são inseridos com ``bulk_create``.
+    """
+    validados = validar_itens(pedido.pizzaria, itens)
+
+    with transaction.atomic():
+        existentes = {}
+        for item in pedido.itens.all():
+            existentes.setdefault((item.produto_id, item.observacao_item), []).append(item)
+
+        alterados, novos = [], []
+        total = Decimal("0")
+        for produto, quantidade, valor_unitario, observacao in validados:
+            total += valor_unitario * quantidade
+            candidatos = existentes.get((produto.id, observacao))
+            if candidatos:
+                item = candidatos.pop(0)
+                if item.quantidade != quantidade or item.valor_unitario != valor_unitario:
+                    item.quantidade = quantidade
+                    item.valor_unitario = valor_unitario
+                    alterados.append(item)
+            else:
+                novos.append(ItemPedido(
+                    pedido=pedido,
+                    produto=produto,
+                    quantidade=quantidade,
+                    valor_unitario=valor_unitario,
+                    observacao_item=observacao,
+                ))
+
+        removidos = [item.id for restantes in existentes.values() for item in restantes]
+        if removidos:
+            ItemPedido.objects.filter(id__in=removidos).delete()
+        if alterados:
+            ItemPedido.objects.bulk_update(alterados, ["quantidade", "valor_unitario"])
+        if novos:
+            ItemPedido.objects.bulk_create(novos)
+
+        pedido.total = total
+        pedido.save()
+        if pedido.status == "ENTREGUE" and (removidos or alterados or novos):
+            # O resumo diário conta os itens, que o save do pedido não acompanha
+            _recalcular_venda(pedido)
+    return pedido
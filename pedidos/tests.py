@@ -0,0 +1,392 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from decimal import Decimal
+
+from autenticacao.models import Pizzaria, UsuarioPizzaria
+from clientes.models import Cliente
+from produtos.models import Produto, PrecoProduto
+from .models import Pedido, ItemPedido, EventoPedido
+from .services import criar_pedido, atualizar_pedido, extrair_itens
+
+
+class PedidoServicesTestCase(TestCase):
+    """Testes para a montagem de pedidos em lote."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123",
+            telefone="(11) 99999-9999"
+        )
+        self.outra_pizzaria = Pizzaria.objects.create(
+            nome="Outra Pizzaria",
+            cnpj="98765432000110",
+            endereco="Rua Outra, 456",
+            telefone="(11) 88888-8888"
+        )
+
+        self.produtos = []
+        for nome, preco in [("Margherita", 4500), ("Calabresa", 4000), ("Refrigerante", 800)]:
+            produto = Produto.objects.create(pizzaria=self.pizzaria, nome=nome)
+            PrecoProduto.objects.create(
+                produto=produto,
+                preco_base_centavos=preco,
+                preco_venda_centavos=preco,
+            )
+            self.produtos.append(produto)
+        self.margherita, self.calabresa, self.refrigerante = self.produtos
+
+        self.produto_outra = Produto.objects.create(pizzaria=self.outra_pizzaria, nome="Portuguesa")
+
+    def _itens(self, *pares):
+        return [
+            {"produto_id": produto.id, "quantidade": quantidade, "observacao": ""}
+            for produto, quantidade in pares
+        ]
+
+    def test_extrair_itens(self):
+        """Testa a leitura dos itens enviados pelo formulário."""
+        dados = {
+            "item_produto_0": str(self.margherita.id),
+            "item_qtd_0": "2",
+            "item_obs_0": "sem cebola",
+            "item_produto_1": "",
+            "item_qtd_1": "5",
+        }
+
+        itens = extrair_itens(dados)
+
+        self.assertEqual(itens, [
+            {"produto_id": str(self.margherita.id), "quantidade": "2", "observacao": "sem cebola"}
+        ])
+
+    def test_criar_pedido_calcula_total(self):
+        """Testa criação do pedido com itens e total calculado em memória."""
+        pedido = criar_pedido(
+            self.pizzaria,
+            self._itens((self.margherita, 2), (self.refrigerante, 3), (self.produto_outra, 1)),
+            forma_pagamento="PIX",
+        )
+
+        self.assertEqual(pedido.total, Decimal("114.00"))
+        self.assertEqual(pedido.itens.count(), 2)
+        item = pedido.itens.get(produto=self.margherita)
+        self.assertEqual(item.valor_unitario, Decimal("45.00"))
+        self.assertEqual(item.quantidade, 2)
+
+    def test_criar_pedido_consultas_fixas(self):
+        """Testa que o número de consultas não depende da quantidade de itens."""
+        # O primeiro pedido cria a sequência de eventos da pizzaria
+        criar_pedido(self.pizzaria, self._itens((self.margherita, 1)), forma_pagamento="DIN")
+
+        # Inclui numerar o evento: SELECT ... FOR UPDATE e UPDATE da sequência
+        with self.assertNumQueries(8):
+            criar_pedido(
+                self.pizzaria,
+                self._itens((self.margherita, 1), (self.calabresa, 2), (self.refrigerante, 3)),
+                forma_pagamento="DIN",
+            )
+
+    def test_criar_pedido_quantidade_invalida(self):
+        """Testa que quantidade inválida não cria pedido."""
+        with self.assertRaises(ValidationError):
+            criar_pedido(self.pizzaria, self._itens((self.margherita, 0)), forma_pagamento="DIN")
+
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_atualizar_pedido_aplica_diferencas(self):
+        """Testa que a edição mantém, altera, remove e insere apenas o necessário."""
+        pedido = criar_pedido(
+            self.pizzaria,
+            self._itens((self.margherita, 1), (self.calabresa, 1)),
+            forma_pagamento="DIN",
+        )
+        item_margherita = pedido.itens.get(produto=self.margherita)
+
+        with self.assertNumQueries(8):
+            atualizar_pedido(pedido, self._itens((self.margherita, 3), (self.refrigerante, 2)))
+
+        pedido.refresh_from_db()
+        self.assertEqual(pedido.total, Decimal("151.00"))
+        self.assertEqual(
+            set(pedido.itens.values_list("produto_id", "quantidade")),
+            {(self.margherita.id, 3), (self.refrigerante.id, 2)},
+        )
+        # O item mantido é atualizado no lugar, não recriado
+        self.assertTrue(ItemPedido.objects.filter(pk=item_margherita.pk, quantidade=3).exists())
+
+
+class PedidoCreateAPITestCase(TestCase):
+    """Testes para a criação de pedidos pela API."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123",
+            telefone="(11) 99999-9999"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="testuser",
+            email="teste@teste.com",
+            password="testpass123"
+        )
+        UsuarioPizzaria.objects.create(
+            usuario=self.user,
+            pizzaria=self.pizzaria,
+            papel="dono_pizzaria"
+        )
+        self.produto = Produto.objects.create(pizzaria=self.pizzaria, nome="Margherita")
+        PrecoProduto.objects.create(
+            produto=self.produto,
+            preco_base_centavos=4500,
+            preco_venda_centavos=4500,
+        )
+        self.client.force_login(self.user)
+
+    def test_criar_pedido_com_itens(self):
+        """Testa criação de pedido com itens pela API."""
+        response = self.client.post(
+            reverse("pedidos_api:pedido_create"),
+            {
+                "forma_pagamento": "PIX",
+                "status": "RECEBIDO",
+                "cliente_nome": "João",
+                "itens": [{"produto": self.produto.id, "quantidade": 2}],
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        pedido = Pedido.objects.get(pk=response.json()["pedido"]["id"])
+        self.assertEqual(pedido.pizzaria, self.pizzaria)
+        self.assertEqual(pedido.total, Decimal("90.00"))
+        self.assertEqual(pedido.itens.count(), 1)
+
+
+    def test_associa_cliente_pelo_telefone(self):
+        """Testa que, sem cliente selecionado, o cadastro é encontrado pelo telefone."""
+        cliente = Cliente.objects.create(pizzaria=self.pizzaria, nome="João Silva", telefone="11955554444")
+
+        response = self.client.post(
+            reverse("pedidos_api:pedido_create"),
+            {
+                "forma_pagamento": "PIX",
+                "status": "RECEBIDO",
+                "cliente_nome": "Joãozinho",
+                "cliente_telefone": "(11) 95555-4444",
+                "itens": [{"produto": self.produto.id}],
+            },
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["pedido"]["cliente_id"], cliente.pk)
+        self.assertEqual(response.json()["pedido"]["confianca_cliente"], 0.8)
+        pedido = Pedido.objects.get(pk=response.json()["pedido"]["id"])
+        self.assertEqual((pedido.cliente, pedido.cliente_nome, pedido.cliente_telefone), (cliente, "", ""))
+
+
+class ProdutosDisponiveisTestCase(TestCase):
+    """Testes para os produtos disponíveis oferecidos nas telas de pedido."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123",
+            telefone="(11) 99999-9999"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="testuser",
+            email="teste@teste.com",
+            password="testpass123"
+        )
+        UsuarioPizzaria.objects.create(
+            usuario=self.user,
+            pizzaria=self.pizzaria,
+            papel="dono_pizzaria"
+        )
+        self._produtos(["Margherita", "Calabresa"])
+        self.pedido = Pedido.objects.create(
+            pizzaria=self.pizzaria,
+            cliente_nome="Maria",
+            forma_pagamento="DIN",
+        )
+        self.client.force_login(self.user)
+        # Tenant já em cache, como em uma sessão em uso (página sem cardápio)
+        self.client.get(reverse("lista_clientes"))
+
+    def _produtos(self, nomes):
+        # Executa os on_commit para que o cardápio em cache mude de versão
+        with self.captureOnCommitCallbacks(execute=True):
+            for nome in nomes:
+                produto = Produto.objects.create(pizzaria=self.pizzaria, nome=nome)
+                PrecoProduto.objects.create(
+                    produto=produto,
+                    preco_base_centavos=4000,
+                    preco_venda_centavos=4500,
+                )
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(consultas), response
+
+    def test_editar_pedido_consultas_fixas(self):
+        """Testa que os dados de edição não consultam o preço produto a produto."""
+        url = reverse("editar_pedido", args=[self.pedido.id])
+        antes, _ = self._consultas(url)
+        self._produtos(["Portuguesa", "Quatro Queijos", "Refrigerante"])
+
+        depois, response = self._consultas(url)
+
+        self.assertEqual(depois, antes)
+        produtos = response.json()["produtos_disponiveis"]
+        self.assertEqual(len(produtos), 5)
+        self.assertEqual({produto["preco"] for produto in produtos}, {45.0})
+
+        # Cardápio em cache: nenhuma consulta a produtos ou preços
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.get(url)
+        self.assertFalse([q for q in consultas if 'FROM "produtos_' in q["sql"]])
+
+    def test_lista_pedidos_consultas_fixas(self):
+        """Testa que a lista de pedidos não consulta o preço produto a produto."""
+        antes, _ = self._consultas(reverse("lista_pedidos"))
+        self._produtos(["Portuguesa", "Quatro Queijos", "Refrigerante"])
+
+        depois, response = self._consultas(reverse("lista_pedidos"))
+
+        self.assertEqual(depois, antes)
+        self.assertContains(response, 'nome: "Portuguesa", preco: 45.0}')
+
+
+class EventoPedidoTestCase(TestCase):
+    """Testes para o feed de eventos dos pedidos."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123",
+            telefone="(11) 99999-9999"
+        )
+        self.user = get_user_model().objects.create_user(
+            username="testuser",
+            email="teste@teste.com",
+            password="testpass123"
+        )
+        UsuarioPizzaria.objects.create(
+            usuario=self.user,
+            pizzaria=self.pizzaria,
+            papel="dono_pizzaria"
+        )
+        self.pedido = Pedido.objects.create(
+            pizzaria=self.pizzaria,
+            cliente_nome="Maria",
+            forma_pagamento="DIN",
+        )
+        self.client.force_login(self.user)
+
+    def test_eventos_gerados_no_save(self):
+        """Testa que criação, mudança de status e cancelamento geram eventos."""
+        self.pedido.observacoes = "Sem troco"
+        self.pedido.save()
+        self.pedido.status = "EM_PREPARO"
+        self.pedido.save(update_fields=["status"])
+        self.pedido.status = "CANCELADO"
+        self.pedido.save(update_fields=["status"])
+
+        eventos = list(EventoPedido.objects.values_list("tipo", "dados__status"))
+        self.assertEqual(eventos, [
+            ("criado", "RECEBIDO"),
+            ("status", "EM_PREPARO"),
+            ("cancelado", "CANCELADO"),
+        ])
+
+    def test_eventos_numerados_em_sequencia_por_pizzaria(self):
+        """Testa que cada pizzaria numera seus eventos sem lacunas."""
+        outra = Pizzaria.objects.create(nome="Outra", cnpj="98765432000110", endereco="Rua Outra, 456")
+        Pedido.objects.create(pizzaria=outra, cliente_nome="João", forma_pagamento="DIN")
+        self.pedido.status = "EM_PREPARO"
+        self.pedido.save()
+
+        self.assertEqual(
+            list(EventoPedido.objects.order_by("id").values_list("pizzaria_id", "sequencia")),
+            [(self.pizzaria.id, 1), (outra.id, 1), (self.pizzaria.id, 2)],
+        )
+        self.assertEqual(self.pizzaria.sequencia_eventos_pedidos.ultimo, 2)
+
+    def test_feed_json_a_partir_do_cursor(self):
+        """Testa que o feed devolve apenas os eventos após o cursor."""
+        cursor = EventoPedido.objects.get().sequencia
+        self.client.post(
+            reverse("alterar_status_pedido", args=[self.pedido.id]),
+            {"status": "EM_PREPARO"},
+        )
+
+        response = self.client.get(reverse("eventos_pedidos"), {"cursor": cursor, "formato": "json"})
+
+        dados = response.json()
+        self.assertEqual([evento["tipo"] for evento in dados["eventos"]], ["status"])
+        self.assertEqual(dados["eventos"][0]["pedido_id"], self.pedido.id)
+        self.assertEqual(dados["cursor"], dados["eventos"][0]["id"])
+
+    def test_long_poll_espera_pelo_proximo_evento(self):
+        """Testa que o long-poll sem eventos pendentes responde com o evento gravado durante a espera."""
+        from unittest import mock
+
+        cursor = EventoPedido.objects.get().sequencia
+
+        def gravar_evento(segundos):
+            self.pedido.status = "PRONTO"
+            self.pedido.save(update_fields=["status"])
+
+        with mock.patch("pedidos.eventos.time.sleep", side_effect=gravar_evento) as espera:
+            response = self.client.get(
+                reverse("eventos_pedidos"), {"cursor": cursor, "formato": "json", "espera": "5"}
+            )
+
+        espera.assert_called_once()
+        dados = response.json()
+        self.assertEqual([evento["status"] for evento in dados["eventos"]], ["PRONTO"])
+        self.assertEqual(dados["cursor"], cursor + 1)
+
+    @override_settings(PEDIDOS_EVENTOS_ESPERA=20)
+    def test_long_poll_limita_a_espera(self):
+        """Testa que a espera do long-poll é limitada e que sem eventos a resposta vem vazia."""
+        cursor = EventoPedido.objects.get().sequencia
+        url = reverse("eventos_pedidos")
+
+        response = self.client.get(url, {"cursor": cursor, "formato": "json", "espera": "0"})
+        self.assertEqual(response.json(), {"eventos": [], "cursor": cursor})
+
+        for espera in ("21", "-1", "abc"):
+            response = self.client.get(url, {"cursor": cursor, "formato": "json", "espera": espera})
+            self.assertEqual(response.status_code, 400)
+
+    @override_settings(PEDIDOS_EVENTOS_DURACAO_STREAM=0)
+    def test_stream_sse_retoma_pelo_last_event_id(self):
+        """Testa que a reconexão recebe só os eventos perdidos."""
+        cursor = EventoPedido.objects.get().sequencia
+        self.pedido.status = "EM_PREPARO"
+        self.pedido.save()
+        evento = EventoPedido.objects.latest("sequencia")
+
+        response = self.client.get(reverse("eventos_pedidos"), HTTP_LAST_EVENT_ID=str(cursor))
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        conteudo = b"".join(response.streaming_content).decode()
+        self.assertIn(f"id: {evento.sequencia}\nevent: status\n", conteudo)
+        self.assertNotIn(f"id: {cursor}\n", conteudo)
@@ -3,6 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.lista_pedidos, name='lista_pedidos'),
+    path('eventos/', views.eventos_pedidos, name='eventos_pedidos'),
     path('<int:pedido_id>/alterar-status/', views.alterar_status_pedido, name='alterar_status_pedido'),
     path('<int:pedido_id>/detalhes/', views.detalhes_pedido, name='detalhes_pedido'),
     path('<int:pedido_id>/editar/', views.editar_pedido, name='editar_pedido'),
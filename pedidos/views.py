@@ -1,14 +1,20 @@
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import ValidationError
+from django.db.models import Max
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
-from autenticacao.models import UsuarioPizzaria
-from produtos.models import Produto
-from .models import Pedido, ItemPedido
+from django.http import JsonResponse, StreamingHttpResponse
+from autenticacao.condicional import calcular_etag, marcar_versao, nao_modificado
+from clientes.services import ResolvedorCliente
+from produtos.cardapio import cardapio
+from .models import Pedido
+from .eventos import aguardar_eventos, serializar_evento, stream_eventos, ultimo_evento_id
+from .services import criar_pedido, atualizar_pedido, extrair_itens
 from django.contrib import messages
 
 @login_required
 def lista_pedidos(request):
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
 
     if request.method == "POST":
@@ -23,102 +29,90 @@ def lista_pedidos(request):
             messages.error(request, "Forma de pagamento é obrigatória.")
             return redirect("lista_pedidos")
 
-        # Buscar cliente se foi selecionado
-        cliente = None
-        if cliente_id:
-            try:
-                from clientes.models import Cliente
-                cliente = Cliente.objects.get(id=cliente_id, pizzaria=pizzaria)
-            except Cliente.DoesNotExist:
-                cliente = None
-        else:
-            # Se não foi selecionado um cliente, tentar encontrar por nome/telefone
-            from clientes.models import Cliente
-            from django.db.models import Q
-            
-            if cliente_nome:
-                # Buscar cliente por nome exato primeiro
-                cliente = Cliente.objects.filter(
-                    nome__iexact=cliente_nome,
-                    pizzaria=pizzaria
-                ).first()
-                
-                # Se não encontrou e tem telefone, buscar por telefone
-                if not cliente and cliente_telefone:
-                    cliente = Cliente.objects.filter(
-                        telefone=cliente_telefone,
-                        pizzaria=pizzaria
-                    ).first()
-                    
-                # Se ainda não encontrou, buscar por nome similar
-                if not cliente:
-                    clientes_similares = Cliente.objects.filter(
-                        nome__icontains=cliente_nome.split()[0],  # Primeiro nome
-                        pizzaria=pizzaria
-                    )
-                    if clientes_similares.count() == 1:
-                        cliente = clientes_similares.first()
-            elif cliente_telefone:
-                # Buscar apenas por telefone
-                cliente = Cliente.objects.filter(
-                    telefone=cliente_telefone,
-                    pizzaria=pizzaria
-                ).first()
-
-        pedido = Pedido.objects.create(
-            pizzaria=pizzaria,
-            cliente=cliente,
-            cliente_nome=cliente_nome if not cliente else "",
-            cliente_telefone=cliente_telefone if not cliente else "",
-            forma_pagamento=forma_pagamento,
-            observacoes=observacoes,
-            status="RECEBIDO",
-        )
-
-        # Processar itens
-        for key, value in request.POST.items():
-            if key.startswith("item_produto_") and value:
-                idx = key.split("_")[2]
-                produto_id = value
-                qtd = int(request.POST.get(f"item_qtd_{idx}", 1))
-                obs_item = request.POST.get(f"item_obs_{idx}", "")
+        # Cliente selecionado ou, pelo nome/telefone digitado, o cadastro mais provável
+        cliente, _ = ResolvedorCliente(pizzaria).resolver(cliente_id, cliente_nome, cliente_telefone)
 
-                try:
-                    produto = Produto.objects.get(id=produto_id, pizzaria=pizzaria)
-                except Produto.DoesNotExist:
-                    continue
+        try:
+            pedido = criar_pedido(
+                pizzaria,
+                extrair_itens(request.POST),
+                cliente=cliente,
+                cliente_nome=cliente_nome if not cliente else "",
+                cliente_telefone=cliente_telefone if not cliente else "",
+                forma_pagamento=forma_pagamento,
+                observacoes=observacoes,
+                status="RECEBIDO",
+            )
+        except ValidationError as e:
+            messages.error(request, " ".join(e.messages))
+            return redirect("lista_pedidos")
 
-                ItemPedido.objects.create(
-                    pedido=pedido,
-                    produto=produto,
-                    quantidade=qtd,
-                    valor_unitario=produto.preco_venda_atual,
-                    observacao_item=obs_item,
-                )
-        # Atualizar total
-        pedido.atualizar_total()
         messages.success(request, f"Pedido #{pedido.id} criado com sucesso!")
         return redirect("lista_pedidos")
 
     # GET - listar
     pedidos = Pedido.objects.filter(pizzaria=pizzaria).select_related("pizzaria").prefetch_related("itens__produto")
-    produtos = Produto.objects.filter(pizzaria=pizzaria, disponivel=True).order_by('nome')
 
     context = {
         "pedidos": pedidos,
-        "produtos_disponiveis": produtos,
+        "produtos_disponiveis": cardapio(pizzaria.pk)['produtos'],
         "status_choices": Pedido.STATUS_CHOICES,
+        # Cursor do feed de eventos: o painel recebe só o que mudou depois da renderização
+        "ultimo_evento_id": ultimo_evento_id(pizzaria),
     }
     return render(request, "pedidos/lista_pedidos.html", context)
 
 
+@login_required
+def eventos_pedidos(request):
+    """Feed de eventos dos pedidos da pizzaria (long-poll JSON ou Server-Sent Events).
+
+    O cursor vem do cabeçalho ``Last-Event-ID`` (reconexão automática do
+    ``EventSource``) ou do parâmetro ``cursor``; sem cursor, o feed começa
+    no evento mais recente. Com ``formato=json`` (usado pelo painel) é um
+    long-poll: responde assim que houver eventos após o cursor ou, sem
+    eventos, ao fim de ``espera`` segundos (limitada a
+    ``PEDIDOS_EVENTOS_ESPERA``). Sem ``formato`` abre o stream SSE.
+    """
+    usuario_pizzaria = request.tenant.obter_ou_404()
+    pizzaria = usuario_pizzaria.pizzaria
+    if not pizzaria:
+        return JsonResponse({"error": "Usuário sem pizzaria associada"}, status=403)
+
+    cursor = request.headers.get("Last-Event-ID") or request.GET.get("cursor")
+    try:
+        cursor = int(cursor) if cursor else ultimo_evento_id(pizzaria)
+    except ValueError:
+        return JsonResponse({"error": "Cursor inválido"}, status=400)
+
+    if request.GET.get("formato") == "json":
+        espera_maxima = getattr(settings, "PEDIDOS_EVENTOS_ESPERA", 20)
+        try:
+            espera = float(request.GET.get("espera", espera_maxima))
+        except ValueError:
+            return JsonResponse({"error": "Espera inválida"}, status=400)
+        if not 0 <= espera <= espera_maxima:
+            return JsonResponse({"error": f"A espera deve estar entre 0 e {espera_maxima} segundos"}, status=400)
+
+        eventos = aguardar_eventos(pizzaria, cursor, espera)
+        return JsonResponse({
+            "eventos": [serializar_evento(evento) for evento in eventos],
+            "cursor": eventos[-1]["sequencia"] if eventos else cursor,
+        })
+
+    response = StreamingHttpResponse(stream_eventos(pizzaria, cursor), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
+
 @login_required
 def alterar_status_pedido(request, pedido_id):
     """Altera o status de um pedido via AJAX."""
     if request.method != "POST":
         return JsonResponse({"error": "Método não permitido"}, status=405)
     
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pedido = get_object_or_404(Pedido, id=pedido_id)
     
     # Verificar permissão
@@ -152,13 +146,25 @@ def alterar_status_pedido(request, pedido_id):
 @login_required
 def detalhes_pedido(request, pedido_id):
     """Retorna detalhes do pedido em JSON para o modal."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
-    pedido = get_object_or_404(Pedido, id=pedido_id)
-    
+    usuario_pizzaria = request.tenant.obter_ou_404()
+    pizzaria_id, ultima_alteracao, alteracao_produtos = get_object_or_404(
+        Pedido.objects.annotate(alteracao_produtos=Max('itens__produto__atualizado_em'))
+        .values_list('pizzaria_id', 'data_atualizacao', 'alteracao_produtos'),
+        id=pedido_id,
+    )
+
     # Verificar permissão
-    if not usuario_pizzaria.is_super_admin() and pedido.pizzaria != usuario_pizzaria.pizzaria:
+    if not usuario_pizzaria.is_super_admin() and pizzaria_id != usuario_pizzaria.pizzaria_id:
         return JsonResponse({"error": "Permissão negada"}, status=403)
-    
+
+    # Itens só mudam com o pedido salvo; nomes de produto vêm da alteração dos produtos
+    etag = calcular_etag('detalhes_pedido', pedido_id, ultima_alteracao, alteracao_produtos)
+    resposta = nao_modificado(request, etag, ultima_alteracao)
+    if resposta is not None:
+        return resposta
+
+    pedido = get_object_or_404(Pedido, id=pedido_id)
+
     # Preparar dados do pedido
     itens = []
     for item in pedido.itens.select_related('produto').all():
@@ -182,7 +188,7 @@ def detalhes_pedido(request, pedido_id):
         'itens': itens
     }
     
-    return JsonResponse(dados)
+    return marcar_versao(JsonResponse(dados), etag, pedido.data_atualizacao)
 
 
 @login_required
@@ -191,7 +197,7 @@ def cancelar_pedido(request, pedido_id):
     if request.method != "POST":
         return JsonResponse({"error": "Método não permitido"}, status=405)
     
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pedido = get_object_or_404(Pedido, id=pedido_id)
     
     # Verificar permissão
@@ -215,7 +221,7 @@ def cancelar_pedido(request, pedido_id):
 @login_required
 def editar_pedido(request, pedido_id):
     """Edita um pedido existente."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pedido = get_object_or_404(Pedido, id=pedido_id)
     
     # Verificar permissão
@@ -233,49 +239,11 @@ def editar_pedido(request, pedido_id):
             cliente_nome = request.POST.get("cliente_nome", "")
             cliente_telefone = request.POST.get("cliente_telefone", "")
             
-            # Buscar cliente se foi selecionado
-            cliente = None
-            pizzaria = pedido.pizzaria  # Definir pizzaria aqui
-            if cliente_id:
-                try:
-                    from clientes.models import Cliente
-                    cliente = Cliente.objects.get(id=cliente_id, pizzaria=pizzaria)
-                except Cliente.DoesNotExist:
-                    cliente = None
-            else:
-                # Se não foi selecionado um cliente, tentar encontrar por nome/telefone
-                from clientes.models import Cliente
-                from django.db.models import Q
-                
-                if cliente_nome:
-                    # Buscar cliente por nome exato primeiro
-                    cliente = Cliente.objects.filter(
-                        nome__iexact=cliente_nome,
-                        pizzaria=pizzaria
-                    ).first()
-                    
-                    # Se não encontrou e tem telefone, buscar por telefone
-                    if not cliente and cliente_telefone:
-                        cliente = Cliente.objects.filter(
-                            telefone=cliente_telefone,
-                            pizzaria=pizzaria
-                        ).first()
-                        
-                    # Se ainda não encontrou, buscar por nome similar
-                    if not cliente:
-                        clientes_similares = Cliente.objects.filter(
-                            nome__icontains=cliente_nome.split()[0],  # Primeiro nome
-                            pizzaria=pizzaria
-                        )
-                        if clientes_similares.count() == 1:
-                            cliente = clientes_similares.first()
-                elif cliente_telefone:
-                    # Buscar apenas por telefone
-                    cliente = Cliente.objects.filter(
-                        telefone=cliente_telefone,
-                        pizzaria=pizzaria
-                    ).first()
-            
+            # Cliente selecionado ou, pelo nome/telefone digitado, o cadastro mais provável
+            cliente, _ = ResolvedorCliente(pedido.pizzaria).resolver(
+                cliente_id, cliente_nome, cliente_telefone
+            )
+
             # Atualizar pedido
             pedido.cliente = cliente
             pedido.cliente_nome = cliente_nome if not cliente else ""
@@ -287,41 +255,16 @@ def editar_pedido(request, pedido_id):
             if not pedido.forma_pagamento:
                 return JsonResponse({"error": "Forma de pagamento é obrigatória"}, status=400)
             
-            pedido.save()
-            
-            # Remover itens existentes
-            pedido.itens.all().delete()
-            
-            # Adicionar novos itens
-            pizzaria = pedido.pizzaria
-            for key, value in request.POST.items():
-                if key.startswith("item_produto_") and value:
-                    idx = key.split("_")[2]
-                    produto_id = value
-                    qtd = int(request.POST.get(f"item_qtd_{idx}", 1))
-                    obs_item = request.POST.get(f"item_obs_{idx}", "")
-
-                    try:
-                        produto = Produto.objects.get(id=produto_id, pizzaria=pizzaria)
-                    except Produto.DoesNotExist:
-                        continue
-
-                    ItemPedido.objects.create(
-                        pedido=pedido,
-                        produto=produto,
-                        quantidade=qtd,
-                        valor_unitario=produto.preco_venda_atual,
-                        observacao_item=obs_item,
-                    )
-            
-            # Atualizar total
-            pedido.atualizar_total()
+            # Salvar pedido aplicando apenas as diferenças nos itens
+            atualizar_pedido(pedido, extrair_itens(request.POST))
             
             return JsonResponse({
                 "success": True,
                 "message": f"Pedido #{pedido.id} atualizado com sucesso!"
             })
             
+        except ValidationError as e:
+            return JsonResponse({"error": f"Erro ao salvar pedido: {' '.join(e.messages)}"}, status=400)
         except Exception as e:
             return JsonResponse({"error": f"Erro ao salvar pedido: {str(e)}"}, status=400)
     
@@ -335,13 +278,8 @@ def editar_pedido(request, pedido_id):
             'observacao': item.observacao_item or ''
         })
     
-    produtos_disponiveis = []
-    for produto in Produto.objects.filter(pizzaria=pedido.pizzaria, disponivel=True):
-        produtos_disponiveis.append({
-            'id': produto.id,
-            'nome': produto.nome,
-            'preco': float(produto.preco_venda_atual)
-        })
+    # Cardápio compilado (cache versionado por pizzaria)
+    produtos_disponiveis = cardapio(pedido.pizzaria_id)['produtos']
     
     # Informações do cliente
     if pedido.cliente:
@@ -350,8 +288,8 @@ def editar_pedido(request, pedido_id):
             'cliente_nome': pedido.cliente.nome,
             'cliente_telefone': pedido.cliente.telefone,
             'cliente_endereco': pedido.cliente.endereco_principal.endereco_completo() if pedido.cliente.endereco_principal else '',
-            'cliente_total_pedidos': pedido.cliente.total_pedidos(),
-            'cliente_total_gasto': pedido.cliente.total_gasto(),
+            'cliente_total_pedidos': pedido.cliente.total_pedidos,
+            'cliente_total_gasto': pedido.cliente.total_gasto,
         }
     else:
         cliente_info = {
@@ -7,6 +7,7 @@ urlpatterns = [
     # Produtos
     path('produtos/', api_views.ProdutosListView.as_view(), name='produtos_list'),
     path('produtos/criar/', api_views.ProdutoCreateView.as_view(), name='produto_create'),
+    path('produtos/cardapio/', api_views.CardapioView.as_view(), name='cardapio'),
     
     # Categorias
     path('categorias/', api_views.CategoriasListView.as_view(), name='categorias_list'),
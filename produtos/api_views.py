@@ -4,14 +4,20 @@ from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from drf_spectacular.types import OpenApiTypes
-from .models import Produto, CategoriaProduto, ProdutoIngrediente
+from django.db.models import OuterRef, Subquery
+
+from autenticacao.condicional import calcular_etag, marcar_versao, nao_modificado, versao_linhas
+from autenticacao.listagem import PARAMETROS_LISTAGEM, ListagemAPIView, reais
+from .cardapio import cardapio, versao_cardapio
+from .models import Produto, CategoriaProduto, PrecoProduto, ProdutoIngrediente
 from .forms import ProdutoForm, CategoriaForm
 
 
 @extend_schema(
     tags=['produtos'],
-    summary='Listar todos os produtos',
-    description='Retorna uma lista de todos os produtos cadastrados no sistema',
+    summary='Listar os produtos',
+    description='Retorna os produtos da pizzaria do usuário, dos mais recentes aos mais antigos, paginados por cursor',
+    parameters=PARAMETROS_LISTAGEM,
     responses={
         200: {
             'description': 'Lista de produtos retornada com sucesso',
@@ -24,33 +30,42 @@ from .forms import ProdutoForm, CategoriaForm
                         'properties': {
                             'id': {'type': 'integer'},
                             'nome': {'type': 'string'},
-                            'categoria': {'type': 'string'},
-                            'preco_venda': {'type': 'number'},
+                            'categoria': {'type': 'string', 'nullable': True},
+                            'preco_venda': {'type': 'number', 'nullable': True},
                             'ativo': {'type': 'boolean'},
                         }
                     }
-                }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
             }
-        }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'},
     }
 )
-class ProdutosListView(APIView):
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        """Lista todos os produtos"""
-        produtos = Produto.objects.all()
-        data = []
-        for produto in produtos:
-            data.append({
-                'id': produto.id,
-                'nome': produto.nome,
-                'categoria': produto.categoria.nome if produto.categoria else None,
-                'preco_venda': float(produto.preco_venda) if produto.preco_venda else None,
-                'ativo': produto.ativo,
-            })
-        
-        return Response({'produtos': data})
+class ProdutosListView(ListagemAPIView):
+    """Lista os produtos da pizzaria com o preço de venda vigente"""
+
+    model = Produto
+    chave = 'produtos'
+    # Preço e receita tocam o produto (produtos.signals)
+    campos_atualizacao = ('atualizado_em', 'categoria__atualizado_em')
+    campos = {
+        'id': 'id',
+        'nome': 'nome',
+        'categoria': 'categoria__nome',
+        'preco_venda': 'preco_venda_centavos',
+        'ativo': 'disponivel',
+    }
+    conversoes = {'preco_venda': reais}
+
+    def get_queryset(self, pizzaria):
+        preco_vigente = PrecoProduto.objects.filter(
+            produto=OuterRef('pk'), data_fim__isnull=True
+        ).order_by('-data_inicio')
+        return super().get_queryset(pizzaria).annotate(
+            preco_venda_centavos=Subquery(preco_vigente.values('preco_venda_centavos')[:1])
+        )
 
 
 @extend_schema(
@@ -117,8 +132,9 @@ class ProdutoCreateView(APIView):
 
 @extend_schema(
     tags=['categorias'],
-    summary='Listar todas as categorias',
-    description='Retorna uma lista de todas as categorias de produtos',
+    summary='Listar as categorias',
+    description='Retorna as categorias de produtos da pizzaria do usuário, paginadas por cursor',
+    parameters=PARAMETROS_LISTAGEM,
     responses={
         200: {
             'description': 'Lista de categorias retornada com sucesso',
@@ -131,31 +147,24 @@ class ProdutoCreateView(APIView):
                         'properties': {
                             'id': {'type': 'integer'},
                             'nome': {'type': 'string'},
-                            'descricao': {'type': 'string'},
-                            'ativa': {'type': 'boolean'},
+                            'ordem': {'type': 'integer'},
                         }
                     }
-                }
+                },
+                'proximo_cursor': {'type': 'string', 'nullable': True},
             }
-        }
+        },
+        400: {'description': 'Cursor ou limite inválido'},
+        403: {'description': 'Usuário sem pizzaria associada'},
     }
 )
-class CategoriasListView(APIView):
-    permission_classes = [IsAuthenticated]
-    
-    def get(self, request):
-        """Lista todas as categorias"""
-        categorias = CategoriaProduto.objects.all()
-        data = []
-        for categoria in categorias:
-            data.append({
-                'id': categoria.id,
-                'nome': categoria.nome,
-                'descricao': categoria.descricao,
-                'ativa': categoria.ativa,
-            })
-        
-        return Response({'categorias': data})
+class CategoriasListView(ListagemAPIView):
+    """Lista as categorias da pizzaria"""
+
+    model = CategoriaProduto
+    chave = 'categorias'
+    campos_atualizacao = ('atualizado_em',)
+    campos = {'id': 'id', 'nome': 'nome', 'ordem': 'ordem'}
 
 
 @extend_schema(
@@ -215,3 +224,77 @@ class CategoriaCreateView(APIView):
                 'error': 'Dados inválidos',
                 'details': form.errors
             }, status=status.HTTP_400_BAD_REQUEST)
+
+
+@extend_schema(
+    tags=['produtos'],
+    summary='Cardápio da pizzaria',
+    description=(
+        'Retorna o cardápio compilado da pizzaria do usuário: categorias em ordem de exibição '
+        'com os produtos disponíveis, preço de venda vigente, restrições alimentares e tempo de preparo. '
+        'Servido de um cache versionado que é renovado sempre que produtos, preços, categorias ou receitas mudam.'
+    ),
+    responses={
+        200: {
+            'description': 'Cardápio retornado com sucesso',
+            'type': 'object',
+            'properties': {
+                'versao': {'type': 'integer'},
+                'categorias': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'id': {'type': 'integer', 'nullable': True},
+                            'nome': {'type': 'string'},
+                            'ordem': {'type': 'integer', 'nullable': True},
+                            'produtos': {'type': 'array', 'items': {'type': 'object'}},
+                        }
+                    }
+                },
+                'produtos': {
+                    'type': 'array',
+                    'items': {
+                        'type': 'object',
+                        'properties': {
+                            'id': {'type': 'integer'},
+                            'nome': {'type': 'string'},
+                            'descricao': {'type': 'string'},
+                            'categoria_id': {'type': 'integer', 'nullable': True},
+                            'preco_venda_centavos': {'type': 'integer'},
+                            'preco': {'type': 'number'},
+                            'tempo_preparo_minutos': {'type': 'integer'},
+                            'vegetariano': {'type': 'boolean'},
+                            'vegano': {'type': 'boolean'},
+                            'contem_gluten': {'type': 'boolean'},
+                            'contem_lactose': {'type': 'boolean'},
+                        }
+                    }
+                }
+            }
+        },
+        403: {'description': 'Usuário sem pizzaria associada'}
+    }
+)
+class CardapioView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """Retorna o cardápio compilado"""
+        usuario_pizzaria = request.tenant.usuario_pizzaria
+        if not usuario_pizzaria or not usuario_pizzaria.pizzaria_id:
+            return Response({
+                'error': 'Usuário sem pizzaria associada'
+            }, status=status.HTTP_403_FORBIDDEN)
+
+        pizzaria_id = usuario_pizzaria.pizzaria_id
+        # A versão do cardápio só muda no cache do processo que salvou (LocMemCache):
+        # a parte lida do banco muda o ETag em todos os workers
+        etag = calcular_etag(
+            'cardapio', pizzaria_id, versao_cardapio(pizzaria_id),
+            *versao_linhas(Produto.objects.filter(pizzaria_id=pizzaria_id), 'atualizado_em', 'categoria__atualizado_em'),
+        )
+        resposta = nao_modificado(request, etag)
+        if resposta is not None:
+            return resposta
+        return marcar_versao(Response(cardapio(pizzaria_id)), etag)
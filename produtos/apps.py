@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class ProdutosConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'produtos'
+    verbose_name = 'Produtos'
+
+    def ready(self):
+        """Registra os sinais quando o app é carregado."""
+        import produtos.signals  # noqa: F401
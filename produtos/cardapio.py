@@ -0,0 +1,130 @@
+"""Cardápio compilado por pizzaria.
+
+As telas de pedido e a API de cardápio leem um snapshot pronto, guardado
+no cache do Django sob uma chave versionada (``produtos:cardapio:<id>:v<versao>``).
+Os signals de ``Produto``, ``PrecoProduto``, ``CategoriaProduto`` e
+``ProdutoIngrediente`` apenas incrementam a versão da pizzaria: o snapshot
+antigo deixa de ser lido e expira sozinho. Com o cache aquecido, a leitura
+do cardápio não faz nenhuma consulta ao banco.
+
+A versão também expira (``PRODUTOS_CARDAPIO_CACHE_TIMEOUT``, curto por
+padrão). Com um cache local ao processo (``LocMemCache``), o incremento só
+chega ao worker que salvou; nos demais, o cardápio antigo é servido até a
+versão expirar. Com um cache compartilhado (Redis, Memcached) todos veem o
+incremento na hora e o tempo pode ser maior.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Produto
+
+
+CHAVE_VERSAO_CARDAPIO = 'produtos:cardapio:versao:{}'
+CHAVE_CARDAPIO = 'produtos:cardapio:{}:v{}'
+
+
+def _timeout():
+    return getattr(settings, 'PRODUTOS_CARDAPIO_CACHE_TIMEOUT', 60)
+
+
+def _nova_versao():
+    # Baseada no relógio: se a chave de versão for despejada do cache, a nova
+    # versão não reaproveita um snapshot antigo ainda guardado
+    return time.time_ns()
+
+
+def versao_cardapio(pizzaria_id):
+    """Versão atual do cardápio da pizzaria."""
+    chave = CHAVE_VERSAO_CARDAPIO.format(pizzaria_id)
+    versao = cache.get(chave)
+    if versao is None:
+        # incr() preserva a expiração: a versão é renovada no máximo a cada _timeout()
+        cache.add(chave, _nova_versao(), _timeout())
+        versao = cache.get(chave)
+    return versao
+
+
+def _incrementar_versao(pizzaria_id):
+    chave = CHAVE_VERSAO_CARDAPIO.format(pizzaria_id)
+    try:
+        cache.incr(chave)
+    except ValueError:
+        cache.set(chave, _nova_versao(), _timeout())
+
+
+def invalidar_cardapio(pizzaria_id):
+    """Incrementa a versão do cardápio quando a transação confirmar."""
+    if pizzaria_id is not None:
+        transaction.on_commit(lambda: _incrementar_versao(pizzaria_id))
+
+
+def _serializar_produto(produto):
+    preco = produto.preco_atual
+    preco_centavos = preco.preco_venda_centavos if preco else 0
+    return {
+        'id': produto.id,
+        'nome': produto.nome,
+        'descricao': produto.descricao,
+        'categoria_id': produto.categoria_id,
+        'preco_venda_centavos': preco_centavos,
+        'preco': preco_centavos / 100,
+        'tempo_preparo_minutos': produto.tempo_preparo_minutos,
+        'vegetariano': produto.vegetariano,
+        'vegano': produto.vegano,
+        'contem_gluten': produto.contem_gluten,
+        'contem_lactose': produto.contem_lactose,
+    }
+
+
+def montar_cardapio(pizzaria_id, versao=None):
+    """Compila o cardápio da pizzaria a partir do banco (duas consultas).
+
+    Retorna ``{'versao', 'categorias', 'produtos'}``: as categorias em
+    ``ordem`` com os seus produtos disponíveis (produtos sem categoria ficam
+    por último, em ``categoria_id=None``) e a lista plana dos produtos na
+    mesma ordem.
+    """
+    produtos = (
+        Produto.objects.filter(pizzaria_id=pizzaria_id, disponivel=True)
+        .select_related('categoria')
+        .com_preco_vigente()
+        .order_by('categoria__ordem', 'categoria__nome', 'nome')
+    )
+
+    categorias = {}
+    sem_categoria = []
+    for produto in produtos:
+        dados = _serializar_produto(produto)
+        categoria = produto.categoria
+        if categoria is None:
+            sem_categoria.append(dados)
+            continue
+        if categoria.id not in categorias:
+            categorias[categoria.id] = {
+                'id': categoria.id,
+                'nome': categoria.nome,
+                'ordem': categoria.ordem,
+                'produtos': [],
+            }
+        categorias[categoria.id]['produtos'].append(dados)
+
+    secoes = list(categorias.values())
+    if sem_categoria:
+        secoes.append({'id': None, 'nome': 'Outros', 'ordem': None, 'produtos': sem_categoria})
+    produtos = [dados for secao in secoes for dados in secao['produtos']]
+
+    return {'versao': versao, 'categorias': secoes, 'produtos': produtos}
+
+
+def cardapio(pizzaria_id):
+    """Cardápio compilado da pizzaria, servido do cache quando possível."""
+    versao = versao_cardapio(pizzaria_id)
+    chave = CHAVE_CARDAPIO.format(pizzaria_id, versao)
+    snapshot = cache.get(chave)
+    if snapshot is None:
+        snapshot = montar_cardapio(pizzaria_id, versao)
+        cache.set(chave, snapshot, _timeout())
+    return snapshot
@@ -0,0 +1,171 @@
+"""Cálculo em lote do custo dos produtos.
+
+O custo de um produto é o preço base mais o custo dos ingredientes da
+receita. Em vez de recalcular produto a produto (uma consulta por preço,
+por ingrediente e por estoque, e um ``save`` por produto), o motor carrega
+de uma vez a matriz de receitas (``ProdutoIngrediente``) e o vetor de
+preços dos ingredientes (``EstoqueIngrediente``), multiplica em memória e
+grava apenas os preços que mudaram com um único ``bulk_update``.
+
+Quando só o preço de compra de um ingrediente muda, a variação é propagada
+de forma incremental (``propagar_variacao_preco``): o custo de cada produto
+dependente recebe a diferença da sua linha em um único ``UPDATE``.
+"""
+from decimal import Decimal, ROUND_DOWN
+
+from django.db.models import Case, F, IntegerField, Value, When
+
+from estoque.models import EstoqueIngrediente
+from estoque.services import converter_para_estoque
+from .models import PrecoProduto, ProdutoIngrediente
+
+
+def custo_linha_centavos(quantidade, unidade, preco_centavos, unidade_estoque):
+    """Custo (centavos) de uma linha da receita ao preço do estoque.
+
+    A quantidade é convertida para a unidade do estoque e o resultado é
+    truncado por ingrediente, como no cálculo original. Unidades não
+    conversíveis (peça ↔ peso) custam 0.
+    """
+    convertida = converter_para_estoque(Decimal(quantidade), unidade, unidade_estoque)
+    if convertida is None:
+        return 0
+    return custo_quantidade_centavos(convertida, preco_centavos)
+
+
+def custo_quantidade_centavos(quantidade_convertida, preco_centavos):
+    """Custo (centavos, truncado) de uma quantidade já na unidade do estoque."""
+    return int((quantidade_convertida * preco_centavos).to_integral_value(rounding=ROUND_DOWN))
+
+
+def carregar_precos_vigentes(pizzaria=None, produtos=None, ingredientes=None):
+    """Preços vigentes dos produtos selecionados, indexados por ``produto_id``."""
+    precos = PrecoProduto.objects.filter(data_fim__isnull=True).select_related('produto')
+    if pizzaria is not None:
+        precos = precos.filter(produto__pizzaria=pizzaria)
+    if produtos is not None:
+        precos = precos.filter(produto__in=produtos)
+    if ingredientes is not None:
+        precos = precos.filter(
+            produto__in=ProdutoIngrediente.objects.filter(ingrediente__in=ingredientes).values('produto_id')
+        )
+    return {preco.produto_id: preco for preco in precos}
+
+
+def calcular_custos_ingredientes(produto_ids):
+    """Custo dos ingredientes (centavos) de cada produto, em duas consultas.
+
+    Retorna ``{produto_id: custo_centavos}``; produtos sem receita ficam com 0.
+    """
+    receitas = list(
+        ProdutoIngrediente.objects.filter(produto_id__in=produto_ids)
+        .values_list('produto_id', 'ingrediente_id', 'quantidade', 'unidade')
+    )
+    precos_ingredientes = {
+        ingrediente_id: (preco_centavos, unidade_medida)
+        for ingrediente_id, preco_centavos, unidade_medida in EstoqueIngrediente.objects.filter(
+            ingrediente_id__in={linha[1] for linha in receitas}
+        ).values_list('ingrediente_id', 'preco_compra_atual_centavos', 'unidade_medida')
+    }
+
+    custos = dict.fromkeys(produto_ids, 0)
+    for produto_id, ingrediente_id, quantidade, unidade in receitas:
+        preco = precos_ingredientes.get(ingrediente_id)
+        if preco is not None:
+            custos[produto_id] += custo_linha_centavos(quantidade, unidade, *preco)
+    return custos
+
+
+def recalcular_custos(pizzaria=None, produtos=None, ingredientes=None):
+    """Recalcula e grava o custo dos produtos selecionados.
+
+    Seleção por pizzaria, por produtos ou pelos produtos que usam
+    ``ingredientes`` (os filtros se combinam). Produtos sem preço vigente
+    são ignorados. Custa três consultas mais um ``bulk_update`` com os
+    preços alterados, que são retornados.
+    """
+    precos = carregar_precos_vigentes(pizzaria, produtos, ingredientes)
+    if not precos:
+        return []
+
+    custos_ingredientes = calcular_custos_ingredientes(list(precos))
+
+    alterados = []
+    for produto_id, preco in precos.items():
+        custo = preco.preco_base_centavos + custos_ingredientes[produto_id]
+        if preco.preco_custo_centavos != custo:
+            preco.preco_custo_centavos = custo
+            alterados.append(preco)
+
+    if alterados:
+        PrecoProduto.objects.bulk_update(alterados, ['preco_custo_centavos'], batch_size=500)
+    return alterados
+
+
+def indice_dependencias(ingrediente_id, unidade_estoque):
+    """Produtos que dependem do ingrediente, com a quantidade na unidade do estoque.
+
+    Retorna ``[(produto_id, quantidade_convertida)]`` a partir de uma consulta
+    às receitas; linhas com unidade não conversível ficam de fora (custo 0).
+    """
+    dependencias = []
+    for produto_id, quantidade, unidade in ProdutoIngrediente.objects.filter(
+        ingrediente_id=ingrediente_id
+    ).values_list('produto_id', 'quantidade', 'unidade'):
+        convertida = converter_para_estoque(Decimal(quantidade), unidade, unidade_estoque)
+        if convertida is not None:
+            dependencias.append((produto_id, convertida))
+    return dependencias
+
+
+def propagar_variacao_preco(ingrediente_id, unidade_estoque, preco_anterior_centavos, preco_novo_centavos):
+    """Aplica nos produtos dependentes a variação de preço de um ingrediente.
+
+    Para cada produto, ``custo += custo_linha(novo) - custo_linha(anterior)``,
+    com o mesmo truncamento por ingrediente do cálculo completo, em um único
+    ``UPDATE`` sobre os preços vigentes. Pressupõe que a unidade do estoque
+    não mudou; nesse caso use ``recalcular_custos``. Retorna a quantidade de
+    preços atualizados.
+    """
+    if preco_anterior_centavos == preco_novo_centavos:
+        return 0
+
+    deltas = {}
+    for produto_id, quantidade in indice_dependencias(ingrediente_id, unidade_estoque):
+        delta = (
+            custo_quantidade_centavos(quantidade, preco_novo_centavos)
+            - custo_quantidade_centavos(quantidade, preco_anterior_centavos)
+        )
+        if delta:
+            deltas[produto_id] = deltas.get(produto_id, 0) + delta
+
+    if not deltas:
+        return 0
+
+    incremento = Case(
+        *[When(produto_id=produto_id, then=Value(delta)) for produto_id, delta in deltas.items()],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return PrecoProduto.objects.filter(
+        produto_id__in=deltas.keys(),
+        data_fim__isnull=True,
+    ).update(preco_custo_centavos=F('preco_custo_centavos') + incremento)
+
+
+def divergencias_custos(pizzaria=None):
+    """Compara os custos armazenados com um recálculo completo, sem gravar.
+
+    Retorna ``[(preco, custo_armazenado, custo_esperado)]`` dos produtos divergentes.
+    """
+    precos = carregar_precos_vigentes(pizzaria)
+    if not precos:
+        return []
+
+    custos_ingredientes = calcular_custos_ingredientes(list(precos))
+    divergencias = []
+    for produto_id, preco in precos.items():
+        esperado = preco.preco_base_centavos + custos_ingredientes[produto_id]
+        if preco.preco_custo_centavos != esperado:
+            divergencias.append((preco, preco.preco_custo_centavos, esperado))
+    return divergencias
@@ -1,5 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
+from produtos.custos import recalcular_custos
 from produtos.models import Produto, PrecoProduto
 
 
@@ -23,46 +24,35 @@ class Command(BaseCommand):
             produtos = Produto.objects.all()
             self.stdout.write('Recalculando custos para todas as pizzarias...')
         
-        produtos_atualizados = 0
-        produtos_sem_preco = 0
+        # Criar preço inicial para produtos sem preço vigente
+        sem_preco = list(produtos.exclude(precos__data_fim__isnull=True))
+        PrecoProduto.objects.bulk_create([
+            PrecoProduto(
+                produto=produto,
+                preco_base_centavos=0,
+                preco_custo_centavos=0,
+                preco_venda_centavos=0,
+                data_inicio=timezone.now().date()
+            )
+            for produto in sem_preco
+        ])
+        for produto in sem_preco:
+            self.stdout.write(
+                self.style.WARNING(f'Criado preço inicial para: {produto.nome}')
+            )
         
-        for produto in produtos:
-            try:
-                # Verificar se o produto tem preço atual
-                preco_atual = produto.preco_atual
-                
-                if not preco_atual:
-                    # Criar preço inicial se não existir
-                    PrecoProduto.objects.create(
-                        produto=produto,
-                        preco_base_centavos=0,
-                        preco_custo_centavos=0,
-                        preco_venda_centavos=0,
-                        data_inicio=timezone.now().date()
-                    )
-                    produtos_sem_preco += 1
-                    self.stdout.write(
-                        self.style.WARNING(f'Criado preço inicial para: {produto.nome}')
-                    )
-                
-                # Recalcular custo
-                produto.recalcular_custo()
-                produtos_atualizados += 1
-                
-                self.stdout.write(
-                    self.style.SUCCESS(f'✓ {produto.nome} - Custo: R$ {produto.preco_custo_atual:.2f}')
-                )
-                
-            except Exception as e:
-                self.stdout.write(
-                    self.style.ERROR(f'✗ Erro ao processar {produto.nome}: {str(e)}')
-                )
+        # Recalcular custos em lote
+        alterados = recalcular_custos(produtos=produtos)
+        for preco in alterados:
+            self.stdout.write(
+                self.style.SUCCESS(f'✓ {preco.produto.nome} - Custo: R$ {preco.preco_custo:.2f}')
+            )
         
         self.stdout.write(
             self.style.SUCCESS(
                 f'\nResumo:\n'
-                f'- Produtos atualizados: {produtos_atualizados}\n'
-                f'- Produtos sem preço (criados): {produtos_sem_preco}\n'
+                f'- Produtos com custo alterado: {len(alterados)}\n'
+                f'- Produtos sem preço (criados): {len(sem_preco)}\n'
                 f'- Total processado: {produtos.count()}'
             )
         )
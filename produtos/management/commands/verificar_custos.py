@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from autenticacao.models import Pizzaria
+from produtos.custos import divergencias_custos, recalcular_custos
+
+
+class Command(BaseCommand):
+    help = 'Compara os custos armazenados (propagação incremental) com um recálculo completo'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pizzaria',
+            type=int,
+            help='ID da pizzaria para verificar (opcional, se não informado verifica todas)',
+        )
+        parser.add_argument(
+            '--corrigir',
+            action='store_true',
+            help='Grava o custo recalculado nos produtos divergentes',
+        )
+
+    def handle(self, *args, **options):
+        if options['pizzaria']:
+            pizzarias = Pizzaria.objects.filter(id=options['pizzaria'])
+        else:
+            pizzarias = Pizzaria.objects.all()
+
+        total_divergencias = 0
+        for pizzaria in pizzarias:
+            divergencias = divergencias_custos(pizzaria)
+            total_divergencias += len(divergencias)
+
+            for preco, armazenado, esperado in divergencias:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'✗ {pizzaria.nome} / {preco.produto.nome}: '
+                        f'armazenado R$ {armazenado / 100:.2f}, esperado R$ {esperado / 100:.2f}'
+                    )
+                )
+
+            if divergencias and options['corrigir']:
+                recalcular_custos(produtos=[preco.produto_id for preco, _, _ in divergencias])
+                self.stdout.write(self.style.SUCCESS(f'  {len(divergencias)} custo(s) corrigido(s)'))
+
+        if total_divergencias:
+            self.stdout.write(
+                self.style.WARNING(f'\n{total_divergencias} produto(s) com custo divergente.')
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('Custos armazenados conferem com o recálculo completo.'))
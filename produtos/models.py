@@ -1,3 +1,4 @@
+from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
 from django.utils import timezone
 
@@ -15,6 +16,7 @@ class CategoriaProduto(models.Model):
     )
     nome = models.CharField(max_length=100)
     ordem = models.PositiveIntegerField(default=0, help_text="Ordem de exibição no cardápio")
+    atualizado_em = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Categoria de Produto"
@@ -26,6 +28,24 @@ class CategoriaProduto(models.Model):
         return self.nome
 
 
+class ProdutoQuerySet(models.QuerySet):
+    """Consultas de produtos."""
+
+    def com_preco_vigente(self):
+        """Pré-carrega o preço vigente de cada produto em uma única consulta.
+
+        ``preco_atual`` (e as propriedades derivadas) passam a usar o preço
+        pré-carregado em vez de consultar o banco produto a produto.
+        """
+        return self.prefetch_related(
+            models.Prefetch(
+                "precos",
+                queryset=PrecoProduto.objects.filter(data_fim__isnull=True).order_by("-data_inicio"),
+                to_attr="_precos_vigentes",
+            )
+        )
+
+
 class Produto(models.Model):
     """Produto que faz parte do cardápio de uma pizzaria."""
 
@@ -52,20 +72,31 @@ class Produto(models.Model):
     contem_gluten = models.BooleanField(default=False)
     contem_lactose = models.BooleanField(default=False)
 
+    # Também tocado pelos signals de preço e receita (versão das leituras condicionais)
+    atualizado_em = models.DateTimeField(auto_now=True)
+
     class Meta:
         verbose_name = "Produto"
         verbose_name_plural = "Produtos"
         unique_together = ("pizzaria", "nome")
         ordering = ("nome",)
 
+    objects = ProdutoQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.nome} - {self.pizzaria.nome}"
 
     @property
     def preco_atual(self):
-        """Retorna o preço vigente (data_fim = NULL)."""
-        preco = self.precos.filter(data_fim__isnull=True).order_by("-data_inicio").first()
-        return preco if preco else None
+        """Retorna o preço vigente (data_fim = NULL).
+
+        Usa o preço pré-carregado por ``Produto.objects.com_preco_vigente()``
+        quando disponível.
+        """
+        precos = getattr(self, "_precos_vigentes", None)
+        if precos is None:
+            return self.precos.filter(data_fim__isnull=True).order_by("-data_inicio").first()
+        return precos[0] if precos else None
 
     @property
     def preco_base_atual(self):
@@ -88,66 +119,7 @@ class Produto(models.Model):
     @property
     def custo_ingredientes_centavos(self):
         """Calcula apenas o custo dos ingredientes em centavos."""
-        custo_total_centavos = 0
-        
-        for produto_ingrediente in self.produto_ingredientes.all():
-            ingrediente = produto_ingrediente.ingrediente
-            quantidade_produto = produto_ingrediente.quantidade
-            unidade_produto = produto_ingrediente.unidade
-            
-            # Buscar preço atual do ingrediente no estoque
-            try:
-                estoque = ingrediente.estoque
-                preco_por_unidade_estoque_centavos = estoque.preco_compra_atual_centavos
-                unidade_estoque = estoque.unidade_medida
-                
-                # Converter quantidade do produto para a unidade do estoque
-                quantidade_convertida = self._converter_unidade(
-                    quantidade_produto, 
-                    unidade_produto, 
-                    unidade_estoque
-                )
-                
-                # Calcular custo: quantidade convertida × preço por unidade
-                custo_parcial = int(float(quantidade_convertida) * preco_por_unidade_estoque_centavos)
-                custo_total_centavos += custo_parcial
-                
-            except Exception as e:
-                # Se não tem estoque ou erro de conversão, usar 0
-                print(f"Erro ao calcular custo do ingrediente {ingrediente.nome}: {e}")
-                pass
-        
-        return custo_total_centavos
-
-    def _converter_unidade(self, quantidade, unidade_origem, unidade_destino):
-        """Converte quantidade de uma unidade para outra."""
-        if unidade_origem == unidade_destino:
-            return quantidade
-        
-        # Sistema simplificado: apenas kg, g e unidade
-        # Unidade NÃO é convertida para gramas - é uma medida independente
-        
-        # Se uma das unidades é "unidade", só pode converter se ambas forem "unidade"
-        if unidade_origem == 'un' or unidade_destino == 'un':
-            if unidade_origem == unidade_destino:
-                return quantidade
-            else:
-                # Não é possível converter entre unidade e peso (kg/g)
-                raise ValueError(f"Não é possível converter entre {unidade_origem} e {unidade_destino}")
-        
-        # Conversão apenas entre kg e g
-        try:
-            if unidade_origem == 'g' and unidade_destino == 'kg':
-                return quantidade / 1000  # gramas para kg
-            elif unidade_origem == 'kg' and unidade_destino == 'g':
-                return quantidade * 1000  # kg para gramas
-            else:
-                # Se chegou aqui, unidades não suportadas
-                raise ValueError(f"Conversão não suportada: {unidade_origem} → {unidade_destino}")
-                
-        except (KeyError, ZeroDivisionError, ValueError):
-            # Se não conseguir converter, lança erro
-            raise ValueError(f"Erro na conversão: {unidade_origem} → {unidade_destino}")
+        return sum(produto_ingrediente.custo_centavos for produto_ingrediente in self.produto_ingredientes.all())
 
     @property
     def custo_ingredientes(self):
@@ -156,16 +128,13 @@ class Produto(models.Model):
 
     def recalcular_custo(self):
         """Recalcula o custo do produto: Preço Base + Custo dos Ingredientes."""
+        from .custos import recalcular_custos  # import local para evitar ciclos
+
+        recalcular_custos(produtos=[self])
+        # O preço pré-carregado ficou desatualizado
+        self.__dict__.pop("_precos_vigentes", None)
         preco_atual = self.preco_atual
-        if preco_atual:
-            # Custo = Preço Base + Custo dos Ingredientes
-            custo_ingredientes_centavos = self.custo_ingredientes_centavos
-            custo_total_centavos = preco_atual.preco_base_centavos + custo_ingredientes_centavos
-            
-            preco_atual.preco_custo_centavos = custo_total_centavos
-            preco_atual.save()
-        
-        return custo_total_centavos if preco_atual else 0
+        return preco_atual.preco_custo_centavos if preco_atual else 0
 
     def get_ingredientes(self):
         """Retorna todos os ingredientes do produto com suas quantidades."""
@@ -296,37 +265,18 @@ class ProdutoIngrediente(models.Model):
     @property
     def custo_centavos(self):
         """Calcula o custo deste ingrediente (proporcional à quantidade usada) em centavos."""
+        from .custos import custo_linha_centavos  # import local para evitar ciclos
+
         try:
             estoque = self.ingrediente.estoque
-        except Exception:
+        except ObjectDoesNotExist:
             return 0
 
-        preco_unitario_centavos = estoque.preco_compra_atual_centavos
-        unidade_estoque = estoque.unidade_medida
-
-        # Converter quantidade usada para a unidade do estoque
-        quantidade_convertida = self._converter_unidade(self.quantidade, self.unidade, unidade_estoque)
-
-        return int(float(quantidade_convertida) * preco_unitario_centavos)
+        return custo_linha_centavos(
+            self.quantidade, self.unidade, estoque.preco_compra_atual_centavos, estoque.unidade_medida
+        )
 
     @property
     def custo(self):
         """Custo deste ingrediente em reais."""
         return self.custo_centavos / 100
-
-    # Método auxiliar para conversão de unidades (g <-> kg). Igual ao usado em Produto.
-    def _converter_unidade(self, quantidade, unidade_origem, unidade_destino):
-        if unidade_origem == unidade_destino:
-            return quantidade
-
-        # Impedir conversões envolvendo unidades não ponderáveis
-        if unidade_origem == 'un' or unidade_destino == 'un':
-            raise ValueError("Não é possível converter entre unidades de peça e peso.")
-
-        if unidade_origem == 'g' and unidade_destino == 'kg':
-            return quantidade / 1000
-        if unidade_origem == 'kg' and unidade_destino == 'g':
-            return quantidade * 1000
-
-        # Se chegar aqui, conversão não suportada
-        raise ValueError(f"Conversão não suportada: {unidade_origem} → {unidade_destino}")
\ No newline at end of file
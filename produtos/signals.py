@@ -0,0 +1,51 @@
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cardapio import invalidar_cardapio
+from .models import CategoriaProduto, Produto, PrecoProduto, ProdutoIngrediente
+
+
+def _pizzaria_do_produto(instance):
+    try:
+        return instance.produto.pizzaria_id
+    except Produto.DoesNotExist:
+        # Produto já removido: o signal do próprio produto invalida o cardápio
+        return None
+
+
+def _tocar_produto(produto_id):
+    """Preço e receita fazem parte do produto nas leituras condicionais (``atualizado_em``)."""
+    Produto.objects.filter(pk=produto_id).update(atualizado_em=timezone.now())
+
+
+@receiver([post_save, post_delete], sender=Produto)
+def invalidar_cardapio_produto(sender, instance, **kwargs):
+    """Nova versão do cardápio quando um produto muda."""
+    invalidar_cardapio(instance.pizzaria_id)
+
+
+@receiver([post_save, post_delete], sender=CategoriaProduto)
+def invalidar_cardapio_categoria(sender, instance, **kwargs):
+    """Nova versão do cardápio quando uma categoria muda."""
+    invalidar_cardapio(instance.pizzaria_id)
+
+
+@receiver([post_save, post_delete], sender=PrecoProduto)
+def invalidar_cardapio_preco(sender, instance, **kwargs):
+    """Nova versão do cardápio quando um preço muda."""
+    invalidar_cardapio(_pizzaria_do_produto(instance))
+    _tocar_produto(instance.produto_id)
+
+
+@receiver([post_save, post_delete], sender=ProdutoIngrediente)
+def invalidar_cardapio_receita(sender, instance, **kwargs):
+    """Nova versão do cardápio quando a receita de um produto muda."""
+    invalidar_cardapio(_pizzaria_do_produto(instance))
+    _tocar_produto(instance.produto_id)
+
+
+@receiver(pre_delete, sender=CategoriaProduto)
+def tocar_produtos_da_categoria(sender, instance, **kwargs):
+    """Os produtos ficam sem categoria (SET_NULL, sem ``auto_now``): marca a alteração antes."""
+    Produto.objects.filter(categoria=instance).update(atualizado_em=timezone.now())
@@ -0,0 +1,345 @@
+from django.conf import settings
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+import time
+
+from autenticacao.models import Pizzaria, UsuarioPizzaria
+from estoque.models import EstoqueIngrediente, CompraIngrediente
+from ingredientes.models import Ingrediente
+from .cardapio import cardapio, versao_cardapio
+from .custos import divergencias_custos, propagar_variacao_preco, recalcular_custos
+from .models import CategoriaProduto, Produto, PrecoProduto, ProdutoIngrediente
+
+
+class CenarioCustosMixin:
+    """Pizzaria com estoques e receitas usados nos testes de custo."""
+
+    def setUp(self):
+        """Configuração inicial para os testes."""
+        self.pizzaria = Pizzaria.objects.create(
+            nome="Pizzaria Teste",
+            cnpj="12345678000190",
+            endereco="Rua Teste, 123",
+            telefone="(11) 99999-9999"
+        )
+
+        self.queijo = Ingrediente.objects.create(nome="Queijo", pizzaria=self.pizzaria)
+        self.molho = Ingrediente.objects.create(nome="Molho", pizzaria=self.pizzaria)
+        self.ovo = Ingrediente.objects.create(nome="Ovo", pizzaria=self.pizzaria)
+        EstoqueIngrediente.objects.create(
+            ingrediente=self.queijo, quantidade_atual=10, unidade_medida='kg', preco_compra_atual_centavos=4000
+        )
+        EstoqueIngrediente.objects.create(
+            ingrediente=self.molho, quantidade_atual=5000, unidade_medida='g', preco_compra_atual_centavos=2
+        )
+        EstoqueIngrediente.objects.create(
+            ingrediente=self.ovo, quantidade_atual=30, unidade_medida='un', preco_compra_atual_centavos=75
+        )
+
+        self.margherita = self._produto("Margherita", 1000, [
+            (self.queijo, '150', 'g'),  # 0,15 kg × 4000 = 600
+            (self.molho, '100', 'g'),  # 100 g × 2 = 200
+        ])
+        self.portuguesa = self._produto("Portuguesa", 1500, [
+            (self.queijo, '0.2', 'kg'),  # 800
+            (self.ovo, '2', 'un'),  # 150
+            (self.molho, '1', 'un'),  # peça ↔ peso: não conversível, custo 0
+        ])
+        self.sem_receita = self._produto("Refrigerante", 500, [])
+
+    def _produto(self, nome, preco_base_centavos, receita):
+        produto = Produto.objects.create(pizzaria=self.pizzaria, nome=nome)
+        PrecoProduto.objects.create(
+            produto=produto,
+            preco_base_centavos=preco_base_centavos,
+            preco_venda_centavos=preco_base_centavos * 3,
+        )
+        for ingrediente, quantidade, unidade in receita:
+            ProdutoIngrediente.objects.create(
+                produto=produto, ingrediente=ingrediente, quantidade=Decimal(quantidade), unidade=unidade
+            )
+        return produto
+
+    def _custo(self, produto):
+        return PrecoProduto.objects.get(produto=produto, data_fim__isnull=True).preco_custo_centavos
+
+
+class CustosProdutosTestCase(CenarioCustosMixin, TestCase):
+    """Testes para o cálculo em lote do custo dos produtos."""
+
+    def test_recalcula_pizzaria_em_consultas_fixas(self):
+        """Testa o custo de todos os produtos com um único bulk_update."""
+        with self.assertNumQueries(4):
+            alterados = recalcular_custos(pizzaria=self.pizzaria)
+
+        self.assertEqual(len(alterados), 3)
+        self.assertEqual(self._custo(self.margherita), 1800)
+        self.assertEqual(self._custo(self.portuguesa), 2450)
+        self.assertEqual(self._custo(self.sem_receita), 500)
+        self.assertEqual(self.margherita.custo_ingredientes_centavos, 800)
+
+        # Nada mudou: nenhuma escrita
+        with self.assertNumQueries(3):
+            self.assertEqual(recalcular_custos(pizzaria=self.pizzaria), [])
+
+    def test_recalcula_apenas_produtos_do_ingrediente(self):
+        """Testa a seleção pelos produtos que usam um ingrediente."""
+        recalcular_custos(pizzaria=self.pizzaria)
+        EstoqueIngrediente.objects.filter(ingrediente=self.ovo).update(preco_compra_atual_centavos=100)
+
+        alterados = recalcular_custos(ingredientes=[self.ovo])
+
+        self.assertEqual([preco.produto_id for preco in alterados], [self.portuguesa.id])
+        self.assertEqual(self._custo(self.portuguesa), 2500)
+
+    def test_compra_atualiza_custo_armazenado(self):
+        """Testa que uma compra com novo preço propaga para o custo dos produtos."""
+        recalcular_custos(pizzaria=self.pizzaria)
+
+        CompraIngrediente.objects.create(
+            ingrediente=self.queijo,
+            quantidade=Decimal('5'),
+            unidade='kg',
+            preco_unitario_centavos=5000,
+        )
+
+        self.assertEqual(self._custo(self.margherita), 1000 + 750 + 200)
+        self.assertEqual(self._custo(self.portuguesa), 1500 + 1000 + 150)
+
+    def test_relatorio_custos_somente_leitura(self):
+        """Testa que o relatório exibe os custos armazenados sem recalcular."""
+        user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client.force_login(user)
+        recalcular_custos(pizzaria=self.pizzaria)
+        # Custo desatualizado de propósito: o relatório não deve reescrevê-lo
+        PrecoProduto.objects.filter(produto=self.margherita).update(preco_custo_centavos=1234)
+
+        response = self.client.get(reverse('estoque:relatorio_custos'))
+
+        self.assertEqual(response.status_code, 200)
+        custos = {item['produto'].id: item['preco_custo'] for item in response.context['produtos']}
+        self.assertEqual(custos[self.margherita.id], 12.34)
+        self.assertEqual(self._custo(self.margherita), 1234)
+
+
+class PropagacaoCustosTestCase(CenarioCustosMixin, TestCase):
+    """Testes para a propagação incremental da variação de preço dos ingredientes."""
+
+    def setUp(self):
+        super().setUp()
+        recalcular_custos(pizzaria=self.pizzaria)
+
+    def test_variacao_aplicada_em_um_update(self):
+        """Testa a propagação com uma consulta às receitas e um UPDATE."""
+        EstoqueIngrediente.objects.filter(ingrediente=self.queijo).update(preco_compra_atual_centavos=4333)
+
+        with self.assertNumQueries(2):
+            atualizados = propagar_variacao_preco(self.queijo.id, 'kg', 4000, 4333)
+
+        self.assertEqual(atualizados, 2)
+        self.assertEqual(self._custo(self.margherita), 1000 + 649 + 200)
+        self.assertEqual(self._custo(self.portuguesa), 1500 + 866 + 150)
+        self.assertEqual(divergencias_custos(self.pizzaria), [])
+
+    def test_atualizar_preco_propaga_incrementalmente(self):
+        """Testa que atualizar o preço do estoque mantém os custos corretos."""
+        estoque = EstoqueIngrediente.objects.get(ingrediente=self.molho)
+
+        with self.assertNumQueries(3):
+            estoque.atualizar_preco(3)
+
+        self.assertEqual(self._custo(self.margherita), 1000 + 600 + 300)
+        self.assertEqual(divergencias_custos(self.pizzaria), [])
+
+    def test_troca_de_unidade_recalcula_completo(self):
+        """Testa que a mudança de unidade do estoque recai no recálculo completo."""
+        estoque = EstoqueIngrediente.objects.get(ingrediente=self.molho)
+        estoque.unidade_medida = 'kg'
+        estoque.preco_compra_atual_centavos = 2000
+        preco_anterior = estoque.preco_anterior_centavos
+        self.assertIsNone(preco_anterior)
+
+        estoque.save()
+        estoque._recalcular_custos_produtos(preco_anterior)
+
+        self.assertEqual(self._custo(self.margherita), 1000 + 600 + 200)
+        self.assertEqual(divergencias_custos(self.pizzaria), [])
+
+    def test_comando_verificar_custos(self):
+        """Testa que o comando aponta e corrige custos divergentes."""
+        PrecoProduto.objects.filter(produto=self.margherita).update(preco_custo_centavos=1)
+
+        saida = StringIO()
+        call_command('verificar_custos', '--corrigir', stdout=saida)
+
+        self.assertIn('Margherita', saida.getvalue())
+        self.assertEqual(self._custo(self.margherita), 1800)
+        self.assertEqual(divergencias_custos(self.pizzaria), [])
+
+
+class PrecoVigenteTestCase(CenarioCustosMixin, TestCase):
+    """Testes para o preço vigente pré-carregado dos produtos."""
+
+    def setUp(self):
+        super().setUp()
+        recalcular_custos(pizzaria=self.pizzaria)
+        user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client.force_login(user)
+        # Tenant já em cache, como em uma sessão em uso
+        self.client.get(reverse('lista_produtos'))
+
+    def _consultas(self, url):
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(consultas), response
+
+    def _mais_produtos(self, quantidade=5):
+        for indice in range(quantidade):
+            self._produto(f"Extra {indice}", 700, [(self.queijo, '100', 'g'), (self.ovo, '1', 'un')])
+        recalcular_custos(pizzaria=self.pizzaria)
+
+    def test_propriedades_usam_preco_pre_carregado(self):
+        """Testa que os preços vêm do prefetch, sem consultas por produto."""
+        produtos = list(Produto.objects.filter(pizzaria=self.pizzaria).com_preco_vigente())
+
+        with self.assertNumQueries(0):
+            precos = {produto.nome: (produto.preco_base_atual, produto.preco_venda_atual) for produto in produtos}
+
+        self.assertEqual(precos["Margherita"], (Decimal("10.00"), Decimal("30.00")))
+
+    def test_preco_sem_pre_carregamento(self):
+        """Testa que, sem prefetch, o preço vigente continua sendo consultado."""
+        PrecoProduto.objects.filter(produto=self.margherita).update(data_fim="2024-01-01")
+        PrecoProduto.objects.create(produto=self.margherita, preco_base_centavos=1100, preco_venda_centavos=3300)
+
+        self.assertEqual(self.margherita.preco_atual.preco_base_centavos, 1100)
+        self.assertEqual(self.sem_receita.preco_custo_atual, Decimal("5.00"))
+
+    def test_lista_produtos_consultas_fixas(self):
+        """Testa que a lista de produtos não faz consultas por produto."""
+        antes, _ = self._consultas(reverse('lista_produtos'))
+        self._mais_produtos()
+
+        depois, response = self._consultas(reverse('lista_produtos'))
+
+        self.assertEqual(depois, antes)
+        self.assertContains(response, "R$ 18.00")
+
+    def test_api_produtos_consultas_fixas(self):
+        """Testa a listagem da API com o preço de venda vigente."""
+        url = reverse('produtos_api:produtos_list')
+        antes, _ = self._consultas(url)
+        self._mais_produtos()
+
+        depois, response = self._consultas(url)
+
+        self.assertEqual(depois, antes)
+        produtos = {produto['nome']: produto for produto in response.json()['produtos']}
+        self.assertEqual(produtos['Margherita']['preco_venda'], 30.0)
+        self.assertTrue(produtos['Margherita']['ativo'])
+
+    def test_relatorio_custos_consultas_fixas(self):
+        """Testa que o relatório de custos não faz consultas por produto."""
+        url = reverse('estoque:relatorio_custos')
+        antes, _ = self._consultas(url)
+        self._mais_produtos()
+
+        depois, response = self._consultas(url)
+
+        self.assertEqual(depois, antes)
+        self.assertEqual(len(response.context['produtos']), 8)
+
+
+class CardapioTestCase(CenarioCustosMixin, TestCase):
+    """Testes para o cardápio compilado em cache."""
+
+    def setUp(self):
+        cache.clear()
+        super().setUp()
+        self.pizzas = CategoriaProduto.objects.create(pizzaria=self.pizzaria, nome="Pizzas", ordem=1)
+        self.bebidas = CategoriaProduto.objects.create(pizzaria=self.pizzaria, nome="Bebidas", ordem=2)
+        Produto.objects.filter(pk__in=[self.margherita.pk, self.portuguesa.pk]).update(categoria=self.pizzas)
+        Produto.objects.filter(pk=self.sem_receita.pk).update(categoria=self.bebidas, vegano=True)
+
+    def test_snapshot_em_cache_sem_consultas(self):
+        """Testa o conteúdo do cardápio e a leitura sem consultas com o cache aquecido."""
+        with self.assertNumQueries(2):
+            snapshot = cardapio(self.pizzaria.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(cardapio(self.pizzaria.id), snapshot)
+
+        self.assertEqual([categoria['nome'] for categoria in snapshot['categorias']], ["Pizzas", "Bebidas"])
+        self.assertEqual(
+            [produto['nome'] for produto in snapshot['produtos']],
+            ["Margherita", "Portuguesa", "Refrigerante"],
+        )
+        refrigerante = snapshot['categorias'][1]['produtos'][0]
+        self.assertEqual(refrigerante['preco_venda_centavos'], 1500)
+        self.assertEqual(refrigerante['preco'], 15.0)
+        self.assertTrue(refrigerante['vegano'])
+        self.assertEqual(refrigerante['tempo_preparo_minutos'], 15)
+
+    def test_signals_trocam_a_versao(self):
+        """Testa que alterações de produto, preço e categoria geram um novo snapshot."""
+        versao = cardapio(self.pizzaria.id)['versao']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            PrecoProduto.objects.filter(produto=self.margherita).update(data_fim="2024-01-01")
+            PrecoProduto.objects.create(produto=self.margherita, preco_base_centavos=1000, preco_venda_centavos=3900)
+        snapshot = cardapio(self.pizzaria.id)
+        self.assertGreater(snapshot['versao'], versao)
+        self.assertEqual(snapshot['produtos'][0]['preco_venda_centavos'], 3900)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.portuguesa.disponivel = False
+            self.portuguesa.save()
+        self.assertNotIn("Portuguesa", [produto['nome'] for produto in cardapio(self.pizzaria.id)['produtos']])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bebidas.ordem = 0
+            self.bebidas.save()
+        self.assertEqual(cardapio(self.pizzaria.id)['categorias'][0]['nome'], "Bebidas")
+
+        versao = versao_cardapio(self.pizzaria.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProdutoIngrediente.objects.filter(produto=self.margherita).first().delete()
+        self.assertGreater(versao_cardapio(self.pizzaria.id), versao)
+
+    def test_versao_expira_sem_o_incremento_de_outro_worker(self):
+        """Testa que um worker que não viu o incremento volta a ler o banco quando a versão expira."""
+        versao = cardapio(self.pizzaria.id)['versao']
+        # Alteração salva por outro processo: o incremento ficou no cache local dele
+        Produto.objects.filter(pk=self.portuguesa.pk).update(nome="Calabresa")
+        self.assertEqual(cardapio(self.pizzaria.id)['versao'], versao)
+
+        depois_da_expiracao = time.time() + settings.PRODUTOS_CARDAPIO_CACHE_TIMEOUT + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=depois_da_expiracao):
+            snapshot = cardapio(self.pizzaria.id)
+
+        self.assertNotEqual(snapshot['versao'], versao)
+        self.assertIn("Calabresa", [produto['nome'] for produto in snapshot['produtos']])
+
+    def test_api_cardapio(self):
+        """Testa a API de cardápio da pizzaria do usuário."""
+        user = get_user_model().objects.create_user(username="dono", password="testpass123")
+        UsuarioPizzaria.objects.create(usuario=user, pizzaria=self.pizzaria, papel="dono_pizzaria")
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('produtos_api:cardapio'))
+
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual(dados['versao'], versao_cardapio(self.pizzaria.id))
+        self.assertEqual(len(dados['produtos']), 3)
@@ -2,18 +2,20 @@ from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
+from django.db.models import Max
 from django.http import JsonResponse
 
-from autenticacao.models import UsuarioPizzaria
+from autenticacao.condicional import calcular_etag, marcar_versao, nao_modificado
 from ingredientes.models import Ingrediente
 from .models import Produto, PrecoProduto, ProdutoIngrediente, CategoriaProduto
 from .forms import ProdutoForm, CategoriaForm, PrecoProdutoForm
+from .custos import recalcular_custos
 
 
 @login_required
 def lista_produtos(request):
     """Lista produtos da pizzaria e processa cadastro via modal."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
 
     if request.method == 'POST':
@@ -56,6 +58,9 @@ def lista_produtos(request):
                         except Ingrediente.DoesNotExist:
                             pass  # Ignora ingredientes inválidos
 
+            # Custo armazenado no preço vigente
+            recalcular_custos(produtos=[produto])
+
             messages.success(request, 'Produto salvo com sucesso!')
             return redirect('lista_produtos')
         else:
@@ -63,7 +68,12 @@ def lista_produtos(request):
     else:
         form = ProdutoForm(pizzaria=pizzaria)
 
-    produtos = Produto.objects.filter(pizzaria=pizzaria).select_related('categoria').prefetch_related('produto_ingredientes__ingrediente')
+    produtos = (
+        Produto.objects.filter(pizzaria=pizzaria)
+        .com_preco_vigente()
+        .select_related('categoria')
+        .prefetch_related('produto_ingredientes__ingrediente__estoque')
+    )
 
     ingredientes_disponiveis = Ingrediente.objects.filter(pizzaria=pizzaria)
     
@@ -78,7 +88,7 @@ def lista_produtos(request):
 @login_required
 def editar_produto(request, produto_id):
     """Edita um produto existente (incluindo ingredientes)."""
-    usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
     if not usuario_pizzaria:
         messages.error(request, "Usuário sem permissões no sistema.")
         return redirect("login")
@@ -140,6 +150,9 @@ def editar_produto(request, produto_id):
                         except Ingrediente.DoesNotExist:
                             pass  # Ignora ingredientes inválidos
 
+            # Custo armazenado no preço vigente
+            recalcular_custos(produtos=[produto])
+
             messages.success(request, "Produto atualizado com sucesso!")
             return redirect("lista_produtos")
         else:
@@ -166,17 +179,28 @@ def editar_produto(request, produto_id):
 @login_required
 def ingredientes_produto(request, produto_id):
     """Retorna os ingredientes de um produto em formato JSON."""
-    usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
     if not usuario_pizzaria:
         return JsonResponse({"error": "Usuário sem permissões"}, status=403)
 
-    produto = get_object_or_404(Produto, id=produto_id)
+    # Receita toca o produto (produtos.signals); nomes vêm da última alteração dos ingredientes
+    pizzaria_id, alteracao_produto, alteracao_ingredientes = get_object_or_404(
+        Produto.objects.annotate(
+            alteracao_ingredientes=Max('produto_ingredientes__ingrediente__atualizado_em')
+        ).values_list('pizzaria_id', 'atualizado_em', 'alteracao_ingredientes'),
+        id=produto_id,
+    )
 
-    if not usuario_pizzaria.is_super_admin() and produto.pizzaria != usuario_pizzaria.pizzaria:
+    if not usuario_pizzaria.is_super_admin() and pizzaria_id != usuario_pizzaria.pizzaria_id:
         return JsonResponse({"error": "Permissão negada"}, status=403)
 
+    etag = calcular_etag('ingredientes_produto', produto_id, alteracao_produto, alteracao_ingredientes)
+    resposta = nao_modificado(request, etag)
+    if resposta is not None:
+        return resposta
+
     ingredientes = []
-    for pi in produto.produto_ingredientes.select_related('ingrediente').all():
+    for pi in ProdutoIngrediente.objects.filter(produto_id=produto_id).select_related('ingrediente'):
         ingredientes.append({
             'ingrediente_id': pi.ingrediente.id,
             'ingrediente_nome': pi.ingrediente.nome,
@@ -184,13 +208,13 @@ def ingredientes_produto(request, produto_id):
             'unidade': pi.unidade
         })
 
-    return JsonResponse({"ingredientes": ingredientes})
+    return marcar_versao(JsonResponse({"ingredientes": ingredientes}), etag)
 
 
 @login_required
 def excluir_produto(request, produto_id):
     """Exclui um produto."""
-    usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
     if not usuario_pizzaria:
         messages.error(request, "Usuário sem permissões no sistema.")
         return redirect("login")
@@ -214,7 +238,7 @@ def alternar_disponibilidade(request, produto_id):
     if request.method != "POST":
         return redirect("lista_produtos")
 
-    usuario_pizzaria = UsuarioPizzaria.objects.filter(usuario=request.user, ativo=True).first()
+    usuario_pizzaria = request.tenant.usuario_pizzaria
     if not usuario_pizzaria:
         messages.error(request, "Usuário sem permissões no sistema.")
         return redirect("login")
@@ -239,7 +263,7 @@ def alternar_disponibilidade(request, produto_id):
 @login_required
 def lista_categorias(request):
     """Lista categorias da pizzaria e processa cadastro via modal."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
 
     if request.method == 'POST':
@@ -271,7 +295,7 @@ def lista_categorias(request):
 @login_required
 def editar_categoria(request, categoria_id):
     """Edita uma categoria existente."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     categoria = get_object_or_404(CategoriaProduto, id=categoria_id)
 
     # Verificar permissão
@@ -300,7 +324,7 @@ def editar_categoria(request, categoria_id):
 @login_required
 def excluir_categoria(request, categoria_id):
     """Exclui uma categoria."""
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     categoria = get_object_or_404(CategoriaProduto, id=categoria_id)
 
     # Verificar permissão
@@ -326,7 +350,7 @@ def reordenar_categorias(request):
     if request.method != "POST":
         return JsonResponse({"error": "Método não permitido"}, status=405)
     
-    usuario_pizzaria = get_object_or_404(UsuarioPizzaria, usuario=request.user, ativo=True)
+    usuario_pizzaria = request.tenant.obter_ou_404()
     pizzaria = usuario_pizzaria.pizzaria
     
     try:
@@ -348,7 +372,7 @@ def reordenar_categorias(request):
 @login_required
 def gerenciar_precos(request, produto_id):
     """Gerencia preços de um produto específico."""
-    pizzaria = request.user.usuarios_pizzaria.first().pizzaria
+    pizzaria = request.tenant.pizzaria
     produto = get_object_or_404(Produto, id=produto_id, pizzaria=pizzaria)
     
     # Buscar ou criar preço atual